@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+CRM Search Benchmark
+Typeahead latency over N accounts: unanchored $regex vs the search index
+
+Variants:
+- regex:  $or of case-insensitive $regex on customer_name / gstin / billing_city
+          (what /crm/accounts?search= did before)
+- index:  search_index.search() - $all over prefix tokens, ranked in Python
+          (GET /crm/search)
+
+Needs a MongoDB at MONGO_URL; uses a scratch database that is dropped
+afterwards. Generating and indexing 500k accounts takes a few minutes.
+
+Usage:
+    python benchmarks/crm_search.py
+    python benchmarks/crm_search.py --accounts 100000 --queries 200
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+from pymongo import IndexModel  # noqa: E402
+
+from utils import search_index  # noqa: E402
+
+NAME_WORDS = ["Shree", "Insta", "Bharat", "Ganesh", "Sai", "Krishna", "Global", "National", "Royal", "Sunrise",
+              "Apex", "Prime", "Metro", "Star", "Omkar", "Laxmi", "Balaji", "Vinayak", "Jay", "Ambica"]
+TRADE_WORDS = ["Tapes", "Adhesives", "Packaging", "Traders", "Polymers", "Industries", "Enterprises", "Plastics",
+               "Labels", "Films", "Distributors", "Agencies", "Corporation", "Exports", "Converters"]
+CITIES = ["Mumbai", "Pune", "Delhi", "Ahmedabad", "Surat", "Chennai", "Bengaluru", "Hyderabad", "Kolkata", "Jaipur",
+          "Indore", "Nagpur", "Ludhiana", "Rajkot", "Vadodara", "Coimbatore", "Nashik", "Thane", "Noida", "Faridabad"]
+BATCH = 5000
+
+
+def account(n):
+    name = f"{random.choice(NAME_WORDS)} {random.choice(NAME_WORDS)} {random.choice(TRADE_WORDS)} {n}"
+    return {
+        "id": str(uuid.uuid4()),
+        "customer_name": name,
+        "gstin": f"{random.randint(1, 37):02d}AAB{n:07d}Z{random.randint(1, 9)}",
+        "billing_city": random.choice(CITIES),
+        "contacts": [{"name": f"Contact {n}", "phone": f"9{random.randint(100000000, 999999999)}"}],
+        "is_active": True,
+        "created_by": "bench",
+        "assigned_to": "bench",
+    }
+
+
+def queries(count):
+    out = []
+    for _ in range(count):
+        kind = random.random()
+        if kind < 0.5:
+            out.append(random.choice(NAME_WORDS)[:random.randint(2, 5)])
+        elif kind < 0.8:
+            out.append(f"{random.choice(NAME_WORDS)[:4]} {random.choice(TRADE_WORDS)[:3]}")
+        else:
+            out.append(f"{random.choice(TRADE_WORDS)[:5]} {random.choice(CITIES)[:3]}")
+    return out
+
+
+async def regex_search(db, q, limit):
+    pattern = {"$regex": q, "$options": "i"}
+    query = {"$or": [{"customer_name": pattern}, {"gstin": pattern}, {"billing_city": pattern}]}
+    return await db.accounts.find(query, {"_id": 0, "id": 1}).limit(limit).to_list(limit)
+
+
+async def index_search(db, q, limit):
+    return await search_index.search(db, q, {"accounts": {}}, limit)
+
+
+async def latencies(fn, db, qs, limit):
+    samples = []
+    for q in qs:
+        start = time.perf_counter()
+        await fn(db, q, limit)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summary(samples):
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"p50 {statistics.median(ordered):8.1f} ms   p95 {p95:8.1f} ms   max {ordered[-1]:8.1f} ms"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=500_000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[f"search_benchmark_{uuid.uuid4().hex[:8]}"]
+    try:
+        await db.search_index.create_indexes([
+            IndexModel([("type", 1), ("doc_id", 1)], unique=True),
+            IndexModel([("tokens", 1), ("type", 1)]),
+        ])
+        start = time.perf_counter()
+        for offset in range(0, args.accounts, BATCH):
+            await db.accounts.insert_many([account(n) for n in range(offset, min(offset + BATCH, args.accounts))])
+        print(f"generated {args.accounts:,} accounts in {time.perf_counter() - start:.1f} s")
+
+        start = time.perf_counter()
+        await search_index.rebuild_search_index(db, ["accounts"])
+        print(f"indexed in {time.perf_counter() - start:.1f} s")
+
+        qs = queries(args.queries)
+        await index_search(db, qs[0], args.limit)  # warm up
+        print(f"{args.queries} typeahead queries, top {args.limit}")
+        print(f"  regex  {summary(await latencies(regex_search, db, qs, args.limit))}")
+        print(f"  index  {summary(await latencies(index_search, db, qs, args.limit))}")
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
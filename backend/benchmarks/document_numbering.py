@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Document Numbering Benchmark
+Throughput of generate_document_number() in strict and block allocation
+
+Variants:
+- strict:  one document_counters $inc per number (gap-free; statutory series)
+- block:   one $inc per block_size numbers per worker (hi/lo)
+- bulk:    generate_document_numbers() - one $inc for the whole run
+
+Each variant runs --concurrency coroutines that together draw --count
+numbers, then checks every number is unique.
+
+Needs a MongoDB at MONGO_URL; uses a scratch database that is dropped
+afterwards.
+
+Usage:
+    python benchmarks/document_numbering.py
+    python benchmarks/document_numbering.py --count 50000 --concurrency 64 --block-size 500
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+from utils.document_numbering import (  # noqa: E402
+    generate_document_number, generate_document_numbers, update_series_config,
+)
+
+
+async def drawn(db, doc_type, count, concurrency):
+    numbers = []
+
+    async def worker(n):
+        for _ in range(n):
+            numbers.append(await generate_document_number(db, doc_type, 'HO'))
+
+    share, extra = divmod(count, concurrency)
+    await asyncio.gather(*(worker(share + (1 if i < extra else 0)) for i in range(concurrency)))
+    return numbers
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    numbers = await coro
+    return time.perf_counter() - start, numbers
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--block-size", type=int, default=100)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[f"numbering_benchmark_{uuid.uuid4().hex[:8]}"]
+    try:
+        await update_series_config(db, "bench_strict", {"allocation": "strict"})
+        await update_series_config(db, "bench_block", {"allocation": "block", "block_size": args.block_size})
+
+        results = [
+            ("strict", *await timed(drawn(db, "bench_strict", args.count, args.concurrency))),
+            (f"block({args.block_size})", *await timed(drawn(db, "bench_block", args.count, args.concurrency))),
+            ("bulk", *await timed(generate_document_numbers(db, "bench_bulk", args.count, 'HO'))),
+        ]
+
+        print(f"{args.count:,} numbers, {args.concurrency} concurrent callers")
+        strict_secs = results[0][1]
+        for name, secs, numbers in results:
+            unique = len(set(numbers)) == len(numbers) == args.count
+            print(f"  {name:<12} {secs:8.2f} s  {args.count / secs:10,.0f}/s  "
+                  f"{strict_secs / secs:6.1f}x  {'unique' if unique else 'DUPLICATES'}")
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
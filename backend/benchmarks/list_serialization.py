@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+List Serialization Benchmark
+Compares the cost of turning 1000 Mongo rows into a JSON response body
+
+Variants (per list endpoint model):
+- validated:  Model(**doc) per row, response_model re-validation, stdlib json
+               (what get_leads/get_accounts did before)
+- validated+orjson: same validation, rendered by FastJSONResponse
+- trusted:    utils.fast_json.trusted_rows + orjson, no model construction
+
+Runs in-process against synthetic documents; no server or database needed.
+
+Usage:
+    python benchmarks/list_serialization.py
+    python benchmarks/list_serialization.py --rows 1000 --repeat 50
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+# Motor connects lazily, so a placeholder URL is enough to import the models
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "serialization_benchmark")
+
+from pydantic import TypeAdapter  # noqa: E402
+
+from routes.crm import Lead, Account  # noqa: E402
+from utils.fast_json import dumps, trusted_rows, orjson  # noqa: E402
+
+
+def fake_lead(i):
+    now = datetime.now(timezone.utc).isoformat()
+    return {
+        "id": str(uuid.uuid4()), "company_name": f"Company {i}", "contact_person": f"Person {i}",
+        "email": f"contact{i}@example.com", "phone": f"98{i:08d}", "city": "Mumbai",
+        "state": "Maharashtra", "pincode": "400001", "source": "website",
+        "industry": random.choice(["Packaging", "Automotive", "Pharma"]),
+        "status": random.choice(["new", "contacted", "qualified", "proposal"]),
+        "estimated_value": random.uniform(1e4, 1e6), "notes": "Follow up next week " * 3,
+        "assigned_to": str(uuid.uuid4()), "lead_score": random.randint(0, 100),
+        "created_by": str(uuid.uuid4()), "created_at": now, "updated_at": now,
+    }
+
+
+def fake_account(i):
+    now = datetime.now(timezone.utc).isoformat()
+    return {
+        "id": str(uuid.uuid4()), "customer_name": f"Customer {i}", "account_type": "Customer",
+        "gstin": f"27AAAAA{i:04d}A1Z5", "billing_address": f"{i} Industrial Estate, Andheri",
+        "billing_city": "Mumbai", "billing_state": "Maharashtra", "billing_pincode": "400069",
+        "shipping_addresses": [{"address": f"Plot {i}", "city": "Pune"}],
+        "contacts": [{"name": f"Person {i}", "phone": f"98{i:08d}", "is_primary": True}],
+        "credit_limit": 500000.0, "credit_days": 30, "credit_control": "Warn",
+        "payment_terms": "30 days", "total_outstanding": random.uniform(0, 1e5),
+        "created_by": str(uuid.uuid4()), "created_at": now, "updated_at": now,
+    }
+
+
+def stdlib_dumps(content):
+    # Starlette JSONResponse.render
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def make_variants(model):
+    adapter = TypeAdapter(List[model])
+
+    def validated(docs, render):
+        # FastAPI: endpoint builds models, then serialize_response dumps,
+        # re-validates against response_model and serializes in JSON mode
+        models = [model(**doc) for doc in docs]
+        content = adapter.validate_python([m.model_dump() for m in models])
+        return render(adapter.dump_python(content, mode="json"))
+
+    return {
+        "validated": lambda docs: validated(docs, stdlib_dumps),
+        "validated+orjson": lambda docs: validated(docs, dumps),
+        "trusted": lambda docs: dumps(trusted_rows(model, docs)),
+    }
+
+
+def bench(fn, docs, repeat):
+    fn(docs)  # warm up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(docs)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("orjson is not installed - fast variants fall back to the stdlib encoder")
+
+    for model, factory in ((Lead, fake_lead), (Account, fake_account)):
+        docs = [factory(i) for i in range(args.rows)]
+        print(f"\n{model.__name__}: {args.rows} rows, median of {args.repeat}")
+        baseline = None
+        for name, fn in make_variants(model).items():
+            seconds = bench(fn, docs, args.repeat)
+            baseline = baseline or seconds
+            print(f"  {name:<18} {seconds * 1000:8.2f} ms  {args.rows / seconds:>10,.0f} rows/s  "
+                  f"x{baseline / seconds:.1f}")
+
+
+if __name__ == "__main__":
+    main()
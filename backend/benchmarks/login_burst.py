@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Login Burst Benchmark
+Measures latency of an unrelated endpoint while a burst of logins is running
+
+Simulates a shift-start login storm: LOGIN_THREADS clients log in repeatedly
+while one probe client keeps calling a cheap authenticated endpoint. If bcrypt
+blocks the event loop, probe p99 climbs to several hundred milliseconds; with
+hashing offloaded (utils/passwords.py) it stays close to the idle baseline.
+
+Usage:
+    REACT_APP_BACKEND_URL=http://localhost:8001 python benchmarks/login_burst.py
+    python benchmarks/login_burst.py --logins 400 --threads 32 --probe /api/auth/me
+"""
+
+import argparse
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'http://localhost:8001').rstrip('/')
+ADMIN_EMAIL = os.environ.get('BENCH_EMAIL', 'admin@instabiz.com')
+ADMIN_PASSWORD = os.environ.get('BENCH_PASSWORD', 'adminpassword')
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def summarize(label, samples):
+    ms = [s * 1000 for s in samples]
+    print(f"{label:<24} n={len(ms):<6} "
+          f"p50={percentile(ms, 50):7.1f}ms  p95={percentile(ms, 95):7.1f}ms  "
+          f"p99={percentile(ms, 99):7.1f}ms  max={max(ms) if ms else 0:7.1f}ms")
+
+
+def login(session):
+    start = time.perf_counter()
+    resp = session.post(f"{BASE_URL}/api/auth/login",
+                        json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}, timeout=60)
+    resp.raise_for_status()
+    return time.perf_counter() - start, resp.json()["token"]
+
+
+def probe_loop(token, path, stop, samples):
+    session = requests.Session()
+    session.headers.update({"Authorization": f"Bearer {token}"})
+    while not stop.is_set():
+        start = time.perf_counter()
+        session.get(f"{BASE_URL}{path}", timeout=60)
+        samples.append(time.perf_counter() - start)
+        time.sleep(0.01)
+
+
+def run_probe(token, path, seconds):
+    samples = []
+    stop = threading.Event()
+    t = threading.Thread(target=probe_loop, args=(token, path, stop, samples))
+    t.start()
+    time.sleep(seconds)
+    stop.set()
+    t.join()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200, help="total logins in the burst")
+    parser.add_argument("--threads", type=int, default=16, help="concurrent login clients")
+    parser.add_argument("--probe", default="/api/auth/me", help="unrelated endpoint to measure")
+    parser.add_argument("--baseline-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    _, token = login(requests.Session())
+
+    print(f"Target: {BASE_URL}  probe: {args.probe}")
+    summarize("probe (idle)", run_probe(token, args.probe, args.baseline_seconds))
+
+    probe_samples = []
+    stop = threading.Event()
+    probe = threading.Thread(target=probe_loop, args=(token, args.probe, stop, probe_samples))
+    probe.start()
+
+    def worker(_):
+        return login(requests.Session())[0]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        login_samples = list(pool.map(worker, range(args.logins)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    probe.join()
+
+    summarize("probe (login burst)", probe_samples)
+    summarize("login", login_samples)
+    print(f"login throughput: {args.logins / elapsed:.1f}/s  "
+          f"(mean {statistics.mean(login_samples) * 1000:.0f}ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Quotation Pricing Benchmark
+Time to price N quotations of L lines each, in-process (no database)
+
+Variants:
+- per-document:  the float loop calculate_quotation_totals() ran before,
+                 once per quotation
+- batch:         utils.pricing.price_documents() over all N in one call,
+                 integer paise arithmetic (POST /crm/quotations/reprice)
+
+The float loop is cheaper per quotation since it does less (no per-line
+tax split, no exact rounding); what the batch call replaces is one HTTP
+round trip per quotation during a mass revision. The numbers that matter are the
+quotations whose float lines do not add up to their own total and those
+whose total is off from per-line rounding.
+
+Usage:
+    python benchmarks/quotation_pricing.py
+    python benchmarks/quotation_pricing.py --quotations 20000 --lines 8
+"""
+
+import argparse
+import random
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from utils.pricing import price_documents  # noqa: E402
+
+
+def float_totals(items, header_discount_percent):
+    """The float loop the quotation, invoice and PO helpers used (two passes)"""
+    subtotal = 0
+    calculated_items = []
+    for item in items:
+        line_subtotal = item['quantity'] * item['unit_price']
+        line_taxable = line_subtotal - line_subtotal * (item['discount_percent'] / 100)
+        line_total = line_taxable + line_taxable * (item['tax_percent'] / 100)
+        calculated_items.append({**item, 'line_total': round(line_total, 2)})
+        subtotal += line_subtotal
+
+    total_tax = 0
+    taxable_amount = 0
+    for item in items:
+        item_taxable = item['quantity'] * item['unit_price'] * (1 - item['discount_percent'] / 100)
+        item_taxable -= item_taxable * (header_discount_percent / 100)
+        taxable_amount += item_taxable
+        total_tax += item_taxable * (item['tax_percent'] / 100)
+    return {'items': calculated_items, 'grand_total': round(taxable_amount + total_tax, 2)}
+
+
+def fake_quotation(lines):
+    return {
+        'items': [{
+            'item_name': f"Tape {n}",
+            'quantity': random.choice([1, 12, 48, 250, 1000, 2.5, 0.75]),
+            'unit_price': round(random.uniform(0.5, 5000), 2),
+            'discount_percent': random.choice([0, 0, 2.5, 5, 7.5, 10]),
+            'tax_percent': random.choice([5, 12, 18, 18, 28]),
+        } for n in range(lines)],
+        'header_discount_percent': random.choice([0, 0, 1.5, 3]),
+        'is_interstate': random.random() < 0.3,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quotations", type=int, default=20_000)
+    parser.add_argument("--lines", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    docs = [fake_quotation(args.lines) for _ in range(args.quotations)]
+
+    start = time.perf_counter()
+    floats = [float_totals(d['items'], d['header_discount_percent']) for d in docs]
+    float_secs = time.perf_counter() - start
+
+    start = time.perf_counter()
+    exact = price_documents(docs)
+    batch_secs = time.perf_counter() - start
+
+    differ = sum(1 for f, e in zip(floats, exact) if abs(f['grand_total'] - e['grand_total']) >= 0.01)
+    unbalanced = sum(
+        1 for f in floats
+        if sum(Decimal(str(i['line_total'])) for i in f['items']) != Decimal(str(f['grand_total']))
+    )
+    exact_unbalanced = sum(
+        1 for e in exact
+        if sum(Decimal(str(i['line_total'])) for i in e['items']) != Decimal(str(e['grand_total']))
+    )
+
+    print(f"{args.quotations:,} quotations x {args.lines} lines")
+    print(f"  per-document float  {float_secs:8.3f} s")
+    print(f"  batch exact         {batch_secs:8.3f} s")
+    print(f"  grand totals differing by >= 1 paisa (float vs per-line rounding): {differ:,}")
+    print(f"  lines not adding up to the total: float {unbalanced:,}, exact {exact_unbalanced:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Serial Number Generation Benchmark
+Time to generate and store N item serial numbers
+
+Variants:
+- per-serial:  read config, increment, write config, insert one serial doc
+               (what generate_serial_number / label runs did before)
+- range:       one reserve_range() $inc for all N, then insert_many in chunks
+               (POST /inventory-advanced/serial-numbers/generate)
+
+Needs a MongoDB at MONGO_URL; uses a scratch database that is dropped
+afterwards. The per-serial variant is capped (--per-serial-max) and
+extrapolated, since at 100k it takes minutes.
+
+Usage:
+    python benchmarks/serial_generation.py
+    python benchmarks/serial_generation.py --count 100000 --per-serial-max 2000
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+from utils.serial_ranges import reserve_range, expand, format_serial, fy_code  # noqa: E402
+
+CHUNK = 5000
+
+
+def serial_doc(serial_number, now):
+    return {
+        "id": str(uuid.uuid4()), "item_id": "bench-item", "item_code": "BENCH", "item_name": "Bench item",
+        "serial_number": serial_number, "batch_id": None, "warehouse_id": "bench-wh", "bin_location": None,
+        "status": "available", "purchase_date": now[:10], "warranty_expiry": None, "current_owner": None,
+        "notes": None, "created_at": now,
+    }
+
+
+async def per_serial(db, count):
+    now = datetime.now(timezone.utc).isoformat()
+    for _ in range(count):
+        config = await db.serial_number_configs.find_one({"doc_type": "per_serial", "warehouse_id": "bench-wh"})
+        config = config or {"prefix": "BENCHP", "current_number": 0}
+        next_number = (config.get("current_number", 0) or 0) + 1
+        await db.serial_number_configs.update_one(
+            {"doc_type": "per_serial", "warehouse_id": "bench-wh"},
+            {"$set": {"current_number": next_number}}, upsert=True
+        )
+        await db.serial_numbers.insert_one(serial_doc(format_serial(config, next_number, fy_code(config)), now))
+
+
+async def ranged(db, count):
+    now = datetime.now(timezone.utc).isoformat()
+    config, start, end = await reserve_range(db, "range", "bench-wh", count, prefix="BENCH")
+    serials = expand(config, start, end)
+    while True:
+        chunk = [serial_doc(sn, now) for sn in itertools.islice(serials, CHUNK)]
+        if not chunk:
+            break
+        await db.serial_numbers.insert_many(chunk, ordered=False)
+
+
+async def timed(fn, db, count):
+    start = time.perf_counter()
+    await fn(db, count)
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--per-serial-max", type=int, default=2000,
+                        help="serials actually generated by the per-serial variant before extrapolating")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[f"serial_benchmark_{uuid.uuid4().hex[:8]}"]
+    try:
+        await db.serial_number_configs.create_index([("doc_type", 1), ("warehouse_id", 1)], unique=True)
+        await db.serial_numbers.create_index([("serial_number", 1)])
+
+        sample = min(args.count, args.per_serial_max)
+        per_serial_secs = await timed(per_serial, db, sample) * args.count / sample
+        range_secs = await timed(ranged, db, args.count)
+
+        print(f"{args.count:,} serials")
+        note = f" (extrapolated from {sample:,})" if sample < args.count else ""
+        print(f"  per-serial  {per_serial_secs:8.2f} s{note}")
+        print(f"  range       {range_secs:8.2f} s   {per_serial_secs / range_secs:6.1f}x faster")
+        stored = await db.serial_numbers.count_documents({"serial_number": {"$regex": "^BENCH"}})
+        distinct = len(await db.serial_numbers.distinct("serial_number"))
+        print(f"  stored {stored:,} serials, {distinct:,} distinct")
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
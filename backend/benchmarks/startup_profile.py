@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Worker Startup Benchmark
+Measures import time and RSS of `server` (the FastAPI app with every router)
+
+Each run imports server.py in a fresh interpreter, the same way a uvicorn
+worker boots, and reports:
+- wall time to import the app
+- peak RSS after import
+- which heavy libraries were loaded eagerly (they should all be lazy now)
+
+Usage:
+    python benchmarks/startup_profile.py                      # 5 runs, print summary
+    python benchmarks/startup_profile.py --save baseline.json # record a baseline
+    python benchmarks/startup_profile.py --check baseline.json --tolerance 0.2
+        exits 1 if median time or RSS regressed by more than 20%, or if a
+        heavy library became an eager import again
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = [
+    "pandas", "numpy", "openpyxl", "reportlab", "xlsxwriter", "qrcode", "PIL",
+    "emergentintegrations", "litellm", "google.generativeai", "google.genai", "openai",
+]
+
+PROBE = r"""
+import json, resource, sys, time
+start = time.perf_counter()
+import server  # noqa: F401
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":
+    rss_kb //= 1024
+heavy = [m for m in json.loads(sys.argv[1]) if m in sys.modules]
+print(json.dumps({"import_seconds": elapsed, "rss_mb": rss_kb / 1024, "eager_heavy": heavy,
+                  "routes": len(server.app.routes)}))
+"""
+
+
+def run_once():
+    env = dict(os.environ)
+    # Motor connects lazily, so a placeholder URL is enough to import the app
+    env.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    env.setdefault("DB_NAME", "startup_benchmark")
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE, json.dumps(HEAVY_MODULES)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--save", help="write the summary as a baseline JSON file")
+    parser.add_argument("--check", help="compare against a baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    summary = {
+        "import_seconds": statistics.median(r["import_seconds"] for r in runs),
+        "rss_mb": statistics.median(r["rss_mb"] for r in runs),
+        "eager_heavy": sorted({m for r in runs for m in r["eager_heavy"]}),
+        "routes": runs[-1]["routes"],
+    }
+
+    print(f"import time (median of {args.runs}): {summary['import_seconds'] * 1000:.0f} ms")
+    print(f"peak RSS   (median of {args.runs}): {summary['rss_mb']:.1f} MB")
+    print(f"routes registered: {summary['routes']}")
+    print(f"heavy libraries loaded at import: {', '.join(summary['eager_heavy']) or 'none'}")
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(summary, indent=2))
+        print(f"baseline written to {args.save}")
+
+    if args.check:
+        baseline = json.loads(Path(args.check).read_text())
+        failures = []
+        for key in ("import_seconds", "rss_mb"):
+            limit = baseline[key] * (1 + args.tolerance)
+            if summary[key] > limit:
+                failures.append(f"{key}: {summary[key]:.3f} > {limit:.3f} (baseline {baseline[key]:.3f})")
+        new_heavy = set(summary["eager_heavy"]) - set(baseline.get("eager_heavy", []))
+        if new_heavy:
+            failures.append(f"new eager heavy imports: {', '.join(sorted(new_heavy))}")
+        if failures:
+            print("REGRESSION:\n  " + "\n  ".join(failures))
+            sys.exit(1)
+        print("no regression against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone, timedelta
 import uuid
 
 from server import db, get_current_user
+from routes.field_registry import fields_projection
+from utils.indexes import register_index
+from utils.pagination import fetch_page, set_next_cursor, MAX_PAGE_SIZE
+from utils.fast_json import raw_response
+from utils.pricing import price_document, supply_terms
 
 router = APIRouter()
 
+register_index("invoices", [("id", 1)], unique=True)
+register_index("invoices", [("invoice_type", 1), ("invoice_date", -1)])
+register_index("invoices", [("account_id", 1), ("invoice_type", 1), ("invoice_date", -1)])
+register_index("invoices", [("status", 1), ("due_date", 1)])
+register_index("invoices", [("invoice_date", -1), ("id", -1)])
+register_index("payments", [("id", 1)], unique=True)
+register_index("payments", [("account_id", 1), ("payment_date", -1)])
+register_index("payments", [("payment_type", 1), ("payment_date", -1)])
+register_index("payments", [("payment_date", -1), ("id", -1)])
+register_index("ledgers", [("id", 1)], unique=True)
+register_index("journal_entries", [("id", 1)], unique=True)
+
 
 # ==================== INVOICE MODELS ====================
 class InvoiceItemCreate(BaseModel):
@@ -51,6 +68,7 @@ class Invoice(BaseModel):
     igst_amount: float
     total_tax: float
     grand_total: float
+    place_of_supply: Optional[str] = None
     invoice_date: str
     due_date: str
     payment_terms: Optional[str] = None
@@ -188,53 +206,15 @@ class TrialBalanceRow(BaseModel):
 
 
 # ==================== HELPERS ====================
-def calculate_invoice_totals(items: List[dict]) -> dict:
-    subtotal = 0
-    total_discount = 0
-    total_tax = 0
-    calculated_items = []
-
-    for item in items:
-        qty = item.get("quantity", 0)
-        price = item.get("unit_price", 0)
-        discount_pct = item.get("discount_percent", 0)
-        tax_pct = item.get("tax_percent", 18)
-
-        line_subtotal = qty * price
-        line_discount = line_subtotal * (discount_pct / 100)
-        line_taxable = line_subtotal - line_discount
-        line_tax = line_taxable * (tax_pct / 100)
-        line_total = line_taxable + line_tax
-
-        calculated_items.append({
-            **item,
-            "line_subtotal": round(line_subtotal, 2),
-            "line_discount": round(line_discount, 2),
-            "line_taxable": round(line_taxable, 2),
-            "line_tax": round(line_tax, 2),
-            "line_total": round(line_total, 2),
-        })
-
-        subtotal += line_subtotal
-        total_discount += line_discount
-        total_tax += line_tax
+INVOICE_TOTAL_FIELDS = (
+    "items", "subtotal", "discount_amount", "taxable_amount",
+    "cgst_amount", "sgst_amount", "igst_amount", "total_tax", "grand_total",
+)
 
-    taxable_amount = subtotal - total_discount
-    cgst = total_tax / 2
-    sgst = total_tax / 2
-    grand_total = taxable_amount + total_tax
 
-    return {
-        "items": calculated_items,
-        "subtotal": round(subtotal, 2),
-        "discount_amount": round(total_discount, 2),
-        "taxable_amount": round(taxable_amount, 2),
-        "cgst_amount": round(cgst, 2),
-        "sgst_amount": round(sgst, 2),
-        "igst_amount": 0,
-        "total_tax": round(total_tax, 2),
-        "grand_total": round(grand_total, 2),
-    }
+def calculate_invoice_totals(items: List[dict], is_interstate: bool = False) -> dict:
+    priced = price_document(items, is_interstate=is_interstate)
+    return {k: priced[k] for k in INVOICE_TOTAL_FIELDS}
 
 
 # ==================== INVOICE ENDPOINTS ====================
@@ -246,12 +226,13 @@ async def create_invoice(inv_data: InvoiceCreate, current_user: dict = Depends(g
     prefix = "INV" if inv_data.invoice_type == "Sales" else "PINV" if inv_data.invoice_type == "Purchase" else "CN" if inv_data.invoice_type == "Credit Note" else "DN"
     inv_number = f"{prefix}-{now.strftime('%Y%m')}-{str(uuid.uuid4())[:6].upper()}"
 
-    account = await db.accounts.find_one({"id": inv_data.account_id}, {"customer_name": 1, "gstin": 1, "_id": 0})
+    account = await db.accounts.find_one({"id": inv_data.account_id}, {"customer_name": 1, "gstin": 1, "billing_state": 1, "_id": 0})
     if not account:
-        account = await db.suppliers.find_one({"id": inv_data.account_id}, {"supplier_name": 1, "gstin": 1, "_id": 0})
+        account = await db.suppliers.find_one({"id": inv_data.account_id}, {"supplier_name": 1, "gstin": 1, "state": 1, "_id": 0})
 
     items_dict = [item.model_dump() for item in inv_data.items]
-    totals = calculate_invoice_totals(items_dict)
+    supply = await supply_terms(db, account, inward=inv_data.invoice_type == "Purchase")
+    totals = calculate_invoice_totals(items_dict, supply["is_interstate"])
 
     inv_doc = {
         "id": inv_id,
@@ -261,6 +242,7 @@ async def create_invoice(inv_data: InvoiceCreate, current_user: dict = Depends(g
         "account_name": (account.get("customer_name") if account else None) or (account.get("supplier_name") if account else None),
         "account_gstin": account.get("gstin") if account else None,
         "order_id": inv_data.order_id,
+        "place_of_supply": supply["place_of_supply"],
         **totals,
         "invoice_date": inv_data.invoice_date,
         "due_date": inv_data.due_date,
@@ -283,12 +265,16 @@ async def create_invoice(inv_data: InvoiceCreate, current_user: dict = Depends(g
 
 @router.get("/invoices", response_model=List[Invoice])
 async def get_invoices(
+    response: Response,
     invoice_type: Optional[str] = None,
     account_id: Optional[str] = None,
     status: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
     overdue: Optional[bool] = None,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
     current_user: dict = Depends(get_current_user),
 ):
     query: Dict[str, Any] = {}
@@ -310,15 +296,22 @@ async def get_invoices(
         query["due_date"] = {"$lt": today}
         query["status"] = {"$nin": ["paid", "cancelled"]}
 
-    invoices = await db.invoices.find(query, {"_id": 0}).sort("invoice_date", -1).to_list(1000)
+    projection = await fields_projection(fields, "accounts", "invoices", Invoice)
+    invoices, next_cursor = await fetch_page(db.invoices, query, "invoice_date", -1, cursor, limit, projection=projection)
+    set_next_cursor(response, next_cursor)
+    if projection:
+        return raw_response(invoices, response)
     return [Invoice(**inv) for inv in invoices]
 
 
 @router.get("/invoices/{inv_id}", response_model=Invoice)
-async def get_invoice(inv_id: str, current_user: dict = Depends(get_current_user)):
-    inv = await db.invoices.find_one({"id": inv_id}, {"_id": 0})
+async def get_invoice(inv_id: str, fields: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    projection = await fields_projection(fields, "accounts", "invoices", Invoice)
+    inv = await db.invoices.find_one({"id": inv_id}, projection or {"_id": 0})
     if not inv:
         raise HTTPException(status_code=404, detail="Invoice not found")
+    if projection:
+        return raw_response(inv)
     return Invoice(**inv)
 
 
@@ -412,11 +405,15 @@ async def create_payment(pmt_data: PaymentCreate, current_user: dict = Depends(g
 
 @router.get("/payments", response_model=List[Payment])
 async def get_payments(
+    response: Response,
     payment_type: Optional[str] = None,
     account_id: Optional[str] = None,
     status: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
     current_user: dict = Depends(get_current_user),
 ):
     query: Dict[str, Any] = {}
@@ -434,7 +431,11 @@ async def get_payments(
         else:
             query["payment_date"] = {"$lte": date_to}
 
-    payments = await db.payments.find(query, {"_id": 0}).sort("payment_date", -1).to_list(1000)
+    projection = await fields_projection(fields, "accounts", "payments", Payment)
+    payments, next_cursor = await fetch_page(db.payments, query, "payment_date", -1, cursor, limit, projection=projection)
+    set_next_cursor(response, next_cursor)
+    if projection:
+        return raw_response(payments, response)
     return [Payment(**pmt) for pmt in payments]
 
 
@@ -19,7 +19,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from server import db, get_current_user
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+from utils.reorder_watchlist import open_entries
 
 router = APIRouter()
 
@@ -62,8 +62,9 @@ async def get_business_context():
     customers = await db.customers.count_documents({})
     
     # Inventory data
-    items = await db.items.find({}, {"_id": 0, "item_name": 1, "current_stock": 1, "reorder_level": 1}).to_list(500)
-    low_stock_items = [i for i in items if (i.get("current_stock", 0) or 0) < (i.get("reorder_level", 10) or 10)]
+    total_items = await db.items.estimated_document_count()
+    low_stock_count = await db.reorder_watchlist.count_documents({"status": "open"})
+    low_stock_items = await open_entries(db, 5).to_list(5)
     
     # Production data
     work_orders = await db.work_orders.find({"status": "in_progress"}, {"_id": 0}).to_list(100)
@@ -102,15 +103,16 @@ async def get_business_context():
         "net_position": ar - ap,
         "active_work_orders": len(work_orders),
         "avg_scrap_percent": round(avg_scrap, 2),
-        "low_stock_items_count": len(low_stock_items),
-        "low_stock_items": [i.get("item_name") for i in low_stock_items[:5]],
+        "low_stock_items_count": low_stock_count,
+        "low_stock_items": [i.get("item_name") for i in low_stock_items],
         "top_products": [{"name": p[0], "revenue": p[1]} for p in top_products],
-        "total_items_in_inventory": len(items)
+        "total_items_in_inventory": total_items
     }
 
 
 async def get_llm_chat(session_id: str, system_message: str):
     """Initialize LLM chat with Gemini"""
+    from emergentintegrations.llm.chat import LlmChat
     chat = LlmChat(
         api_key=EMERGENT_LLM_KEY,
         session_id=session_id,
@@ -126,6 +128,7 @@ async def natural_language_query(data: NLQueryRequest, current_user: dict = Depe
     Ask questions about your business data in natural language
     Examples: "What were our top 5 products last month?", "How much do we owe suppliers?"
     """
+    from emergentintegrations.llm.chat import UserMessage
     if not EMERGENT_LLM_KEY:
         raise HTTPException(status_code=500, detail="AI service not configured")
     
@@ -184,6 +187,7 @@ async def generate_ai_insights(data: InsightRequest, current_user: dict = Depend
     Generate AI-powered insights about business performance
     Focus areas: sales, inventory, production, finance, all
     """
+    from emergentintegrations.llm.chat import UserMessage
     if not EMERGENT_LLM_KEY:
         raise HTTPException(status_code=500, detail="AI service not configured")
     
@@ -248,6 +252,7 @@ async def predictive_analytics(data: PredictionRequest, current_user: dict = Dep
     """
     AI-powered predictions for sales, inventory needs, cash flow
     """
+    from emergentintegrations.llm.chat import UserMessage
     if not EMERGENT_LLM_KEY:
         raise HTTPException(status_code=500, detail="AI service not configured")
     
@@ -330,6 +335,7 @@ async def generate_smart_alerts(data: AlertCheckRequest, current_user: dict = De
     """
     AI detects unusual patterns and generates smart alerts
     """
+    from emergentintegrations.llm.chat import UserMessage
     if not EMERGENT_LLM_KEY:
         raise HTTPException(status_code=500, detail="AI service not configured")
     
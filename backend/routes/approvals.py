@@ -5,9 +5,14 @@ from datetime import datetime, timezone
 import uuid
 
 from server import db, get_current_user
+from utils.indexes import register_index
 
 router = APIRouter()
 
+register_index("approval_requests", [("id", 1)], unique=True)
+register_index("approval_requests", [("module", 1), ("entity_type", 1), ("entity_id", 1), ("action", 1), ("status", 1)])
+register_index("approval_requests", [("status", 1), ("approver_role", 1), ("requested_at", -1)])
+
 
 class ApprovalRequestCreate(BaseModel):
     module: str
@@ -16,12 +16,12 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone
 import uuid
 import io
-import pandas as pd
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 
 from server import db, get_current_user
+from utils.search_index import index_documents
+from utils.reorder_watchlist import sync_reorder_watchlist
 
+# pandas/openpyxl are imported inside the endpoints so they only load on first import
 router = APIRouter()
 
 
@@ -29,6 +29,8 @@ router = APIRouter()
 @router.get("/templates/{template_type}")
 async def download_template(template_type: str, current_user: dict = Depends(get_current_user)):
     """Download Excel template for bulk import"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
     
     wb = Workbook()
     ws = wb.active
@@ -179,6 +181,7 @@ async def import_customers(
     current_user: dict = Depends(get_current_user)
 ):
     """Bulk import customers from Excel"""
+    import pandas as pd
     if not file.filename.endswith(('.xlsx', '.xls')):
         raise HTTPException(status_code=400, detail="Only Excel files (.xlsx, .xls) are supported")
     
@@ -212,6 +215,7 @@ async def import_customers(
     df = df.rename(columns=column_map)
     
     results = {"success": 0, "errors": [], "skipped": 0}
+    created = []
     
     for idx, row in df.iterrows():
         try:
@@ -255,11 +259,14 @@ async def import_customers(
             }
             
             await db.accounts.insert_one(account_doc)
+            created.append(account_doc)
             results['success'] += 1
             
         except Exception as e:
             results['errors'].append({"row": idx + 2, "error": str(e)})
     
+    await index_documents(db, 'accounts', created)
+    
     return {
         "message": f"Import completed: {results['success']} created, {results['skipped']} skipped, {len(results['errors'])} errors",
         "details": results
@@ -272,6 +279,7 @@ async def import_items(
     current_user: dict = Depends(get_current_user)
 ):
     """Bulk import items from Excel"""
+    import pandas as pd
     if not file.filename.endswith(('.xlsx', '.xls')):
         raise HTTPException(status_code=400, detail="Only Excel files (.xlsx, .xls) are supported")
     
@@ -307,6 +315,7 @@ async def import_items(
     df = df.rename(columns=column_map)
     
     results = {"success": 0, "errors": [], "skipped": 0}
+    imported_ids = []
     
     for idx, row in df.iterrows():
         try:
@@ -358,11 +367,15 @@ async def import_items(
             }
             
             await db.items.insert_one(item_doc)
+            imported_ids.append(item_id)
             results['success'] += 1
             
         except Exception as e:
             results['errors'].append({"row": idx + 2, "error": str(e)})
     
+    # New items start at zero stock, so any with a reorder level are already due
+    await sync_reorder_watchlist(db, imported_ids)
+    
     return {
         "message": f"Import completed: {results['success']} created, {results['skipped']} skipped, {len(results['errors'])} errors",
         "details": results
@@ -375,6 +388,7 @@ async def import_opening_balance(
     current_user: dict = Depends(get_current_user)
 ):
     """Import opening balances for accounts"""
+    import pandas as pd
     if not file.filename.endswith(('.xlsx', '.xls')):
         raise HTTPException(status_code=400, detail="Only Excel files supported")
     
@@ -463,6 +477,7 @@ async def import_opening_stock(
     current_user: dict = Depends(get_current_user)
 ):
     """Import opening stock for items"""
+    import pandas as pd
     if not file.filename.endswith(('.xlsx', '.xls')):
         raise HTTPException(status_code=400, detail="Only Excel files supported")
     
@@ -485,6 +500,7 @@ async def import_opening_stock(
     df = df.rename(columns=column_map)
     
     results = {"success": 0, "errors": [], "not_found": []}
+    stocked_ids = []
     
     for idx, row in df.iterrows():
         try:
@@ -531,12 +547,15 @@ async def import_opening_stock(
                 "created_by": current_user['id']
             }
             await db.stock_entries.insert_one(stock_entry)
+            stocked_ids.append(item['id'])
             
             results['success'] += 1
             
         except Exception as e:
             results['errors'].append({"row": idx + 2, "error": str(e)})
     
+    await sync_reorder_watchlist(db, stocked_ids)
+    
     return {
         "message": f"Import completed: {results['success']} entries created, {len(results['not_found'])} items not found, {len(results['errors'])} errors",
         "details": results
@@ -1,83 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, UploadFile, File
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone, timedelta
 import uuid
 import re
+import io
+from pymongo import UpdateOne
 from server import db, get_current_user
+from routes.field_registry import fields_projection, get_active_kanban_stages, get_default_lead_stages
+from utils.indexes import register_index
+from utils.pagination import fetch_page, set_next_cursor, encode_cursor, MAX_PAGE_SIZE
+from utils.fast_json import model_projection, trusted_list_response, raw_response
+from utils.org_hierarchy import visibility_cache, subordinate_ids, owned_by
+from utils import search_index
+from utils.pricing import price_document, price_documents, apply_percent, to_paise, supply_for, company_state_code, supply_terms
+from utils.geo import INDIA_STATES_UT, MAX_BATCH, lookup_india_pincode, lookup_states_for_country, resolve_pincodes, load_pincode_directory
 
 router = APIRouter()
 
-import httpx
-
-# ==================== GEO HELPERS (PINCODE / STATES) ====================
-INDIA_STATES_UT = [
-    "Andhra Pradesh", "Arunachal Pradesh", "Assam", "Bihar", "Chhattisgarh", "Goa",
-    "Gujarat", "Haryana", "Himachal Pradesh", "Jharkhand", "Karnataka", "Kerala",
-    "Madhya Pradesh", "Maharashtra", "Manipur", "Meghalaya", "Mizoram", "Nagaland",
-    "Odisha", "Punjab", "Rajasthan", "Sikkim", "Tamil Nadu", "Telangana", "Tripura",
-    "Uttar Pradesh", "Uttarakhand", "West Bengal",
-    "Andaman and Nicobar Islands", "Chandigarh", "Dadra and Nagar Haveli and Daman and Diu",
-    "Delhi", "Jammu and Kashmir", "Ladakh", "Lakshadweep", "Puducherry"
-]
-
-PINCODE_API_BASE = "https://api.postalpincode.in/pincode/"
-COUNTRIESNOW_STATES_API = "https://countriesnow.space/api/v0.1/countries/states"
-
-async def lookup_india_pincode(pincode: str) -> Optional[dict]:
-    """Return {city, district, state, country} for India PIN (6 digits)"""
-    if not pincode or len(pincode) != 6 or not pincode.isdigit():
-        return None
-
-    async with httpx.AsyncClient(timeout=10.0, headers={"User-Agent": "adhesive-erp"}) as client:
-        resp = await client.get(f"{PINCODE_API_BASE}{pincode}")
-        if resp.status_code != 200:
-            return None
-        data = resp.json()
-
-    # Expected: list with one element
-    if not isinstance(data, list) or not data:
-        return None
-    entry = data[0]
-    if entry.get("Status") != "Success":
-        return None
-
-    offices = entry.get("PostOffice") or []
-    if not offices:
-        return None
-
-    po = offices[0]
-    return {
-        "country": "India",
-        "state": po.get("State"),
-        "district": po.get("District"),
-        "city": po.get("Block") or po.get("Region") or po.get("Taluk")
-    }
-
-async def lookup_states_for_country(country_name: str) -> List[str]:
-    """Free public API to get list of states/provinces for a country (no key)."""
-    if not country_name:
-        return []
-    if country_name.strip().lower() in ["india", "bharat", "in"]:
-        return INDIA_STATES_UT
-
-    payload = {"country": country_name}
-    async with httpx.AsyncClient(timeout=15.0, headers={"User-Agent": "adhesive-erp"}, follow_redirects=True) as client:
-        resp = await client.post(COUNTRIESNOW_STATES_API, json=payload)
-        if resp.status_code != 200:
-            return []
-        data = resp.json()
-
-    states = []
-    for s in (data.get("data", {}).get("states") or []):
-        name = s.get("name")
-        if name:
-            states.append(name)
-    return states
+register_index("leads", [("id", 1)], unique=True)
+register_index("leads", [("created_at", -1), ("id", -1)])
+register_index("leads", [("status", 1), ("updated_at", -1), ("id", -1)])
+register_index("leads", [("assigned_to", 1), ("created_at", -1)])
+register_index("leads", [("created_by", 1), ("created_at", -1)])
+register_index("accounts", [("id", 1)], unique=True)
+register_index("accounts", [("created_at", -1), ("id", -1)])
+register_index("accounts", [("gstin", 1)], sparse=True)
+register_index("accounts", [("assigned_to", 1), ("created_at", -1)])
+register_index("quotations", [("id", 1)], unique=True)
+register_index("quotations", [("account_id", 1), ("created_at", -1)])
+register_index("quotations", [("status", 1), ("created_at", -1)])
+register_index("quotations", [("created_at", -1), ("id", -1)])
+register_index("quotations", [("items.item_id", 1), ("status", 1)])
+register_index("samples", [("id", 1)], unique=True)
+register_index("samples", [("account_id", 1), ("created_at", -1)])
+register_index("samples", [("created_at", -1), ("id", -1)])
+register_index("followups", [("id", 1)], unique=True)
+register_index("followups", [("status", 1), ("scheduled_date", 1)])
+register_index("followups", [("scheduled_date", 1), ("id", 1)])
+register_index("search_index", [("type", 1), ("doc_id", 1)], unique=True)
+register_index("search_index", [("tokens", 1), ("type", 1)])
+register_index("pincode_directory", [("pincode", 1)], unique=True)
+register_index("geo_cache", [("expires_at", 1)], expireAfterSeconds=0)
 
 # ==================== PERMISSION HELPER ====================
 async def get_data_filter(current_user: dict, module: str) -> dict:
-    """Build query filter based on user's data access permissions"""
+    """
+    Build query filter based on user's data access permissions.
+    Compiled filters are cached per (user, module); see utils/org_hierarchy.py.
+    """
     user_id = current_user.get('id')
     role = current_user.get('role', 'viewer')
     
@@ -85,31 +56,21 @@ async def get_data_filter(current_user: dict, module: str) -> dict:
     if role == 'admin':
         return {}
 
-    # CRM Leads hierarchy rule (requested): assigned salesperson + team leader + sales manager
+    key = (user_id, module)
+    cached = visibility_cache.get(key)
+    if cached is None:
+        cached = await _compile_data_filter(user_id, role, module)
+        visibility_cache[key] = cached
+    return dict(cached)
+
+async def _compile_data_filter(user_id: str, role: str, module: str) -> dict:
+    # CRM Leads hierarchy rule (requested): assigned salesperson + every manager above them + sales manager
     if module == "crm_leads":
         if role == "sales_manager":
             return {}
 
-        if role == "sales_team_leader":
-            reports = await db.users.find({"reports_to": user_id}, {"id": 1, "_id": 0}).to_list(1000)
-            team_user_ids = [u.get("id") for u in reports if u.get("id")]
-            team_user_ids.append(user_id)
-            return {"$or": [
-                {"assigned_to": {"$in": team_user_ids}},
-                {"assigned_to": {"$in": [None, ""]}, "created_by": {"$in": team_user_ids}}
-            ]}
-
-        if role == "salesperson":
-            return {"$or": [
-                {"assigned_to": user_id},
-                {"assigned_to": {"$in": [None, ""]}, "created_by": user_id}
-            ]}
-
-        # Default: if user isn't in sales hierarchy, show only own/assigned
-        return {"$or": [
-            {"assigned_to": user_id},
-            {"assigned_to": {"$in": [None, ""]}, "created_by": user_id}
-        ]}
+        # The user's own leads plus those of everyone reporting to them, at any depth
+        return owned_by([user_id] + await subordinate_ids(db, user_id))
     
     # Check user's custom access config
     access = await db.user_access.find_one({"user_id": user_id}, {"_id": 0})
@@ -131,19 +92,13 @@ async def get_data_filter(current_user: dict, module: str) -> dict:
             # Get team members
             teams = access.get("assigned_teams", [])
             if teams:
-                team_users = await db.users.find({"team": {"$in": teams}}, {"id": 1}).to_list(100)
+                team_users = await db.users.find({"team": {"$in": teams}}, {"id": 1}).to_list(None)
                 team_user_ids = [u["id"] for u in team_users]
                 team_user_ids.append(user_id)
-                return {"$or": [
-                    {"created_by": {"$in": team_user_ids}},
-                    {"assigned_to": {"$in": team_user_ids}}
-                ]}
+                return owned_by(team_user_ids, unassigned_by_creator=False)
     
     # Default: user sees only their own data
-    return {"$or": [
-        {"created_by": user_id},
-        {"assigned_to": user_id}
-    ]}
+    return owned_by([user_id], unassigned_by_creator=False)
 
 # ==================== GST VALIDATION HELPER ====================
 INDIAN_STATES = {
@@ -420,6 +375,15 @@ class QuotationUpdate(BaseModel):
     header_discount_percent: Optional[float] = None
     status: Optional[str] = None
 
+class QuotationReprice(BaseModel):
+    prices: Dict[str, float] = {}  # item_id -> new unit price
+    use_item_master: bool = False  # other lines take the item's current selling_price
+    percent_change: Optional[float] = None  # 5 = +5%, -3 = -3% on the quoted unit price
+    item_ids: Optional[List[str]] = None  # limit percent_change to these items
+    statuses: List[str] = ['draft', 'sent']
+    account_id: Optional[str] = None
+    dry_run: bool = False
+
 class Quotation(BaseModel):
     id: str
     quote_number: str
@@ -440,6 +404,9 @@ class Quotation(BaseModel):
     igst_amount: float
     total_tax: float
     grand_total: float
+    discount_amount: float = 0
+    place_of_supply: Optional[str] = None
+    is_interstate: bool = False
     transport: Optional[str] = None
     delivery_terms: Optional[str] = None
     payment_terms: Optional[str] = None
@@ -459,16 +426,47 @@ async def get_india_states(current_user: dict = Depends(get_current_user)):
 
 @router.get("/geo/states")
 async def get_states(country: str, current_user: dict = Depends(get_current_user)):
-    states = await lookup_states_for_country(country)
+    states = await lookup_states_for_country(db, country)
     return {"country": country, "states": states}
 
 @router.get("/geo/pincode/{pincode}")
 async def get_pincode_details(pincode: str, current_user: dict = Depends(get_current_user)):
-    details = await lookup_india_pincode(pincode)
+    details = await lookup_india_pincode(db, pincode)
     if not details:
         raise HTTPException(status_code=404, detail="Pincode not found")
     return details
 
+class PincodeBatch(BaseModel):
+    pincodes: List[str] = Field(..., min_length=1, max_length=MAX_BATCH)
+    remote: bool = False  # fall back to the public API for pincodes not known locally
+
+@router.post("/geo/pincodes/resolve")
+async def resolve_pincode_batch(batch: PincodeBatch, current_user: dict = Depends(get_current_user)):
+    """
+    Resolve up to 5000 pincodes (e.g. to validate an import) in one call.
+    Only the directory and cache are used unless remote=true; even then at
+    most MAX_REMOTE_PER_CALL pincodes go to the public API per call, and the
+    rest are listed in `pending` - send those again to resolve them.
+    """
+    results, pending = await resolve_pincodes(db, batch.pincodes, remote=batch.remote)
+    deferred = set(pending)
+    return {
+        'results': results,
+        'resolved': sum(1 for r in results.values() if r),
+        'unresolved': [p for p, r in results.items() if not r and p not in deferred],
+        'pending': pending
+    }
+
+@router.post("/geo/pincodes/import")
+async def import_pincode_directory(file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
+    """Load the India Post pincode directory CSV into the local lookup table"""
+    if current_user.get('role') != 'admin':
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="Only CSV files are supported")
+    
+    return await load_pincode_directory(db, io.TextIOWrapper(file.file, encoding='utf-8-sig'))
+
 
 # ==================== CRM USERS (for assignment) ====================
 @router.get("/users/sales")
@@ -577,6 +575,32 @@ class Followup(BaseModel):
     created_at: str
 
 # ==================== LEAD ENDPOINTS ====================
+# ==================== SEARCH ====================
+@router.get("/search")
+async def search_crm(
+    q: str = Query(..., min_length=1, max_length=100),
+    types: str = "accounts,leads",
+    limit: int = Query(10, ge=1, le=50),
+    current_user: dict = Depends(get_current_user)
+):
+    """Ranked typeahead over accounts and leads (word prefixes of name, contact, phone, GSTIN, city)"""
+    requested = [t.strip() for t in types.split(',') if t.strip()]
+    unknown = [t for t in requested if t not in search_index.SEARCH_FIELDS]
+    if unknown or not requested:
+        raise HTTPException(status_code=400, detail=f"types must be among: {sorted(search_index.SEARCH_FIELDS)}")
+    
+    modules = {'accounts': 'crm_accounts', 'leads': 'crm_leads'}
+    filters = {t: await get_data_filter(current_user, modules[t]) for t in requested}
+    results = await search_index.search(db, q, filters, limit)
+    return {'query': q, 'results': results}
+
+@router.post("/search/reindex")
+async def reindex_crm_search(current_user: dict = Depends(get_current_user)):
+    """Rebuild the search index from leads and accounts (backfill / repair)"""
+    if current_user.get('role') != 'admin':
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return await search_index.rebuild_search_index(db)
+
 @router.post("/leads", response_model=Lead)
 async def create_lead(lead_data: LeadCreate, current_user: dict = Depends(get_current_user)):
     lead_id = str(uuid.uuid4())
@@ -590,7 +614,7 @@ async def create_lead(lead_data: LeadCreate, current_user: dict = Depends(get_cu
 
     # If India PIN is provided, auto-fill geo fields
     if (lead_payload.get('country') or 'India').strip().lower() == 'india' and lead_payload.get('pincode'):
-        geo = await lookup_india_pincode(lead_payload.get('pincode'))
+        geo = await lookup_india_pincode(db, lead_payload.get('pincode'))
         if geo:
             lead_payload['country'] = geo.get('country') or lead_payload.get('country')
             lead_payload['state'] = geo.get('state') or lead_payload.get('state')
@@ -600,7 +624,7 @@ async def create_lead(lead_data: LeadCreate, current_user: dict = Depends(get_cu
     lead_doc = {
         'id': lead_id,
         **lead_payload,
-        'status': lead_payload.get('status') or 'new',
+        'status': lead_payload.get('status') or LEAD_INITIAL_STATUS,
         'lead_score': 0,
         'last_contacted': None,
         'created_by': current_user['id'],
@@ -609,10 +633,12 @@ async def create_lead(lead_data: LeadCreate, current_user: dict = Depends(get_cu
     }
 
     await db.leads.insert_one(lead_doc)
+    await search_index.index_documents(db, 'leads', [lead_doc])
     return Lead(**{k: v for k, v in lead_doc.items() if k != '_id'})
 
 @router.get("/leads", response_model=List[Lead])
 async def get_leads(
+    response: Response,
     source: Optional[str] = None, 
     status: Optional[str] = None,
     assigned_to: Optional[str] = None,
@@ -622,6 +648,9 @@ async def get_leads(
     search: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
     current_user: dict = Depends(get_current_user)
 ):
     # Apply permission-based filtering
@@ -641,12 +670,8 @@ async def get_leads(
     if state:
         query['state'] = {"$regex": state, "$options": "i"}
     if search:
-        query['$or'] = [
-            {'company_name': {"$regex": search, "$options": "i"}},
-            {'contact_person': {"$regex": search, "$options": "i"}},
-            {'email': {"$regex": search, "$options": "i"}},
-            {'phone': {"$regex": search, "$options": "i"}}
-        ]
+        # Word-prefix match through the search index (company, contact, phone, email, city)
+        query.update(await search_index.list_filter(db, 'leads', search, base_filter))
     if date_from:
         query['created_at'] = {"$gte": date_from}
     if date_to:
@@ -655,8 +680,12 @@ async def get_leads(
         else:
             query['created_at'] = {"$lte": date_to}
 
-    leads = await db.leads.find(query, {'_id': 0}).sort('created_at', -1).to_list(1000)
-    return [Lead(**lead) for lead in leads]
+    projection = await fields_projection(fields, 'crm', 'leads', Lead)
+    leads, next_cursor = await fetch_page(db.leads, query, 'created_at', -1, cursor, limit, projection=projection or model_projection(Lead))
+    set_next_cursor(response, next_cursor)
+    if projection:
+        return raw_response(leads, response)
+    return trusted_list_response(Lead, leads, response)
 
 @router.post("/leads/{lead_id}/create-quotation")
 async def create_quotation_from_lead(lead_id: str, current_user: dict = Depends(get_current_user)):
@@ -729,6 +758,7 @@ async def create_quotation_from_lead(lead_id: str, current_user: dict = Depends(
             'updated_at': now
         }
         await db.accounts.insert_one(account_doc)
+        await search_index.index_documents(db, 'accounts', [account_doc])
         await db.leads.update_one({'id': lead_id}, {'$set': {'account_id': account_id, 'updated_at': now}})
         account = account_doc
 
@@ -750,7 +780,8 @@ async def create_quotation_from_lead(lead_id: str, current_user: dict = Depends(
         'tax_percent': 18,
         'line_total': 0
     }]
-    totals = calculate_quotation_totals(items_dict, 0)
+    supply = await supply_terms(db, account)
+    totals = calculate_quotation_totals(items_dict, 0, supply['is_interstate'])
 
     quote_doc = {
         'id': quote_id,
@@ -762,6 +793,7 @@ async def create_quotation_from_lead(lead_id: str, current_user: dict = Depends(
         'reference': f"Lead: {lead_id}",
         'quote_date': now_dt.isoformat(),
         'valid_until': (now_dt + timedelta(days=15)).date().isoformat(),
+        **supply,
         **totals,
         'transport': None,
         'delivery_terms': None,
@@ -779,40 +811,89 @@ async def create_quotation_from_lead(lead_id: str, current_user: dict = Depends(
     await db.quotations.insert_one(quote_doc)
     return {'message': 'Quotation created from lead', 'quotation_id': quote_id, 'quote_number': quote_number}
 
+# Status of a newly created lead; a valid target even when it is not a board stage
+LEAD_INITIAL_STATUS = 'new'
+# Board column for leads whose status is not one of the configured stages
+UNSTAGED_COLUMN = 'unstaged'
+
+async def get_lead_stages() -> List[Dict[str, Any]]:
+    """Active lead stages from the field registry (its defaults when none are saved)"""
+    return await get_active_kanban_stages('crm', 'leads', get_default_lead_stages())
+
 @router.get("/leads/kanban/view")
-async def get_leads_kanban(current_user: dict = Depends(get_current_user)):
-    """Get leads organized by status for Kanban view"""
+async def get_leads_kanban(
+    response: Response,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get leads organized by status for Kanban view.
+    
+    Cards (newest update first) and counts for every column come from one
+    $facet aggregation. Pass `status` with the column's cursor to load more
+    cards in a single column. Leads whose status is not a configured stage
+    (e.g. 'new', or a stage since removed) are shown in the 'unstaged' column.
+    """
     base_filter = await get_data_filter(current_user, "crm_leads")
+    stages = await get_lead_stages()
+    statuses = [stage['value'] for stage in stages]
+    columns = [UNSTAGED_COLUMN] + statuses
+    column_match = {value: {'status': value} for value in statuses}
+    column_match[UNSTAGED_COLUMN] = {'status': {'$nin': statuses}}
     
-    # Define Kanban columns/statuses
-    statuses = ['new', 'contacted', 'qualified', 'proposal', 'negotiation', 'converted', 'lost']
+    if status:
+        if status not in column_match:
+            raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {columns}")
+        query = {**base_filter, **column_match[status]}
+        leads, next_cursor = await fetch_page(db.leads, query, 'updated_at', -1, cursor, limit)
+        set_next_cursor(response, next_cursor)
+        return {'status': status, 'data': leads, 'cursor': next_cursor}
+    
+    # Facet keys are positional; stage values may hold characters a field name cannot
+    facets_spec = {
+        f"s{i}": [
+            {'$match': column_match[value]},
+            {'$sort': {'updated_at': -1, 'id': -1}},
+            {'$limit': limit + 1},
+            {'$project': {'_id': 0}}
+        ]
+        for i, value in enumerate(columns)
+    }
+    facets_spec['counts'] = [{'$group': {'_id': '$status', 'count': {'$sum': 1}}}]
     
-    kanban_data = {}
-    for status in statuses:
-        query = {**base_filter, 'status': status} if base_filter else {'status': status}
-        leads = await db.leads.find(query, {'_id': 0}).sort('updated_at', -1).to_list(100)
-        kanban_data[status] = leads
+    result = await db.leads.aggregate([{'$match': base_filter}, {'$facet': facets_spec}]).to_list(1)
+    facets = result[0] if result else {}
     
-    # Get status counts
-    counts = {}
-    for status in statuses:
-        query = {**base_filter, 'status': status} if base_filter else {'status': status}
-        counts[status] = await db.leads.count_documents(query)
+    status_counts = {row['_id']: row['count'] for row in facets.get('counts', [])}
+    counts = {value: status_counts.get(value, 0) for value in statuses}
+    counts[UNSTAGED_COLUMN] = sum(c for value, c in status_counts.items() if value not in counts)
+    kanban_data, cursors = {}, {}
+    for i, value in enumerate(columns):
+        leads = facets.get(f"s{i}", [])
+        cursors[value] = encode_cursor(leads[limit - 1], 'updated_at') if len(leads) > limit else None
+        kanban_data[value] = leads[:limit]
     
     return {
-        'columns': statuses,
+        'columns': columns,
         'statuses': statuses,
+        'stages': stages,
         'data': kanban_data,
-        'counts': counts
+        'counts': {value: counts[value] for value in columns},
+        'cursors': cursors
     }
 
 @router.get("/leads/{lead_id}", response_model=Lead)
-async def get_lead(lead_id: str, current_user: dict = Depends(get_current_user)):
+async def get_lead(lead_id: str, fields: Optional[str] = None, current_user: dict = Depends(get_current_user)):
     base_filter = await get_data_filter(current_user, "crm_leads")
+    projection = await fields_projection(fields, 'crm', 'leads', Lead)
     query = {"id": lead_id, **base_filter} if base_filter else {"id": lead_id}
-    lead = await db.leads.find_one(query, {'_id': 0})
+    lead = await db.leads.find_one(query, projection or {'_id': 0})
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
+    if projection:
+        return raw_response(lead)
     return Lead(**lead)
 
 @router.put("/leads/{lead_id}", response_model=Lead)
@@ -833,7 +914,7 @@ async def update_lead(lead_id: str, lead_data: LeadUpdate, current_user: dict =
 
     # If India PIN is provided/changed, auto-fill geo fields
     if (update_dict.get('country') or 'India').strip().lower() == 'india' and update_dict.get('pincode'):
-        geo = await lookup_india_pincode(update_dict.get('pincode'))
+        geo = await lookup_india_pincode(db, update_dict.get('pincode'))
         if geo:
             update_dict['country'] = geo.get('country') or update_dict.get('country')
             update_dict['state'] = geo.get('state') or update_dict.get('state')
@@ -849,6 +930,7 @@ async def update_lead(lead_id: str, lead_data: LeadUpdate, current_user: dict =
         raise HTTPException(status_code=404, detail="Lead not found")
 
     lead = await db.leads.find_one({'id': lead_id}, {'_id': 0})
+    await search_index.index_documents(db, 'leads', [lead])
     return Lead(**lead)
 
 @router.delete("/leads/{lead_id}")
@@ -865,6 +947,7 @@ async def delete_lead(lead_id: str, current_user: dict = Depends(get_current_use
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Lead not found")
 
+    await search_index.remove_records(db, 'leads', [lead_id])
     return {'message': 'Lead deleted successfully'}
 
 @router.put("/leads/{lead_id}/contact")
@@ -890,7 +973,9 @@ async def mark_lead_contacted(lead_id: str, notes: Optional[str] = None, current
 @router.put("/leads/{lead_id}/move")
 async def move_lead_status(lead_id: str, new_status: str, current_user: dict = Depends(get_current_user)):
     """Move lead to a new status (for Kanban drag-drop)"""
-    valid_statuses = ['new', 'contacted', 'qualified', 'proposal', 'negotiation', 'converted', 'lost']
+    valid_statuses = [stage['value'] for stage in await get_lead_stages()]
+    if LEAD_INITIAL_STATUS not in valid_statuses:
+        valid_statuses.append(LEAD_INITIAL_STATUS)
     if new_status not in valid_statuses:
         raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
     
@@ -932,6 +1017,7 @@ async def convert_lead_to_account(lead_id: str, account_data: AccountCreate, cur
     account_doc['contacts'] = [c.model_dump() if hasattr(c, 'model_dump') else c for c in account_doc.get('contacts', [])]
     
     await db.accounts.insert_one(account_doc)
+    await search_index.index_documents(db, 'accounts', [account_doc])
     await db.leads.update_one(
         {'id': lead_id}, 
         {'$set': {'status': 'converted', 'account_id': account_id, 'updated_at': now}}
@@ -988,7 +1074,7 @@ async def create_account(account_data: AccountCreate, current_user: dict = Depen
 
     # Auto-fill geo fields for India PIN
     if (payload.get('billing_country') or 'India').strip().lower() == 'india' and payload.get('billing_pincode'):
-        geo = await lookup_india_pincode(payload.get('billing_pincode'))
+        geo = await lookup_india_pincode(db, payload.get('billing_pincode'))
         if geo:
             payload['billing_country'] = geo.get('country') or payload.get('billing_country')
             payload['billing_state'] = geo.get('state') or payload.get('billing_state')
@@ -1028,10 +1114,12 @@ async def create_account(account_data: AccountCreate, current_user: dict = Depen
     account_doc['contacts'] = [c.model_dump() if hasattr(c, 'model_dump') else c for c in account_doc.get('contacts', [])]
     
     await db.accounts.insert_one(account_doc)
+    await search_index.index_documents(db, 'accounts', [account_doc])
     return Account(**{k: v for k, v in account_doc.items() if k != '_id'})
 
 @router.get("/accounts", response_model=List[Account])
 async def get_accounts(
+    response: Response,
     account_type: Optional[str] = None,
     is_active: Optional[bool] = None,
     location: Optional[str] = None,
@@ -1041,6 +1129,9 @@ async def get_accounts(
     industry: Optional[str] = None,
     search: Optional[str] = None,
     has_outstanding: Optional[bool] = None,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
     current_user: dict = Depends(get_current_user)
 ):
     # Apply permission-based filtering
@@ -1062,22 +1153,26 @@ async def get_accounts(
     if industry:
         query['industry'] = industry
     if search:
-        query['$or'] = [
-            {'customer_name': {"$regex": search, "$options": "i"}},
-            {'gstin': {"$regex": search, "$options": "i"}}
-        ]
+        # Word-prefix match through the search index (name, code, GSTIN, contacts, city)
+        query.update(await search_index.list_filter(db, 'accounts', search, base_filter))
     if has_outstanding:
         query['total_outstanding'] = {"$gt": 0}
     
-    accounts = await db.accounts.find(query, {'_id': 0}).sort('created_at', -1).to_list(1000)
-    return [Account(**account) for account in accounts]
-    return [Account(**account) for account in accounts]
+    projection = await fields_projection(fields, 'crm', 'accounts', Account)
+    accounts, next_cursor = await fetch_page(db.accounts, query, 'created_at', -1, cursor, limit, projection=projection or model_projection(Account))
+    set_next_cursor(response, next_cursor)
+    if projection:
+        return raw_response(accounts, response)
+    return trusted_list_response(Account, accounts, response)
 
 @router.get("/accounts/{account_id}", response_model=Account)
-async def get_account(account_id: str, current_user: dict = Depends(get_current_user)):
-    account = await db.accounts.find_one({'id': account_id}, {'_id': 0})
+async def get_account(account_id: str, fields: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    projection = await fields_projection(fields, 'crm', 'accounts', Account)
+    account = await db.accounts.find_one({'id': account_id}, projection or {'_id': 0})
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
+    if projection:
+        return raw_response(account)
     return Account(**account)
 
 @router.put("/accounts/{account_id}", response_model=Account)
@@ -1086,7 +1181,7 @@ async def update_account(account_id: str, account_data: AccountUpdate, current_u
 
     # Auto-fill geo fields for India PIN if changed
     if (update_dict.get('billing_country') or 'India').strip().lower() == 'india' and update_dict.get('billing_pincode'):
-        geo = await lookup_india_pincode(update_dict.get('billing_pincode'))
+        geo = await lookup_india_pincode(db, update_dict.get('billing_pincode'))
         if geo:
             update_dict['billing_country'] = geo.get('country') or update_dict.get('billing_country')
             update_dict['billing_state'] = geo.get('state') or update_dict.get('billing_state')
@@ -1110,6 +1205,7 @@ async def update_account(account_id: str, account_data: AccountUpdate, current_u
         raise HTTPException(status_code=404, detail="Account not found")
     
     account = await db.accounts.find_one({'id': account_id}, {'_id': 0})
+    await search_index.index_documents(db, 'accounts', [account])
     return Account(**account)
 
 @router.delete("/accounts/{account_id}")
@@ -1123,6 +1219,7 @@ async def delete_account(account_id: str, current_user: dict = Depends(get_curre
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Account not found")
     
+    await search_index.index_records(db, 'accounts', [account_id])
     return {'message': 'Account deactivated successfully'}
 
 @router.get("/accounts/{account_id}/credit-check")
@@ -1145,58 +1242,14 @@ async def check_account_credit(account_id: str, amount: float = 0, current_user:
     }
 
 # ==================== QUOTATION ENDPOINTS ====================
-def calculate_quotation_totals(items: List[dict], header_discount_percent: float = 0):
-    subtotal = 0
-    calculated_items = []
-    
-    for item in items:
-        qty = item.get('quantity', 0)
-        price = item.get('unit_price', 0)
-        discount = item.get('discount_percent', 0)
-        tax = item.get('tax_percent', 18)
-        
-        line_subtotal = qty * price
-        line_discount = line_subtotal * (discount / 100)
-        line_taxable = line_subtotal - line_discount
-        line_tax = line_taxable * (tax / 100)
-        line_total = line_taxable + line_tax
-        
-        calc_item = {**item, 'line_total': round(line_total, 2)}
-        calculated_items.append(calc_item)
-        subtotal += line_subtotal
-    
-    header_discount_amount = subtotal * (header_discount_percent / 100)
-    taxable_amount = subtotal - header_discount_amount
-    
-    # Calculate GST (assuming intra-state for now - CGST + SGST)
-    total_tax = 0
-    cgst_amount = 0
-    sgst_amount = 0
-    igst_amount = 0
-    
-    for item in items:
-        tax_rate = item.get('tax_percent', 18)
-        item_taxable = (item.get('quantity', 0) * item.get('unit_price', 0)) * (1 - item.get('discount_percent', 0) / 100)
-        item_taxable -= item_taxable * (header_discount_percent / 100)
-        item_tax = item_taxable * (tax_rate / 100)
-        total_tax += item_tax
-        cgst_amount += item_tax / 2
-        sgst_amount += item_tax / 2
-    
-    grand_total = taxable_amount + total_tax
-    
-    return {
-        'items': calculated_items,
-        'subtotal': round(subtotal, 2),
-        'header_discount_percent': header_discount_percent,
-        'header_discount_amount': round(header_discount_amount, 2),
-        'taxable_amount': round(taxable_amount, 2),
-        'cgst_amount': round(cgst_amount, 2),
-        'sgst_amount': round(sgst_amount, 2),
-        'igst_amount': round(igst_amount, 2),
-        'total_tax': round(total_tax, 2),
-        'grand_total': round(grand_total, 2)
-    }
+def calculate_quotation_totals(items: List[dict], header_discount_percent: float = 0, is_interstate: bool = False):
+    priced = price_document(items, header_discount_percent, is_interstate)
+    return {k: priced[k] for k in QUOTATION_TOTAL_FIELDS}
+
+QUOTATION_TOTAL_FIELDS = (
+    'items', 'subtotal', 'discount_amount', 'header_discount_percent', 'header_discount_amount',
+    'taxable_amount', 'cgst_amount', 'sgst_amount', 'igst_amount', 'total_tax', 'grand_total'
+)
 
 @router.post("/quotations", response_model=Quotation)
 async def create_quotation(quote_data: QuotationCreate, current_user: dict = Depends(get_current_user)):
@@ -1211,7 +1264,8 @@ async def create_quotation(quote_data: QuotationCreate, current_user: dict = Dep
     
     # Calculate totals
     items_dict = [item.model_dump() for item in quote_data.items]
-    totals = calculate_quotation_totals(items_dict, quote_data.header_discount_percent)
+    supply = await supply_terms(db, account)
+    totals = calculate_quotation_totals(items_dict, quote_data.header_discount_percent, supply['is_interstate'])
     
     quote_doc = {
         'id': quote_id,
@@ -1223,6 +1277,7 @@ async def create_quotation(quote_data: QuotationCreate, current_user: dict = Dep
         'reference': quote_data.reference,
         'quote_date': now.isoformat(),
         'valid_until': quote_data.valid_until,
+        **supply,
         **totals,
         'transport': quote_data.transport,
         'delivery_terms': quote_data.delivery_terms,
@@ -1240,11 +1295,117 @@ async def create_quotation(quote_data: QuotationCreate, current_user: dict = Dep
     await db.quotations.insert_one(quote_doc)
     return Quotation(**{k: v for k, v in quote_doc.items() if k != '_id'})
 
+REPRICE_BATCH = 1000
+
+@router.post("/quotations/reprice")
+async def reprice_quotations(data: QuotationReprice, current_user: dict = Depends(get_current_user)):
+    """
+    Apply a price change to all open quotations at once. Quotations are read
+    in batches, priced together and written back with one bulk write per
+    batch; a quotation edited in the meantime is left alone (conflicts).
+    """
+    if current_user.get('role') != 'admin':
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if not data.prices and not data.use_item_master and data.percent_change is None:
+        raise HTTPException(status_code=400, detail="Provide prices, use_item_master or percent_change")
+    if set(data.statuses) & {'accepted', 'converted'}:
+        raise HTTPException(status_code=400, detail="Cannot modify accepted or converted quotation")
+
+    query: Dict[str, Any] = {'status': {'$in': data.statuses}}
+    if data.account_id:
+        query['account_id'] = data.account_id
+    if not data.use_item_master and (data.percent_change is None or data.item_ids is not None):
+        query['items.item_id'] = {'$in': list(data.prices) + (data.item_ids or [])}
+
+    percent_scope = set(data.item_ids) if data.item_ids is not None else None
+    master_prices: Dict[str, Optional[float]] = {}
+    accounts: Dict[str, dict] = {}
+    company_code = await company_state_code(db)
+    now = datetime.now(timezone.utc).isoformat()
+    stats = {'matched': 0, 'repriced': 0, 'unchanged': 0, 'conflicts': 0}
+    value = {'before': 0, 'after': 0}
+
+    def new_price(item: dict) -> Optional[float]:
+        item_id = item.get('item_id')
+        if item_id in data.prices:
+            return data.prices[item_id]
+        if master_prices.get(item_id) is not None:
+            # A selling_price of 0 is a real price; None means the item has none
+            return master_prices[item_id]
+        if data.percent_change is not None and (percent_scope is None or item_id in percent_scope):
+            return apply_percent(item.get('unit_price'), data.percent_change)
+        return None
+
+    async def reprice_batch(batch: List[dict]):
+        item_ids = {i.get('item_id') for q in batch for i in q.get('items') or []} - {None}
+        missing = item_ids - master_prices.keys() - data.prices.keys()
+        if data.use_item_master and missing:
+            async for item in db.items.find({'id': {'$in': list(missing)}}, {'_id': 0, 'id': 1, 'selling_price': 1}):
+                master_prices[item['id']] = item.get('selling_price')
+            master_prices.update({i: None for i in missing if i not in master_prices})
+        account_ids = list({q.get('account_id') for q in batch} - accounts.keys())
+        async for account in db.accounts.find({'id': {'$in': account_ids}}, {'_id': 0, 'id': 1, 'gstin': 1, 'billing_state': 1}):
+            accounts[account['id']] = account
+
+        docs = []
+        for quote in batch:
+            items = []
+            for item in quote.get('items') or []:
+                price = new_price(item)
+                items.append(item if price is None else {**item, 'unit_price': price})
+            docs.append({
+                'items': items,
+                'header_discount_percent': quote.get('header_discount_percent') or 0,
+                **supply_for(company_code, accounts.get(quote.get('account_id')))
+            })
+
+        ops = []
+        for quote, doc, priced in zip(batch, docs, price_documents(docs)):
+            stats['matched'] += 1
+            if all(old.get('unit_price') == new.get('unit_price') for old, new in zip(quote.get('items') or [], doc['items'])):
+                stats['unchanged'] += 1
+                continue
+            update = {k: priced[k] for k in QUOTATION_TOTAL_FIELDS}
+            update.update(place_of_supply=doc['place_of_supply'], is_interstate=doc['is_interstate'], updated_at=now)
+            ops.append(UpdateOne({'id': quote['id'], 'updated_at': quote.get('updated_at')}, {'$set': update}))
+            value['before'] += to_paise(quote.get('grand_total'))
+            value['after'] += to_paise(priced['grand_total'])
+
+        if ops and not data.dry_run:
+            result = await db.quotations.bulk_write(ops, ordered=False)
+            stats['repriced'] += result.matched_count
+            stats['conflicts'] += len(ops) - result.matched_count
+        else:
+            stats['repriced'] += len(ops)
+
+    projection = {'_id': 0, 'id': 1, 'account_id': 1, 'items': 1, 'header_discount_percent': 1,
+                  'grand_total': 1, 'updated_at': 1}
+    batch = []
+    async for quote in db.quotations.find(query, projection).batch_size(REPRICE_BATCH):
+        batch.append(quote)
+        if len(batch) >= REPRICE_BATCH:
+            await reprice_batch(batch)
+            batch = []
+    if batch:
+        await reprice_batch(batch)
+
+    return {
+        **stats,
+        'dry_run': data.dry_run,
+        'value_before': value['before'] / 100,
+        'value_after': value['after'] / 100,
+        'value_change': (value['after'] - value['before']) / 100
+    }
+
 @router.get("/quotations", response_model=List[Quotation])
 async def get_quotations(
+    response: Response,
     account_id: Optional[str] = None,
     status: Optional[str] = None,
     salesperson_id: Optional[str] = None,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
     current_user: dict = Depends(get_current_user)
 ):
     query = {}
@@ -1255,14 +1416,21 @@ async def get_quotations(
     if salesperson_id:
         query['salesperson_id'] = salesperson_id
     
-    quotations = await db.quotations.find(query, {'_id': 0}).sort('created_at', -1).to_list(1000)
+    projection = await fields_projection(fields, 'crm', 'quotations', Quotation)
+    quotations, next_cursor = await fetch_page(db.quotations, query, 'created_at', -1, cursor, limit, projection=projection)
+    set_next_cursor(response, next_cursor)
+    if projection:
+        return raw_response(quotations, response)
     return [Quotation(**quote) for quote in quotations]
 
 @router.get("/quotations/{quote_id}", response_model=Quotation)
-async def get_quotation(quote_id: str, current_user: dict = Depends(get_current_user)):
-    quote = await db.quotations.find_one({'id': quote_id}, {'_id': 0})
+async def get_quotation(quote_id: str, fields: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    projection = await fields_projection(fields, 'crm', 'quotations', Quotation)
+    quote = await db.quotations.find_one({'id': quote_id}, projection or {'_id': 0})
     if not quote:
         raise HTTPException(status_code=404, detail="Quotation not found")
+    if projection:
+        return raw_response(quote)
     return Quotation(**quote)
 
 @router.put("/quotations/{quote_id}", response_model=Quotation)
@@ -1276,12 +1444,14 @@ async def update_quotation(quote_id: str, quote_data: QuotationUpdate, current_u
     
     update_dict = {k: v for k, v in quote_data.model_dump().items() if v is not None}
     
-    # Recalculate totals if items changed
-    if 'items' in update_dict:
-        items_dict = [item.model_dump() if hasattr(item, 'model_dump') else item for item in update_dict['items']]
+    # Recalculate totals if items or the header discount changed
+    if 'items' in update_dict or 'header_discount_percent' in update_dict:
+        items_dict = update_dict.get('items', existing.get('items', []))
         discount = update_dict.get('header_discount_percent', existing.get('header_discount_percent', 0))
-        totals = calculate_quotation_totals(items_dict, discount)
-        update_dict.update(totals)
+        account = await db.accounts.find_one({'id': existing['account_id']}, {'_id': 0, 'gstin': 1, 'billing_state': 1})
+        supply = await supply_terms(db, account)
+        update_dict.update(supply)
+        update_dict.update(calculate_quotation_totals(items_dict, discount, supply['is_interstate']))
     
     update_dict['updated_at'] = datetime.now(timezone.utc).isoformat()
     
@@ -1397,9 +1567,13 @@ async def create_sample(sample_data: SampleCreate, current_user: dict = Depends(
 
 @router.get("/samples", response_model=List[Sample])
 async def get_samples(
+    response: Response,
     account_id: Optional[str] = None,
     status: Optional[str] = None,
     feedback_status: Optional[str] = None,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
     current_user: dict = Depends(get_current_user)
 ):
     query = {}
@@ -1410,14 +1584,21 @@ async def get_samples(
     if feedback_status:
         query['feedback_status'] = feedback_status
     
-    samples = await db.samples.find(query, {'_id': 0}).sort('created_at', -1).to_list(1000)
+    projection = await fields_projection(fields, 'crm', 'samples', Sample)
+    samples, next_cursor = await fetch_page(db.samples, query, 'created_at', -1, cursor, limit, projection=projection)
+    set_next_cursor(response, next_cursor)
+    if projection:
+        return raw_response(samples, response)
     return [Sample(**sample) for sample in samples]
 
 @router.get("/samples/{sample_id}", response_model=Sample)
-async def get_sample(sample_id: str, current_user: dict = Depends(get_current_user)):
-    sample = await db.samples.find_one({'id': sample_id}, {'_id': 0})
+async def get_sample(sample_id: str, fields: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    projection = await fields_projection(fields, 'crm', 'samples', Sample)
+    sample = await db.samples.find_one({'id': sample_id}, projection or {'_id': 0})
     if not sample:
         raise HTTPException(status_code=404, detail="Sample not found")
+    if projection:
+        return raw_response(sample)
     return Sample(**sample)
 
 @router.put("/samples/{sample_id}", response_model=Sample)
@@ -1549,10 +1730,13 @@ async def create_followup(followup_data: FollowupCreate, current_user: dict = De
 
 @router.get("/followups")
 async def get_followups(
+    response: Response,
     entity_type: Optional[str] = None,
     entity_id: Optional[str] = None,
     status: Optional[str] = None,
     assigned_to: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
     current_user: dict = Depends(get_current_user)
 ):
     query = {}
@@ -1565,7 +1749,8 @@ async def get_followups(
     if assigned_to:
         query['assigned_to'] = assigned_to
     
-    followups = await db.followups.find(query, {'_id': 0}).sort('scheduled_date', 1).to_list(1000)
+    followups, next_cursor = await fetch_page(db.followups, query, 'scheduled_date', 1, cursor, limit)
+    set_next_cursor(response, next_cursor)
     return followups
 
 @router.put("/followups/{followup_id}/complete")
@@ -5,7 +5,6 @@ from datetime import datetime, timezone, timedelta
 import uuid
 import os
 from server import db, get_current_user
-from emergentintegrations.llm.chat import LlmChat, UserMessage
 
 router = APIRouter()
 
@@ -161,6 +160,7 @@ async def get_production_analytics(current_user: dict = Depends(get_current_user
 
 @router.get("/ai-insights")
 async def get_ai_insights(current_user: dict = Depends(get_current_user)):
+    from emergentintegrations.llm.chat import LlmChat, UserMessage
     overview = await get_dashboard_overview(current_user)
     revenue_data = await get_revenue_analytics("month", current_user)
     production_data = await get_production_analytics(current_user)
@@ -221,6 +221,7 @@ async def get_forecast(metric: str, current_user: dict = Depends(get_current_use
     AI-powered forecasting for various metrics
     metric: 'revenue', 'demand', 'inventory'
     """
+    from emergentintegrations.llm.chat import LlmChat, UserMessage
     now = datetime.now(timezone.utc)
     start_date = now - timedelta(days=90)
     
@@ -298,6 +299,7 @@ async def get_recommendations(area: str, current_user: dict = Depends(get_curren
     Get AI-powered recommendations for specific areas
     area: 'inventory', 'production', 'sales', 'quality'
     """
+    from emergentintegrations.llm.chat import LlmChat, UserMessage
     
     if area == "inventory":
         low_stock = await db.stock.aggregate([
@@ -17,7 +17,6 @@ import uuid
 import json
 import hashlib
 import base64
-import qrcode
 import io
 
 from server import db, get_current_user
@@ -596,6 +595,7 @@ def generate_qr_data(irn: str, invoice: dict, customer: dict, company: dict) ->
 
 def generate_qr_code(data: str) -> str:
     """Generate QR code image as base64"""
+    import qrcode
     qr = qrcode.QRCode(version=1, box_size=10, border=5)
     qr.add_data(data)
     qr.make(fit=True)
@@ -5,10 +5,12 @@ Metadata-Driven Field Configuration System for all modules
 
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Type
 from datetime import datetime, timezone
+from cachetools import TTLCache
 import uuid
 from server import db, get_current_user
+from utils.sparse_fields import parse_fields, build_projection
 
 router = APIRouter()
 
@@ -177,6 +179,8 @@ async def save_field_config(config: ModuleEntityConfig, current_user: dict = Dep
         config_dict['created_by'] = current_user['id']
         await db.field_configurations.insert_one(config_dict)
     
+    _registry_fields_cache.pop((config.module, config.entity), None)
+    _kanban_stages_cache.pop((config.module, config.entity), None)
     return {"message": "Configuration saved successfully", "module": config.module, "entity": config.entity}
 
 
@@ -214,6 +218,8 @@ async def reset_field_config(module: str, entity: str, current_user: dict = Depe
         raise HTTPException(status_code=403, detail="Only admin or director can reset configurations")
     
     await db.field_configurations.delete_one({'module': module, 'entity': entity})
+    _registry_fields_cache.pop((module, entity), None)
+    _kanban_stages_cache.pop((module, entity), None)
     return {"message": "Configuration reset to default", "module": module, "entity": entity}
 
 
@@ -305,6 +311,7 @@ async def save_kanban_stages(
         upsert=True
     )
     
+    _kanban_stages_cache.pop((module, entity), None)
     return {"message": "Stages saved successfully", "stages_count": len(stages)}
 
 
@@ -326,6 +333,31 @@ async def get_kanban_stages(module: str, entity: str, current_user: dict = Depen
     return []
 
 
+# Saved stages per (module, entity); saving, reordering or resetting drops the entry
+_kanban_stages_cache: TTLCache = TTLCache(maxsize=256, ttl=60)
+
+
+async def get_active_kanban_stages(
+    module: str,
+    entity: str,
+    default: Optional[List[Dict[str, Any]]] = None
+) -> List[Dict[str, Any]]:
+    """Active Kanban stages in board order (saved stages, else `default`)"""
+    key = (module, entity)
+    stages = _kanban_stages_cache.get(key)
+    if stages is None:
+        config = await db.field_configurations.find_one(
+            {'module': module, 'entity': entity},
+            {'_id': 0, 'kanban_stages': 1}
+        )
+        stages = (config or {}).get('kanban_stages') or []
+        _kanban_stages_cache[key] = stages
+    
+    stages = stages or default or []
+    active = [stage for stage in stages if stage.get('is_active', True)]
+    return sorted(active, key=lambda stage: stage.get('order', 0))
+
+
 # ==================== DEFAULT CONFIGURATIONS ====================
 
 def get_default_lead_stages():
@@ -959,6 +991,49 @@ async def get_default_config(module: str, entity: str):
     }
 
 
+# ==================== SPARSE FIELDSETS ====================
+
+# Field names per (module, entity); saving or resetting a config drops its entry
+_registry_fields_cache: TTLCache = TTLCache(maxsize=256, ttl=60)
+
+
+async def get_registry_field_names(module: str, entity: str) -> set:
+    """Field names configured for an entity (saved config, else the default config)"""
+    key = (module, entity)
+    names = _registry_fields_cache.get(key)
+    if names is None:
+        config = await db.field_configurations.find_one(
+            {'module': module, 'entity': entity},
+            {'_id': 0, 'fields.field_name': 1}
+        )
+        if not config:
+            config = await get_default_config(module, entity)
+        names = {f['field_name'] for f in config.get('fields') or [] if f.get('field_name')}
+        _registry_fields_cache[key] = names
+    return names
+
+
+async def fields_projection(
+    fields: Optional[str],
+    module: str,
+    entity: str,
+    model: Optional[Type[BaseModel]] = None
+) -> Optional[Dict[str, int]]:
+    """
+    Mongo projection for a `fields=` query parameter, or None when no fields
+    were requested. Names must be registry fields for module/entity or
+    fields of the endpoint's response model (system fields such as
+    created_at); anything else is a 400.
+    """
+    requested = parse_fields(fields)
+    if not requested:
+        return None
+    allowed = set(await get_registry_field_names(module, entity))
+    if model is not None:
+        allowed.update(model.model_fields)
+    return build_projection(requested, allowed, f"{module}/{entity}")
+
+
 # ==================== MASTERS CRUD ====================
 
 @router.post("/masters/{master_type}")
@@ -1154,4 +1229,5 @@ async def reorder_stages(
         {'$set': {'kanban_stages': stages, 'updated_at': datetime.now(timezone.utc).isoformat()}}
     )
     
+    _kanban_stages_cache.pop((module, entity), None)
     return {"message": "Stages reordered successfully"}
@@ -10,7 +10,7 @@ Features:
 - GSTR-2A/2B Reconciliation
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone, timedelta
@@ -21,9 +21,16 @@ import hashlib
 import base64
 
 from server import db, get_current_user
+from utils.indexes import register_index
+from utils.streaming import wants_stream, stream_rows, STREAM_BATCH_SIZE
 
 router = APIRouter()
 
+register_index("e_invoices", [("invoice_id", 1), ("status", 1)])
+register_index("eway_bills", [("invoice_id", 1), ("status", 1)])
+register_index("eway_bills", [("created_at", -1)])
+register_index("gst_returns", [("return_type", 1), ("period", 1)])
+
 # ==================== MODELS ====================
 class GSTReturn(BaseModel):
     id: str
@@ -120,11 +127,106 @@ def generate_qr_code_data(invoice_data: dict, irn: str) -> str:
     return base64.b64encode(json.dumps(qr_data).encode()).decode()
 
 # ==================== GSTR-1 ENDPOINTS ====================
+def _gstr1_classify(inv: dict):
+    """Map a sales invoice to its GSTR-1 table and row"""
+    gstin = inv.get("account_gstin", "")
+    invoice_entry = {
+        "invoice_number": inv.get("invoice_number"),
+        "invoice_date": inv.get("invoice_date"),
+        "invoice_value": inv.get("grand_total", 0),
+        "place_of_supply": inv.get("place_of_supply", ""),
+        "reverse_charge": "N",
+        "invoice_type": "Regular",
+        "taxable_value": inv.get("taxable_amount", 0),
+        "igst": inv.get("igst_amount", 0),
+        "cgst": inv.get("cgst_amount", 0),
+        "sgst": inv.get("sgst_amount", 0),
+        "cess": 0
+    }
+    
+    # Categorize based on GSTIN and value
+    if inv.get("invoice_type") in ["Credit Note", "Debit Note"]:
+        return "cdnr", {**invoice_entry, "original_invoice": inv.get("reference_invoice")}
+    if gstin and len(gstin) == 15:
+        invoice_entry["buyer_gstin"] = gstin
+        invoice_entry["buyer_name"] = inv.get("account_name", "")
+        return "b2b", invoice_entry
+    if inv.get("grand_total", 0) > 250000:
+        return "b2c_large", invoice_entry
+    return "b2c_small", invoice_entry
+
+
+class _GSTR1Totals:
+    """Running summary, document counts and HSN table (Table 12) for GSTR-1"""
+    
+    def __init__(self):
+        self.total_invoices = 0
+        self.total_taxable = 0
+        self.total_igst = 0
+        self.total_cgst = 0
+        self.total_sgst = 0
+        self.total_cess = 0
+        self.doc_summary = {"invoices": 0, "credit_notes": 0, "debit_notes": 0}
+        self.hsn_summary = {}
+    
+    def add(self, inv: dict, table: str):
+        self.total_invoices += 1
+        self.total_taxable += inv.get("taxable_amount", 0)
+        self.total_igst += inv.get("igst_amount", 0)
+        self.total_cgst += inv.get("cgst_amount", 0)
+        self.total_sgst += inv.get("sgst_amount", 0)
+        
+        if table == "cdnr":
+            self.doc_summary["credit_notes" if "Credit" in inv.get("invoice_type", "") else "debit_notes"] += 1
+        else:
+            self.doc_summary["invoices"] += 1
+        
+        # HSN Summary
+        for item in inv.get("items", []):
+            hsn = item.get("hsn_code", "0000")
+            if hsn not in self.hsn_summary:
+                self.hsn_summary[hsn] = {
+                    "hsn_code": hsn,
+                    "description": item.get("description", ""),
+                    "uom": item.get("unit", "NOS"),
+                    "total_quantity": 0,
+                    "total_value": 0,
+                    "taxable_value": 0,
+                    "igst": 0,
+                    "cgst": 0,
+                    "sgst": 0
+                }
+            self.hsn_summary[hsn]["total_quantity"] += item.get("quantity", 0)
+            self.hsn_summary[hsn]["total_value"] += item.get("line_total", 0)
+            self.hsn_summary[hsn]["taxable_value"] += item.get("line_taxable", 0)
+    
+    def summary(self) -> dict:
+        return {
+            "total_invoices": self.total_invoices,
+            "total_taxable_value": round(self.total_taxable, 2),
+            "total_igst": round(self.total_igst, 2),
+            "total_cgst": round(self.total_cgst, 2),
+            "total_sgst": round(self.total_sgst, 2),
+            "total_cess": round(self.total_cess, 2),
+            "total_tax": round(self.total_igst + self.total_cgst + self.total_sgst + self.total_cess, 2)
+        }
+
+
 @router.get("/gstr1/{period}")
-async def get_gstr1_report(period: str, current_user: dict = Depends(get_current_user)):
+async def get_gstr1_report(
+    period: str,
+    request: Request,
+    stream: bool = Query(default=False, description="Stream GSTR-1 rows as a JSON array"),
+    current_user: dict = Depends(get_current_user)
+):
     """
     Generate GSTR-1 (Outward Supplies) Report
     Period format: MMYYYY (e.g., 012025 for January 2025)
+    
+    With ?stream=1 or Accept: application/x-ndjson, invoice rows are streamed
+    as {"table": "b2b" | "b2c_large" | "b2c_small" | "cdnr", ...}, followed by
+    one {"table": "hsn_summary"} row per HSN, then {"table": "doc_summary"}
+    and {"table": "summary"}.
     """
     try:
         month = int(period[:2])
@@ -134,110 +236,55 @@ async def get_gstr1_report(period: str, current_user: dict = Depends(get_current
     except:
         raise HTTPException(status_code=400, detail="Invalid period format. Use MMYYYY")
     
-    # Fetch all sales invoices for the period
-    invoices = await db.invoices.find({
+    # All sales invoices for the period, read in batches
+    cursor = db.invoices.find({
         "invoice_type": "Sales",
         "invoice_date": {
             "$gte": start_date.strftime("%Y-%m-%d"),
             "$lte": end_date.strftime("%Y-%m-%d")
         }
-    }, {"_id": 0}).to_list(10000)
+    }, {"_id": 0}).sort("invoice_date", 1).batch_size(STREAM_BATCH_SIZE)
     
-    # Categorize invoices for GSTR-1 tables
-    b2b_invoices = []  # B2B regular (Table 4)
-    b2c_large = []     # B2C Large (Table 5)
-    b2c_small = []     # B2C Small (Table 7)
-    cdnr = []          # Credit/Debit Notes Registered (Table 9)
-    hsn_summary = {}   # HSN Summary (Table 12)
-    doc_summary = {"invoices": 0, "credit_notes": 0, "debit_notes": 0}
-    
-    total_taxable = 0
-    total_igst = 0
-    total_cgst = 0
-    total_sgst = 0
-    total_cess = 0
+    totals = _GSTR1Totals()
     
-    for inv in invoices:
-        gstin = inv.get("account_gstin", "")
-        taxable = inv.get("taxable_amount", 0)
-        igst = inv.get("igst_amount", 0)
-        cgst = inv.get("cgst_amount", 0)
-        sgst = inv.get("sgst_amount", 0)
-        
-        total_taxable += taxable
-        total_igst += igst
-        total_cgst += cgst
-        total_sgst += sgst
-        
-        invoice_entry = {
-            "invoice_number": inv.get("invoice_number"),
-            "invoice_date": inv.get("invoice_date"),
-            "invoice_value": inv.get("grand_total", 0),
-            "place_of_supply": inv.get("place_of_supply", ""),
-            "reverse_charge": "N",
-            "invoice_type": "Regular",
-            "taxable_value": taxable,
-            "igst": igst,
-            "cgst": cgst,
-            "sgst": sgst,
-            "cess": 0
-        }
+    if wants_stream(request, stream):
+        def to_row(inv):
+            table, entry = _gstr1_classify(inv)
+            totals.add(inv, table)
+            return {"table": table, **entry}
         
-        # Categorize based on GSTIN and value
-        if inv.get("invoice_type") in ["Credit Note", "Debit Note"]:
-            cdnr.append({**invoice_entry, "original_invoice": inv.get("reference_invoice")})
-            doc_summary["credit_notes" if "Credit" in inv.get("invoice_type", "") else "debit_notes"] += 1
-        elif gstin and len(gstin) == 15:
-            invoice_entry["buyer_gstin"] = gstin
-            invoice_entry["buyer_name"] = inv.get("account_name", "")
-            b2b_invoices.append(invoice_entry)
-            doc_summary["invoices"] += 1
-        elif inv.get("grand_total", 0) > 250000:
-            b2c_large.append(invoice_entry)
-            doc_summary["invoices"] += 1
-        else:
-            b2c_small.append(invoice_entry)
-            doc_summary["invoices"] += 1
+        def trailer():
+            for hsn in totals.hsn_summary.values():
+                yield {"table": "hsn_summary", **hsn}
+            yield {"table": "doc_summary", **totals.doc_summary}
+            yield {"table": "summary", "period": period, **totals.summary()}
         
-        # HSN Summary
-        for item in inv.get("items", []):
-            hsn = item.get("hsn_code", "0000")
-            if hsn not in hsn_summary:
-                hsn_summary[hsn] = {
-                    "hsn_code": hsn,
-                    "description": item.get("description", ""),
-                    "uom": item.get("unit", "NOS"),
-                    "total_quantity": 0,
-                    "total_value": 0,
-                    "taxable_value": 0,
-                    "igst": 0,
-                    "cgst": 0,
-                    "sgst": 0
-                }
-            hsn_summary[hsn]["total_quantity"] += item.get("quantity", 0)
-            hsn_summary[hsn]["total_value"] += item.get("line_total", 0)
-            hsn_summary[hsn]["taxable_value"] += item.get("line_taxable", 0)
+        return stream_rows(request, cursor, transform=to_row, trailer=trailer, filename=f"gstr1_{period}")
+    
+    # Categorize invoices for GSTR-1 tables
+    tables = {
+        "b2b": [],        # B2B regular (Table 4)
+        "b2c_large": [],  # B2C Large (Table 5)
+        "b2c_small": [],  # B2C Small (Table 7)
+        "cdnr": [],       # Credit/Debit Notes Registered (Table 9)
+    }
+    async for inv in cursor:
+        table, entry = _gstr1_classify(inv)
+        totals.add(inv, table)
+        tables[table].append(entry)
     
     return {
         "period": period,
         "period_name": f"{start_date.strftime('%B %Y')}",
         "generated_at": datetime.now(timezone.utc).isoformat(),
-        "summary": {
-            "total_invoices": len(invoices),
-            "total_taxable_value": round(total_taxable, 2),
-            "total_igst": round(total_igst, 2),
-            "total_cgst": round(total_cgst, 2),
-            "total_sgst": round(total_sgst, 2),
-            "total_cess": round(total_cess, 2),
-            "total_tax": round(total_igst + total_cgst + total_sgst + total_cess, 2)
-        },
+        "summary": totals.summary(),
         "tables": {
-            "b2b": {"count": len(b2b_invoices), "data": b2b_invoices},
-            "b2c_large": {"count": len(b2c_large), "data": b2c_large},
-            "b2c_small": {"count": len(b2c_small), "data": b2c_small},
-            "cdnr": {"count": len(cdnr), "data": cdnr},
-            "hsn_summary": {"count": len(hsn_summary), "data": list(hsn_summary.values())},
-            "doc_summary": doc_summary
+            "b2b": {"count": len(tables["b2b"]), "data": tables["b2b"]},
+            "b2c_large": {"count": len(tables["b2c_large"]), "data": tables["b2c_large"]},
+            "b2c_small": {"count": len(tables["b2c_small"]), "data": tables["b2c_small"]},
+            "cdnr": {"count": len(tables["cdnr"]), "data": tables["cdnr"]},
+            "hsn_summary": {"count": len(totals.hsn_summary), "data": list(totals.hsn_summary.values())},
+            "doc_summary": totals.doc_summary
         }
     }
 
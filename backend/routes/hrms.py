@@ -1,12 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timezone
 import uuid
 from server import db, get_current_user
+from utils.indexes import register_index
+from utils.pagination import fetch_page, set_next_cursor, MAX_PAGE_SIZE
 
 router = APIRouter()
 
+register_index("employees", [("id", 1)], unique=True)
+register_index("employees", [("employee_code", 1), ("id", 1)])
+register_index("employees", [("department", 1), ("location", 1)])
+register_index("attendance", [("employee_id", 1), ("date", -1)])
+register_index("attendance", [("date", -1), ("id", -1)])
+register_index("leave_requests", [("employee_id", 1), ("created_at", -1)])
+register_index("leave_requests", [("created_at", -1), ("id", -1)])
+register_index("payroll", [("employee_id", 1), ("year", 1), ("month", 1)])
+register_index("payroll", [("created_at", -1), ("id", -1)])
+
 class EmployeeCreate(BaseModel):
     employee_code: str
     name: str
@@ -107,14 +119,15 @@ async def create_employee(emp_data: EmployeeCreate, current_user: dict = Depends
     return Employee(**{k: v for k, v in emp_doc.items() if k != '_id'})
 
 @router.get("/employees", response_model=List[Employee])
-async def get_employees(department: Optional[str] = None, location: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+async def get_employees(response: Response, department: Optional[str] = None, location: Optional[str] = None, cursor: Optional[str] = None, limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE), current_user: dict = Depends(get_current_user)):
     query = {'status': 'active'}
     if department:
         query['department'] = department
     if location:
         query['location'] = location
     
-    employees = await db.employees.find(query, {'_id': 0}).to_list(1000)
+    employees, next_cursor = await fetch_page(db.employees, query, 'employee_code', 1, cursor, limit)
+    set_next_cursor(response, next_cursor)
     return [Employee(**emp) for emp in employees]
 
 @router.get("/employees/{emp_id}", response_model=Employee)
@@ -142,7 +155,7 @@ async def mark_attendance(att_data: AttendanceCreate, current_user: dict = Depen
     return Attendance(**{k: v for k, v in att_doc.items() if k != '_id'})
 
 @router.get("/attendance", response_model=List[Attendance])
-async def get_attendance(employee_id: Optional[str] = None, date: Optional[str] = None, month: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+async def get_attendance(response: Response, employee_id: Optional[str] = None, date: Optional[str] = None, month: Optional[str] = None, cursor: Optional[str] = None, limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE), current_user: dict = Depends(get_current_user)):
     query = {}
     if employee_id:
         query['employee_id'] = employee_id
@@ -151,7 +164,8 @@ async def get_attendance(employee_id: Optional[str] = None, date: Optional[str]
     if month:
         query['date'] = {'$regex': f'^{month}'}
     
-    attendance = await db.attendance.find(query, {'_id': 0}).sort('date', -1).to_list(1000)
+    attendance, next_cursor = await fetch_page(db.attendance, query, 'date', -1, cursor, limit)
+    set_next_cursor(response, next_cursor)
     return [Attendance(**att) for att in attendance]
 
 
@@ -175,14 +189,15 @@ async def create_leave_request(leave_data: LeaveRequestCreate, current_user: dic
     return LeaveRequest(**{k: v for k, v in leave_doc.items() if k != '_id'})
 
 @router.get("/leave-requests", response_model=List[LeaveRequest])
-async def get_leave_requests(employee_id: Optional[str] = None, status: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+async def get_leave_requests(response: Response, employee_id: Optional[str] = None, status: Optional[str] = None, cursor: Optional[str] = None, limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE), current_user: dict = Depends(get_current_user)):
     query = {}
     if employee_id:
         query['employee_id'] = employee_id
     if status:
         query['status'] = status
     
-    leaves = await db.leave_requests.find(query, {'_id': 0}).sort('created_at', -1).to_list(1000)
+    leaves, next_cursor = await fetch_page(db.leave_requests, query, 'created_at', -1, cursor, limit)
+    set_next_cursor(response, next_cursor)
     return [LeaveRequest(**leave) for leave in leaves]
 
 @router.put("/leave-requests/{leave_id}/approve")
@@ -292,7 +307,7 @@ async def generate_payroll(payroll_data: PayrollCreate, current_user: dict = Dep
     return {'message': 'Payroll generated', 'payroll_id': payroll_id, 'net_salary': net_salary}
 
 @router.get("/payroll")
-async def get_payroll(employee_id: Optional[str] = None, month: Optional[str] = None, year: Optional[int] = None, current_user: dict = Depends(get_current_user)):
+async def get_payroll(response: Response, employee_id: Optional[str] = None, month: Optional[str] = None, year: Optional[int] = None, cursor: Optional[str] = None, limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE), current_user: dict = Depends(get_current_user)):
     query = {}
     if employee_id:
         query['employee_id'] = employee_id
@@ -301,7 +316,8 @@ async def get_payroll(employee_id: Optional[str] = None, month: Optional[str] =
     if year:
         query['year'] = year
     
-    payroll = await db.payroll.find(query, {'_id': 0}).sort('created_at', -1).to_list(1000)
+    payroll, next_cursor = await fetch_page(db.payroll, query, 'created_at', -1, cursor, limit)
+    set_next_cursor(response, next_cursor)
     return payroll
 
 @router.get("/reports/attendance-summary")
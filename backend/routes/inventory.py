@@ -1,13 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone
 import uuid
 from server import db, get_current_user
+from routes.field_registry import fields_projection
+from utils.indexes import register_index
+from utils.pagination import fetch_page, set_next_cursor, MAX_PAGE_SIZE
+from utils.fast_json import model_projection, trusted_list_response, raw_response
+from utils.stock_posting import post_stock_movement, post_stock_movements, StockPostingError
+from utils.streaming import wants_stream, stream_rows, STREAM_BATCH_SIZE
+from utils import stock_snapshots
+from utils.reorder_watchlist import sync_reorder_watchlist
+from utils.barcodes import barcode_cache
 from utils.uom_converter import convert_all_uom, calculate_sqm
 
 router = APIRouter()
 
+register_index("items", [("id", 1)], unique=True)
+register_index("items", [("item_code", 1), ("id", 1)])
+register_index("items", [("category", 1), ("is_active", 1)])
+register_index("warehouses", [("id", 1)], unique=True)
+register_index("stock_balance", [("item_id", 1), ("warehouse_id", 1)], unique=True)
+register_index("stock_balance", [("warehouse_id", 1)])
+register_index("stock_ledger", [("item_id", 1), ("warehouse_id", 1), ("transaction_date", -1)])
+register_index("stock_ledger", [("transaction_date", -1), ("id", -1)])
+register_index("stock_ledger", [("reference_type", 1), ("reference_id", 1)])
+register_index("stock_snapshots", [("snapshot_date", 1), ("item_id", 1), ("warehouse_id", 1)], unique=True)
+register_index("stock_snapshots", [("item_id", 1), ("warehouse_id", 1), ("snapshot_date", -1)])
+register_index("stock_snapshot_runs", [("snapshot_date", 1)], unique=True)
+register_index("stock_snapshot_runs", [("status", 1), ("snapshot_date", -1)])
+register_index("stock_transfers", [("id", 1)], unique=True)
+register_index("stock_transfers", [("status", 1), ("created_at", -1)])
+register_index("stock_transfers", [("created_at", -1), ("id", -1)])
+
 # ==================== ITEM MODELS ====================
 class ItemCreate(BaseModel):
     item_code: str
@@ -120,6 +146,9 @@ class StockEntry(BaseModel):
     unit_cost: float = 0
     notes: Optional[str] = None
 
+class StockEntryBatch(BaseModel):
+    entries: List[StockEntry] = Field(..., min_length=1, max_length=2000)
+
 class StockBalance(BaseModel):
     id: str
     item_id: str
@@ -236,6 +265,7 @@ async def create_item(item_data: ItemCreate, current_user: dict = Depends(get_cu
     }
     
     await db.items.insert_one(item_doc)
+    await sync_reorder_watchlist(db, [item_id])
     return Item(**{k: v for k, v in item_doc.items() if k != '_id'})
 
 
@@ -283,11 +313,15 @@ async def convert_item_uom(
 
 @router.get("/items", response_model=List[Item])
 async def get_items(
+    response: Response,
     category: Optional[str] = None,
     item_type: Optional[str] = None,
     is_active: Optional[bool] = None,
     search: Optional[str] = None,
     low_stock: Optional[bool] = None,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
     current_user: dict = Depends(get_current_user)
 ):
     query = {}
@@ -305,14 +339,21 @@ async def get_items(
     if low_stock:
         query["$expr"] = {"$lte": ["$current_stock", "$reorder_level"]}
     
-    items = await db.items.find(query, {"_id": 0}).sort("item_code", 1).to_list(1000)
-    return [Item(**item) for item in items]
+    projection = await fields_projection(fields, "inventory", "items", Item)
+    items, next_cursor = await fetch_page(db.items, query, "item_code", 1, cursor, limit, projection=projection or model_projection(Item))
+    set_next_cursor(response, next_cursor)
+    if projection:
+        return raw_response(items, response)
+    return trusted_list_response(Item, items, response)
 
 @router.get("/items/{item_id}", response_model=Item)
-async def get_item(item_id: str, current_user: dict = Depends(get_current_user)):
-    item = await db.items.find_one({"id": item_id}, {"_id": 0})
+async def get_item(item_id: str, fields: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    projection = await fields_projection(fields, "inventory", "items", Item)
+    item = await db.items.find_one({"id": item_id}, projection or {"_id": 0})
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
+    if projection:
+        return raw_response(item)
     return Item(**item)
 
 @router.put("/items/{item_id}", response_model=Item)
@@ -320,9 +361,16 @@ async def update_item(item_id: str, item_data: ItemUpdate, current_user: dict =
     update_dict = {k: v for k, v in item_data.model_dump().items() if v is not None}
     update_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
     
-    result = await db.items.update_one({"id": item_id}, {"$set": update_dict})
-    if result.matched_count == 0:
+    previous = await db.items.find_one_and_update(
+        {"id": item_id}, {"$set": update_dict}, {"_id": 0, "item_code": 1, "barcode": 1}
+    )
+    if previous is None:
         raise HTTPException(status_code=404, detail="Item not found")
+    codes = [previous.get(f) for f in ("item_code", "barcode") if f in update_dict] + \
+        [update_dict[f] for f in ("item_code", "barcode") if f in update_dict]
+    barcode_cache.invalidate(*filter(None, codes))
+    if update_dict.keys() & {"reorder_level", "safety_stock", "min_order_qty", "is_active", "item_name"}:
+        await sync_reorder_watchlist(db, [item_id])
     
     item = await db.items.find_one({"id": item_id}, {"_id": 0})
     return Item(**item)
@@ -336,6 +384,7 @@ async def delete_item(item_id: str, current_user: dict = Depends(get_current_use
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Item not found")
+    await sync_reorder_watchlist(db, [item_id])
     return {"message": "Item deactivated"}
 
 # ==================== WAREHOUSE ENDPOINTS ====================
@@ -370,103 +419,73 @@ async def get_warehouse(wh_id: str, current_user: dict = Depends(get_current_use
     return Warehouse(**wh)
 
 # ==================== STOCK ENDPOINTS ====================
+ADJUSTMENT_OUT_TYPES = ["adjustment", "adjustment_out"]
+
+async def require_adjustment_approvals(entries: List[StockEntry]):
+    """WORKBOOK APPROVAL: block negative adjustments until approved"""
+    refs = {e.reference_id or "" for e in entries if e.transaction_type in ADJUSTMENT_OUT_TYPES}
+    if not refs:
+        return
+    approved = await db.approval_requests.distinct("entity_id", {
+        "module": "Inventory",
+        "entity_type": "StockEntry",
+        "entity_id": {"$in": list(refs)},
+        "action": "Stock Adjustment",
+        "status": "approved",
+    })
+    if refs - set(approved):
+        raise HTTPException(status_code=409, detail="Approval required: Stock Adjustment")
+
+async def post_stock_entries(entries: List[StockEntry], current_user: dict) -> List[dict]:
+    """
+    Post several stock movements as one batch (utils/stock_posting.py).
+    Used by the bulk endpoint and internally by GRN approval, transfers and production.
+    """
+    try:
+        return await post_stock_movements(db, [e.model_dump() for e in entries], current_user["id"])
+    except StockPostingError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
 @router.post("/stock/entry")
 async def create_stock_entry(entry: StockEntry, current_user: dict = Depends(get_current_user)):
     """Record a stock transaction"""
 
-    # WORKBOOK APPROVAL: block negative adjustments until approved
-    if entry.transaction_type in ["adjustment", "adjustment_out"]:
-        base_approval = await db.approval_requests.find_one({
-            "module": "Inventory",
-            "entity_type": "StockEntry",
-            "entity_id": entry.reference_id or "",
-            "action": "Stock Adjustment",
-            "status": "approved",
-        }, {"_id": 0})
-        if not base_approval:
-            raise HTTPException(status_code=409, detail="Approval required: Stock Adjustment")
-
-    entry_id = str(uuid.uuid4())
-    now = datetime.now(timezone.utc).isoformat()
-    
-    # Validate item exists
-    item = await db.items.find_one({"id": entry.item_id}, {"_id": 0})
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-    
-    # Get current balance
-    balance = await db.stock_balance.find_one({
-        "item_id": entry.item_id,
-        "warehouse_id": entry.warehouse_id
-    })
-    
-    current_qty = balance.get("quantity", 0) if balance else 0
-    
-    # Calculate new balance
-    if entry.transaction_type in ["receipt", "transfer_in", "adjustment_in"]:
-        new_qty = current_qty + entry.quantity
-        in_qty = entry.quantity
-        out_qty = 0
-    else:
-        if current_qty < entry.quantity:
-            raise HTTPException(status_code=400, detail="Insufficient stock")
-        new_qty = current_qty - entry.quantity
-        in_qty = 0
-        out_qty = entry.quantity
-    
-    # Create ledger entry
-    ledger_doc = {
-        "id": entry_id,
-        "item_id": entry.item_id,
-        "warehouse_id": entry.warehouse_id,
-        "transaction_date": now,
-        "transaction_type": entry.transaction_type,
-        "reference_type": entry.reference_type,
-        "reference_id": entry.reference_id,
-        "in_qty": in_qty,
-        "out_qty": out_qty,
-        "balance_qty": new_qty,
-        "unit_cost": entry.unit_cost,
-        "batch_no": entry.batch_no,
-        "notes": entry.notes,
-        "created_by": current_user["id"]
-    }
-    await db.stock_ledger.insert_one(ledger_doc)
-    
-    # Update or create balance
-    if balance:
-        await db.stock_balance.update_one(
-            {"item_id": entry.item_id, "warehouse_id": entry.warehouse_id},
-            {"$set": {"quantity": new_qty, "last_updated": now}}
+    await require_adjustment_approvals([entry])
+
+    # Conditional $inc on the balance: no read-check-write race (utils/stock_posting.py)
+    try:
+        ledger = await post_stock_movement(
+            db,
+            item_id=entry.item_id,
+            warehouse_id=entry.warehouse_id,
+            quantity=entry.quantity,
+            transaction_type=entry.transaction_type,
+            created_by=current_user["id"],
+            reference_type=entry.reference_type,
+            reference_id=entry.reference_id,
+            batch_no=entry.batch_no,
+            unit_cost=entry.unit_cost,
+            notes=entry.notes,
         )
-    else:
-        wh = await db.warehouses.find_one({"id": entry.warehouse_id}, {"warehouse_name": 1})
-        balance_doc = {
-            "id": str(uuid.uuid4()),
-            "item_id": entry.item_id,
-            "item_code": item.get("item_code"),
-            "item_name": item.get("item_name"),
-            "warehouse_id": entry.warehouse_id,
-            "warehouse_name": wh.get("warehouse_name") if wh else "",
-            "quantity": new_qty,
-            "reserved_qty": 0,
-            "available_qty": new_qty,
-            "uom": item.get("uom"),
-            "avg_cost": entry.unit_cost,
-            "total_value": new_qty * entry.unit_cost,
-            "last_updated": now
-        }
-        await db.stock_balance.insert_one(balance_doc)
-    
-    # Update item's total stock
-    total_stock = await db.stock_balance.aggregate([
-        {"$match": {"item_id": entry.item_id}},
-        {"$group": {"_id": None, "total": {"$sum": "$quantity"}}}
-    ]).to_list(1)
-    total = total_stock[0]["total"] if total_stock else 0
-    await db.items.update_one({"id": entry.item_id}, {"$set": {"current_stock": total}})
+    except StockPostingError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     
-    return {"message": "Stock entry recorded", "new_balance": new_qty}
+    return {"message": "Stock entry recorded", "new_balance": ledger["balance_qty"]}
+
+@router.post("/stock/entries/bulk")
+async def create_stock_entries_bulk(batch: StockEntryBatch, current_user: dict = Depends(get_current_user)):
+    """Record a batch of stock transactions - all or nothing"""
+    await require_adjustment_approvals(batch.entries)
+    ledger = await post_stock_entries(batch.entries, current_user)
+    return {
+        "message": f"{len(ledger)} stock entries recorded",
+        "count": len(ledger),
+        "entries": [
+            {"id": row["id"], "item_id": row["item_id"], "warehouse_id": row["warehouse_id"],
+             "transaction_type": row["transaction_type"], "balance_qty": row["balance_qty"]}
+            for row in ledger
+        ]
+    }
 
 @router.get("/stock/balance")
 async def get_stock_balance(
@@ -496,10 +515,13 @@ async def get_stock_balance(
 
 @router.get("/stock/ledger/{item_id}")
 async def get_stock_ledger(
+    response: Response,
     item_id: str,
     warehouse_id: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=MAX_PAGE_SIZE),
     current_user: dict = Depends(get_current_user)
 ):
     query = {"item_id": item_id}
@@ -513,9 +535,84 @@ async def get_stock_ledger(
         else:
             query["transaction_date"] = {"$lte": date_to}
     
-    ledger = await db.stock_ledger.find(query, {"_id": 0}).sort("transaction_date", -1).to_list(500)
+    ledger, next_cursor = await fetch_page(db.stock_ledger, query, "transaction_date", -1, cursor, limit)
+    set_next_cursor(response, next_cursor)
     return ledger
 
+# ==================== STOCK SNAPSHOTS ====================
+
+def _snapshot_date_param(value: str, name: str) -> str:
+    try:
+        return stock_snapshots.parse_date(value).strftime(stock_snapshots.DATE_FORMAT)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be YYYY-MM-DD")
+
+@router.get("/stock/as-of")
+async def get_stock_as_of(
+    request: Request,
+    date: str,
+    item_id: Optional[str] = None,
+    warehouse_id: Optional[str] = None,
+    stream: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Closing stock per item/warehouse at the end of `date`.
+    Nearest snapshot on or before the date + ledger movements since it.
+    """
+    as_of = _snapshot_date_param(date, "date")
+    snapshot_date = await stock_snapshots.latest_snapshot_date(db, as_of)
+    pipeline = stock_snapshots.stock_as_of_pipeline(snapshot_date, as_of, item_id, warehouse_id)
+    cursor = db.stock_ledger.aggregate(pipeline, batchSize=STREAM_BATCH_SIZE)
+
+    if wants_stream(request, stream):
+        return stream_rows(request, cursor, filename=f"stock_as_of_{as_of}")
+
+    return {
+        "as_of": as_of,
+        "snapshot_date": snapshot_date,
+        "balances": await cursor.to_list(None)
+    }
+
+@router.post("/stock/snapshots")
+async def create_stock_snapshot(
+    date: Optional[str] = None,
+    force: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Build the checkpoint for a completed day (default: the latest settled day).
+    force=True rebuilds it and every later snapshot, which are built on it.
+    """
+    if current_user.get('role') != 'admin':
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    settled = stock_snapshots.last_settled_day()
+    snapshot_date = _snapshot_date_param(date, "date") if date else \
+        settled.strftime(stock_snapshots.DATE_FORMAT)
+    if stock_snapshots.parse_date(snapshot_date) > settled:
+        raise HTTPException(status_code=400, detail="Snapshots can only be taken for completed, settled days")
+
+    if force:
+        runs = await stock_snapshots.rebuild_snapshots(db, snapshot_date)
+        if not runs:
+            raise HTTPException(status_code=409, detail=f"Snapshot for {snapshot_date} is in progress")
+        return {**runs[0], "rebuilt_after": [run["snapshot_date"] for run in runs[1:]]}
+
+    run = await stock_snapshots.build_snapshot(db, snapshot_date)
+    if run is None:
+        raise HTTPException(status_code=409, detail=f"Snapshot for {snapshot_date} already exists or is in progress")
+    return run
+
+@router.get("/stock/snapshots")
+async def list_stock_snapshots(
+    month_end_only: bool = False,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user)
+):
+    query = {"is_month_end": True} if month_end_only else {}
+    return await db[stock_snapshots.RUNS].find(query, {"_id": 0}).sort("snapshot_date", -1).to_list(limit)
+
 # ==================== TRANSFER ENDPOINTS ====================
 @router.post("/transfers", response_model=StockTransfer)
 async def create_transfer(transfer_data: StockTransferCreate, current_user: dict = Depends(get_current_user)):
@@ -585,9 +682,12 @@ async def create_transfer(transfer_data: StockTransferCreate, current_user: dict
 
 @router.get("/transfers", response_model=List[StockTransfer])
 async def get_transfers(
+    response: Response,
     status: Optional[str] = None,
     from_warehouse: Optional[str] = None,
     to_warehouse: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=MAX_PAGE_SIZE),
     current_user: dict = Depends(get_current_user)
 ):
     query = {}
@@ -598,7 +698,8 @@ async def get_transfers(
     if to_warehouse:
         query["to_warehouse"] = to_warehouse
     
-    transfers = await db.stock_transfers.find(query, {"_id": 0}).sort("created_at", -1).to_list(500)
+    transfers, next_cursor = await fetch_page(db.stock_transfers, query, "created_at", -1, cursor, limit)
+    set_next_cursor(response, next_cursor)
     return [StockTransfer(**t) for t in transfers]
 
 @router.put("/transfers/{transfer_id}/issue")
@@ -626,8 +727,8 @@ async def issue_transfer(transfer_id: str, current_user: dict = Depends(get_curr
     now = datetime.now(timezone.utc).isoformat()
     
     # Deduct stock from source warehouse
-    for item in transfer["items"]:
-        entry = StockEntry(
+    await post_stock_entries([
+        StockEntry(
             item_id=item["item_id"],
             warehouse_id=transfer["from_warehouse"],
             quantity=item["quantity"],
@@ -636,7 +737,8 @@ async def issue_transfer(transfer_id: str, current_user: dict = Depends(get_curr
             reference_id=transfer_id,
             batch_no=item.get("batch_no")
         )
-        await create_stock_entry(entry, current_user)
+        for item in transfer["items"]
+    ], current_user)
     
     await db.stock_transfers.update_one(
         {"id": transfer_id},
@@ -658,8 +760,8 @@ async def receive_transfer(transfer_id: str, received_items: List[dict], current
     now = datetime.now(timezone.utc).isoformat()
     
     # Add stock to destination warehouse
-    for recv_item in received_items:
-        entry = StockEntry(
+    await post_stock_entries([
+        StockEntry(
             item_id=recv_item["item_id"],
             warehouse_id=transfer["to_warehouse"],
             quantity=recv_item["received_qty"],
@@ -668,7 +770,8 @@ async def receive_transfer(transfer_id: str, received_items: List[dict], current
             reference_id=transfer_id,
             batch_no=recv_item.get("batch_no")
         )
-        await create_stock_entry(entry, current_user)
+        for recv_item in received_items
+    ], current_user)
     
     await db.stock_transfers.update_one(
         {"id": transfer_id},
@@ -10,16 +10,48 @@ Features:
 - Stock Valuation (FIFO, LIFO, Weighted Avg)
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import BaseModel, Field
+from typing import Iterator, List, Optional, Dict, Any
 from datetime import datetime, timezone, timedelta
+import itertools
 import uuid
 
+from pymongo.errors import BulkWriteError
+
 from server import db, get_current_user
+from utils.indexes import register_index
+from utils.cost_layers import valuation_pipeline, rebuild_cost_layers
+from utils.reorder_watchlist import open_entries, rebuild_reorder_watchlist, sync_reorder_watchlist, changes_since
+from utils.barcodes import resolve_barcodes, barcode_cache
+from utils.serial_ranges import reserve_range, adopt_warehouse_counters, format_serial, expand, MAX_RANGE, ALL_WAREHOUSES
+from utils.streaming import wants_stream, stream_rows, STREAM_BATCH_SIZE
+from utils.pagination import fetch_page, set_next_cursor, MAX_PAGE_SIZE
 
 router = APIRouter()
 
+SERIAL_INSERT_CHUNK = 5000
+
+register_index("batches", [("id", 1)], unique=True)
+register_index("batches", [("item_id", 1), ("warehouse_id", 1), ("status", 1)])
+register_index("batches", [("status", 1), ("expiry_date", 1)])
+register_index("batches", [("warehouse_id", 1), ("created_at", 1), ("id", 1)])
+register_index("batches", [("created_at", 1), ("id", 1)])
+register_index("serial_numbers", [("serial_number", 1)])
+register_index("serial_numbers", [("item_id", 1), ("serial_number", 1)], unique=True)
+register_index("serial_numbers", [("item_id", 1), ("status", 1)])
+register_index("items", [("barcode", 1)], sparse=True)
+register_index("batches", [("batch_number", 1)])
+register_index("cost_layers", [("id", 1)], unique=True)
+register_index("cost_layers", [("item_id", 1), ("warehouse_id", 1), ("fifo_open", 1), ("received_at", 1), ("id", 1)])
+register_index("cost_layers", [("item_id", 1), ("warehouse_id", 1), ("lifo_open", 1), ("received_at", -1), ("id", -1)])
+register_index("cost_layers", [("fifo_open", 1), ("warehouse_id", 1)])
+register_index("cost_layers", [("lifo_open", 1), ("warehouse_id", 1)])
+register_index("stock_ledger", [("item_id", 1), ("transaction_date", 1), ("id", 1)])
+register_index("reorder_watchlist", [("item_id", 1)], unique=True)
+register_index("reorder_watchlist", [("status", 1), ("urgency", 1), ("suggested_qty", -1)])
+register_index("reorder_watchlist", [("seq", 1)])
+
 # ==================== MODELS ====================
 class BatchCreate(BaseModel):
     item_id: str
@@ -97,6 +129,9 @@ class ReorderAlert(BaseModel):
     status: str  # pending, po_created, ignored
     created_at: str
 
+class BarcodeBulkLookup(BaseModel):
+    codes: List[str] = Field(..., min_length=1, max_length=1000)
+
 # ==================== BATCH TRACKING ENDPOINTS ====================
 @router.post("/batches", response_model=Batch)
 async def create_batch(batch_data: BatchCreate, current_user: dict = Depends(get_current_user)):
@@ -158,6 +193,7 @@ async def create_batch(batch_data: BatchCreate, current_user: dict = Depends(get
         {"id": batch_data.item_id},
         {"$inc": {"current_stock": batch_data.quantity}}
     )
+    await sync_reorder_watchlist(db, [batch_data.item_id])
     
     return Batch(**{k: v for k, v in batch_doc.items() if k != '_id'})
 
@@ -284,6 +320,89 @@ async def create_serial_numbers_bulk(
     
     return {"created": len(serial_docs), "serial_numbers": serial_numbers}
 
+def _chunks(values: Iterator[str], size: int) -> Iterator[List[str]]:
+    while True:
+        chunk = list(itertools.islice(values, size))
+        if not chunk:
+            return
+        yield chunk
+
+@router.post("/serial-numbers/generate")
+async def generate_serial_numbers(
+    item_id: str,
+    warehouse_id: str,
+    count: int = Query(..., ge=1, le=MAX_RANGE),
+    batch_id: Optional[str] = None,
+    bin_location: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Generate `count` new serial numbers for an item from its counter.
+    The whole range is claimed in one update and inserted in chunks.
+    One counter serves all warehouses, so an item's serials never repeat.
+    """
+    item = await db.items.find_one({"id": item_id}, {"item_code": 1, "item_name": 1})
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    
+    doc_type = f"item_serial:{item['item_code']}"
+    await adopt_warehouse_counters(db, doc_type, prefix=item.get("item_code"))
+    config, start, end = await reserve_range(db, doc_type, ALL_WAREHOUSES, count, prefix=item.get("item_code"))
+    now = datetime.now(timezone.utc).isoformat()
+    template = {
+        "item_id": item_id,
+        "item_code": item.get("item_code"),
+        "item_name": item.get("item_name"),
+        "batch_id": batch_id,
+        "warehouse_id": warehouse_id,
+        "bin_location": bin_location,
+        "status": "available",
+        "purchase_date": now[:10],
+        "warranty_expiry": None,
+        "current_owner": None,
+        "notes": None,
+        "created_at": now
+    }
+    
+    # Numbers entered by hand earlier would collide; check the whole range before writing any of it
+    duplicates = []
+    for chunk in _chunks(expand(config, start, end), SERIAL_INSERT_CHUNK):
+        duplicates += [s["serial_number"] async for s in db.serial_numbers.find(
+            {"item_id": item_id, "serial_number": {"$in": chunk}}, {"_id": 0, "serial_number": 1}
+        )]
+    if duplicates:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Serial numbers already exist for this item: {', '.join(duplicates[:20])}. "
+                   f"Nothing was created; range {start}-{end} is skipped, so a retry uses the next one"
+        )
+
+    inserted_ids: List[str] = []
+    for chunk in _chunks(expand(config, start, end), SERIAL_INSERT_CHUNK):
+        docs = [{"id": str(uuid.uuid4()), "serial_number": sn, **template} for sn in chunk]
+        inserted_ids += [d["id"] for d in docs]
+        try:
+            await db.serial_numbers.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # Lost a race with a hand entry: take back everything this call wrote
+            for ids in _chunks(iter(inserted_ids), SERIAL_INSERT_CHUNK):
+                await db.serial_numbers.delete_many({"id": {"$in": ids}})
+            duplicates = [err["op"]["serial_number"] for err in e.details.get("writeErrors", []) if err.get("code") == 11000]
+            if len(duplicates) != len(e.details.get("writeErrors", [])):
+                raise
+            raise HTTPException(
+                status_code=409,
+                detail=f"Serial numbers already exist for this item: {', '.join(duplicates[:20])}. Nothing was created"
+            )
+    
+    return {
+        "created": count,
+        "first": format_serial(config, start),
+        "last": format_serial(config, end),
+        "start_number": start,
+        "end_number": end
+    }
+
 @router.get("/serial-numbers")
 async def list_serial_numbers(
     item_id: Optional[str] = None,
@@ -384,74 +503,142 @@ async def list_bin_locations(
     return bins
 
 # ==================== STOCK AGING ANALYSIS ====================
+# Bucket name -> (min_age_days, max_age_days); None = open-ended
+AGING_BUCKETS = {
+    "0_30_days": (0, 30),
+    "31_60_days": (31, 60),
+    "61_90_days": (61, 90),
+    "91_180_days": (91, 180),
+    "over_180_days": (181, None),
+}
+
+def _aging_as_of(as_of: Optional[str]) -> datetime:
+    if not as_of:
+        return datetime.now(timezone.utc)
+    try:
+        parsed = datetime.fromisoformat(as_of.replace('Z', '+00:00'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="as_of must be an ISO timestamp")
+    # Cutoffs are compared as ISO strings against UTC created_at values
+    return parsed.astimezone(timezone.utc) if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def _age_cutoff(now: datetime, days: int) -> str:
+    """created_at strictly after this is younger than `days` days (ISO strings sort chronologically)"""
+    return (now - timedelta(days=days)).isoformat()
+
+def _aging_window(now: datetime, bucket: str) -> Dict[str, str]:
+    """created_at range for one bucket - the same windows the $bucket boundaries use"""
+    min_age, max_age = AGING_BUCKETS[bucket]
+    window = {}
+    if max_age is not None:
+        window["$gte"] = _age_cutoff(now, max_age + 1)
+    if min_age:
+        window["$lt"] = _age_cutoff(now, min_age)
+    return window
+
+def _open_batches_query(warehouse_id: Optional[str]) -> Dict[str, Any]:
+    # Batches without a created_at timestamp have no age and are left out of every bucket
+    query = {"current_quantity": {"$gt": 0}, "created_at": {"$type": "string"}}
+    if warehouse_id:
+        query["warehouse_id"] = warehouse_id
+    return query
+
 @router.get("/stock-aging")
 async def get_stock_aging(
     warehouse_id: Optional[str] = None,
+    as_of: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get stock aging analysis"""
-    query = {"current_quantity": {"$gt": 0}}
-    if warehouse_id:
-        query["warehouse_id"] = warehouse_id
-    
-    batches = await db.batches.find(query, {"_id": 0}).to_list(10000)
-    
-    now = datetime.now(timezone.utc)
-    aging_buckets = {
-        "0_30_days": {"count": 0, "value": 0, "items": []},
-        "31_60_days": {"count": 0, "value": 0, "items": []},
-        "61_90_days": {"count": 0, "value": 0, "items": []},
-        "91_180_days": {"count": 0, "value": 0, "items": []},
-        "over_180_days": {"count": 0, "value": 0, "items": []}
+    """
+    Get stock aging analysis - bucket totals only.
+    Batches in a bucket are listed by /stock-aging/{bucket}/batches.
+    """
+    now = _aging_as_of(as_of)
+
+    # $bucket boundaries must ascend: oldest cutoff first, then an upper bound above any timestamp.
+    # Anything older than the first boundary lands in the default bucket.
+    boundaries = [_age_cutoff(now, AGING_BUCKETS[b][1] + 1) for b in
+                  ("91_180_days", "61_90_days", "31_60_days", "0_30_days")] + ["~"]
+    boundary_names = dict(zip(boundaries, ("91_180_days", "61_90_days", "31_60_days", "0_30_days")))
+    value = {"$multiply": ["$current_quantity", {"$ifNull": ["$unit_cost", 0]}]}
+
+    pipeline = [
+        {"$match": _open_batches_query(warehouse_id)},
+        {"$facet": {
+            "buckets": [{"$bucket": {
+                "groupBy": "$created_at",
+                "boundaries": boundaries,
+                "default": "over_180_days",
+                "output": {
+                    "count": {"$sum": 1},
+                    "quantity": {"$sum": "$current_quantity"},
+                    "value": {"$sum": value},
+                },
+            }}],
+            "totals": [{"$group": {"_id": None, "count": {"$sum": 1}, "value": {"$sum": value}}}],
+        }},
+    ]
+    result = (await db.batches.aggregate(pipeline).to_list(1))[0]
+
+    aging_buckets = {name: {"count": 0, "quantity": 0, "value": 0} for name in AGING_BUCKETS}
+    for row in result["buckets"]:
+        name = boundary_names.get(row["_id"], row["_id"])
+        aging_buckets[name] = {
+            "count": row["count"],
+            "quantity": row["quantity"],
+            "value": round(row["value"], 2),
+        }
+    totals = result["totals"][0] if result["totals"] else {"count": 0, "value": 0}
+
+    return {
+        "generated_at": now.isoformat(),
+        "total_batches": totals["count"],
+        "total_value": round(totals["value"], 2),
+        "aging_buckets": aging_buckets
     }
-    
+
+@router.get("/stock-aging/{bucket}/batches")
+async def get_stock_aging_batches(
+    bucket: str,
+    response: Response,
+    warehouse_id: Optional[str] = None,
+    as_of: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Batches in one aging bucket, oldest first (keyset paged via X-Next-Cursor).
+    Pass the summary's generated_at as as_of so pages line up with its totals.
+    """
+    if bucket not in AGING_BUCKETS:
+        raise HTTPException(status_code=404, detail=f"Unknown aging bucket. Use one of: {', '.join(AGING_BUCKETS)}")
+    now = _aging_as_of(as_of)
+
+    query = _open_batches_query(warehouse_id)
+    query["created_at"].update(_aging_window(now, bucket))
+
+    projection = {"_id": 0, "id": 1, "batch_number": 1, "item_id": 1, "item_code": 1, "item_name": 1,
+                  "warehouse_id": 1, "current_quantity": 1, "unit_cost": 1, "created_at": 1}
+    batches, next_cursor = await fetch_page(db.batches, query, "created_at", 1, cursor, limit, projection)
+    set_next_cursor(response, next_cursor)
+
+    rows = []
     for batch in batches:
         created = datetime.fromisoformat(batch["created_at"].replace('Z', '+00:00'))
-        age_days = (now - created).days
-        value = batch.get("current_quantity", 0) * batch.get("unit_cost", 0)
-        
-        item_info = {
-            "batch_number": batch["batch_number"],
+        rows.append({
+            "id": batch["id"],
+            "batch_number": batch.get("batch_number"),
+            "item_id": batch.get("item_id"),
             "item_code": batch.get("item_code"),
             "item_name": batch.get("item_name"),
+            "warehouse_id": batch.get("warehouse_id"),
             "quantity": batch["current_quantity"],
-            "value": round(value, 2),
-            "age_days": age_days
-        }
-        
-        if age_days <= 30:
-            aging_buckets["0_30_days"]["count"] += 1
-            aging_buckets["0_30_days"]["value"] += value
-            aging_buckets["0_30_days"]["items"].append(item_info)
-        elif age_days <= 60:
-            aging_buckets["31_60_days"]["count"] += 1
-            aging_buckets["31_60_days"]["value"] += value
-            aging_buckets["31_60_days"]["items"].append(item_info)
-        elif age_days <= 90:
-            aging_buckets["61_90_days"]["count"] += 1
-            aging_buckets["61_90_days"]["value"] += value
-            aging_buckets["61_90_days"]["items"].append(item_info)
-        elif age_days <= 180:
-            aging_buckets["91_180_days"]["count"] += 1
-            aging_buckets["91_180_days"]["value"] += value
-            aging_buckets["91_180_days"]["items"].append(item_info)
-        else:
-            aging_buckets["over_180_days"]["count"] += 1
-            aging_buckets["over_180_days"]["value"] += value
-            aging_buckets["over_180_days"]["items"].append(item_info)
-    
-    # Round values
-    for bucket in aging_buckets.values():
-        bucket["value"] = round(bucket["value"], 2)
-    
-    total_value = sum(b["value"] for b in aging_buckets.values())
-    
-    return {
-        "generated_at": now.isoformat(),
-        "total_batches": len(batches),
-        "total_value": round(total_value, 2),
-        "aging_buckets": aging_buckets
-    }
+            "value": round(batch["current_quantity"] * batch.get("unit_cost", 0), 2),
+            "age_days": (now - created).days,
+            "created_at": batch["created_at"]
+        })
+    return rows
 
 # ==================== AUTO REORDER SYSTEM ====================
 @router.get("/reorder-alerts")
@@ -459,53 +646,56 @@ async def get_reorder_alerts(
     warehouse_id: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get items that need reordering"""
-    # Find items below reorder level
-    pipeline = [
-        {"$match": {"is_active": True}},
-        {"$lookup": {
-            "from": "stock",
-            "localField": "id",
-            "foreignField": "item_id",
-            "as": "stock_info"
-        }}
-    ]
-    
-    items = await db.items.aggregate(pipeline).to_list(1000)
-    
-    alerts = []
-    for item in items:
-        current_stock = item.get("current_stock", 0)
-        reorder_level = item.get("reorder_level", 0)
-        safety_stock = item.get("safety_stock", 0)
-        
-        if current_stock <= reorder_level and reorder_level > 0:
-            # Calculate suggested order quantity
-            suggested_qty = max(item.get("min_order_qty", 1), (reorder_level + safety_stock) - current_stock)
-            
-            alerts.append({
-                "id": str(uuid.uuid4()),
-                "item_id": item["id"],
-                "item_code": item.get("item_code"),
-                "item_name": item.get("item_name"),
-                "current_stock": current_stock,
-                "reorder_level": reorder_level,
-                "safety_stock": safety_stock,
-                "suggested_qty": suggested_qty,
-                "urgency": "critical" if current_stock <= safety_stock else "warning",
-                "status": "pending"
-            })
-    
-    # Sort by urgency
-    alerts.sort(key=lambda x: (0 if x["urgency"] == "critical" else 1, -x["suggested_qty"]))
-    
+    """Get items that need reordering (open reorder watchlist entries)"""
+    entries = await open_entries(db).to_list(None)
+
+    alerts = [{
+        "id": entry["id"],
+        "item_id": entry["item_id"],
+        "item_code": entry.get("item_code"),
+        "item_name": entry.get("item_name"),
+        "current_stock": entry["current_stock"],
+        "reorder_level": entry["reorder_level"],
+        "safety_stock": entry.get("safety_stock", 0),
+        "suggested_qty": entry["suggested_qty"],
+        "urgency": entry["urgency"],
+        "status": "pending",
+        "opened_at": entry.get("opened_at")
+    } for entry in entries]
+    critical_count = sum(1 for a in alerts if a["urgency"] == "critical")
+
     return {
         "total_alerts": len(alerts),
-        "critical_count": len([a for a in alerts if a["urgency"] == "critical"]),
-        "warning_count": len([a for a in alerts if a["urgency"] == "warning"]),
+        "critical_count": critical_count,
+        "warning_count": len(alerts) - critical_count,
         "alerts": alerts
     }
 
+@router.get("/reorder-alerts/changes")
+async def get_reorder_alert_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=MAX_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Watchlist entries that opened, cleared or changed urgency after sequence `since`.
+    Poll again with the returned `next_since`.
+    """
+    changes = await changes_since(db, since, limit)
+    return {
+        "changes": changes,
+        "next_since": changes[-1]["seq"] if changes else since,
+        "has_more": len(changes) == limit
+    }
+
+@router.post("/reorder-alerts/rebuild")
+async def rebuild_reorder_alerts(current_user: dict = Depends(get_current_user)):
+    """Re-evaluate every item against its reorder level"""
+    if current_user.get('role') != 'admin':
+        raise HTTPException(status_code=403, detail="Admin access required")
+    changed = await rebuild_reorder_watchlist(db)
+    return {"message": "Reorder watchlist rebuilt", "changes": changed}
+
 @router.post("/reorder-alerts/{item_id}/create-po")
 async def create_po_from_alert(
     item_id: str,
@@ -562,34 +752,23 @@ async def create_po_from_alert(
     return {"message": "Auto-PO created", "po_number": po_number, "po_id": po_id}
 
 # ==================== BARCODE SUPPORT ====================
+@router.post("/barcode/lookup/bulk")
+async def lookup_barcodes_bulk(data: BarcodeBulkLookup, current_user: dict = Depends(get_current_user)):
+    """Resolve a batch of scanned codes (item code, barcode, serial or batch number) in one call"""
+    resolved = await resolve_barcodes(db, data.codes)
+    results = [{"code": code, "found": item is not None, "item": item} for code, item in resolved.items()]
+    found = sum(1 for r in results if r["found"])
+    return {
+        "total": len(results),
+        "found": found,
+        "not_found": len(results) - found,
+        "results": results
+    }
+
 @router.get("/barcode/lookup/{barcode}")
 async def lookup_barcode(barcode: str, current_user: dict = Depends(get_current_user)):
     """Lookup item by barcode or item code"""
-    # Search by item_code first
-    item = await db.items.find_one(
-        {"$or": [
-            {"item_code": barcode},
-            {"barcode": barcode}
-        ]},
-        {"_id": 0}
-    )
-    
-    if not item:
-        # Try serial number
-        serial = await db.serial_numbers.find_one({"serial_number": barcode}, {"_id": 0})
-        if serial:
-            item = await db.items.find_one({"id": serial["item_id"]}, {"_id": 0})
-            if item:
-                item["serial_info"] = serial
-    
-    if not item:
-        # Try batch number
-        batch = await db.batches.find_one({"batch_number": barcode}, {"_id": 0})
-        if batch:
-            item = await db.items.find_one({"id": batch["item_id"]}, {"_id": 0})
-            if item:
-                item["batch_info"] = batch
-    
+    item = (await resolve_barcodes(db, [barcode]))[barcode]
     if not item:
         raise HTTPException(status_code=404, detail="Item not found for barcode")
     
@@ -607,77 +786,63 @@ async def update_item_barcode(
     if existing:
         raise HTTPException(status_code=400, detail="Barcode already assigned to another item")
     
-    result = await db.items.update_one(
+    previous = await db.items.find_one_and_update(
         {"id": item_id},
-        {"$set": {"barcode": barcode, "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"barcode": barcode, "updated_at": datetime.now(timezone.utc).isoformat()}},
+        {"_id": 0, "barcode": 1}
     )
     
-    if result.matched_count == 0:
+    if previous is None:
         raise HTTPException(status_code=404, detail="Item not found")
+    barcode_cache.invalidate(barcode, *([previous["barcode"]] if previous.get("barcode") else []))
     
     return {"message": "Barcode updated successfully"}
 
 # ==================== STOCK VALUATION ====================
 @router.get("/stock-valuation")
 async def get_stock_valuation(
+    request: Request,
     method: str = Query(default="weighted_avg"),  # fifo, lifo, weighted_avg
     warehouse_id: Optional[str] = None,
+    stream: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get stock valuation using different methods"""
-    query = {"current_quantity": {"$gt": 0}}
-    if warehouse_id:
-        query["warehouse_id"] = warehouse_id
-    
-    batches = await db.batches.find(query, {"_id": 0}).sort("created_at", 1).to_list(10000)
-    
-    # Group by item
-    item_batches = {}
-    for batch in batches:
-        item_id = batch["item_id"]
-        if item_id not in item_batches:
-            item_batches[item_id] = {
-                "item_id": item_id,
-                "item_code": batch.get("item_code"),
-                "item_name": batch.get("item_name"),
-                "batches": []
-            }
-        item_batches[item_id]["batches"].append(batch)
-    
-    valuations = []
-    total_value = 0
-    
-    for item_id, data in item_batches.items():
-        total_qty = sum(b["current_quantity"] for b in data["batches"])
-        
-        if method == "fifo":
-            # First In First Out - use oldest batches first
-            value = sum(b["current_quantity"] * b["unit_cost"] for b in data["batches"])
-            avg_cost = value / total_qty if total_qty > 0 else 0
-        elif method == "lifo":
-            # Last In First Out - use newest batches first
-            value = sum(b["current_quantity"] * b["unit_cost"] for b in reversed(data["batches"]))
-            avg_cost = value / total_qty if total_qty > 0 else 0
-        else:
-            # Weighted Average
-            total_cost = sum(b["current_quantity"] * b["unit_cost"] for b in data["batches"])
-            avg_cost = total_cost / total_qty if total_qty > 0 else 0
-            value = total_qty * avg_cost
-        
-        valuations.append({
-            "item_id": item_id,
-            "item_code": data["item_code"],
-            "item_name": data["item_name"],
-            "quantity": total_qty,
-            "avg_cost": round(avg_cost, 2),
-            "total_value": round(value, 2),
-            "batch_count": len(data["batches"])
-        })
-        total_value += value
-    
+    """Get stock valuation from cost layers (utils/cost_layers.py)"""
+    if method not in ("fifo", "lifo", "weighted_avg"):
+        raise HTTPException(status_code=400, detail="method must be fifo, lifo or weighted_avg")
+
+    cursor = db.cost_layers.aggregate(valuation_pipeline(method, warehouse_id), batchSize=STREAM_BATCH_SIZE)
+
+    if wants_stream(request, stream):
+        totals = {"total_items": 0, "total_value": 0.0}
+
+        def count(row):
+            totals["total_items"] += 1
+            totals["total_value"] += row["total_value"]
+            return row
+
+        def trailer():
+            yield {"row_type": "summary", "valuation_method": method,
+                   "total_items": totals["total_items"], "total_value": round(totals["total_value"], 2)}
+
+        return stream_rows(request, cursor, transform=count, trailer=trailer,
+                           filename=f"stock_valuation_{method}")
+
+    valuations = await cursor.to_list(None)
     return {
         "valuation_method": method,
         "total_items": len(valuations),
-        "total_value": round(total_value, 2),
-        "items": sorted(valuations, key=lambda x: x["total_value"], reverse=True)
+        "total_value": round(sum(v["total_value"] for v in valuations), 2),
+        "items": valuations
     }
+
+@router.post("/cost-layers/rebuild")
+async def rebuild_item_cost_layers(
+    item_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Replay the stock ledger into cost layers (backfill or repair)"""
+    if current_user.get('role') != 'admin':
+        raise HTTPException(status_code=403, detail="Admin access required")
+    stats = await rebuild_cost_layers(db, item_id)
+    return {"message": "Cost layers rebuilt", **stats}
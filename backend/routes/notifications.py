@@ -15,9 +15,15 @@ from datetime import datetime, timezone, timedelta
 import uuid
 
 from server import db, get_current_user
+from utils.indexes import register_index
+from utils.reorder_watchlist import open_entries
 
 router = APIRouter()
 
+register_index("notifications", [("target_user_id", 1), ("created_at", -1)])
+register_index("activity_logs", [("entity_type", 1), ("created_at", -1)])
+register_index("activity_logs", [("user_id", 1), ("created_at", -1)])
+
 # ==================== MODELS ====================
 class NotificationCreate(BaseModel):
     title: str
@@ -150,16 +156,12 @@ async def generate_system_alerts(current_user: dict = Depends(get_current_user))
             alerts_created.append(notif["title"])
     
     # 2. Low Stock Alerts
-    low_stock_items = await db.items.find({
-        "is_active": True,
-        "$expr": {"$lte": ["$current_stock", "$reorder_level"]},
-        "reorder_level": {"$gt": 0}
-    }, {"_id": 0, "id": 1, "item_code": 1, "item_name": 1, "current_stock": 1, "reorder_level": 1}).to_list(50)
+    low_stock_items = await open_entries(db, 50).to_list(50)
     
     for item in low_stock_items:
         existing = await db.notifications.find_one({
             "reference_type": "item",
-            "reference_id": item["id"],
+            "reference_id": item["item_id"],
             "created_at": {"$gte": (now - timedelta(days=1)).isoformat()}
         })
         if not existing:
@@ -172,7 +174,7 @@ async def generate_system_alerts(current_user: dict = Depends(get_current_user))
                 "priority": "urgent" if is_critical else "high",
                 "target_user_id": None,
                 "reference_type": "item",
-                "reference_id": item["id"],
+                "reference_id": item["item_id"],
                 "action_url": "/inventory",
                 "is_read": False,
                 "created_at": now.isoformat()
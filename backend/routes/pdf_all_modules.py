@@ -15,16 +15,8 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from datetime import datetime, timezone
 import io
-import qrcode
-from PIL import Image as PILImage
-
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch, mm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
 
+# reportlab/qrcode/PIL are imported inside the generators so they only load on first PDF
 from server import db, get_current_user
 
 router = APIRouter()
@@ -47,6 +39,9 @@ COMPANY_INFO = {
 
 def get_styles():
     """Get common styles for PDF generation"""
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER
     styles = getSampleStyleSheet()
     styles.add(ParagraphStyle(name='CompanyName', fontName='Helvetica-Bold', fontSize=16, alignment=TA_CENTER, spaceAfter=5))
     styles.add(ParagraphStyle(name='DocTitle', fontName='Helvetica-Bold', fontSize=14, alignment=TA_CENTER, spaceAfter=10, textColor=colors.HexColor('#1e3a5f')))
@@ -57,6 +52,10 @@ def get_styles():
 
 def create_header(elements, styles, company_info, doc_title, title_color='#1e3a5f'):
     """Create common header for all documents"""
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import Paragraph, Spacer
+    from reportlab.lib.enums import TA_CENTER
     elements.append(Paragraph(company_info["name"], styles['CompanyName']))
     elements.append(Paragraph(company_info["address"], styles['SmallText']))
     elements.append(Paragraph(f"GSTIN: {company_info['gstin']} | Phone: {company_info['phone']} | Email: {company_info['email']}", styles['SmallText']))
@@ -69,6 +68,7 @@ def create_header(elements, styles, company_info, doc_title, title_color='#1e3a5
 
 def create_footer(elements, company_info):
     """Create common footer with signature"""
+    from reportlab.platypus import Table, TableStyle, Spacer
     elements.append(Spacer(1, 30))
     footer_table = Table([
         ["", f"For {company_info['name']}"],
@@ -86,6 +86,9 @@ def create_footer(elements, company_info):
 # ==================== WORK ORDER PDF ====================
 def generate_work_order_pdf(wo: dict, company_info: dict = COMPANY_INFO) -> io.BytesIO:
     """Generate Work Order PDF"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
     styles = get_styles()
@@ -174,6 +177,9 @@ def generate_work_order_pdf(wo: dict, company_info: dict = COMPANY_INFO) -> io.B
 # ==================== DELIVERY CHALLAN PDF ====================
 def generate_delivery_challan_pdf(challan: dict, company_info: dict = COMPANY_INFO) -> io.BytesIO:
     """Generate Delivery Challan PDF"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
     styles = get_styles()
@@ -255,6 +261,9 @@ def generate_delivery_challan_pdf(challan: dict, company_info: dict = COMPANY_IN
 # ==================== PURCHASE ORDER PDF ====================
 def generate_purchase_order_pdf(po: dict, company_info: dict = COMPANY_INFO) -> io.BytesIO:
     """Generate Purchase Order PDF"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
     styles = get_styles()
@@ -339,6 +348,9 @@ def generate_purchase_order_pdf(po: dict, company_info: dict = COMPANY_INFO) ->
 # ==================== SAMPLE PDF ====================
 def generate_sample_pdf(sample: dict, company_info: dict = COMPANY_INFO) -> io.BytesIO:
     """Generate Sample Dispatch PDF"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
     styles = get_styles()
@@ -409,6 +421,9 @@ def generate_sample_pdf(sample: dict, company_info: dict = COMPANY_INFO) -> io.B
 # ==================== PAYMENT RECEIPT PDF ====================
 def generate_payment_receipt_pdf(payment: dict, company_info: dict = COMPANY_INFO) -> io.BytesIO:
     """Generate Payment Receipt PDF"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
     styles = get_styles()
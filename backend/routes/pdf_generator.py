@@ -14,14 +14,7 @@ from datetime import datetime, timezone
 import io
 import uuid
 
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch, mm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.pdfgen import canvas
-from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
-
+# reportlab is imported inside the generators so it only loads on first PDF
 from server import db, get_current_user
 
 router = APIRouter()
@@ -40,6 +33,11 @@ COMPANY_INFO = {
 
 def generate_invoice_pdf(invoice: dict, company_info: dict = COMPANY_INFO) -> io.BytesIO:
     """Generate professional Invoice PDF"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.enums import TA_CENTER
     buffer = io.BytesIO()
     
     # Create PDF document
@@ -218,6 +216,11 @@ def generate_invoice_pdf(invoice: dict, company_info: dict = COMPANY_INFO) -> io
 
 def generate_quotation_pdf(quotation: dict, company_info: dict = COMPANY_INFO) -> io.BytesIO:
     """Generate professional Quotation PDF"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.enums import TA_CENTER
     buffer = io.BytesIO()
     
     doc = SimpleDocTemplate(
@@ -4,9 +4,15 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone
 import uuid
 from server import db, get_current_user
+from utils.user_cache import user_cache
+from utils.org_hierarchy import invalidate_visibility
+from utils.indexes import register_index
 
 router = APIRouter()
 
+register_index("user_access", [("user_id", 1)], unique=True)
+register_index("roles", [("role_name", 1)], unique=True)
+
 # ==================== PERMISSION MODELS ====================
 class ModulePermission(BaseModel):
     module: str
@@ -376,6 +382,8 @@ async def update_user_access(user_id: str, access_level: str, assigned_locations
         access_doc["custom_permissions"] = None
         await db.user_access.insert_one(access_doc)
     
+    user_cache.invalidate(user_id)
+    invalidate_visibility()
     return {"message": "User access updated", "data_access_level": access_level}
 
 @router.put("/users/{user_id}/permissions")
@@ -415,6 +423,8 @@ async def update_user_permissions(user_id: str, permissions: List[ModulePermissi
         }
         await db.user_access.insert_one(access_doc)
     
+    user_cache.invalidate(user_id)
+    invalidate_visibility()
     return {"message": "User permissions updated"}
 
 # ==================== PERMISSION CHECK HELPER ====================
@@ -1,37 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone
 import uuid
 import re
-import httpx
 from server import db, get_current_user
+from routes.field_registry import fields_projection
+from utils.indexes import register_index
+from utils.pagination import fetch_page, set_next_cursor, MAX_PAGE_SIZE
+from utils.fast_json import model_projection, trusted_list_response, raw_response
+from utils.geo import lookup_india_pincode
+from utils.pricing import price_document, supply_terms
 
 router = APIRouter()
 
-# ==================== PINCODE & GSTIN HELPERS ====================
-PINCODE_API_BASE = "https://api.postalpincode.in/pincode/"
-
-async def lookup_india_pincode(pincode: str) -> Optional[dict]:
-    """Fetch city/state/district from Indian pincode API."""
-    if not pincode or len(pincode) != 6 or not pincode.isdigit():
-        return None
-    try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            resp = await client.get(f"{PINCODE_API_BASE}{pincode}")
-            data = resp.json()
-            if data and data[0].get("Status") == "Success":
-                po = data[0]["PostOffice"][0]
-                return {
-                    "city": po.get("Block") or po.get("Name"),
-                    "district": po.get("District"),
-                    "state": po.get("State"),
-                    "country": "India"
-                }
-    except Exception:
-        pass
-    return None
+register_index("suppliers", [("id", 1)], unique=True)
+register_index("suppliers", [("supplier_name", 1), ("id", 1)])
+register_index("purchase_orders", [("id", 1)], unique=True)
+register_index("purchase_orders", [("supplier_id", 1), ("created_at", -1)])
+register_index("purchase_orders", [("status", 1), ("created_at", -1)])
+register_index("purchase_orders", [("created_at", -1), ("id", -1)])
+register_index("grn", [("id", 1)], unique=True)
+register_index("grn", [("po_id", 1)])
+register_index("grn", [("status", 1), ("created_at", -1)])
+register_index("grn", [("created_at", -1), ("id", -1)])
 
+# ==================== PINCODE & GSTIN HELPERS ====================
 # Indian state code mapping (first 2 digits of GSTIN)
 GSTIN_STATE_CODES = {
     "01": "Jammu & Kashmir", "02": "Himachal Pradesh", "03": "Punjab",
@@ -196,6 +190,7 @@ class PurchaseOrder(BaseModel):
     igst_amount: float
     total_tax: float
     grand_total: float
+    place_of_supply: Optional[str] = None
     currency: str
     payment_terms: Optional[str] = None
     delivery_terms: Optional[str] = None
@@ -280,7 +275,7 @@ async def create_supplier(supplier_data: SupplierCreate, current_user: dict = De
     
     # Auto-fill geo fields from pincode (India)
     if supplier_doc.get("pincode") and len(supplier_doc.get("pincode", "")) == 6:
-        geo = await lookup_india_pincode(supplier_doc["pincode"])
+        geo = await lookup_india_pincode(db, supplier_doc["pincode"])
         if geo:
             if not supplier_doc.get("city"):
                 supplier_doc["city"] = geo.get("city")
@@ -303,11 +298,15 @@ async def create_supplier(supplier_data: SupplierCreate, current_user: dict = De
 
 @router.get("/suppliers", response_model=List[Supplier])
 async def get_suppliers(
+    response: Response,
     supplier_type: Optional[str] = None,
     is_active: Optional[bool] = None,
     search: Optional[str] = None,
     city: Optional[str] = None,
     state: Optional[str] = None,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
     current_user: dict = Depends(get_current_user)
 ):
     query = {}
@@ -326,14 +325,21 @@ async def get_suppliers(
     if state:
         query["state"] = {"$regex": state, "$options": "i"}
     
-    suppliers = await db.suppliers.find(query, {"_id": 0}).sort("supplier_name", 1).to_list(1000)
-    return [Supplier(**s) for s in suppliers]
+    projection = await fields_projection(fields, "procurement", "suppliers", Supplier)
+    suppliers, next_cursor = await fetch_page(db.suppliers, query, "supplier_name", 1, cursor, limit, projection=projection or model_projection(Supplier))
+    set_next_cursor(response, next_cursor)
+    if projection:
+        return raw_response(suppliers, response)
+    return trusted_list_response(Supplier, suppliers, response)
 
 @router.get("/suppliers/{supplier_id}", response_model=Supplier)
-async def get_supplier(supplier_id: str, current_user: dict = Depends(get_current_user)):
-    supplier = await db.suppliers.find_one({"id": supplier_id}, {"_id": 0})
+async def get_supplier(supplier_id: str, fields: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    projection = await fields_projection(fields, "procurement", "suppliers", Supplier)
+    supplier = await db.suppliers.find_one({"id": supplier_id}, projection or {"_id": 0})
     if not supplier:
         raise HTTPException(status_code=404, detail="Supplier not found")
+    if projection:
+        return raw_response(supplier)
     return Supplier(**supplier)
 
 @router.put("/suppliers/{supplier_id}", response_model=Supplier)
@@ -343,7 +349,7 @@ async def update_supplier(supplier_id: str, supplier_data: SupplierUpdate, curre
     
     # Auto-fill geo fields from pincode (India)
     if update_dict.get("pincode") and len(update_dict.get("pincode", "")) == 6:
-        geo = await lookup_india_pincode(update_dict["pincode"])
+        geo = await lookup_india_pincode(db, update_dict["pincode"])
         if geo:
             if not update_dict.get("city"):
                 update_dict["city"] = geo.get("city")
@@ -377,52 +383,16 @@ async def delete_supplier(supplier_id: str, current_user: dict = Depends(get_cur
     return {"message": "Supplier deactivated"}
 
 # ==================== PURCHASE ORDER ENDPOINTS ====================
-def calculate_po_totals(items: List[dict]) -> dict:
-    subtotal = 0
-    total_discount = 0
-    total_tax = 0
-    
-    calculated_items = []
-    for item in items:
-        qty = item.get("quantity", 0)
-        price = item.get("unit_price", 0)
-        discount_pct = item.get("discount_percent", 0)
-        tax_pct = item.get("tax_percent", 18)
-        
-        line_subtotal = qty * price
-        line_discount = line_subtotal * (discount_pct / 100)
-        line_taxable = line_subtotal - line_discount
-        line_tax = line_taxable * (tax_pct / 100)
-        line_total = line_taxable + line_tax
-        
-        calculated_items.append({
-            **item,
-            "line_subtotal": round(line_subtotal, 2),
-            "line_discount": round(line_discount, 2),
-            "line_taxable": round(line_taxable, 2),
-            "line_tax": round(line_tax, 2),
-            "line_total": round(line_total, 2),
-            "received_qty": 0
-        })
-        
-        subtotal += line_subtotal
-        total_discount += line_discount
-        total_tax += line_tax
-    
-    taxable_amount = subtotal - total_discount
-    cgst = total_tax / 2
-    sgst = total_tax / 2
-    
+PO_TOTAL_FIELDS = (
+    "subtotal", "discount_amount", "taxable_amount",
+    "cgst_amount", "sgst_amount", "igst_amount", "total_tax", "grand_total",
+)
+
+def calculate_po_totals(items: List[dict], is_interstate: bool = False) -> dict:
+    priced = price_document(items, is_interstate=is_interstate)
     return {
-        "items": calculated_items,
-        "subtotal": round(subtotal, 2),
-        "discount_amount": round(total_discount, 2),
-        "taxable_amount": round(taxable_amount, 2),
-        "cgst_amount": round(cgst, 2),
-        "sgst_amount": round(sgst, 2),
-        "igst_amount": 0,
-        "total_tax": round(total_tax, 2),
-        "grand_total": round(taxable_amount + total_tax, 2)
+        "items": [{**item, "received_qty": 0} for item in priced["items"]],
+        **{k: priced[k] for k in PO_TOTAL_FIELDS}
     }
 
 @router.post("/purchase-orders", response_model=PurchaseOrder)
@@ -432,7 +402,7 @@ async def create_purchase_order(po_data: PurchaseOrderCreate, current_user: dict
     po_number = f"PO-{now.strftime('%Y%m%d')}-{str(uuid.uuid4())[:6].upper()}"
     
     # Get supplier details
-    supplier = await db.suppliers.find_one({"id": po_data.supplier_id}, {"supplier_name": 1, "payment_terms": 1})
+    supplier = await db.suppliers.find_one({"id": po_data.supplier_id}, {"supplier_name": 1, "payment_terms": 1, "gstin": 1, "state": 1})
     if not supplier:
         raise HTTPException(status_code=404, detail="Supplier not found")
     
@@ -453,7 +423,8 @@ async def create_purchase_order(po_data: PurchaseOrderCreate, current_user: dict
             })
     
     # Calculate totals
-    totals = calculate_po_totals(items_with_details)
+    supply = await supply_terms(db, supplier, inward=True)
+    totals = calculate_po_totals(items_with_details, supply["is_interstate"])
     
     po_doc = {
         "id": po_id,
@@ -463,6 +434,7 @@ async def create_purchase_order(po_data: PurchaseOrderCreate, current_user: dict
         "po_type": po_data.po_type,
         "warehouse_id": po_data.warehouse_id,
         "warehouse_name": warehouse.get("warehouse_name") if warehouse else "",
+        "place_of_supply": supply["place_of_supply"],
         **totals,
         "currency": po_data.currency,
         "payment_terms": po_data.payment_terms or supplier.get("payment_terms"),
@@ -482,11 +454,15 @@ async def create_purchase_order(po_data: PurchaseOrderCreate, current_user: dict
 
 @router.get("/purchase-orders", response_model=List[PurchaseOrder])
 async def get_purchase_orders(
+    response: Response,
     supplier_id: Optional[str] = None,
     status: Optional[str] = None,
     warehouse_id: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
     current_user: dict = Depends(get_current_user)
 ):
     query = {}
@@ -504,14 +480,21 @@ async def get_purchase_orders(
         else:
             query["created_at"] = {"$lte": date_to}
     
-    pos = await db.purchase_orders.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    projection = await fields_projection(fields, "procurement", "purchase_orders", PurchaseOrder)
+    pos, next_cursor = await fetch_page(db.purchase_orders, query, "created_at", -1, cursor, limit, projection=projection)
+    set_next_cursor(response, next_cursor)
+    if projection:
+        return raw_response(pos, response)
     return [PurchaseOrder(**po) for po in pos]
 
 @router.get("/purchase-orders/{po_id}", response_model=PurchaseOrder)
-async def get_purchase_order(po_id: str, current_user: dict = Depends(get_current_user)):
-    po = await db.purchase_orders.find_one({"id": po_id}, {"_id": 0})
+async def get_purchase_order(po_id: str, fields: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    projection = await fields_projection(fields, "procurement", "purchase_orders", PurchaseOrder)
+    po = await db.purchase_orders.find_one({"id": po_id}, projection or {"_id": 0})
     if not po:
         raise HTTPException(status_code=404, detail="Purchase Order not found")
+    if projection:
+        return raw_response(po)
     return PurchaseOrder(**po)
 
 @router.put("/purchase-orders/{po_id}/status")
@@ -569,8 +552,10 @@ async def update_purchase_order(po_id: str, po_data: PurchaseOrderUpdate, curren
                 })
         
         # Recalculate totals
-        totals = calculate_po_totals(items_with_details)
-        update_dict.update(totals)
+        supplier = await db.suppliers.find_one({"id": po.get("supplier_id")}, {"_id": 0, "gstin": 1, "state": 1})
+        supply = await supply_terms(db, supplier, inward=True)
+        update_dict["place_of_supply"] = supply["place_of_supply"]
+        update_dict.update(calculate_po_totals(items_with_details, supply["is_interstate"]))
     
     # Update other fields
     if po_data.payment_terms is not None:
@@ -595,7 +580,7 @@ async def update_purchase_order(po_id: str, po_data: PurchaseOrderUpdate, curren
 @router.get("/geo/pincode/{pincode}")
 async def get_pincode_details(pincode: str, current_user: dict = Depends(get_current_user)):
     """Lookup city, district, state from Indian pincode"""
-    details = await lookup_india_pincode(pincode)
+    details = await lookup_india_pincode(db, pincode)
     if not details:
         raise HTTPException(status_code=404, detail="Pincode not found or invalid")
     return details
@@ -759,9 +744,13 @@ async def create_grn(grn_data: GRNCreate, current_user: dict = Depends(get_curre
 
 @router.get("/grn", response_model=List[GRN])
 async def get_grns(
+    response: Response,
     po_id: Optional[str] = None,
     supplier_id: Optional[str] = None,
     status: Optional[str] = None,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=MAX_PAGE_SIZE),
     current_user: dict = Depends(get_current_user)
 ):
     query = {}
@@ -772,7 +761,11 @@ async def get_grns(
     if status:
         query["status"] = status
     
-    grns = await db.grn.find(query, {"_id": 0}).sort("created_at", -1).to_list(500)
+    projection = await fields_projection(fields, "procurement", "grn", GRN)
+    grns, next_cursor = await fetch_page(db.grn, query, "created_at", -1, cursor, limit, projection=projection)
+    set_next_cursor(response, next_cursor)
+    if projection:
+        return raw_response(grns, response)
     return [GRN(**g) for g in grns]
 
 @router.put("/grn/{grn_id}/approve")
@@ -787,23 +780,22 @@ async def approve_grn(grn_id: str, current_user: dict = Depends(get_current_user
     
     now = datetime.now(timezone.utc).isoformat()
     
-    # Add stock for each accepted item
-    for item in grn["items"]:
-        if item["accepted_qty"] > 0:
-            # Create stock entry
-            from routes.inventory import StockEntry, create_stock_entry
-            entry = StockEntry(
-                item_id=item["item_id"],
-                warehouse_id=grn["warehouse_id"],
-                quantity=item["accepted_qty"],
-                transaction_type="receipt",
-                reference_type="GRN",
-                reference_id=grn_id,
-                batch_no=item.get("batch_no"),
-                expiry_date=item.get("expiry_date"),
-                unit_cost=item["unit_price"]
-            )
-            await create_stock_entry(entry, current_user)
+    # Add stock for all accepted lines in one batch
+    from routes.inventory import StockEntry, post_stock_entries
+    await post_stock_entries([
+        StockEntry(
+            item_id=item["item_id"],
+            warehouse_id=grn["warehouse_id"],
+            quantity=item["accepted_qty"],
+            transaction_type="receipt",
+            reference_type="GRN",
+            reference_id=grn_id,
+            batch_no=item.get("batch_no"),
+            expiry_date=item.get("expiry_date"),
+            unit_cost=item["unit_price"]
+        )
+        for item in grn["items"] if item["accepted_qty"] > 0
+    ], current_user)
     
     await db.grn.update_one(
         {"id": grn_id},
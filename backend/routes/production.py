@@ -4,9 +4,15 @@ from typing import List, Optional
 from datetime import datetime, timezone
 import uuid
 from server import db, get_current_user
+from utils.indexes import register_index
 
 router = APIRouter()
 
+register_index("work_orders", [("id", 1)], unique=True)
+register_index("work_orders", [("status", 1), ("created_at", -1)])
+register_index("production_entries", [("wo_id", 1)])
+register_index("production_entries", [("batch_number", 1)])
+
 class WorkOrderCreate(BaseModel):
     sales_order_id: Optional[str] = None
     item_id: str
@@ -178,10 +184,31 @@ async def create_production_entry(entry_data: ProductionEntry, current_user: dic
                 })
                 raise HTTPException(status_code=409, detail="Approval required: Production Scrap > 7%")
 
+    # Production output is received into the Main warehouse (first warehouse as fallback)
+    default_wh = await db.warehouses.find_one({'warehouse_type': 'Main'}, {'_id': 0, 'id': 1})
+    if not default_wh:
+        default_wh = await db.warehouses.find_one({}, {'_id': 0, 'id': 1})
+    if not default_wh:
+        raise HTTPException(status_code=400, detail="No warehouse configured to receive production output")
     
     entry_id = str(uuid.uuid4())
     batch_number = f"{wo['item_id']}-{datetime.now(timezone.utc).strftime('%Y%m%d')}-{wo['machine_id']}-{wo['wo_number']}"
     
+    # Record stock movement into Inventory stock ledger/balance (uses Inventory module collections)
+    # before the entry and work order, so a rejected posting leaves nothing half-recorded
+    from routes.inventory import StockEntry, post_stock_entries
+    machine = await db.machines.find_one({'id': wo['machine_id']}, {'_id': 0, 'machine_code': 1})
+    await post_stock_entries([StockEntry(
+        item_id=wo['item_id'],
+        warehouse_id=default_wh['id'],
+        quantity=entry_data.quantity_produced,
+        transaction_type='production_in',
+        reference_type='WorkOrder',
+        reference_id=wo['id'],
+        batch_no=batch_number,
+        notes=f"Machine: {(machine or {}).get('machine_code', wo['machine_id'])}"
+    )], current_user)
+    
     entry_doc = {
         'id': entry_id,
         'batch_number': batch_number,
@@ -204,63 +231,6 @@ async def create_production_entry(entry_data: ProductionEntry, current_user: dic
     
     await db.work_orders.update_one({'id': entry_data.wo_id}, {'$set': update_data})
     
-    # Record stock movement into Inventory stock ledger/balance (uses Inventory module collections)
-    machine = await db.machines.find_one({'id': wo['machine_id']}, {'_id': 0})
-    warehouses = await db.warehouses.find({}, {'_id': 0}).to_list(1000)
-    default_wh = next((w for w in warehouses if w.get('warehouse_type') == 'Main'), warehouses[0] if warehouses else None)
-
-    # Update stock_balance and item current_stock similarly to Inventory /stock/entry logic
-    balance = await db.stock_balance.find_one({'item_id': wo['item_id'], 'warehouse_id': (default_wh or {}).get('id', '')}, {'_id': 0})
-    current_qty = balance.get('quantity', 0) if balance else 0
-    new_qty = current_qty + entry_data.quantity_produced
-
-    await db.stock_ledger.insert_one({
-        'id': str(uuid.uuid4()),
-        'item_id': wo['item_id'],
-        'warehouse_id': (default_wh or {}).get('id', ''),
-        'transaction_date': datetime.now(timezone.utc).isoformat(),
-        'transaction_type': 'production_in',
-        'reference_type': 'WorkOrder',
-        'reference_id': wo['id'],
-        'in_qty': entry_data.quantity_produced,
-        'out_qty': 0,
-        'balance_qty': new_qty,
-        'unit_cost': 0,
-        'batch_no': batch_number,
-        'notes': f"Machine: {(machine or {}).get('machine_code', wo['machine_id'])}",
-        'created_by': current_user['id']
-    })
-
-    if balance:
-        await db.stock_balance.update_one(
-            {'item_id': wo['item_id'], 'warehouse_id': (default_wh or {}).get('id', '')},
-            {'$set': {'quantity': new_qty, 'available_qty': new_qty, 'last_updated': datetime.now(timezone.utc).isoformat()}}
-        )
-    else:
-        item_doc = await db.items.find_one({'id': wo['item_id']}, {'_id': 0})
-        await db.stock_balance.insert_one({
-            'id': str(uuid.uuid4()),
-            'item_id': wo['item_id'],
-            'item_code': (item_doc or {}).get('item_code'),
-            'item_name': (item_doc or {}).get('item_name'),
-            'warehouse_id': (default_wh or {}).get('id', ''),
-            'warehouse_name': (default_wh or {}).get('warehouse_name', ''),
-            'quantity': new_qty,
-            'reserved_qty': 0,
-            'available_qty': new_qty,
-            'uom': (item_doc or {}).get('uom', 'Rolls'),
-            'avg_cost': 0,
-            'total_value': 0,
-            'last_updated': datetime.now(timezone.utc).isoformat()
-        })
-
-    total_stock = await db.stock_balance.aggregate([
-        {'$match': {'item_id': wo['item_id']}},
-        {'$group': {'_id': None, 'total': {'$sum': '$quantity'}}}
-    ]).to_list(1)
-    total = total_stock[0]['total'] if total_stock else 0
-    await db.items.update_one({'id': wo['item_id']}, {'$set': {'current_stock': total}})
-    
     return {'message': 'Production entry created', 'entry_id': entry_id, 'batch_number': batch_number}
 
 @router.get("/production-entries")
@@ -196,30 +196,21 @@ async def issue_rm_requisition(req_id: str, current_user: dict = Depends(get_cur
     if req['status'] not in ['draft', 'submitted']:
         raise HTTPException(status_code=400, detail="Requisition already processed")
     
-    # Deduct stock for each item
-    for item in req['items']:
-        # Update stock balance
-        await db.stock_balance.update_one(
-            {'item_id': item['item_id'], 'warehouse_id': item['warehouse_id']},
-            {'$inc': {'quantity': -item['required_qty'], 'available_qty': -item['required_qty']}}
+    # Deduct stock for all lines in one batch (fails without posting if any line is short)
+    from routes.inventory import StockEntry, post_stock_entries
+    await post_stock_entries([
+        StockEntry(
+            item_id=item['item_id'],
+            warehouse_id=item['warehouse_id'],
+            quantity=item['required_qty'],
+            transaction_type='issue',
+            reference_type='RM_Requisition',
+            reference_id=req_id,
+            batch_no=item.get('batch_no'),
+            notes=f"RM Issue for WO: {req.get('wo_number')}"
         )
-        
-        # Create stock ledger entry
-        await db.stock_ledger.insert_one({
-            'id': str(uuid.uuid4()),
-            'item_id': item['item_id'],
-            'warehouse_id': item['warehouse_id'],
-            'transaction_date': datetime.now(timezone.utc).isoformat(),
-            'transaction_type': 'issue',
-            'reference_type': 'RM_Requisition',
-            'reference_id': req_id,
-            'in_qty': 0,
-            'out_qty': item['required_qty'],
-            'unit_cost': 0,
-            'batch_no': item.get('batch_no'),
-            'notes': f"RM Issue for WO: {req.get('wo_number')}",
-            'created_by': current_user['id']
-        })
+        for item in req['items']
+    ], current_user)
     
     # Update requisition status
     await db.rm_requisitions.update_one(
@@ -1,12 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timezone
 import uuid
 from server import db, get_current_user
+from utils.indexes import register_index
+from utils.pagination import fetch_page, set_next_cursor, MAX_PAGE_SIZE
 
 router = APIRouter()
 
+register_index("qc_inspections", [("id", 1)], unique=True)
+register_index("qc_inspections", [("inspection_type", 1), ("created_at", -1)])
+register_index("qc_inspections", [("created_at", -1), ("id", -1)])
+register_index("customer_complaints", [("status", 1), ("created_at", -1)])
+register_index("customer_complaints", [("created_at", -1), ("id", -1)])
+register_index("tds_documents", [("item_id", 1), ("created_at", -1)])
+register_index("tds_documents", [("created_at", -1), ("id", -1)])
+
 class QCInspectionCreate(BaseModel):
     inspection_type: str
     reference_type: str
@@ -94,14 +104,15 @@ async def create_qc_inspection(inspection_data: QCInspectionCreate, current_user
     return QCInspection(**{k: v for k, v in inspection_doc.items() if k != '_id' and k not in ['passed_tests', 'total_tests', 'created_by']})
 
 @router.get("/inspections", response_model=List[QCInspection])
-async def get_qc_inspections(inspection_type: Optional[str] = None, result: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+async def get_qc_inspections(response: Response, inspection_type: Optional[str] = None, result: Optional[str] = None, cursor: Optional[str] = None, limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE), current_user: dict = Depends(get_current_user)):
     query = {}
     if inspection_type:
         query['inspection_type'] = inspection_type
     if result:
         query['result'] = result
     
-    inspections = await db.qc_inspections.find(query, {'_id': 0, 'passed_tests': 0, 'total_tests': 0, 'created_by': 0}).sort('created_at', -1).to_list(1000)
+    inspections, next_cursor = await fetch_page(db.qc_inspections, query, 'created_at', -1, cursor, limit, projection={'_id': 0, 'passed_tests': 0, 'total_tests': 0, 'created_by': 0})
+    set_next_cursor(response, next_cursor)
     return [QCInspection(**inspection) for inspection in inspections]
 
 @router.get("/inspections/{inspection_id}", response_model=QCInspection)
@@ -130,14 +141,15 @@ async def create_complaint(complaint_data: CustomerComplaintCreate, current_user
     return CustomerComplaint(**{k: v for k, v in complaint_doc.items() if k != '_id' and k != 'created_by'})
 
 @router.get("/complaints", response_model=List[CustomerComplaint])
-async def get_complaints(status: Optional[str] = None, severity: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+async def get_complaints(response: Response, status: Optional[str] = None, severity: Optional[str] = None, cursor: Optional[str] = None, limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE), current_user: dict = Depends(get_current_user)):
     query = {}
     if status:
         query['status'] = status
     if severity:
         query['severity'] = severity
     
-    complaints = await db.customer_complaints.find(query, {'_id': 0, 'created_by': 0}).sort('created_at', -1).to_list(1000)
+    complaints, next_cursor = await fetch_page(db.customer_complaints, query, 'created_at', -1, cursor, limit, projection={'_id': 0, 'created_by': 0})
+    set_next_cursor(response, next_cursor)
     return [CustomerComplaint(**complaint) for complaint in complaints]
 
 @router.put("/complaints/{complaint_id}/resolve")
@@ -173,12 +185,13 @@ async def create_tds(tds_data: TDSCreate, current_user: dict = Depends(get_curre
     return TDS(**{k: v for k, v in tds_doc.items() if k != '_id' and k != 'created_by'})
 
 @router.get("/tds", response_model=List[TDS])
-async def get_tds(item_id: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+async def get_tds(response: Response, item_id: Optional[str] = None, cursor: Optional[str] = None, limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE), current_user: dict = Depends(get_current_user)):
     query = {}
     if item_id:
         query['item_id'] = item_id
     
-    tds_docs = await db.tds_documents.find(query, {'_id': 0, 'created_by': 0}).sort('created_at', -1).to_list(1000)
+    tds_docs, next_cursor = await fetch_page(db.tds_documents, query, 'created_at', -1, cursor, limit, projection={'_id': 0, 'created_by': 0})
+    set_next_cursor(response, next_cursor)
     return [TDS(**tds) for tds in tds_docs]
 
 
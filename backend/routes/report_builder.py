@@ -16,16 +16,13 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone
 import uuid
 import io
+import re
 
 from server import db, get_current_user
 from models.schemas import ReportCreate, ReportUpdate, ReportColumnDef, ReportFilterDef
 
-# PDF and Excel
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-import xlsxwriter
+# PDF/Excel libraries (reportlab, xlsxwriter) are imported inside the export
+# endpoints so they only load on first export
 
 router = APIRouter()
 
@@ -298,7 +295,8 @@ async def run_report(
         elif op == 'lte':
             query[field] = {"$lte": value}
         elif op == 'contains':
-            query[field] = {"$regex": value, "$options": "i"}
+            # Literal substring match; user input is not a pattern
+            query[field] = {"$regex": re.escape(str(value)), "$options": "i"}
         elif op == 'in':
             query[field] = {"$in": value if isinstance(value, list) else [value]}
         elif op == 'between':
@@ -356,6 +354,7 @@ async def export_report_excel(
     current_user: dict = Depends(get_current_user)
 ):
     """Export report to Excel"""
+    import xlsxwriter
     result = await run_report(report_id, limit=5000, current_user=current_user)
     report = result['report']
     data = result['data']
@@ -407,6 +406,10 @@ async def export_report_pdf(
     current_user: dict = Depends(get_current_user)
 ):
     """Export report to PDF"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
     result = await run_report(report_id, limit=500, current_user=current_user)
     report = result['report']
     data = result['data']
@@ -13,7 +13,7 @@ Features:
 - Scheduled Email Reports
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
@@ -23,15 +23,10 @@ import uuid
 import io
 
 from server import db, get_current_user
+from utils.streaming import wants_stream, stream_rows, STREAM_BATCH_SIZE
 
-# PDF and Excel export libraries
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch, mm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.pdfgen import canvas
-import xlsxwriter
+# PDF/Excel libraries (reportlab, xlsxwriter) are imported inside the export
+# endpoints so they only load on first export
 
 router = APIRouter()
 
@@ -341,23 +336,39 @@ async def get_inventory_summary(current_user: dict = Depends(get_current_user)):
 
 @router.get("/inventory/movement")
 async def get_inventory_movement(
+    request: Request,
     period_days: int = Query(default=30),
+    stream: bool = Query(default=False, description="Stream ledger rows as a JSON array"),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get inventory movement report"""
+    """
+    Get inventory movement report
+
+    With ?stream=1 or Accept: application/x-ndjson the matching stock ledger
+    rows are streamed instead of summarised (monthly movement exports).
+    """
     start_date = (datetime.now(timezone.utc) - timedelta(days=period_days)).isoformat()
+    query = {"transaction_date": {"$gte": start_date}}
+    
+    if wants_stream(request, stream):
+        cursor = db.stock_ledger.find(query, {"_id": 0}).sort("transaction_date", 1).batch_size(STREAM_BATCH_SIZE)
+        return stream_rows(request, cursor, filename=f"inventory_movement_{period_days}d")
     
-    # Get stock ledger entries
-    movements = await db.stock_ledger.find({
-        "transaction_date": {"$gte": start_date}
-    }, {"_id": 0}).to_list(100000)
+    # Iterate the cursor rather than materialising every ledger row
+    cursor = db.stock_ledger.find(
+        query, {"_id": 0, "in_qty": 1, "out_qty": 1, "transaction_type": 1}
+    ).batch_size(STREAM_BATCH_SIZE)
     
-    total_in = sum(m.get("in_qty", 0) for m in movements)
-    total_out = sum(m.get("out_qty", 0) for m in movements)
+    total_transactions = 0
+    total_in = 0
+    total_out = 0
     
     # By transaction type
     by_type = {}
-    for m in movements:
+    async for m in cursor:
+        total_transactions += 1
+        total_in += m.get("in_qty", 0)
+        total_out += m.get("out_qty", 0)
         t_type = m.get("transaction_type", "unknown")
         if t_type not in by_type:
             by_type[t_type] = {"in_qty": 0, "out_qty": 0, "count": 0}
@@ -367,7 +378,7 @@ async def get_inventory_movement(
     
     return {
         "period_days": period_days,
-        "total_transactions": len(movements),
+        "total_transactions": total_transactions,
         "total_in_qty": round(total_in, 2),
         "total_out_qty": round(total_out, 2),
         "net_movement": round(total_in - total_out, 2),
@@ -555,6 +566,10 @@ async def export_report_pdf(
     current_user: dict = Depends(get_current_user)
 ):
     """Export report as PDF"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
     buffer = io.BytesIO()
     
     doc = SimpleDocTemplate(
@@ -758,6 +773,7 @@ async def export_report_excel(
     current_user: dict = Depends(get_current_user)
 ):
     """Export report as Excel"""
+    import xlsxwriter
     buffer = io.BytesIO()
     workbook = xlsxwriter.Workbook(buffer, {'in_memory': True})
     
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 from datetime import datetime, timezone
 import uuid
 from server import db, get_current_user
+from utils.user_cache import user_cache
+from utils.org_hierarchy import set_manager, remove_from_hierarchy, rebuild_org_hierarchy, invalidate_visibility
+from utils.document_numbering import STATUTORY_DOC_TYPES, get_series_config, update_series_config
 
 router = APIRouter()
 
@@ -43,6 +46,15 @@ async def update_user(user_id: str, update_data: UserUpdate, current_user: dict
     update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
     update_dict['updated_at'] = datetime.now(timezone.utc).isoformat()
     
+    # Reporting line changes go through the hierarchy so ancestor paths stay in sync ('' clears it)
+    if 'reports_to' in update_dict:
+        try:
+            found = await set_manager(db, user_id, update_dict.pop('reports_to'))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not found:
+            raise HTTPException(status_code=404, detail="User not found")
+    
     result = await db.users.update_one(
         {'id': user_id},
         {'$set': update_dict}
@@ -51,6 +63,9 @@ async def update_user(user_id: str, update_data: UserUpdate, current_user: dict
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
     
+    user_cache.invalidate(user_id)
+    # Role, team or location changes alter compiled visibility filters
+    invalidate_visibility()
     return {'message': 'User updated successfully'}
 
 @router.delete("/users/{user_id}")
@@ -61,9 +76,48 @@ async def delete_user(user_id: str, current_user: dict = Depends(get_current_use
     if user_id == current_user['id']:
         raise HTTPException(status_code=400, detail="Cannot delete your own account")
     
-    result = await db.users.delete_one({'id': user_id})
+    deleted = await db.users.find_one_and_delete({'id': user_id}, {'_id': 0, 'reports_to': 1})
     
-    if result.deleted_count == 0:
+    if deleted is None:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return {'message': 'User deleted successfully'}
\ No newline at end of file
+    await remove_from_hierarchy(db, user_id, deleted.get('reports_to'))
+    user_cache.invalidate(user_id)
+    return {'message': 'User deleted successfully'}
+
+@router.post("/org-hierarchy/rebuild")
+async def rebuild_hierarchy(current_user: dict = Depends(get_current_user)):
+    """Recompute every user's manager chain from reports_to"""
+    if current_user['role'] != 'admin':
+        raise HTTPException(status_code=403, detail="Access denied. Admin only.")
+    
+    return await rebuild_org_hierarchy(db)
+
+# ==================== DOCUMENT NUMBERING SERIES ====================
+class NumberingSeriesUpdate(BaseModel):
+    prefix: Optional[str] = None
+    seq_padding: Optional[int] = Field(None, ge=1, le=10)
+    allocation: Optional[Literal['strict', 'block']] = None
+    block_size: Optional[int] = Field(None, ge=1, le=10000)
+
+@router.get("/numbering-series/{doc_type}")
+async def get_numbering_series(doc_type: str, current_user: dict = Depends(get_current_user)):
+    config = await get_series_config(db, doc_type)
+    config['statutory'] = doc_type.lower() in STATUTORY_DOC_TYPES
+    return config
+
+@router.put("/numbering-series/{doc_type}")
+async def update_numbering_series(doc_type: str, update_data: NumberingSeriesUpdate, current_user: dict = Depends(get_current_user)):
+    if current_user['role'] != 'admin':
+        raise HTTPException(status_code=403, detail="Access denied. Admin only.")
+    
+    update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
+    update_dict['updated_at'] = datetime.now(timezone.utc).isoformat()
+    
+    try:
+        config = await update_series_config(db, doc_type, update_dict)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    config['statutory'] = doc_type.lower() in STATUTORY_DOC_TYPES
+    return config
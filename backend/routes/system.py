@@ -0,0 +1,99 @@
+"""
+System Diagnostics Module
+Admin-only endpoints for inspecting database and runtime health
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+
+from server import db, get_current_user
+from utils.indexes import ensure_indexes, index_report, get_registered_indexes
+from utils.user_cache import user_cache
+from utils.barcodes import barcode_cache, image_cache_stats
+from utils.slow_ops import slow_op_recorder, slow_op_report, SLOW_OPS_COLLECTION
+
+router = APIRouter()
+
+
+def require_admin(current_user: dict):
+    if current_user.get('role') != 'admin':
+        raise HTTPException(status_code=403, detail="Access denied. Admin only.")
+
+
+# ==================== INDEXES ====================
+@router.get("/indexes")
+async def get_index_report(current_user: dict = Depends(get_current_user)):
+    """Missing, unused ($indexStats) and unregistered indexes per collection"""
+    require_admin(current_user)
+    return await index_report(db)
+
+
+@router.get("/indexes/registry")
+async def get_index_registry(collection: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    """Indexes declared by route modules"""
+    require_admin(current_user)
+    registry = get_registered_indexes(collection)
+    return {
+        coll: [{"keys": spec["keys"], **spec["options"]} for spec in specs]
+        for coll, specs in registry.items()
+    }
+
+
+@router.post("/indexes/ensure")
+async def apply_index_registry(current_user: dict = Depends(get_current_user)):
+    """Create any registered index that is missing"""
+    require_admin(current_user)
+    return await ensure_indexes(db)
+
+
+# ==================== CACHES ====================
+@router.get("/cache/users")
+async def get_user_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Hit/miss counters of the get_current_user cache (this worker)"""
+    require_admin(current_user)
+    return user_cache.stats()
+
+
+@router.post("/cache/users/clear")
+async def clear_user_cache(current_user: dict = Depends(get_current_user)):
+    """Drop every cached user document (this worker)"""
+    require_admin(current_user)
+    user_cache.clear()
+    return {"message": "User cache cleared"}
+
+
+@router.get("/cache/barcodes")
+async def get_barcode_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Barcode resolution and rendered-image caches (this worker)"""
+    require_admin(current_user)
+    return {"resolutions": barcode_cache.stats(), "images": image_cache_stats()}
+
+
+# ==================== SLOW OPERATIONS ====================
+@router.get("/slow-ops")
+async def get_slow_op_ranking(
+    limit: int = Query(20, ge=1, le=200),
+    route: Optional[str] = None,
+    collection: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Worst query shapes by total time, with the routes that issue them"""
+    require_admin(current_user)
+    await slow_op_recorder.flush()
+    return {
+        "threshold_ms": slow_op_recorder.threshold_ms,
+        "explain_enabled": slow_op_recorder.explain,
+        "dropped": slow_op_recorder.listener.dropped,
+        "shapes": await slow_op_report(db, limit=limit, route=route, collection=collection)
+    }
+
+
+@router.get("/slow-ops/recent")
+async def get_recent_slow_ops(
+    limit: int = Query(50, ge=1, le=500),
+    current_user: dict = Depends(get_current_user)
+):
+    """Most recent slow operations (newest first)"""
+    require_admin(current_user)
+    await slow_op_recorder.flush()
+    return await db[SLOW_OPS_COLLECTION].find({}, {"_id": 0}).sort("$natural", -1).to_list(limit)
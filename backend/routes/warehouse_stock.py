@@ -3,18 +3,25 @@ Warehouse & Stock Management Module
 GST-wise warehouse management with full barcoding, batch tracking, and stock operations
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone
+import re
 import uuid
-import qrcode
-from io import BytesIO
-import base64
 from server import db, get_current_user
+from utils.indexes import register_index
+from utils.pagination import fetch_page, set_next_cursor, MAX_PAGE_SIZE
+from utils.barcodes import render_barcode_image
+from utils.serial_ranges import reserve_range, format_serial, expand, MAX_RANGE
 
 router = APIRouter()
 
+register_index("stock_entries", [("warehouse_id", 1), ("item_id", 1)])
+register_index("stock_entries", [("warehouse_id", 1), ("created_at", 1), ("id", 1)])
+register_index("stock_adjustments", [("id", 1)], unique=True)
+register_index("serial_number_configs", [("doc_type", 1), ("warehouse_id", 1)], unique=True)
+
 # ==================== PYDANTIC MODELS ====================
 
 class WarehouseCreate(BaseModel):
@@ -91,6 +98,17 @@ class BatchCreate(BaseModel):
 
 # ==================== WAREHOUSE CRUD ====================
 
+def _stock_summary_group(group_id) -> Dict[str, Any]:
+    return {"$group": {
+        "_id": group_id,
+        "total_items": {"$sum": 1},
+        "total_quantity": {"$sum": "$quantity"},
+        "total_value": {"$sum": {"$multiply": ["$quantity", {"$ifNull": ["$cost_price", 0]}]}}
+    }}
+
+EMPTY_STOCK_SUMMARY = {"total_items": 0, "total_quantity": 0, "total_value": 0}
+
+
 @router.get("/warehouses")
 async def get_warehouses(
     include_inactive: bool = False,
@@ -99,22 +117,18 @@ async def get_warehouses(
     """Get all warehouses with stock summary"""
     query = {} if include_inactive else {"is_active": {"$ne": False}}
     
-    warehouses = await db.warehouses.find(query, {"_id": 0}).to_list(100)
+    warehouses = await db.warehouses.find(query, {"_id": 0}).to_list(1000)
+    
+    # One $group over every warehouse's stock, joined in memory
+    summaries = await db.stock_entries.aggregate([
+        {"$match": {"warehouse_id": {"$in": [wh.get("id") for wh in warehouses]}}},
+        _stock_summary_group("$warehouse_id")
+    ]).to_list(None)
+    by_warehouse = {row.pop("_id"): row for row in summaries}
     
-    # Add stock summary for each warehouse
     for wh in warehouses:
-        # Count total items and value
-        stock_summary = await db.stock_entries.aggregate([
-            {"$match": {"warehouse_id": wh.get("id")}},
-            {"$group": {
-                "_id": None,
-                "total_items": {"$sum": 1},
-                "total_quantity": {"$sum": "$quantity"},
-                "total_value": {"$sum": {"$multiply": ["$quantity", {"$ifNull": ["$cost_price", 0]}]}}
-            }}
-        ]).to_list(1)
-        
-        wh["stock_summary"] = stock_summary[0] if stock_summary else {"total_items": 0, "total_quantity": 0, "total_value": 0}
+        summary = by_warehouse.get(wh.get("id"))
+        wh["stock_summary"] = {"_id": None, **summary} if summary else dict(EMPTY_STOCK_SUMMARY)
     
     return warehouses
 
@@ -170,9 +184,12 @@ async def get_warehouse(warehouse_id: str, current_user: dict = Depends(get_curr
     if not warehouse:
         raise HTTPException(status_code=404, detail="Warehouse not found")
     
-    # Get stock entries
-    stock = await db.stock_entries.find({"warehouse_id": warehouse_id}, {"_id": 0}).to_list(1000)
-    warehouse["stock"] = stock
+    # Stock totals; the entries themselves are paged by /warehouses/{warehouse_id}/stock
+    summary = await db.stock_entries.aggregate([
+        {"$match": {"warehouse_id": warehouse_id}},
+        _stock_summary_group(None)
+    ]).to_list(1)
+    warehouse["stock_summary"] = summary[0] if summary else dict(EMPTY_STOCK_SUMMARY)
     
     # Get serial number configs
     serial_configs = await db.serial_number_configs.find({"warehouse_id": warehouse_id}, {"_id": 0}).to_list(20)
@@ -181,6 +198,29 @@ async def get_warehouse(warehouse_id: str, current_user: dict = Depends(get_curr
     return warehouse
 
 
+@router.get("/warehouses/{warehouse_id}/stock")
+async def get_warehouse_stock(
+    warehouse_id: str,
+    response: Response,
+    item_id: Optional[str] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=MAX_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user)
+):
+    """Stock entries in one warehouse (keyset paged via X-Next-Cursor)"""
+    query = {"warehouse_id": warehouse_id}
+    if item_id:
+        query["item_id"] = item_id
+    if search:
+        pattern = {"$regex": re.escape(search), "$options": "i"}
+        query["$or"] = [{"item_code": pattern}, {"item_name": pattern}, {"batch_no": pattern}]
+    
+    stock, next_cursor = await fetch_page(db.stock_entries, query, "created_at", 1, cursor, limit)
+    set_next_cursor(response, next_cursor)
+    return stock
+
+
 @router.put("/warehouses/{warehouse_id}")
 async def update_warehouse(warehouse_id: str, warehouse: WarehouseCreate, current_user: dict = Depends(get_current_user)):
     """Update warehouse details"""
@@ -255,84 +295,40 @@ async def create_serial_config(config: SerialNumberConfig, current_user: dict =
 @router.get("/generate-serial/{doc_type}/{warehouse_id}")
 async def generate_serial_number(doc_type: str, warehouse_id: str, current_user: dict = Depends(get_current_user)):
     """Generate next serial number for a document type"""
-    config = await db.serial_number_configs.find_one({
+    config, next_number, _ = await reserve_range(db, doc_type, warehouse_id, 1)
+    return {"serial_number": format_serial(config, next_number), "next_number": next_number}
+
+
+@router.post("/serial-ranges/{doc_type}/{warehouse_id}")
+async def reserve_serial_range(
+    doc_type: str,
+    warehouse_id: str,
+    count: int = Query(..., ge=1, le=MAX_RANGE),
+    include_numbers: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Claim `count` consecutive serial numbers in one atomic update.
+    The caller owns first..last; set include_numbers to get every formatted serial.
+    """
+    config, start, end = await reserve_range(db, doc_type, warehouse_id, count)
+    result = {
         "doc_type": doc_type,
-        "warehouse_id": warehouse_id
-    })
-    
-    if not config:
-        # Use default format
-        config = {
-            "prefix": doc_type[:3].upper(),
-            "separator": "/",
-            "include_fy": True,
-            "fy_format": "2425",
-            "number_length": 4,
-            "current_number": 0
-        }
-    
-    # Get current financial year
-    now = datetime.now()
-    fy_start_year = now.year if now.month >= 4 else now.year - 1
-    fy_end_year = fy_start_year + 1
-    
-    if config.get("fy_format") == "2425":
-        fy = f"{str(fy_start_year)[-2:]}{str(fy_end_year)[-2:]}"
-    elif config.get("fy_format") == "24-25":
-        fy = f"{str(fy_start_year)[-2:]}-{str(fy_end_year)[-2:]}"
-    else:
-        fy = f"{fy_start_year}-{str(fy_end_year)[-2:]}"
-    
-    # Increment number
-    next_number = (config.get("current_number", 0) or 0) + 1
-    
-    # Build serial number
-    sep = config.get("separator", "/")
-    parts = []
-    if config.get("prefix"):
-        parts.append(config["prefix"])
-    if config.get("include_fy", True):
-        parts.append(fy)
-    parts.append(str(next_number).zfill(config.get("number_length", 4)))
-    if config.get("suffix"):
-        parts.append(config["suffix"])
-    
-    serial_number = sep.join(parts)
-    
-    # Update current number
-    await db.serial_number_configs.update_one(
-        {"doc_type": doc_type, "warehouse_id": warehouse_id},
-        {"$set": {"current_number": next_number}},
-        upsert=True
-    )
-    
-    return {"serial_number": serial_number, "next_number": next_number}
+        "warehouse_id": warehouse_id,
+        "count": count,
+        "start_number": start,
+        "end_number": end,
+        "first": format_serial(config, start),
+        "last": format_serial(config, end)
+    }
+    if include_numbers:
+        result["serial_numbers"] = list(expand(config, start, end))
+    return result
 
 
 def generate_sample_serial(config: dict) -> str:
     """Generate a sample serial number format"""
-    now = datetime.now()
-    fy_start_year = now.year if now.month >= 4 else now.year - 1
-    fy_end_year = fy_start_year + 1
-    
-    if config.get("fy_format") == "2425":
-        fy = f"{str(fy_start_year)[-2:]}{str(fy_end_year)[-2:]}"
-    elif config.get("fy_format") == "24-25":
-        fy = f"{str(fy_start_year)[-2:]}-{str(fy_end_year)[-2:]}"
-    else:
-        fy = f"{fy_start_year}-{str(fy_end_year)[-2:]}"
-    
-    sep = config.get("separator", "/")
-    parts = []
-    if config.get("prefix"):
-        parts.append(config["prefix"])
-    if config.get("include_fy", True):
-        parts.append(fy)
-    parts.append("0001")
-    if config.get("suffix"):
-        parts.append(config["suffix"])
-    
-    return sep.join(parts)
+    return format_serial(config, 1)
 
 
 # ==================== BATCH MANAGEMENT ====================
@@ -412,19 +408,10 @@ async def get_batches(
 
 @router.get("/generate-barcode/{data}")
 async def generate_barcode(data: str, format: str = "qr", current_user: dict = Depends(get_current_user)):
-    """Generate barcode/QR code for item/batch"""
-    if format == "qr":
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(data)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
-        buffer.seek(0)
-        
-        img_base64 = base64.b64encode(buffer.getvalue()).decode()
-        return {"format": "qr", "data": data, "image": f"data:image/png;base64,{img_base64}"}
+    """Generate barcode/QR code for item/batch (rendered images are cached by content)"""
+    image = render_barcode_image(data, format)
+    if image:
+        return {"format": format, "data": data, "image": image}
     
     return {"format": format, "data": data, "error": "Only QR format supported currently"}
 
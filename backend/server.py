@@ -1,8 +1,10 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, status
+from fastapi.responses import PlainTextResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
 import os
 import logging
 from pathlib import Path
@@ -10,19 +12,34 @@ from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timezone, timedelta
-import bcrypt
 import jwt
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+from utils.indexes import register_index, ensure_indexes
+from utils.user_cache import user_cache
+from utils.passwords import hash_password, verify_password, shutdown_password_pool
+from utils.metrics import metrics, MongoCommandListener, MetricsMiddleware
+from utils.slow_ops import slow_op_recorder
+from utils.stock_snapshots import stock_snapshot_scheduler
+from utils.org_hierarchy import ancestors_of, rebuild_org_hierarchy, invalidate_visibility
+from utils.search_index import backfill_search_index
+from utils.geo import close_http_client
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.fast_json import FastJSONResponse
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandListener(), slow_op_recorder.listener])
 db = client[os.environ['DB_NAME']]
 
-app = FastAPI()
+register_index("users", [("id", 1)], unique=True)
+register_index("users", [("email", 1)], unique=True)
+register_index("users", [("reports_to", 1)])
+register_index("users", [("ancestors", 1)])
+register_index("users", [("team", 1)])
+
+app = FastAPI(default_response_class=FastJSONResponse)
 api_router = APIRouter(prefix="/api")
 security = HTTPBearer()
 
@@ -63,9 +80,12 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         token = credentials.credentials
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         user_id = payload.get('user_id')
-        user = await db.users.find_one({'id': user_id}, {'_id': 0})
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
+        user = user_cache.get(user_id)
+        if user is None:
+            user = await db.users.find_one({'id': user_id}, {'_id': 0})
+            if not user:
+                raise HTTPException(status_code=401, detail="User not found")
+            user_cache.set(user_id, user)
         return user
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
@@ -79,21 +99,28 @@ async def register(user_data: UserCreate):
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = bcrypt.hashpw(user_data.password.encode('utf-8'), bcrypt.gensalt())
+    try:
+        ancestors = await ancestors_of(db, user_data.reports_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    hashed_password = await hash_password(user_data.password)
     user_id = str(uuid.uuid4())
     user_doc = {
         'id': user_id,
         'email': user_data.email,
-        'password': hashed_password.decode('utf-8'),
+        'password': hashed_password,
         'name': user_data.name,
         'role': user_data.role,
         'location': user_data.location,
         'department': user_data.department,
         'team': user_data.team,
         'reports_to': user_data.reports_to,
+        'ancestors': ancestors,
         'created_at': datetime.now(timezone.utc).isoformat()
     }
     await db.users.insert_one(user_doc)
+    invalidate_visibility()
     
     token = jwt.encode({'user_id': user_id, 'exp': datetime.now(timezone.utc) + timedelta(days=7)}, JWT_SECRET, algorithm=JWT_ALGORITHM)
     
@@ -105,7 +132,7 @@ async def register(user_data: UserCreate):
 @api_router.post("/auth/login", response_model=TokenResponse)
 async def login(credentials: UserLogin):
     user = await db.users.find_one({'email': credentials.email}, {'_id': 0})
-    if not user or not bcrypt.checkpw(credentials.password.encode('utf-8'), user['password'].encode('utf-8')):
+    if not user or not await verify_password(credentials.password, user.get('password')):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     token = jwt.encode({'user_id': user['id'], 'exp': datetime.now(timezone.utc) + timedelta(days=7)}, JWT_SECRET, algorithm=JWT_ALGORITHM)
@@ -141,6 +168,7 @@ from routes import pdf_all_modules
 from routes import document_communication
 from routes import field_registry
 from routes import warehouse_stock
+from routes import system
 
 api_router.include_router(crm.router, prefix="/crm", tags=["CRM"])
 api_router.include_router(inventory.router, prefix="/inventory", tags=["Inventory"])
@@ -193,6 +221,7 @@ api_router.include_router(pdf_all_modules.router, prefix="/pdf", tags=["PDF All
 api_router.include_router(document_communication.router, prefix="/communicate", tags=["Document Communication"])
 api_router.include_router(field_registry.router, prefix="/field-registry", tags=["Field Registry - Command Center"])
 api_router.include_router(warehouse_stock.router, prefix="/warehouse", tags=["Warehouse & Stock Management"])
+api_router.include_router(system.router, prefix="/system", tags=["System Diagnostics"])
 
 # ==================== DASHBOARD OVERVIEW ====================
 @api_router.get("/dashboard/overview")
@@ -254,6 +283,17 @@ async def dashboard_ai_insights(current_user: dict = Depends(get_current_user)):
         ]
     }
 
+# ==================== METRICS ====================
+METRICS_PATH = "/api/_metrics"
+
+@api_router.get("/_metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    """Per-route latency and Mongo command metrics (Prometheus text format)"""
+    metrics_token = os.environ.get('METRICS_TOKEN')
+    if metrics_token and request.headers.get('authorization') != f"Bearer {metrics_token}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 app.include_router(api_router)
 
 app.add_middleware(
@@ -262,8 +302,39 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
+app.add_middleware(MetricsMiddleware, exclude_paths=(METRICS_PATH,))
+
+@app.on_event("startup")
+async def ensure_db_indexes():
+    # Create/verify every index declared via utils.indexes.register_index
+    if os.environ.get('MONGO_ENSURE_INDEXES', 'true').lower() in ('1', 'true', 'yes'):
+        await ensure_indexes(db)
+
+@app.on_event("startup")
+async def backfill_org_hierarchy():
+    # Users created before ancestor paths were materialized
+    if await db.users.find_one({'ancestors': {'$exists': False}}, {'_id': 1}):
+        await rebuild_org_hierarchy(db)
+
+@app.on_event("startup")
+async def start_search_index_backfill():
+    # Large account books take a while to index; don't hold up startup
+    asyncio.create_task(backfill_search_index(db))
+
+@app.on_event("startup")
+async def start_slow_op_recorder():
+    await slow_op_recorder.start(db)
+
+@app.on_event("startup")
+async def start_stock_snapshots():
+    await stock_snapshot_scheduler.start(db)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    await slow_op_recorder.stop()
+    await stock_snapshot_scheduler.stop()
+    await close_http_client()
+    client.close()
+    shutdown_password_pool()
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""
+Barcode Lookup Tests
+Single and bulk resolution of scanned codes via /api/inventory-advanced/barcode/lookup
+"""
+
+import uuid
+
+from test_stock_posting import StockFixture, BASE_URL
+
+
+class TestBarcodeLookup(StockFixture):
+    """Item with a barcode and one batch"""
+
+    def _set_barcode(self):
+        self.barcode = f"890{uuid.uuid4().int % 10**10:010d}"
+        response = self.session.put(f"{BASE_URL}/api/inventory-advanced/items/{self.item_id}/barcode",
+                                    params={"barcode": self.barcode})
+        assert response.status_code == 200, response.text
+
+    def _batch(self):
+        batch_number = f"TEST-SCAN-{uuid.uuid4().hex[:8].upper()}"
+        response = self.session.post(f"{BASE_URL}/api/inventory-advanced/batches", json={
+            "item_id": self.item_id, "warehouse_id": self.warehouse_id,
+            "batch_number": batch_number, "quantity": 3, "unit_cost": 1,
+        })
+        assert response.status_code == 200, response.text
+        return batch_number
+
+    def test_single_lookup(self):
+        self._set_barcode()
+        response = self.session.get(f"{BASE_URL}/api/inventory-advanced/barcode/lookup/{self.barcode}")
+        assert response.status_code == 200
+        assert response.json()["id"] == self.item_id
+
+    def test_single_lookup_unknown(self):
+        response = self.session.get(f"{BASE_URL}/api/inventory-advanced/barcode/lookup/NO-SUCH-{uuid.uuid4().hex}")
+        assert response.status_code == 404
+
+    def test_bulk_lookup_mixed_codes(self):
+        """Test barcode, batch number and unknown codes resolve in one call, in input order"""
+        self._set_barcode()
+        batch_number = self._batch()
+        unknown = f"NO-SUCH-{uuid.uuid4().hex}"
+        codes = [self.barcode, batch_number, unknown, self.barcode]
+
+        response = self.session.post(f"{BASE_URL}/api/inventory-advanced/barcode/lookup/bulk",
+                                     json={"codes": codes})
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert [r["code"] for r in data["results"]] == [self.barcode, batch_number, unknown]
+        assert data["found"] == 2 and data["not_found"] == 1
+
+        by_code = {r["code"]: r for r in data["results"]}
+        assert by_code[self.barcode]["item"]["id"] == self.item_id
+        assert by_code[batch_number]["item"]["batch_info"]["batch_number"] == batch_number
+        assert by_code[unknown]["item"] is None
+
+    def test_bulk_lookup_limits(self):
+        url = f"{BASE_URL}/api/inventory-advanced/barcode/lookup/bulk"
+        assert self.session.post(url, json={"codes": []}).status_code == 422
+        assert self.session.post(url, json={"codes": ["X"] * 1001}).status_code == 422
@@ -0,0 +1,80 @@
+"""
+Cost Layer Valuation Tests
+FIFO / LIFO layers consumed by /api/inventory/stock/entry and valued by
+/api/inventory-advanced/stock-valuation
+"""
+
+from test_stock_posting import StockFixture, BASE_URL
+
+
+class TestCostLayerValuation(StockFixture):
+    """Two receipts at different costs, then one issue spanning both"""
+
+    def _entry(self, transaction_type, quantity, unit_cost=0):
+        response = self.session.post(f"{BASE_URL}/api/inventory/stock/entry", json={
+            "item_id": self.item_id,
+            "warehouse_id": self.warehouse_id,
+            "quantity": quantity,
+            "transaction_type": transaction_type,
+            "unit_cost": unit_cost,
+            "reference_type": "Test",
+        })
+        assert response.status_code == 200, response.text
+
+    def _valuation(self, method, **params):
+        response = self.session.get(f"{BASE_URL}/api/inventory-advanced/stock-valuation",
+                                    params={"method": method, "warehouse_id": self.warehouse_id, **params})
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    def _receive_and_issue(self):
+        self._entry("receipt", 10, 5)
+        self._entry("receipt", 10, 8)
+        self._entry("issue", 12)
+
+    def test_fifo_values_newest_layers(self):
+        """Test FIFO consumes the oldest layer first: 8 left at 8.00"""
+        self._receive_and_issue()
+        data = self._valuation("fifo")
+        assert data["valuation_method"] == "fifo"
+        row = next(i for i in data["items"] if i["item_id"] == self.item_id)
+        assert row["quantity"] == 8
+        assert row["total_value"] == 64
+        assert row["avg_cost"] == 8
+
+    def test_lifo_values_oldest_layers(self):
+        """Test LIFO consumes the newest layer first: 8 left at 5.00"""
+        self._receive_and_issue()
+        row = next(i for i in self._valuation("lifo")["items"] if i["item_id"] == self.item_id)
+        assert row["quantity"] == 8
+        assert row["total_value"] == 40
+
+    def test_weighted_avg(self):
+        """Test weighted average values the open quantity at the average receipt cost"""
+        self._receive_and_issue()
+        row = next(i for i in self._valuation("weighted_avg")["items"] if i["item_id"] == self.item_id)
+        assert row["quantity"] == 8
+        assert row["avg_cost"] == 6.5
+        assert row["total_value"] == 52
+
+    def test_stream_has_summary_trailer(self):
+        """Test ?stream=1 emits item rows followed by a summary row"""
+        self._receive_and_issue()
+        rows = self._valuation("fifo", stream=1)
+        assert rows[-1]["row_type"] == "summary"
+        assert rows[-1]["total_value"] == sum(r["total_value"] for r in rows[:-1])
+
+    def test_invalid_method_rejected(self):
+        response = self.session.get(f"{BASE_URL}/api/inventory-advanced/stock-valuation",
+                                    params={"method": "average"})
+        assert response.status_code == 400
+
+    def test_rebuild_matches_live_layers(self):
+        """Test replaying the ledger reproduces the live FIFO valuation"""
+        self._receive_and_issue()
+        response = self.session.post(f"{BASE_URL}/api/inventory-advanced/cost-layers/rebuild",
+                                     params={"item_id": self.item_id})
+        assert response.status_code == 200, response.text
+        assert response.json()["layers"] == 2
+        row = next(i for i in self._valuation("fifo")["items"] if i["item_id"] == self.item_id)
+        assert row["total_value"] == 64
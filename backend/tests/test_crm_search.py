@@ -0,0 +1,122 @@
+"""
+CRM Search Tests
+Typeahead via /api/crm/search and search= filters on the leads/accounts lists,
+both served by the prefix-token search index
+"""
+
+import random
+import re
+import string
+import uuid
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+def _word():
+    return "".join(random.choices(string.ascii_lowercase, k=10))
+
+
+class TestCrmSearch:
+    """Search over a freshly created account and lead"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup - get auth token, one account and one lead with unique names"""
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        login_response = self.session.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@instabiz.com",
+            "password": "adminpassword"
+        })
+        if login_response.status_code != 200:
+            pytest.skip("Authentication failed - skipping tests")
+        self.session.headers.update({"Authorization": f"Bearer {login_response.json().get('token')}"})
+
+        self.name_word, self.city_word = _word(), _word()
+        self.phone = "9" + "".join(random.choices(string.digits, k=9))
+        account = self.session.post(f"{BASE_URL}/api/crm/accounts", json={
+            "customer_name": f"TEST {self.name_word.title()} Adhesives",
+            "gstin": "27AABCU9603R1ZM",
+            "billing_address": "Test address",
+            "billing_city": self.city_word.title(),
+            "contacts": [{"name": "Test Contact", "phone": f"+91 {self.phone[:5]} {self.phone[5:]}"}],
+        })
+        assert account.status_code == 200, account.text
+        self.account_id = account.json()["id"]
+
+        lead = self.session.post(f"{BASE_URL}/api/crm/leads", json={
+            "company_name": f"TEST {self.name_word.title()} Traders",
+            "contact_person": "Test Contact",
+            "email": f"{uuid.uuid4().hex[:8]}@example.com",
+            "phone": "9999999999",
+            "source": "Website",
+        })
+        assert lead.status_code == 200, lead.text
+        self.lead_id = lead.json()["id"]
+        yield
+        self.session.delete(f"{BASE_URL}/api/crm/leads/{self.lead_id}")
+        self.session.delete(f"{BASE_URL}/api/crm/accounts/{self.account_id}")
+
+    def _search(self, q, **params):
+        response = self.session.get(f"{BASE_URL}/api/crm/search", params={"q": q, **params})
+        assert response.status_code == 200, response.text
+        return response.json()["results"]
+
+    def test_prefix_finds_account_and_lead(self):
+        results = self._search(self.name_word[:4])
+        ids = {(r["type"], r["id"]) for r in results}
+        assert ("accounts", self.account_id) in ids
+        assert ("leads", self.lead_id) in ids
+
+    def test_multi_word_and_type_filter(self):
+        results = self._search(f"{self.name_word[:5]} {self.city_word[:3]}", types="accounts")
+        assert [r["id"] for r in results] == [self.account_id]
+
+    def test_phone_and_gstin(self):
+        assert self.account_id in [r["id"] for r in self._search(self.phone[:7], types="accounts", limit=50)]
+        by_gstin = self._search(f"27AABCU9603R1ZM {self.name_word[:3]}", types="accounts")
+        assert [r["id"] for r in by_gstin] == [self.account_id]
+
+    def test_ranking_prefers_name_match(self):
+        results = self._search(self.name_word)
+        assert results[0]["id"] in (self.account_id, self.lead_id)
+        assert results == sorted(results, key=lambda r: -r["score"])
+
+    def test_list_search_uses_index(self):
+        response = self.session.get(f"{BASE_URL}/api/crm/accounts", params={"search": self.name_word[:6]})
+        assert response.status_code == 200, response.text
+        assert [a["id"] for a in response.json()] == [self.account_id]
+
+        response = self.session.get(f"{BASE_URL}/api/crm/leads", params={"search": self.name_word})
+        assert [lead["id"] for lead in response.json()] == [self.lead_id]
+
+    def test_list_search_single_character(self):
+        """One-character search still matches by word prefix"""
+        letter = self.name_word[0]
+        response = self.session.get(f"{BASE_URL}/api/crm/accounts",
+                                    params={"search": f"{letter} {self.name_word}"})
+        assert response.status_code == 200, response.text
+        assert [a["id"] for a in response.json()] == [self.account_id]
+
+        response = self.session.get(f"{BASE_URL}/api/crm/leads", params={"search": letter, "limit": 50})
+        assert response.status_code == 200, response.text
+        for lead in response.json():
+            words = " ".join(str(lead.get(f) or "") for f in ("company_name", "contact_person", "email", "phone", "city"))
+            assert any(w.startswith(letter) for w in re.findall(r"[a-z0-9]+", words.lower()))
+
+    def test_updates_are_reindexed(self):
+        renamed = _word()
+        response = self.session.put(f"{BASE_URL}/api/crm/accounts/{self.account_id}",
+                                    json={"customer_name": f"TEST {renamed.title()}"})
+        assert response.status_code == 200, response.text
+        assert [r["id"] for r in self._search(renamed, types="accounts")] == [self.account_id]
+        assert self._search(self.name_word, types="accounts") == []
+
+    def test_invalid_type(self):
+        response = self.session.get(f"{BASE_URL}/api/crm/search", params={"q": "test", "types": "invoices"})
+        assert response.status_code == 400
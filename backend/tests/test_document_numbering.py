@@ -0,0 +1,69 @@
+"""
+Document Numbering Series Tests
+Series configuration via /api/settings/numbering-series - block allocation
+is refused for statutory series, and updates are visible immediately
+"""
+
+import uuid
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestNumberingSeries:
+    """Numbering series configuration"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup - get auth token"""
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        login_response = self.session.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@instabiz.com",
+            "password": "adminpassword"
+        })
+        if login_response.status_code != 200:
+            pytest.skip("Authentication failed - skipping tests")
+        self.session.headers.update({"Authorization": f"Bearer {login_response.json().get('token')}"})
+
+    def test_default_series_is_strict(self):
+        doc_type = f"test_{uuid.uuid4().hex[:6]}"
+        response = self.session.get(f"{BASE_URL}/api/settings/numbering-series/{doc_type}")
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["allocation"] == "strict"
+        assert data["seq_padding"] == 4
+        assert data["statutory"] is False
+
+    def test_update_is_visible_immediately(self):
+        """Test the cached config is invalidated on update"""
+        doc_type = f"test_{uuid.uuid4().hex[:6]}"
+        self.session.get(f"{BASE_URL}/api/settings/numbering-series/{doc_type}")
+
+        response = self.session.put(f"{BASE_URL}/api/settings/numbering-series/{doc_type}", json={
+            "prefix": "TST", "allocation": "block", "block_size": 50,
+        })
+        assert response.status_code == 200, response.text
+
+        data = self.session.get(f"{BASE_URL}/api/settings/numbering-series/{doc_type}").json()
+        assert (data["prefix"], data["allocation"], data["block_size"]) == ("TST", "block", 50)
+
+    def test_statutory_series_must_stay_strict(self):
+        response = self.session.put(f"{BASE_URL}/api/settings/numbering-series/invoice", json={
+            "allocation": "block",
+        })
+        assert response.status_code == 400
+
+        data = self.session.get(f"{BASE_URL}/api/settings/numbering-series/invoice").json()
+        assert data["statutory"] is True
+        assert data["allocation"] == "strict"
+
+    def test_invalid_allocation(self):
+        response = self.session.put(f"{BASE_URL}/api/settings/numbering-series/test_invalid", json={
+            "allocation": "random",
+        })
+        assert response.status_code == 422
@@ -445,5 +445,62 @@ class TestFieldRegistryNonAdminAccess:
         assert save_response.status_code == 403, "Non-admin should not be able to save config"
 
 
+class TestSparseFieldsets:
+    """fields= projection on list/detail endpoints, validated against the registry"""
+    
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup test fixtures"""
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+        
+        login_response = self.session.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@instabiz.com",
+            "password": "adminpassword"
+        })
+        assert login_response.status_code == 200, f"Login failed: {login_response.text}"
+        self.token = login_response.json().get("token")
+        self.session.headers.update({"Authorization": f"Bearer {self.token}"})
+    
+    def test_accounts_list_returns_only_requested_fields(self):
+        """Test /crm/accounts?fields= narrows each row"""
+        response = self.session.get(f"{BASE_URL}/api/crm/accounts?fields=customer_name,gstin&limit=20")
+        assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
+        
+        for row in response.json():
+            # id and the pagination sort key are always present
+            assert set(row) <= {"id", "created_at", "customer_name", "gstin"}
+            assert "contacts" not in row and "shipping_addresses" not in row
+    
+    def test_unknown_field_rejected(self):
+        """Test fields outside the registry/model return 400"""
+        response = self.session.get(f"{BASE_URL}/api/crm/leads?fields=company_name,password_hash")
+        assert response.status_code == 400
+        assert "password_hash" in response.json().get("detail", "")
+    
+    def test_operator_injection_rejected(self):
+        """Test Mongo operators cannot be smuggled in as field names"""
+        response = self.session.get(f"{BASE_URL}/api/inventory/items?fields=$where")
+        assert response.status_code == 400
+    
+    def test_invoice_detail_sparse(self):
+        """Test detail endpoint honours fields="""
+        invoices = self.session.get(f"{BASE_URL}/api/accounts/invoices?limit=1").json()
+        if not invoices:
+            pytest.skip("No invoices to test with")
+        
+        inv_id = invoices[0]["id"]
+        response = self.session.get(f"{BASE_URL}/api/accounts/invoices/{inv_id}?fields=invoice_number,grand_total")
+        assert response.status_code == 200
+        assert set(response.json()) <= {"id", "invoice_number", "grand_total"}
+    
+    def test_without_fields_response_unchanged(self):
+        """Test omitting fields= still returns full documents"""
+        response = self.session.get(f"{BASE_URL}/api/procurement/suppliers?limit=5")
+        assert response.status_code == 200
+        for row in response.json():
+            assert "supplier_name" in row and "payment_terms" in row
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,105 @@
+"""
+Leads Kanban Board Tests
+Tests for /api/crm/leads/kanban/view - per-column cards and counts, and
+cursor paging within one column
+"""
+
+import uuid
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestLeadsKanban:
+    """Kanban board for CRM leads"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup - get auth token and three qualified leads"""
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        login_response = self.session.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@instabiz.com",
+            "password": "adminpassword"
+        })
+        if login_response.status_code != 200:
+            pytest.skip("Authentication failed - skipping tests")
+        self.session.headers.update({"Authorization": f"Bearer {login_response.json().get('token')}"})
+
+        self.lead_ids = []
+        for _ in range(3):
+            suffix = uuid.uuid4().hex[:8]
+            lead = self.session.post(f"{BASE_URL}/api/crm/leads", json={
+                "company_name": f"TEST_Kanban {suffix}",
+                "contact_person": "Test Contact",
+                "email": f"kanban-{suffix}@example.com",
+                "phone": "9999999999",
+                "source": "Website",
+                "status": "qualified",
+            })
+            assert lead.status_code == 200, lead.text
+            self.lead_ids.append(lead.json()["id"])
+        yield
+        for lead_id in self.lead_ids:
+            self.session.delete(f"{BASE_URL}/api/crm/leads/{lead_id}")
+
+    def test_board_shape(self):
+        response = self.session.get(f"{BASE_URL}/api/crm/leads/kanban/view")
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["statuses"] == [s["value"] for s in data["stages"]]
+        assert data["columns"] == ["unstaged"] + data["statuses"]
+        for status in data["statuses"]:
+            assert len(data["data"][status]) <= data["counts"][status]
+            assert all(lead["status"] == status for lead in data["data"][status])
+        assert all(lead["status"] not in data["statuses"] for lead in data["data"]["unstaged"])
+        assert data["counts"]["qualified"] >= 3
+
+    def test_lead_outside_stages_is_unstaged(self):
+        """Test a lead in a status that is not a stage ('new' by default) stays on the board"""
+        lead = self.session.post(f"{BASE_URL}/api/crm/leads", json={
+            "company_name": f"TEST_Kanban {uuid.uuid4().hex[:8]}",
+            "contact_person": "Test Contact",
+            "source": "Website",
+        })
+        assert lead.status_code == 200, lead.text
+        lead = lead.json()
+        self.lead_ids.append(lead["id"])
+
+        board = self.session.get(f"{BASE_URL}/api/crm/leads/kanban/view").json()
+        column = lead["status"] if lead["status"] in board["statuses"] else "unstaged"
+        page = self.session.get(f"{BASE_URL}/api/crm/leads/kanban/view",
+                                params={"status": column, "limit": 500}).json()
+        assert lead["id"] in [card["id"] for card in page["data"]]
+
+        moved = self.session.put(f"{BASE_URL}/api/crm/leads/{lead['id']}/move",
+                                 params={"new_status": lead["status"]})
+        assert moved.status_code == 200, moved.text
+
+    def test_load_more_in_one_column(self):
+        """Test following a column cursor returns every card in that column once"""
+        board = self.session.get(f"{BASE_URL}/api/crm/leads/kanban/view", params={"limit": 1}).json()
+        assert len(board["data"]["qualified"]) == 1
+        cursor = board["cursors"]["qualified"]
+        assert cursor
+
+        ids = [board["data"]["qualified"][0]["id"]]
+        while cursor:
+            response = self.session.get(f"{BASE_URL}/api/crm/leads/kanban/view", params={
+                "status": "qualified", "cursor": cursor, "limit": 50,
+            })
+            assert response.status_code == 200, response.text
+            page = response.json()
+            ids.extend(lead["id"] for lead in page["data"])
+            cursor = page["cursor"]
+
+        assert len(ids) == len(set(ids)) == board["counts"]["qualified"]
+        assert set(self.lead_ids) <= set(ids)
+
+    def test_unknown_column(self):
+        response = self.session.get(f"{BASE_URL}/api/crm/leads/kanban/view", params={"status": "no_such_stage"})
+        assert response.status_code == 400
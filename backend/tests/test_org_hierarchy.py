@@ -0,0 +1,101 @@
+"""
+Org Hierarchy Tests
+Multi-level lead visibility through reporting lines, and reporting line
+changes via /api/settings/users/{id}
+"""
+
+import uuid
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+PASSWORD = "testpassword"
+
+
+class TestOrgHierarchy:
+    """Leader -> team leader -> salesperson chain"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup - admin session plus a three-level reporting chain"""
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        login_response = self.session.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@instabiz.com",
+            "password": "adminpassword"
+        })
+        if login_response.status_code != 200:
+            pytest.skip("Authentication failed - skipping tests")
+        self.session.headers.update({"Authorization": f"Bearer {login_response.json().get('token')}"})
+
+        self.users = {}
+        manager = None
+        for name, role in (("head", "sales_team_leader"), ("lead", "sales_team_leader"), ("rep", "salesperson")):
+            registered = requests.post(f"{BASE_URL}/api/auth/register", json={
+                "email": f"test-org-{name}-{uuid.uuid4().hex[:8]}@example.com",
+                "password": PASSWORD, "name": f"TEST_{name}", "role": role, "reports_to": manager,
+            })
+            assert registered.status_code == 200, registered.text
+            data = registered.json()
+            self.users[name] = {"id": data["user"]["id"], "token": data["token"]}
+            manager = data["user"]["id"]
+
+        rep = self._as("rep")
+        lead = rep.post(f"{BASE_URL}/api/crm/leads", json={
+            "company_name": f"TEST_Org {uuid.uuid4().hex[:8]}", "contact_person": "Test Contact",
+            "email": "org@example.com", "phone": "9999999999", "source": "Website",
+            "assigned_to": self.users["rep"]["id"],
+        })
+        assert lead.status_code == 200, lead.text
+        self.lead_id = lead.json()["id"]
+        yield
+        self.session.delete(f"{BASE_URL}/api/crm/leads/{self.lead_id}")
+        for user in self.users.values():
+            self.session.delete(f"{BASE_URL}/api/settings/users/{user['id']}")
+
+    def _as(self, name):
+        session = requests.Session()
+        session.headers.update({"Authorization": f"Bearer {self.users[name]['token']}"})
+        return session
+
+    def _sees_lead(self, name):
+        response = self._as(name).get(f"{BASE_URL}/api/crm/leads/{self.lead_id}")
+        assert response.status_code in (200, 404), response.text
+        return response.status_code == 200
+
+    def test_every_manager_above_sees_the_lead(self):
+        """Test visibility reaches two levels up the chain"""
+        assert self._sees_lead("rep")
+        assert self._sees_lead("lead")
+        assert self._sees_lead("head")
+
+    def test_reporting_change_moves_visibility(self):
+        response = self.session.put(f"{BASE_URL}/api/settings/users/{self.users['lead']['id']}",
+                                    json={"reports_to": ""})
+        assert response.status_code == 200, response.text
+        assert self._sees_lead("lead")
+        assert not self._sees_lead("head")
+
+    def test_cycle_is_rejected(self):
+        response = self.session.put(f"{BASE_URL}/api/settings/users/{self.users['head']['id']}",
+                                    json={"reports_to": self.users["rep"]["id"]})
+        assert response.status_code == 400
+
+    def test_search_keeps_visibility(self):
+        """Test a search on the lead list does not widen what a user can see"""
+        response = self._as("rep").get(f"{BASE_URL}/api/crm/leads", params={"search": "TEST_"})
+        assert response.status_code == 200, response.text
+        assert all(lead.get("assigned_to") == self.users["rep"]["id"] or lead.get("created_by") == self.users["rep"]["id"]
+                   for lead in response.json())
+
+    def test_delete_hands_reports_to_manager(self):
+        """Test deleting the middle manager re-points the rep at the head"""
+        response = self.session.delete(f"{BASE_URL}/api/settings/users/{self.users['lead']['id']}")
+        assert response.status_code == 200, response.text
+
+        users = {u["id"]: u for u in self.session.get(f"{BASE_URL}/api/settings/users").json()}
+        assert users[self.users["rep"]["id"]]["reports_to"] == self.users["head"]["id"]
+        assert self._sees_lead("head")
@@ -0,0 +1,84 @@
+"""
+Keyset Pagination API Tests
+Tests for cursor/limit paging on list endpoints (X-Next-Cursor header)
+"""
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestKeysetPagination:
+    """Cursor pagination on list endpoints"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup - get auth token"""
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        login_response = self.session.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@instabiz.com",
+            "password": "adminpassword"
+        })
+        if login_response.status_code == 200:
+            token = login_response.json().get("token")
+            self.session.headers.update({"Authorization": f"Bearer {token}"})
+        else:
+            pytest.skip("Authentication failed - skipping tests")
+
+    def _walk(self, path, page_size):
+        """Follow X-Next-Cursor until the last page, returning all ids"""
+        ids = []
+        cursor = None
+        for _ in range(1000):
+            params = {"limit": page_size}
+            if cursor:
+                params["cursor"] = cursor
+            response = self.session.get(f"{BASE_URL}{path}", params=params)
+            assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
+            page = response.json()
+            assert isinstance(page, list), "List endpoints should still return a plain array"
+            assert len(page) <= page_size
+            ids.extend(doc["id"] for doc in page)
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                return ids
+        pytest.fail("Pagination did not terminate")
+
+    @pytest.mark.parametrize("path", [
+        "/api/crm/leads",
+        "/api/crm/accounts",
+        "/api/accounts/invoices",
+        "/api/inventory/items",
+        "/api/procurement/suppliers",
+    ])
+    def test_pages_cover_full_list_without_duplicates(self, path):
+        """Test walking small pages returns the same rows as one large page"""
+        full = self.session.get(f"{BASE_URL}{path}", params={"limit": 1000})
+        assert full.status_code == 200
+        if full.headers.get("X-Next-Cursor"):
+            pytest.skip("More than one full page of data - comparison not meaningful")
+
+        paged_ids = self._walk(path, 3)
+        assert len(paged_ids) == len(set(paged_ids)), "Pages should not overlap"
+        assert paged_ids == [doc["id"] for doc in full.json()], "Pages should preserve sort order"
+
+    def test_last_page_has_no_cursor(self):
+        """Test a page that holds everything has no X-Next-Cursor"""
+        response = self.session.get(f"{BASE_URL}/api/crm/leads", params={"limit": 1000})
+        assert response.status_code == 200
+        if len(response.json()) < 1000:
+            assert "X-Next-Cursor" not in response.headers
+
+    def test_invalid_cursor_rejected(self):
+        """Test a malformed cursor returns 400"""
+        response = self.session.get(f"{BASE_URL}/api/crm/leads", params={"cursor": "not-a-cursor!"})
+        assert response.status_code == 400
+
+    def test_limit_out_of_range_rejected(self):
+        """Test limit above the maximum page size returns 422"""
+        response = self.session.get(f"{BASE_URL}/api/crm/leads", params={"limit": 100000})
+        assert response.status_code == 422
@@ -0,0 +1,151 @@
+"""
+Quotation Pricing Tests
+Exact paise totals with the GST split by place of supply, and bulk re-pricing
+via /api/crm/quotations/reprice
+"""
+
+import uuid
+from decimal import Decimal
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+def _paise(value):
+    return int(Decimal(str(value)) * 100)
+
+
+class TestQuotationPricing:
+    """Totals of a quotation for a fresh account"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup - get auth token, one account and one item id unique to this test"""
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        login_response = self.session.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@instabiz.com",
+            "password": "adminpassword"
+        })
+        if login_response.status_code != 200:
+            pytest.skip("Authentication failed - skipping tests")
+        self.session.headers.update({"Authorization": f"Bearer {login_response.json().get('token')}"})
+
+        account = self.session.post(f"{BASE_URL}/api/crm/accounts", json={
+            "customer_name": f"TEST Pricing {uuid.uuid4().hex[:6]}",
+            "gstin": "24AABCU9603R1ZM",
+            "billing_address": "Test address",
+            "billing_state": "Gujarat",
+        })
+        assert account.status_code == 200, account.text
+        self.account_id = account.json()["id"]
+        self.item_id = f"test-item-{uuid.uuid4().hex[:8]}"
+        yield
+
+    def _create(self, **overrides):
+        payload = {
+            "account_id": self.account_id,
+            "valid_until": "2099-12-31",
+            "items": [
+                {"item_id": self.item_id, "item_name": "Test Tape", "quantity": 3, "unit_price": 33.33,
+                 "discount_percent": 10, "tax_percent": 18},
+                {"item_name": "Test Core", "quantity": 1.5, "unit_price": 0.05, "tax_percent": 5},
+            ],
+            "header_discount_percent": 2.5,
+            **overrides
+        }
+        response = self.session.post(f"{BASE_URL}/api/crm/quotations", json=payload)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    def test_lines_add_up_to_totals(self):
+        quote = self._create()
+        items = quote["items"]
+        for field, line_field in (("subtotal", "line_subtotal"), ("taxable_amount", "line_taxable"),
+                                  ("total_tax", "line_tax"), ("grand_total", "line_total")):
+            assert sum(_paise(i[line_field]) for i in items) == _paise(quote[field]), field
+
+        assert _paise(quote["subtotal"]) == 9999 + 8
+        assert _paise(quote["discount_amount"]) == 1000
+        assert _paise(quote["taxable_amount"]) == (_paise(quote["subtotal"]) - _paise(quote["discount_amount"])
+                                                   - _paise(quote["header_discount_amount"]))
+        assert _paise(quote["grand_total"]) == _paise(quote["taxable_amount"]) + _paise(quote["total_tax"])
+
+    def test_gst_split_follows_place_of_supply(self):
+        quote = self._create()
+        assert quote["place_of_supply"] == "24-Gujarat"
+        tax = _paise(quote["total_tax"])
+        if quote["is_interstate"]:
+            assert quote["cgst_amount"] == quote["sgst_amount"] == 0
+            assert _paise(quote["igst_amount"]) == tax
+        else:
+            assert quote["igst_amount"] == 0
+            assert quote["cgst_amount"] == quote["sgst_amount"]
+            assert _paise(quote["cgst_amount"]) * 2 == tax
+
+    def test_bulk_reprice(self):
+        quote = self._create()
+        request = {"prices": {self.item_id: 40}, "statuses": ["draft"], "account_id": self.account_id}
+
+        dry = self.session.post(f"{BASE_URL}/api/crm/quotations/reprice", json={**request, "dry_run": True})
+        assert dry.status_code == 200, dry.text
+        assert dry.json()["repriced"] == 1
+        unchanged = self.session.get(f"{BASE_URL}/api/crm/quotations/{quote['id']}").json()
+        assert unchanged["grand_total"] == quote["grand_total"]
+
+        result = self.session.post(f"{BASE_URL}/api/crm/quotations/reprice", json=request)
+        assert result.status_code == 200, result.text
+        data = result.json()
+        assert data["matched"] == 1 and data["repriced"] == 1 and data["conflicts"] == 0
+
+        repriced = self.session.get(f"{BASE_URL}/api/crm/quotations/{quote['id']}").json()
+        tape = next(i for i in repriced["items"] if i.get("item_id") == self.item_id)
+        assert tape["unit_price"] == 40
+        assert _paise(tape["line_subtotal"]) == 12000
+        assert _paise(data["value_after"]) == _paise(repriced["grand_total"])
+
+        again = self.session.post(f"{BASE_URL}/api/crm/quotations/reprice", json=request)
+        assert again.json()["unchanged"] == 1
+
+    def test_reprice_percent_change(self):
+        quote = self._create()
+        result = self.session.post(f"{BASE_URL}/api/crm/quotations/reprice", json={
+            "percent_change": 10, "item_ids": [self.item_id], "account_id": self.account_id
+        })
+        assert result.status_code == 200, result.text
+        repriced = self.session.get(f"{BASE_URL}/api/crm/quotations/{quote['id']}").json()
+        prices = {i.get("item_id"): i["unit_price"] for i in repriced["items"]}
+        assert prices[self.item_id] == 36.66
+        assert prices[None] == 0.05
+
+    def test_reprice_from_zero_master_price(self):
+        """Test a selling_price of 0 in the item master is applied, not skipped"""
+        item = self.session.post(f"{BASE_URL}/api/inventory/items", json={
+            "item_code": f"TEST-FREE-{uuid.uuid4().hex[:6]}", "item_name": "TEST Free Sample",
+            "category": "Test", "selling_price": 0,
+        })
+        assert item.status_code == 200, item.text
+        self.item_id = item.json()["id"]
+        quote = self._create()
+
+        result = self.session.post(f"{BASE_URL}/api/crm/quotations/reprice", json={
+            "use_item_master": True, "account_id": self.account_id
+        })
+        assert result.status_code == 200, result.text
+        repriced = self.session.get(f"{BASE_URL}/api/crm/quotations/{quote['id']}").json()
+        free = next(i for i in repriced["items"] if i.get("item_id") == self.item_id)
+        assert free["unit_price"] == 0
+        assert free["line_total"] == 0
+
+    def test_reprice_needs_a_change(self):
+        response = self.session.post(f"{BASE_URL}/api/crm/quotations/reprice", json={"statuses": ["draft"]})
+        assert response.status_code == 400
+
+        response = self.session.post(f"{BASE_URL}/api/crm/quotations/reprice", json={
+            "percent_change": 5, "statuses": ["accepted"]
+        })
+        assert response.status_code == 400
@@ -0,0 +1,133 @@
+"""
+Reorder Watchlist Tests
+/api/inventory-advanced/reorder-alerts is read from the watchlist kept in step
+with stock posting, and /reorder-alerts/changes reports only the deltas
+"""
+
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from test_stock_posting import StockFixture, BASE_URL
+
+INTERLEAVED_ITEMS = 24
+
+
+class TestReorderWatchlist(StockFixture):
+    """Fresh item with reorder_level 10 and safety_stock 2"""
+
+    def _set_levels(self):
+        response = self.session.put(f"{BASE_URL}/api/inventory/items/{self.item_id}",
+                                    json={"reorder_level": 10, "safety_stock": 2})
+        assert response.status_code == 200, response.text
+
+    def _alert(self):
+        response = self.session.get(f"{BASE_URL}/api/inventory-advanced/reorder-alerts")
+        assert response.status_code == 200
+        return next((a for a in response.json()["alerts"] if a["item_id"] == self.item_id), None)
+
+    def _changes(self, since):
+        response = self.session.get(f"{BASE_URL}/api/inventory-advanced/reorder-alerts/changes",
+                                    params={"since": since})
+        assert response.status_code == 200
+        return response.json()
+
+    def _latest_seq(self):
+        data = self._changes(0)
+        while data["has_more"]:
+            data = self._changes(data["next_since"])
+        return data["next_since"]
+
+    def _item_changes(self, since):
+        return [c for c in self._changes(since)["changes"] if c["item_id"] == self.item_id]
+
+    def test_setting_levels_opens_alert(self):
+        """Test an item with no stock is critical once it gets a reorder level"""
+        assert self._alert() is None
+        self._set_levels()
+        alert = self._alert()
+        assert alert is not None
+        assert alert["urgency"] == "critical"
+        assert alert["suggested_qty"] == 12
+
+    def test_posting_crosses_threshold(self):
+        """Test receipts clear the alert and issues reopen it as a warning"""
+        self._set_levels()
+        assert self._post("receipt", 20).status_code == 200
+        assert self._alert() is None
+
+        assert self._post("issue", 15).status_code == 200
+        alert = self._alert()
+        assert alert["urgency"] == "warning"
+        assert alert["current_stock"] == 5
+
+    def test_change_feed_reports_deltas_only(self):
+        """Test the feed returns changes after `since` and nothing for unchanged items"""
+        self._set_levels()
+        since = self._latest_seq()
+        assert self._item_changes(since) == []
+
+        assert self._post("receipt", 20).status_code == 200
+        changes = self._item_changes(since)
+        assert [c["status"] for c in changes] == ["cleared"]
+
+        # Movement that stays above the level is not a change
+        since = self._latest_seq()
+        assert self._post("issue", 1).status_code == 200
+        assert self._item_changes(since) == []
+
+    def test_batch_receipt_clears_alert(self):
+        """Test stock received as a batch closes the alert"""
+        self._set_levels()
+        assert self._alert() is not None
+        response = self.session.post(f"{BASE_URL}/api/inventory-advanced/batches", json={
+            "item_id": self.item_id,
+            "batch_number": "TEST-BATCH-1",
+            "warehouse_id": self.warehouse_id,
+            "quantity": 25,
+            "unit_cost": 10,
+        })
+        assert response.status_code == 200, response.text
+        assert self._alert() is None
+
+    def test_interleaved_syncs_lose_no_changes(self):
+        """Test a poller running alongside concurrent syncs sees every opened alert"""
+        item_ids = []
+        for n in range(INTERLEAVED_ITEMS):
+            item = self.session.post(f"{BASE_URL}/api/inventory/items", json={
+                "item_code": f"TEST-FEED-{uuid.uuid4().hex[:8].upper()}",
+                "item_name": f"TEST Feed Item {n}",
+                "category": "Test",
+            })
+            assert item.status_code == 200, item.text
+            item_ids.append(item.json()["id"])
+
+        since = self._latest_seq()
+        seen, done = set(), threading.Event()
+
+        def poll():
+            cursor = since
+            while True:
+                finished = done.is_set()
+                data = self._changes(cursor)
+                seen.update(c["item_id"] for c in data["changes"])
+                cursor = data["next_since"]
+                if finished and not data["has_more"]:
+                    return
+
+        def open_alert(item_id):
+            session = requests.Session()
+            session.headers.update({"Authorization": f"Bearer {self.token}"})
+            return session.put(f"{BASE_URL}/api/inventory/items/{item_id}", json={"reorder_level": 10})
+
+        poller = threading.Thread(target=poll)
+        poller.start()
+        with ThreadPoolExecutor(max_workers=INTERLEAVED_ITEMS) as pool:
+            results = list(pool.map(open_alert, item_ids))
+        done.set()
+        poller.join(timeout=60)
+
+        assert all(r.status_code == 200 for r in results)
+        assert set(item_ids) <= seen
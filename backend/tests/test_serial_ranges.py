@@ -0,0 +1,106 @@
+"""
+Serial Range Tests
+Atomic serial number blocks via /api/warehouse/serial-ranges and item serial
+generation via /api/inventory-advanced/serial-numbers/generate
+"""
+
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from test_stock_posting import StockFixture, BASE_URL
+
+
+class TestSerialRanges(StockFixture):
+    """Counters on a fresh warehouse"""
+
+    def _reserve(self, doc_type, count, session=None, **params):
+        session = session or self.session
+        return session.post(f"{BASE_URL}/api/warehouse/serial-ranges/{doc_type}/{self.warehouse_id}",
+                            params={"count": count, **params})
+
+    def test_range_is_contiguous(self):
+        doc_type = f"test_{uuid.uuid4().hex[:6]}"
+        first = self._reserve(doc_type, 5, include_numbers=True)
+        assert first.status_code == 200, first.text
+        data = first.json()
+        assert (data["start_number"], data["end_number"]) == (1, 5)
+        assert len(data["serial_numbers"]) == 5
+        assert data["serial_numbers"][0] == data["first"]
+        assert data["serial_numbers"][-1] == data["last"]
+
+        second = self._reserve(doc_type, 3).json()
+        assert (second["start_number"], second["end_number"]) == (6, 8)
+        assert "serial_numbers" not in second
+
+    def test_concurrent_ranges_never_overlap(self):
+        """Test 20 parallel reservations claim disjoint blocks"""
+        doc_type = f"test_{uuid.uuid4().hex[:6]}"
+
+        def reserve(_):
+            session = requests.Session()
+            session.headers.update({"Authorization": f"Bearer {self.token}"})
+            return self._reserve(doc_type, 10, session=session).json()
+
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            blocks = list(pool.map(reserve, range(20)))
+        numbers = [n for b in blocks for n in range(b["start_number"], b["end_number"] + 1)]
+        assert sorted(numbers) == list(range(1, 201))
+
+    def test_count_limits(self):
+        assert self._reserve("test_limits", 0).status_code == 422
+        assert self._reserve("test_limits", 100_001).status_code == 422
+
+    def test_generate_item_serials(self):
+        """Test generated item serials are stored and unique"""
+        response = self.session.post(f"{BASE_URL}/api/inventory-advanced/serial-numbers/generate", params={
+            "item_id": self.item_id, "warehouse_id": self.warehouse_id, "count": 50,
+        })
+        assert response.status_code == 200, response.text
+        assert response.json()["created"] == 50
+
+        serials = self.session.get(f"{BASE_URL}/api/inventory-advanced/serial-numbers",
+                                   params={"item_id": self.item_id}).json()
+        assert len(serials) == 50
+        assert len({s["serial_number"] for s in serials}) == 50
+
+    def test_item_serials_unique_across_warehouses(self):
+        """Test the same item gets distinct serials in two warehouses"""
+        other = self.session.post(f"{BASE_URL}/api/inventory/warehouses", json={
+            "warehouse_code": f"TWH2-{uuid.uuid4().hex[:8].upper()}",
+            "warehouse_name": "TEST Second WH",
+        })
+        assert other.status_code == 200, other.text
+
+        for warehouse_id in (self.warehouse_id, other.json()["id"]):
+            response = self.session.post(f"{BASE_URL}/api/inventory-advanced/serial-numbers/generate", params={
+                "item_id": self.item_id, "warehouse_id": warehouse_id, "count": 10,
+            })
+            assert response.status_code == 200, response.text
+
+        serials = self.session.get(f"{BASE_URL}/api/inventory-advanced/serial-numbers",
+                                   params={"item_id": self.item_id}).json()
+        assert len(serials) == 20
+        assert len({s["serial_number"] for s in serials}) == 20
+        assert {s["warehouse_id"] for s in serials} == {self.warehouse_id, other.json()["id"]}
+
+    def test_collision_creates_nothing(self):
+        """Test a hand-entered serial inside the next range fails the whole call"""
+        generate = f"{BASE_URL}/api/inventory-advanced/serial-numbers/generate"
+        first = self.session.post(generate, params={"item_id": self.item_id, "warehouse_id": self.warehouse_id, "count": 1})
+        assert first.status_code == 200, first.text
+        head, number = first.json()["last"].rsplit("/", 1)
+        taken = f"{head}/{str(first.json()['end_number'] + 5).zfill(len(number))}"
+
+        manual = self.session.post(f"{BASE_URL}/api/inventory-advanced/serial-numbers/bulk", json=[taken],
+                                   params={"item_id": self.item_id, "warehouse_id": self.warehouse_id})
+        assert manual.status_code == 200, manual.text
+
+        response = self.session.post(generate, params={"item_id": self.item_id, "warehouse_id": self.warehouse_id, "count": 10})
+        assert response.status_code == 409
+        assert taken in response.json()["detail"]
+
+        serials = self.session.get(f"{BASE_URL}/api/inventory-advanced/serial-numbers",
+                                   params={"item_id": self.item_id}).json()
+        assert sorted(s["serial_number"] for s in serials) == sorted([first.json()["last"], taken])
@@ -0,0 +1,82 @@
+"""
+Stock Aging Tests
+Bucket totals from /api/inventory-advanced/stock-aging and the paged
+per-bucket drill-down
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from test_stock_posting import StockFixture, BASE_URL
+
+
+class TestStockAging(StockFixture):
+    """Aging for batches in a fresh warehouse"""
+
+    def _batch(self, quantity=10, unit_cost=2):
+        response = self.session.post(f"{BASE_URL}/api/inventory-advanced/batches", json={
+            "item_id": self.item_id,
+            "warehouse_id": self.warehouse_id,
+            "batch_number": f"TEST-AGE-{uuid.uuid4().hex[:8].upper()}",
+            "quantity": quantity,
+            "unit_cost": unit_cost,
+        })
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    def _aging(self, **params):
+        response = self.session.get(f"{BASE_URL}/api/inventory-advanced/stock-aging",
+                                    params={"warehouse_id": self.warehouse_id, **params})
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    def test_totals_only(self):
+        """Test new batches land in 0_30_days and buckets carry no item lists"""
+        self._batch(10, 2)
+        self._batch(5, 4)
+        data = self._aging()
+        assert data["total_batches"] == 2
+        assert data["total_value"] == 40
+        assert data["aging_buckets"]["0_30_days"]["count"] == 2
+        assert data["aging_buckets"]["0_30_days"]["value"] == 40
+        assert all("items" not in b for b in data["aging_buckets"].values())
+        assert set(data["aging_buckets"]) == {"0_30_days", "31_60_days", "61_90_days", "91_180_days", "over_180_days"}
+
+    def test_as_of_shifts_bucket(self):
+        """Test aging as of 45 days ahead moves today's batches to 31_60_days"""
+        self._batch()
+        as_of = (datetime.now(timezone.utc) + timedelta(days=45)).isoformat()
+        data = self._aging(as_of=as_of)
+        assert data["aging_buckets"]["31_60_days"]["count"] == 1
+        assert data["aging_buckets"]["0_30_days"]["count"] == 0
+
+    def test_as_of_with_offset_is_utc(self):
+        """Test an as_of with a +05:30 offset is read as the same instant in UTC"""
+        self._batch()
+        ist = timezone(timedelta(hours=5, minutes=30))
+        as_of = (datetime.now(timezone.utc) + timedelta(days=45)).astimezone(ist)
+        data = self._aging(as_of=as_of.isoformat())
+        assert data["generated_at"].endswith("+00:00")
+        assert data["aging_buckets"]["31_60_days"]["count"] == 1
+
+    def test_drill_down_pages(self):
+        """Test the bucket drill-down pages through every batch with X-Next-Cursor"""
+        created = {self._batch()["id"] for _ in range(3)}
+        seen, cursor = [], None
+        while True:
+            params = {"warehouse_id": self.warehouse_id, "limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = self.session.get(f"{BASE_URL}/api/inventory-advanced/stock-aging/0_30_days/batches",
+                                        params=params)
+            assert response.status_code == 200, response.text
+            seen.extend(row["id"] for row in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        assert set(seen) == created
+        assert len(seen) == len(created)
+
+    def test_unknown_bucket(self):
+        response = self.session.get(f"{BASE_URL}/api/inventory-advanced/stock-aging/7_days/batches")
+        assert response.status_code == 404
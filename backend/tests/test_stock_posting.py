@@ -0,0 +1,179 @@
+"""
+Stock Posting Concurrency Tests
+Stress tests for /api/inventory/stock/entry - concurrent issues must never drive stock negative -
+and /api/inventory/stock/entries/bulk batch posting
+"""
+
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+CONCURRENT_ISSUES = 60
+OPENING_QTY = 25
+
+
+class StockFixture:
+    """Fresh item and warehouse per test, plus posting helpers"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup - get auth token and a fresh item/warehouse"""
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        login_response = self.session.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@instabiz.com",
+            "password": "adminpassword"
+        })
+        if login_response.status_code != 200:
+            pytest.skip("Authentication failed - skipping tests")
+        self.token = login_response.json().get("token")
+        self.session.headers.update({"Authorization": f"Bearer {self.token}"})
+
+        suffix = uuid.uuid4().hex[:8].upper()
+        item = self.session.post(f"{BASE_URL}/api/inventory/items", json={
+            "item_code": f"TEST-STRESS-{suffix}",
+            "item_name": f"TEST Stress Item {suffix}",
+            "category": "Test",
+        })
+        assert item.status_code == 200, f"Item creation failed: {item.text}"
+        self.item_id = item.json()["id"]
+
+        wh = self.session.post(f"{BASE_URL}/api/inventory/warehouses", json={
+            "warehouse_code": f"TWH-{suffix}",
+            "warehouse_name": f"TEST Stress WH {suffix}",
+        })
+        assert wh.status_code == 200, f"Warehouse creation failed: {wh.text}"
+        self.warehouse_id = wh.json()["id"]
+
+    def _post(self, transaction_type, quantity):
+        session = requests.Session()
+        session.headers.update({"Authorization": f"Bearer {self.token}"})
+        return session.post(f"{BASE_URL}/api/inventory/stock/entry", json={
+            "item_id": self.item_id,
+            "warehouse_id": self.warehouse_id,
+            "quantity": quantity,
+            "transaction_type": transaction_type,
+            "reference_type": "Test",
+        })
+
+    def _balance(self):
+        response = self.session.get(f"{BASE_URL}/api/inventory/stock/balance",
+                                     params={"item_id": self.item_id, "warehouse_id": self.warehouse_id})
+        assert response.status_code == 200
+        rows = response.json()
+        return rows[0]["quantity"] if rows else 0
+
+
+class TestStockPostingConcurrency(StockFixture):
+    """Concurrent receipts/issues against a single item and warehouse"""
+
+    def test_concurrent_issues_never_oversell(self):
+        """Test only OPENING_QTY of CONCURRENT_ISSUES parallel 1-unit issues succeed"""
+        assert self._post("receipt", OPENING_QTY).status_code == 200
+
+        with ThreadPoolExecutor(max_workers=CONCURRENT_ISSUES) as pool:
+            results = list(pool.map(lambda _: self._post("issue", 1), range(CONCURRENT_ISSUES)))
+
+        ok = [r for r in results if r.status_code == 200]
+        rejected = [r for r in results if r.status_code == 400]
+        assert len(ok) == OPENING_QTY, f"Expected {OPENING_QTY} successful issues, got {len(ok)}"
+        assert len(rejected) == CONCURRENT_ISSUES - OPENING_QTY
+        assert all(r.json()["detail"] == "Insufficient stock" for r in rejected)
+
+        # Every successful issue saw a distinct post-movement balance
+        balances = sorted(r.json()["new_balance"] for r in ok)
+        assert balances == list(range(OPENING_QTY))
+        assert self._balance() == 0
+
+        item = self.session.get(f"{BASE_URL}/api/inventory/items/{self.item_id}").json()
+        assert item["current_stock"] == 0
+
+    def test_concurrent_mixed_movements_reconcile(self):
+        """Test parallel receipts and issues leave balance == receipts - successful issues"""
+        assert self._post("receipt", 10).status_code == 200
+
+        moves = ["receipt", "issue"] * 40
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            results = list(pool.map(lambda t: (t, self._post(t, 1)), moves))
+
+        received = 10 + sum(1 for t, r in results if t == "receipt" and r.status_code == 200)
+        issued = sum(1 for t, r in results if t == "issue" and r.status_code == 200)
+        assert all(r.status_code in (200, 400) for _, r in results)
+        assert self._balance() == received - issued >= 0
+
+        ledger = self.session.get(f"{BASE_URL}/api/inventory/stock/ledger/{self.item_id}",
+                                  params={"warehouse_id": self.warehouse_id, "limit": 500}).json()
+        assert sum(row["in_qty"] - row["out_qty"] for row in ledger) == received - issued
+
+    def test_available_qty_follows_movements(self):
+        """Test available_qty tracks quantity across receipts and issues"""
+        assert self._post("receipt", 10).status_code == 200
+        assert self._post("issue", 4).status_code == 200
+        row = self.session.get(f"{BASE_URL}/api/inventory/stock/balance",
+                               params={"item_id": self.item_id, "warehouse_id": self.warehouse_id}).json()[0]
+        assert row["quantity"] == 6
+        assert row["available_qty"] == row["quantity"] - row["reserved_qty"]
+
+    def test_issue_without_balance_rejected(self):
+        """Test issuing from an empty warehouse returns 400 and creates no balance"""
+        response = self._post("issue", 5)
+        assert response.status_code == 400
+        assert self._balance() == 0
+
+    def test_unknown_item_returns_404(self):
+        """Test posting against a missing item returns 404"""
+        response = self.session.post(f"{BASE_URL}/api/inventory/stock/entry", json={
+            "item_id": "does-not-exist",
+            "warehouse_id": self.warehouse_id,
+            "quantity": 1,
+            "transaction_type": "receipt",
+        })
+        assert response.status_code == 404
+
+
+class TestBulkStockEntries(StockFixture):
+    """Batch posting via /api/inventory/stock/entries/bulk"""
+
+    def _bulk(self, entries):
+        return self.session.post(f"{BASE_URL}/api/inventory/stock/entries/bulk", json={"entries": entries})
+
+    def _entry(self, transaction_type, quantity, **extra):
+        return {"item_id": self.item_id, "warehouse_id": self.warehouse_id, "quantity": quantity,
+                "transaction_type": transaction_type, "reference_type": "Test", **extra}
+
+    def test_bulk_receipts_running_balance(self):
+        """Test a 200-line batch posts every line with a running balance_qty"""
+        response = self._bulk([self._entry("receipt", 1) for _ in range(200)])
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["count"] == 200
+        assert [row["balance_qty"] for row in data["entries"]] == list(range(1, 201))
+        assert self._balance() == 200
+
+        item = self.session.get(f"{BASE_URL}/api/inventory/items/{self.item_id}").json()
+        assert item["current_stock"] == 200
+
+    def test_bulk_is_all_or_nothing(self):
+        """Test a batch with one short line posts nothing"""
+        assert self._post("receipt", 5).status_code == 200
+        response = self._bulk([self._entry("issue", 3), self._entry("issue", 3)])
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Insufficient stock"
+        assert self._balance() == 5
+
+    def test_bulk_unknown_warehouse_rejected(self):
+        """Test the prefetch rejects unknown warehouses before writing"""
+        entries = [self._entry("receipt", 1), {**self._entry("receipt", 1), "warehouse_id": "missing"}]
+        response = self._bulk(entries)
+        assert response.status_code == 404
+        assert self._balance() == 0
+
+    def test_bulk_empty_batch_rejected(self):
+        """Test an empty batch fails validation"""
+        assert self._bulk([]).status_code == 422
@@ -0,0 +1,102 @@
+"""
+Stock Snapshot Tests
+As-of-date stock via /api/inventory/stock/as-of (nearest snapshot + ledger delta)
+and snapshot creation via /api/inventory/stock/snapshots
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from test_stock_posting import StockFixture, BASE_URL
+
+
+def _today():
+    return datetime.now(timezone.utc).date()
+
+
+class TestStockAsOf(StockFixture):
+    """As-of balances for a fresh item/warehouse"""
+
+    def _as_of(self, day, **params):
+        return self.session.get(f"{BASE_URL}/api/inventory/stock/as-of", params={
+            "date": day.isoformat(), "item_id": self.item_id, "warehouse_id": self.warehouse_id, **params,
+        })
+
+    def test_as_of_today_matches_live_balance(self):
+        """Test snapshot + ledger delta equals the running balance"""
+        assert self._post("receipt", 10).status_code == 200
+        assert self._post("issue", 3).status_code == 200
+
+        response = self._as_of(_today())
+        assert response.status_code == 200
+        data = response.json()
+        assert data["as_of"] == _today().isoformat()
+        assert len(data["balances"]) == 1
+        row = data["balances"][0]
+        assert row["quantity"] == 7 == self._balance()
+        assert row["in_qty"] == 10 and row["out_qty"] == 3
+
+    def test_as_of_before_first_movement_is_empty(self):
+        """Test movements made today are not visible as of yesterday"""
+        assert self._post("receipt", 5).status_code == 200
+        response = self._as_of(_today() - timedelta(days=1))
+        assert response.status_code == 200
+        assert response.json()["balances"] == []
+
+    def test_as_of_streams_rows(self):
+        """Test ?stream=1 returns the balances as a JSON array"""
+        assert self._post("receipt", 4).status_code == 200
+        response = self._as_of(_today(), stream=1)
+        assert response.status_code == 200
+        rows = response.json()
+        assert [r["quantity"] for r in rows] == [4]
+
+    def test_invalid_date_rejected(self):
+        response = self.session.get(f"{BASE_URL}/api/inventory/stock/as-of", params={"date": "31-01-2025"})
+        assert response.status_code == 400
+
+
+class TestStockSnapshots(StockFixture):
+    """Snapshot creation and listing"""
+
+    def test_snapshot_then_as_of_uses_it(self):
+        """Test a forced snapshot of a past day becomes the base for today's as-of"""
+        past = (_today() - timedelta(days=2)).isoformat()
+        response = self.session.post(f"{BASE_URL}/api/inventory/stock/snapshots",
+                                     params={"date": past, "force": True})
+        assert response.status_code in (200, 409), response.text
+        if response.status_code == 200:
+            assert response.json()["status"] == "completed"
+
+        assert self._post("receipt", 6).status_code == 200
+        data = self.session.get(f"{BASE_URL}/api/inventory/stock/as-of", params={
+            "date": _today().isoformat(), "item_id": self.item_id,
+        }).json()
+        assert data["snapshot_date"] is not None and data["snapshot_date"] <= _today().isoformat()
+        assert [r["quantity"] for r in data["balances"]] == [6]
+
+    def test_forced_rebuild_rebuilds_later_snapshots(self):
+        """Test forcing an older snapshot also rebuilds the completed ones after it"""
+        later = (_today() - timedelta(days=2)).isoformat()
+        earlier = (_today() - timedelta(days=3)).isoformat()
+        self.session.post(f"{BASE_URL}/api/inventory/stock/snapshots", params={"date": later})
+
+        response = self.session.post(f"{BASE_URL}/api/inventory/stock/snapshots",
+                                     params={"date": earlier, "force": True})
+        assert response.status_code in (200, 409), response.text
+        if response.status_code == 200:
+            assert response.json()["snapshot_date"] == earlier
+            assert later in response.json()["rebuilt_after"]
+
+    def test_snapshot_of_today_rejected(self):
+        response = self.session.post(f"{BASE_URL}/api/inventory/stock/snapshots",
+                                     params={"date": _today().isoformat()})
+        assert response.status_code == 400
+
+    def test_list_snapshots(self):
+        response = self.session.get(f"{BASE_URL}/api/inventory/stock/snapshots")
+        assert response.status_code == 200
+        runs = response.json()
+        assert isinstance(runs, list)
+        dates = [r["snapshot_date"] for r in runs]
+        assert dates == sorted(dates, reverse=True)
+
@@ -0,0 +1,196 @@
+"""
+System Diagnostics API Tests
+Tests for /api/system/* admin endpoints (index registry, caches) and /api/_metrics
+"""
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestIndexRegistry:
+    """Index registry / $indexStats report tests"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup - get auth token"""
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        login_response = self.session.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@instabiz.com",
+            "password": "adminpassword"
+        })
+        if login_response.status_code == 200:
+            token = login_response.json().get("token")
+            self.session.headers.update({"Authorization": f"Bearer {token}"})
+        else:
+            pytest.skip("Authentication failed - skipping tests")
+
+    def test_index_report_requires_auth(self):
+        """Test /api/system/indexes requires authentication"""
+        response = requests.get(f"{BASE_URL}/api/system/indexes")
+        assert response.status_code in [401, 403]
+
+    def test_index_registry_lists_hot_collections(self):
+        """Test registry contains the invoice and stock indexes"""
+        response = self.session.get(f"{BASE_URL}/api/system/indexes/registry")
+        assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
+
+        data = response.json()
+        for collection in ["users", "invoices", "stock_balance", "stock_ledger", "leads"]:
+            assert collection in data, f"Registry should contain '{collection}'"
+
+        names = [idx["name"] for idx in data["invoices"]]
+        assert "invoice_type_1_invoice_date_-1" in names
+
+    def test_index_report_structure(self):
+        """Test /api/system/indexes reports missing/unused per collection"""
+        response = self.session.get(f"{BASE_URL}/api/system/indexes")
+        assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
+
+        data = response.json()
+        assert "collections" in data
+        assert "total_missing" in data
+        assert "total_unused" in data
+
+        invoices = data["collections"]["invoices"]
+        for key in ["registered", "existing", "missing", "unused", "unregistered", "usage"]:
+            assert key in invoices, f"Collection report should contain '{key}'"
+
+    def test_ensure_indexes_leaves_nothing_missing(self):
+        """Test POST /api/system/indexes/ensure creates registered indexes"""
+        response = self.session.post(f"{BASE_URL}/api/system/indexes/ensure")
+        assert response.status_code == 200
+        assert "ensured" in response.json()
+
+        report = self.session.get(f"{BASE_URL}/api/system/indexes").json()
+        assert report["collections"]["stock_balance"]["missing"] == []
+
+
+class TestUserCache:
+    """get_current_user cache counters"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup - get auth token"""
+        self.session = requests.Session()
+        login_response = self.session.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@instabiz.com",
+            "password": "adminpassword"
+        })
+        if login_response.status_code == 200:
+            token = login_response.json().get("token")
+            self.session.headers.update({"Authorization": f"Bearer {token}"})
+        else:
+            pytest.skip("Authentication failed - skipping tests")
+
+    def test_repeated_requests_hit_cache(self):
+        """Test authenticated requests are served from the user cache"""
+        before = self.session.get(f"{BASE_URL}/api/system/cache/users").json()
+        for _ in range(3):
+            assert self.session.get(f"{BASE_URL}/api/auth/me").status_code == 200
+        after = self.session.get(f"{BASE_URL}/api/system/cache/users").json()
+
+        for key in ["size", "maxsize", "ttl_seconds", "hits", "misses", "invalidations", "hit_rate"]:
+            assert key in after, f"Cache stats should contain '{key}'"
+        # Counters are per worker, so only assert that lookups were recorded
+        assert after["hits"] + after["misses"] > before["hits"] + before["misses"]
+
+    @pytest.fixture
+    def restore_access(self):
+        """Put the admin's access configuration back after the test"""
+        me = self.session.get(f"{BASE_URL}/api/auth/me").json()
+        original = self.session.get(f"{BASE_URL}/api/permissions/users/{me['id']}/access").json()
+        yield me
+        custom = original.get("custom_access") or {}
+        self.session.put(f"{BASE_URL}/api/permissions/users/{me['id']}/access", params={
+            "access_level": custom.get("data_access_level", original["effective_data_access"]),
+            "assigned_locations": custom.get("assigned_locations") or [],
+            "assigned_teams": custom.get("assigned_teams") or [],
+        })
+
+    def test_user_access_update_invalidates(self, restore_access):
+        """Test PUT /permissions/users/{id}/access drops the cached user"""
+        me = restore_access
+        # This request caches the admin, so the update below has an entry to drop
+        before = self.session.get(f"{BASE_URL}/api/system/cache/users").json()
+
+        response = self.session.put(
+            f"{BASE_URL}/api/permissions/users/{me['id']}/access",
+            params={"access_level": "all"}
+        )
+        assert response.status_code == 200
+
+        after = self.session.get(f"{BASE_URL}/api/system/cache/users").json()
+        assert after["invalidations"] > before["invalidations"]
+
+
+class TestPrometheusMetrics:
+    """/api/_metrics exposition tests"""
+
+    def test_metrics_prometheus_format(self):
+        """Test /api/_metrics records route templates and Mongo commands"""
+        login_response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@instabiz.com",
+            "password": "adminpassword"
+        })
+        if login_response.status_code != 200:
+            pytest.skip("Authentication failed - skipping tests")
+        headers = {"Authorization": f"Bearer {login_response.json()['token']}"}
+        requests.get(f"{BASE_URL}/api/crm/leads", headers=headers)
+
+        metrics_headers = {}
+        if os.environ.get('METRICS_TOKEN'):
+            metrics_headers["Authorization"] = f"Bearer {os.environ['METRICS_TOKEN']}"
+        response = requests.get(f"{BASE_URL}/api/_metrics", headers=metrics_headers)
+        assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
+        assert response.headers["content-type"].startswith("text/plain")
+
+        body = response.text
+        assert "# TYPE http_request_duration_seconds histogram" in body
+        assert "# TYPE http_request_mongo_commands histogram" in body
+        assert "mongo_commands_total" in body
+        # Route templates, not raw paths, are used as labels
+        assert 'route="/api/auth/login"' in body
+
+
+class TestSlowOps:
+    """Slow-operation log ranking tests"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup - get auth token"""
+        self.session = requests.Session()
+        login_response = self.session.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@instabiz.com",
+            "password": "adminpassword"
+        })
+        if login_response.status_code == 200:
+            token = login_response.json().get("token")
+            self.session.headers.update({"Authorization": f"Bearer {token}"})
+        else:
+            pytest.skip("Authentication failed - skipping tests")
+
+    def test_slow_ops_ranking_structure(self):
+        """Test GET /api/system/slow-ops returns ranked shapes"""
+        response = self.session.get(f"{BASE_URL}/api/system/slow-ops", params={"limit": 5})
+        assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
+
+        data = response.json()
+        assert "threshold_ms" in data
+        assert "shapes" in data
+        assert isinstance(data["shapes"], list)
+        totals = [s["total_ms"] for s in data["shapes"]]
+        assert totals == sorted(totals, reverse=True), "Shapes should be ranked by total time"
+        for shape in data["shapes"]:
+            for key in ["shape_hash", "collection", "command", "shape", "count", "max_ms", "batches", "routes"]:
+                assert key in shape, f"Shape should contain '{key}'"
+
+    def test_recent_slow_ops(self):
+        """Test GET /api/system/slow-ops/recent returns a list"""
+        response = self.session.get(f"{BASE_URL}/api/system/slow-ops/recent", params={"limit": 10})
+        assert response.status_code == 200
+        assert isinstance(response.json(), list)
@@ -0,0 +1,91 @@
+"""
+Warehouse Stock Tests
+Stock summaries on /api/warehouse/warehouses and the paged per-warehouse
+stock listing /api/warehouse/warehouses/{id}/stock
+"""
+
+import uuid
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestWarehouseStock:
+    """One GST warehouse with three batches of two items"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup - get auth token, create a warehouse, items and batches"""
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        login_response = self.session.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@instabiz.com",
+            "password": "adminpassword"
+        })
+        if login_response.status_code != 200:
+            pytest.skip("Authentication failed - skipping tests")
+        self.session.headers.update({"Authorization": f"Bearer {login_response.json().get('token')}"})
+
+        suffix = uuid.uuid4().hex[:8].upper()
+        wh = self.session.post(f"{BASE_URL}/api/warehouse/warehouses", json={
+            "warehouse_code": f"TWS-{suffix}",
+            "warehouse_name": f"TEST Summary WH {suffix}",
+            "prefix": f"T{suffix[:3]}",
+            "gstin": f"27TEST{suffix}Z5",
+        })
+        assert wh.status_code == 200, wh.text
+        self.warehouse_id = wh.json()["id"]
+
+        self.item_ids = []
+        for n in range(2):
+            item = self.session.post(f"{BASE_URL}/api/inventory/items", json={
+                "item_code": f"TEST-WS-{suffix}-{n}",
+                "item_name": f"TEST Warehouse Stock Item {suffix} {n}",
+                "category": "Test",
+            })
+            assert item.status_code == 200, item.text
+            self.item_ids.append(item.json()["id"])
+
+        for item_id, quantity in ((self.item_ids[0], 10), (self.item_ids[0], 5), (self.item_ids[1], 4)):
+            batch = self.session.post(f"{BASE_URL}/api/warehouse/batches", json={
+                "item_id": item_id, "warehouse_id": self.warehouse_id, "quantity": quantity, "cost_price": 2,
+            })
+            assert batch.status_code == 200, batch.text
+
+    def test_list_includes_summary(self):
+        """Test each warehouse carries its stock totals"""
+        response = self.session.get(f"{BASE_URL}/api/warehouse/warehouses")
+        assert response.status_code == 200
+        wh = next(w for w in response.json() if w["id"] == self.warehouse_id)
+        assert wh["stock_summary"]["total_items"] == 3
+        assert wh["stock_summary"]["total_quantity"] == 19
+        assert wh["stock_summary"]["total_value"] == 38
+
+    def test_detail_has_summary(self):
+        response = self.session.get(f"{BASE_URL}/api/warehouse/warehouses/{self.warehouse_id}")
+        assert response.status_code == 200
+        assert response.json()["stock_summary"]["total_items"] == 3
+
+    def test_stock_pages(self):
+        """Test the stock listing pages with X-Next-Cursor"""
+        url = f"{BASE_URL}/api/warehouse/warehouses/{self.warehouse_id}/stock"
+        first = self.session.get(url, params={"limit": 2})
+        assert first.status_code == 200
+        assert len(first.json()) == 2
+        cursor = first.headers.get("X-Next-Cursor")
+        assert cursor
+        second = self.session.get(url, params={"limit": 2, "cursor": cursor})
+        assert len(second.json()) == 1
+        assert "X-Next-Cursor" not in second.headers
+        ids = {row["id"] for row in first.json() + second.json()}
+        assert len(ids) == 3
+
+    def test_stock_item_filter(self):
+        response = self.session.get(f"{BASE_URL}/api/warehouse/warehouses/{self.warehouse_id}/stock",
+                                    params={"item_id": self.item_ids[1]})
+        assert response.status_code == 200
+        assert [row["quantity"] for row in response.json()] == [4]
@@ -0,0 +1,167 @@
+"""
+Barcode Resolution & Rendering
+Scanned code -> item / serial / batch, and cached barcode images
+
+resolve_barcodes() looks up any number of scanned codes with one indexed $in
+query per collection, in the same precedence as the single-code lookup:
+
+    items.item_code / items.barcode  ->  serial_numbers.serial_number  ->  batches.batch_number
+
+Which document a code points to rarely changes, so that mapping is kept in a
+per-worker TTL cache (barcode_cache). Documents themselves are always read
+fresh by id and must still carry the code; an entry whose document was
+deleted or renumbered since (on any worker) is dropped and the code resolved
+again. Codes that resolve to nothing are not cached; the code may be
+registered a moment later.
+
+render_barcode_image() caches rendered images keyed by a hash of
+(format, data); the same pallet label printed twice is rendered once.
+"""
+
+import base64
+import hashlib
+import os
+from io import BytesIO
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from cachetools import LRUCache
+
+from utils.ttl_cache import CountedTTLCache
+
+# code -> (match_type, document id); match_type is "item", "serial" or "batch"
+Resolution = Tuple[str, str]
+
+barcode_cache = CountedTTLCache(
+    maxsize=int(os.environ.get('BARCODE_CACHE_SIZE', 50000)),
+    ttl=float(os.environ.get('BARCODE_CACHE_TTL_SECONDS', 600)),
+)
+
+
+async def _resolve_uncached(db, codes: List[str]) -> Dict[str, Resolution]:
+    resolved: Dict[str, Resolution] = {}
+    wanted = set(codes)
+
+    items = await db.items.find(
+        {"$or": [{"item_code": {"$in": codes}}, {"barcode": {"$in": codes}}]},
+        {"_id": 0, "id": 1, "item_code": 1, "barcode": 1}
+    ).to_list(None)
+    # item_code wins over another item's barcode, as in the single lookup
+    for field in ("barcode", "item_code"):
+        for item in items:
+            if item.get(field) in wanted:
+                resolved[item[field]] = ("item", item["id"])
+
+    remaining = [c for c in codes if c not in resolved]
+    if remaining:
+        async for serial in db.serial_numbers.find(
+            {"serial_number": {"$in": remaining}}, {"_id": 0, "id": 1, "serial_number": 1}
+        ):
+            resolved.setdefault(serial["serial_number"], ("serial", serial["id"]))
+
+    remaining = [c for c in remaining if c not in resolved]
+    if remaining:
+        async for batch in db.batches.find(
+            {"batch_number": {"$in": remaining}}, {"_id": 0, "id": 1, "batch_number": 1}
+        ):
+            resolved.setdefault(batch["batch_number"], ("batch", batch["id"]))
+
+    return resolved
+
+
+def _carries(match_type: str, doc: Dict[str, Any], code: str) -> bool:
+    """Whether the document still holds `code` in the field it was resolved by"""
+    if match_type == "item":
+        return code in (doc.get("item_code"), doc.get("barcode"))
+    return doc.get("serial_number" if match_type == "serial" else "batch_number") == code
+
+
+async def _load(db, resolutions: Dict[str, Resolution]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """code -> item document for each resolution, None where the document no longer carries the code"""
+    ids: Dict[str, set] = {"item": set(), "serial": set(), "batch": set()}
+    for match_type, doc_id in resolutions.values():
+        ids[match_type].add(doc_id)
+    serials = {s["id"]: s for s in await db.serial_numbers.find(
+        {"id": {"$in": list(ids["serial"])}}, {"_id": 0}).to_list(None)} if ids["serial"] else {}
+    batches = {b["id"]: b for b in await db.batches.find(
+        {"id": {"$in": list(ids["batch"])}}, {"_id": 0}).to_list(None)} if ids["batch"] else {}
+    item_ids = ids["item"] | {s["item_id"] for s in serials.values()} | {b["item_id"] for b in batches.values()}
+    items = {i["id"]: i for i in await db.items.find(
+        {"id": {"$in": list(item_ids)}}, {"_id": 0}).to_list(None)} if item_ids else {}
+
+    loaded: Dict[str, Optional[Dict[str, Any]]] = {}
+    for code, (match_type, doc_id) in resolutions.items():
+        if match_type == "item":
+            item = items.get(doc_id)
+            loaded[code] = dict(item) if item and _carries("item", item, code) else None
+        else:
+            source = (serials if match_type == "serial" else batches).get(doc_id)
+            item = items.get(source["item_id"]) if source and _carries(match_type, source, code) else None
+            loaded[code] = {**item, f"{match_type}_info": source} if item else None
+    return loaded
+
+
+async def resolve_barcodes(db, codes: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Resolve scanned codes to item documents.
+
+    Returns:
+        code -> item document (with serial_info / batch_info when the code is a
+        serial or batch number) or None when nothing matches
+    """
+    codes = list(dict.fromkeys(codes))
+    cached: Dict[str, Resolution] = {}
+    misses = []
+    for code in codes:
+        resolution = barcode_cache.get(code)
+        if resolution:
+            cached[code] = resolution
+        else:
+            misses.append(code)
+
+    results = await _load(db, cached)
+    # Cached documents deleted or renumbered since: drop and resolve again
+    stale = [code for code, doc in results.items() if doc is None]
+    barcode_cache.invalidate(*stale)
+    misses += stale
+
+    if misses:
+        fresh = await _resolve_uncached(db, misses)
+        loaded = await _load(db, fresh)
+        for code, resolution in fresh.items():
+            if loaded[code] is not None:
+                barcode_cache.set(code, resolution)
+        results.update(loaded)
+
+    return {code: results.get(code) for code in codes}
+
+
+# ==================== IMAGE RENDERING ====================
+_image_cache: LRUCache = LRUCache(maxsize=int(os.environ.get('BARCODE_IMAGE_CACHE_SIZE', 1024)))
+
+
+def _image_key(data: str, format: str) -> str:
+    return hashlib.sha256(f"{format}\x00{data}".encode()).hexdigest()
+
+
+def render_barcode_image(data: str, format: str = "qr") -> Optional[str]:
+    """PNG data URI for `data`, or None if the format is not supported"""
+    if format != "qr":
+        return None
+    key = _image_key(data, format)
+    image = _image_cache.get(key)
+    if image is None:
+        import qrcode
+        qr = qrcode.QRCode(version=1, box_size=10, border=5)
+        qr.add_data(data)
+        qr.make(fit=True)
+        img = qr.make_image(fill_color="black", back_color="white")
+
+        buffer = BytesIO()
+        img.save(buffer, format="PNG")
+        image = f"data:image/png;base64,{base64.b64encode(buffer.getvalue()).decode()}"
+        _image_cache[key] = image
+    return image
+
+
+def image_cache_stats() -> Dict[str, Any]:
+    return {"size": len(_image_cache), "maxsize": _image_cache.maxsize}
@@ -0,0 +1,287 @@
+"""
+Cost Layers
+FIFO / LIFO inventory costing from the stock ledger
+
+Every inward movement opens a layer (quantity at unit cost) in cost_layers.
+Every outward movement consumes open layers twice, independently:
+
+    fifo_remaining  - oldest layers first
+    lifo_remaining  - newest layers first
+
+so either valuation is available at any time without replaying history:
+
+    value(method) = sum(remaining * unit_cost) over layers still open for method
+
+Layers are consumed with a compare-and-set on the remaining quantity, so
+concurrent issues against the same item/warehouse never consume a layer twice.
+The issue cost is written back to the ledger row (fifo_cost / lifo_cost);
+transfer_in layers without a unit cost take the FIFO cost of the matching
+transfer_out leg, other inward movements without a cost fall back to the
+item's standard_cost.
+
+Layer upkeep runs after the stock posting itself (utils/stock_posting.py).
+rebuild_cost_layers() replays the ledger to backfill existing stock or to
+repair layers after a failed update.
+"""
+
+import logging
+import uuid
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+METHODS = ("fifo", "lifo")
+TRANSFER_IN = "transfer_in"
+TRANSFER_OUT = "transfer_out"
+
+# Quantities are floats (kg, sqm, rolls); anything below this is zero
+EPSILON = 1e-9
+
+# Open layers fetched per round trip while consuming
+_LAYER_BATCH = 16
+_WRITE_BATCH = 1000
+
+
+def _sort(method: str) -> List[Tuple[str, int]]:
+    order = 1 if method == "fifo" else -1
+    return [("received_at", order), ("id", order)]
+
+
+def _new_layer(row: Dict[str, Any], unit_cost: float) -> Dict[str, Any]:
+    qty = row["in_qty"]
+    return {
+        "id": str(uuid.uuid4()),
+        "item_id": row["item_id"],
+        "warehouse_id": row["warehouse_id"],
+        "ledger_id": row.get("id"),
+        "received_at": row["transaction_date"],
+        "transaction_type": row.get("transaction_type"),
+        "reference_type": row.get("reference_type"),
+        "reference_id": row.get("reference_id"),
+        "batch_no": row.get("batch_no"),
+        "qty": qty,
+        "unit_cost": unit_cost,
+        "fifo_remaining": qty,
+        "lifo_remaining": qty,
+        "fifo_open": qty > EPSILON,
+        "lifo_open": qty > EPSILON,
+    }
+
+
+async def _layer_cost(db, row: Dict[str, Any], standard_costs: Dict[str, float]) -> float:
+    if row.get("unit_cost"):
+        return row["unit_cost"]
+    if row.get("transaction_type") == TRANSFER_IN and row.get("reference_id"):
+        issued = await db.stock_ledger.find_one(
+            {"reference_type": row.get("reference_type"), "reference_id": row["reference_id"],
+             "item_id": row["item_id"], "transaction_type": TRANSFER_OUT, "fifo_cost": {"$exists": True}},
+            {"_id": 0, "fifo_cost": 1, "out_qty": 1}
+        )
+        if issued and issued.get("out_qty"):
+            return issued["fifo_cost"] / issued["out_qty"]
+    return await _standard_cost(db, row["item_id"], standard_costs)
+
+
+async def _standard_cost(db, item_id: str, cache: Dict[str, float]) -> float:
+    if item_id not in cache:
+        item = await db.items.find_one({"id": item_id}, {"_id": 0, "standard_cost": 1})
+        cache[item_id] = (item or {}).get("standard_cost") or 0
+    return cache[item_id]
+
+
+async def consume(db, item_id: str, warehouse_id: str, quantity: float, method: str) -> Tuple[float, float]:
+    """
+    Consume `quantity` from the open layers in method order.
+
+    Returns:
+        (cost, unlayered_qty) - unlayered_qty is stock issued with no open
+        layer to cost it against (stock that predates the layers)
+    """
+    remaining_field, open_field = f"{method}_remaining", f"{method}_open"
+    remaining, cost = quantity, 0.0
+    while remaining > EPSILON:
+        layers = await db.cost_layers.find(
+            {"item_id": item_id, "warehouse_id": warehouse_id, open_field: True},
+            {"_id": 0, "id": 1, "unit_cost": 1, remaining_field: 1}
+        ).sort(_sort(method)).limit(_LAYER_BATCH).to_list(_LAYER_BATCH)
+        if not layers:
+            break
+        for layer in layers:
+            available = layer[remaining_field]
+            take = min(remaining, available)
+            left = available - take
+            result = await db.cost_layers.update_one(
+                {"id": layer["id"], remaining_field: available},
+                {"$set": {remaining_field: left, open_field: left > EPSILON}}
+            )
+            if result.modified_count == 0:
+                # Consumed concurrently; fetch the open layers again
+                break
+            cost += take * layer["unit_cost"]
+            remaining -= take
+            if remaining <= EPSILON:
+                break
+    return cost, max(remaining, 0.0)
+
+
+async def apply_cost_layers(db, ledger_rows: List[Dict[str, Any]]) -> None:
+    """Open layers for inward rows and consume them for outward rows, in ledger order"""
+    standard_costs: Dict[str, float] = {}
+    pending: List[Dict[str, Any]] = []
+    ledger_ops: List[UpdateOne] = []
+
+    for row in ledger_rows:
+        if row.get("in_qty"):
+            pending.append(_new_layer(row, await _layer_cost(db, row, standard_costs)))
+            continue
+        if not row.get("out_qty"):
+            continue
+        if pending:
+            # An issue in the same batch may consume a layer opened just before it
+            await db.cost_layers.insert_many(pending)
+            pending = []
+        costs = {}
+        for method in METHODS:
+            cost, unlayered = await consume(db, row["item_id"], row["warehouse_id"], row["out_qty"], method)
+            costs[f"{method}_cost"] = round(cost, 4)
+            if unlayered > EPSILON:
+                logger.warning(f"Cost layers short by {unlayered} for item {row['item_id']} "
+                               f"in warehouse {row['warehouse_id']} ({method}); run a cost layer rebuild")
+        row.update(costs)
+        ledger_ops.append(UpdateOne({"id": row["id"]}, {"$set": costs}))
+
+    if pending:
+        await db.cost_layers.insert_many(pending)
+    if ledger_ops:
+        await db.stock_ledger.bulk_write(ledger_ops, ordered=False)
+
+
+async def rebuild_cost_layers(db, item_id: Optional[str] = None) -> Dict[str, int]:
+    """
+    Recreate cost_layers (and ledger issue costs) by replaying stock_ledger
+    item by item in transaction order. Memory is bounded by one item's layers.
+    """
+    item_ids = [item_id] if item_id else await db.stock_ledger.distinct("item_id")
+    stats = {"items": 0, "layers": 0, "issues": 0}
+
+    for iid in item_ids:
+        standard_costs: Dict[str, float] = {}
+        open_layers: Dict[str, Dict[str, Any]] = {}  # warehouse_id -> {"fifo": deque, "lifo": list}
+        transfer_costs: Dict[Tuple[Any, Any], Tuple[float, float]] = {}
+        layers: List[Dict[str, Any]] = []
+        ledger_ops: List[UpdateOne] = []
+
+        cursor = db.stock_ledger.find(
+            {"item_id": iid},
+            {"_id": 0, "id": 1, "item_id": 1, "warehouse_id": 1, "transaction_date": 1, "transaction_type": 1,
+             "reference_type": 1, "reference_id": 1, "batch_no": 1, "in_qty": 1, "out_qty": 1, "unit_cost": 1}
+        ).sort([("transaction_date", 1), ("id", 1)]).batch_size(_WRITE_BATCH)
+
+        async for row in cursor:
+            wh = open_layers.setdefault(row["warehouse_id"], {"fifo": deque(), "lifo": []})
+            if row.get("in_qty"):
+                unit_cost = row.get("unit_cost")
+                if not unit_cost and row.get("transaction_type") == TRANSFER_IN:
+                    issued = transfer_costs.get((row.get("reference_type"), row.get("reference_id")))
+                    if issued and issued[1]:
+                        unit_cost = issued[0] / issued[1]
+                if not unit_cost:
+                    unit_cost = await _standard_cost(db, iid, standard_costs)
+                layer = _new_layer(row, unit_cost)
+                layers.append(layer)
+                wh["fifo"].append(layer)
+                wh["lifo"].append(layer)
+                continue
+            if not row.get("out_qty"):
+                continue
+
+            costs = {}
+            for method in METHODS:
+                stack, field = wh[method], f"{method}_remaining"
+                remaining, cost = row["out_qty"], 0.0
+                while remaining > EPSILON and stack:
+                    layer = stack[0] if method == "fifo" else stack[-1]
+                    take = min(remaining, layer[field])
+                    layer[field] -= take
+                    cost += take * layer["unit_cost"]
+                    remaining -= take
+                    if layer[field] <= EPSILON:
+                        layer[field] = 0
+                        layer[f"{method}_open"] = False
+                        stack.popleft() if method == "fifo" else stack.pop()
+                costs[f"{method}_cost"] = round(cost, 4)
+            if row.get("transaction_type") == TRANSFER_OUT:
+                transfer_costs[(row.get("reference_type"), row.get("reference_id"))] = (costs["fifo_cost"], row["out_qty"])
+            ledger_ops.append(UpdateOne({"id": row["id"]}, {"$set": costs}))
+            stats["issues"] += 1
+            if len(ledger_ops) >= _WRITE_BATCH:
+                await db.stock_ledger.bulk_write(ledger_ops, ordered=False)
+                ledger_ops = []
+
+        await db.cost_layers.delete_many({"item_id": iid})
+        for start in range(0, len(layers), _WRITE_BATCH):
+            await db.cost_layers.insert_many(layers[start:start + _WRITE_BATCH])
+        if ledger_ops:
+            await db.stock_ledger.bulk_write(ledger_ops, ordered=False)
+        stats["items"] += 1
+        stats["layers"] += len(layers)
+
+    return stats
+
+
+def valuation_pipeline(method: str, warehouse_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Per-item valuation over cost_layers.
+
+    fifo / lifo read only layers still open for that method. weighted_avg
+    values the open quantity at the average cost of everything received.
+    """
+    match: Dict[str, Any] = {"warehouse_id": warehouse_id} if warehouse_id else {}
+    if method in METHODS:
+        remaining = f"${method}_remaining"
+        stages = [
+            {"$match": {**match, f"{method}_open": True}},
+            {"$group": {
+                "_id": "$item_id",
+                "quantity": {"$sum": remaining},
+                "total_value": {"$sum": {"$multiply": [remaining, "$unit_cost"]}},
+                "batch_count": {"$sum": 1},
+            }},
+            {"$addFields": {"avg_cost": {"$cond": [
+                {"$gt": ["$quantity", 0]}, {"$divide": ["$total_value", "$quantity"]}, 0
+            ]}}},
+        ]
+    else:
+        stages = [
+            {"$match": match},
+            {"$group": {
+                "_id": "$item_id",
+                "quantity": {"$sum": "$fifo_remaining"},
+                "received_qty": {"$sum": "$qty"},
+                "received_value": {"$sum": {"$multiply": ["$qty", "$unit_cost"]}},
+                "batch_count": {"$sum": {"$cond": ["$fifo_open", 1, 0]}},
+            }},
+            {"$match": {"quantity": {"$gt": EPSILON}}},
+            {"$addFields": {"avg_cost": {"$cond": [
+                {"$gt": ["$received_qty", 0]}, {"$divide": ["$received_value", "$received_qty"]}, 0
+            ]}}},
+            {"$addFields": {"total_value": {"$multiply": ["$quantity", "$avg_cost"]}}},
+        ]
+
+    return stages + [
+        {"$lookup": {"from": "items", "localField": "_id", "foreignField": "id", "as": "item"}},
+        {"$project": {
+            "_id": 0,
+            "item_id": "$_id",
+            "item_code": {"$arrayElemAt": ["$item.item_code", 0]},
+            "item_name": {"$arrayElemAt": ["$item.item_name", 0]},
+            "quantity": 1,
+            "avg_cost": {"$round": ["$avg_cost", 2]},
+            "total_value": {"$round": ["$total_value", 2]},
+            "batch_count": 1,
+        }},
+        {"$sort": {"total_value": -1, "item_id": 1}},
+    ]
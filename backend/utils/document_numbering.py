@@ -10,12 +10,31 @@ Supports:
 - Financial year based sequences
 - Custom prefixes per document type
 - Auto-increment sequences
+- Block (hi/lo) allocation for high-volume, non-statutory series
+
+Sequence allocation per series (numbering_series.allocation):
+- 'strict' (default): one atomic $inc per document. Gap-free, ordered.
+  Always used for STATUTORY_DOC_TYPES (GST invoices, notes, vouchers
+  including journal and purchase invoices).
+- 'block': each worker reserves block_size numbers with one $inc and hands
+  them out from memory. Numbers stay unique, but a restarted worker leaves
+  the rest of its block unused and workers interleave out of order.
+
+generate_document_numbers() reserves a contiguous gap-free run for callers
+that create many documents at once (payroll runs, imports), in any mode.
+
+Series configs are cached per worker for SERIES_CACHE_TTL_SECONDS;
+update_series_config() invalidates this worker's entry immediately.
 """
 
+import asyncio
+import os
 from datetime import datetime, timezone
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 import re
 
+from cachetools import TTLCache
+
 
 def get_financial_year(date: datetime = None) -> str:
     """
@@ -103,30 +122,85 @@ DOCUMENT_PREFIXES = {
     'expense': 'EXP',
 }
 
+# Series that must stay gap-free and in order: GST invoices and notes, and the
+# books' vouchers (journal, purchase, payment and receipt)
+STATUTORY_DOC_TYPES = {
+    'invoice', 'sales_invoice', 'purchase_invoice', 'credit_note', 'debit_note', 'delivery_note',
+    'receipt', 'payment', 'journal',
+}
+
+DEFAULT_BLOCK_SIZE = int(os.environ.get('DOCUMENT_NUMBER_BLOCK_SIZE', 100))
+
+_series_cache: TTLCache = TTLCache(maxsize=256, ttl=float(os.environ.get('SERIES_CACHE_TTL_SECONDS', 60)))
+
+# counter_id -> [next, hi] of this worker's reserved block, guarded per counter
+_blocks: Dict[str, List[int]] = {}
+_block_locks: Dict[str, asyncio.Lock] = {}
+
+
+async def _reserve_sequence(db, counter_id: str, count: int) -> int:
+    """Atomically add `count` to a counter; returns the last number reserved"""
+    result = await db.document_counters.find_one_and_update(
+        {'_id': counter_id},
+        {'$inc': {'seq': count}},
+        upsert=True,
+        return_document=True
+    )
+    
+    return result.get('seq', count)
+
 
 async def get_next_sequence(
     db,
     doc_type: str,
     branch_code: str = 'HO',
-    fy_code: str = None
+    fy_code: str = None,
+    block_size: int = 1
 ) -> int:
     """
     Get next sequence number for a document type
-    Uses MongoDB findAndModify for atomic increment
+    Uses MongoDB findAndModify for atomic increment; with block_size > 1 the
+    number comes from this worker's preallocated block (hi/lo)
     """
     if fy_code is None:
         fy_code = get_financial_year()
     
     counter_id = f"{doc_type}_{branch_code}_{fy_code}"
     
-    result = await db.document_counters.find_one_and_update(
-        {'_id': counter_id},
-        {'$inc': {'seq': 1}},
-        upsert=True,
-        return_document=True
-    )
+    if block_size <= 1:
+        return await _reserve_sequence(db, counter_id, 1)
+    
+    lock = _block_locks.setdefault(counter_id, asyncio.Lock())
+    async with lock:
+        block = _blocks.get(counter_id)
+        if block is None or block[0] > block[1]:
+            hi = await _reserve_sequence(db, counter_id, block_size)
+            block = _blocks[counter_id] = [hi - block_size + 1, hi]
+        seq = block[0]
+        block[0] += 1
+    return seq
+
+
+async def reserve_sequences(
+    db,
+    doc_type: str,
+    count: int,
+    branch_code: str = 'HO',
+    fy_code: str = None
+) -> range:
+    """Reserve `count` consecutive, gap-free sequence numbers in one update"""
+    if fy_code is None:
+        fy_code = get_financial_year()
     
-    return result.get('seq', 1)
+    hi = await _reserve_sequence(db, f"{doc_type}_{branch_code}_{fy_code}", count)
+    return range(hi - count + 1, hi + 1)
+
+
+def series_block_size(doc_type: str, config: Dict) -> int:
+    """Numbers reserved per worker round trip for a series (1 = strict)"""
+    if config.get('allocation') != 'block' or doc_type.lower() in STATUTORY_DOC_TYPES:
+        return 1
+    return max(1, int(config.get('block_size') or DEFAULT_BLOCK_SIZE))
 
 
 async def generate_document_number(
@@ -149,21 +223,42 @@ async def generate_document_number(
     Returns:
         Document number string like 'INV/MH/2425/0001'
     """
-    # Get prefix
-    prefix = custom_prefix or DOCUMENT_PREFIXES.get(doc_type.lower(), doc_type.upper()[:3])
+    config = await get_series_config(db, doc_type)
+    prefix = custom_prefix or config['prefix']
     
     # Get FY code
     fy_code = get_financial_year(date)
     
     # Get next sequence
-    seq = await get_next_sequence(db, doc_type, branch_code, fy_code)
+    seq = await get_next_sequence(db, doc_type, branch_code, fy_code, series_block_size(doc_type, config))
     
     # Format sequence with padding
-    seq_str = str(seq).zfill(4)
+    seq_str = str(seq).zfill(config.get('seq_padding', 4))
     
     return f"{prefix}/{branch_code}/{fy_code}/{seq_str}"
 
 
+async def generate_document_numbers(
+    db,
+    doc_type: str,
+    count: int,
+    branch_code: str = 'HO',
+    custom_prefix: str = None,
+    date: datetime = None
+) -> List[str]:
+    """
+    Generate `count` consecutive document numbers with one counter update
+    (gap-free, so safe for statutory series too)
+    """
+    config = await get_series_config(db, doc_type)
+    prefix = custom_prefix or config['prefix']
+    fy_code = get_financial_year(date)
+    padding = config.get('seq_padding', 4)
+    
+    seqs = await reserve_sequences(db, doc_type, count, branch_code, fy_code)
+    return [f"{prefix}/{branch_code}/{fy_code}/{str(seq).zfill(padding)}" for seq in seqs]
+
+
 async def generate_simple_number(
     db,
     doc_type: str,
@@ -227,32 +322,46 @@ async def get_series_config(db, doc_type: str) -> Dict:
     Get document numbering series configuration
     Allows admin to customize prefix, format, etc.
     """
+    cached = _series_cache.get(doc_type)
+    if cached is not None:
+        return dict(cached)
+    
     config = await db.numbering_series.find_one(
         {'doc_type': doc_type},
         {'_id': 0}
     )
     
-    if not config:
-        return {
-            'doc_type': doc_type,
-            'prefix': DOCUMENT_PREFIXES.get(doc_type.lower(), doc_type.upper()[:3]),
-            'format': 'PREFIX/BRANCH/FY/SEQ',
-            'seq_padding': 4,
-            'branch_wise': True,
-            'fy_wise': True
-        }
+    defaults = {
+        'doc_type': doc_type,
+        'prefix': DOCUMENT_PREFIXES.get(doc_type.lower(), doc_type.upper()[:3]),
+        'format': 'PREFIX/BRANCH/FY/SEQ',
+        'seq_padding': 4,
+        'branch_wise': True,
+        'fy_wise': True,
+        'allocation': 'strict',
+        'block_size': DEFAULT_BLOCK_SIZE
+    }
+    config = {**defaults, **(config or {})}
     
-    return config
+    _series_cache[doc_type] = config
+    return dict(config)
 
 
 async def update_series_config(db, doc_type: str, config: Dict) -> Dict:
     """
     Update document numbering series configuration
+    
+    Raises:
+        ValueError: block allocation requested for a statutory series
     """
+    if config.get('allocation') == 'block' and doc_type.lower() in STATUTORY_DOC_TYPES:
+        raise ValueError(f"{doc_type} is a statutory series and must use strict allocation")
+    
     await db.numbering_series.update_one(
         {'doc_type': doc_type},
         {'$set': config},
         upsert=True
     )
     
+    _series_cache.pop(doc_type, None)
     return await get_series_config(db, doc_type)
@@ -0,0 +1,103 @@
+"""
+Fast JSON Responses
+orjson-based response rendering and a validation-free path for trusted list rows
+
+FastJSONResponse is the app's default response class. It renders with orjson
+(falling back to the stdlib encoder when orjson is not installed) and produces
+the same compact UTF-8 JSON as Starlette's JSONResponse.
+
+List endpoints that read their rows straight from Mongo can skip constructing
+one Pydantic model per document (and FastAPI re-validating it against
+response_model) with trusted_list_response():
+
+    rows, next_cursor = await fetch_page(db.leads, query, 'created_at', -1,
+                                         cursor, limit, projection=model_projection(Lead))
+    set_next_cursor(response, next_cursor)
+    return trusted_list_response(Lead, rows, response)
+
+The projection limits documents to the model's fields and missing optional
+fields are filled from the model defaults, so the body keeps the same keys as
+the validated response. Only use it for models with JSON-native fields whose
+documents are written by this API.
+"""
+
+import copy
+import json
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes; unknown types fall back to str()"""
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=_ORJSON_OPTIONS)
+    return json.dumps(content, default=str, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def _model_defaults(model: Type[BaseModel]):
+    defaults = {}
+    for name, field in model.model_fields.items():
+        if not field.is_required():
+            defaults[name] = field.get_default(call_default_factory=True)
+    return tuple(model.model_fields), defaults
+
+
+def model_projection(model: Type[BaseModel]) -> Dict[str, int]:
+    """Mongo projection returning only the fields declared on model"""
+    fields, _ = _model_defaults(model)
+    return {"_id": 0, **{name: 1 for name in fields}}
+
+
+def trusted_rows(model: Type[BaseModel], docs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Shape documents like model.model_dump() without validating them"""
+    fields, defaults = _model_defaults(model)
+    rows = []
+    for doc in docs:
+        row = {}
+        for name in fields:
+            if name in doc:
+                row[name] = doc[name]
+            elif name in defaults:
+                value = defaults[name]
+                row[name] = copy.copy(value) if isinstance(value, (list, dict)) else value
+        rows.append(row)
+    return rows
+
+
+def trusted_list_response(model: Type[BaseModel], docs: Iterable[Dict[str, Any]],
+                          response: Optional[Response] = None) -> FastJSONResponse:
+    """
+    Return Mongo rows directly, bypassing per-row model construction and
+    response_model validation. Headers set on the injected Response
+    (e.g. X-Next-Cursor) are carried over.
+    """
+    return raw_response(trusted_rows(model, docs), response)
+
+
+def raw_response(content: Any, response: Optional[Response] = None) -> FastJSONResponse:
+    """Return content without response_model validation, keeping headers set on response"""
+    out = FastJSONResponse(content)
+    if response is not None:
+        for key, value in response.headers.items():
+            if key != "content-length":
+                out.headers[key] = value
+    return out
@@ -0,0 +1,291 @@
+"""
+Geo Lookups
+India pincode and country -> states resolution, local first
+
+Lookup order for a pincode:
+
+    1. per-worker LRU (TTL)                      _memory
+    2. pincode_directory  (bundled dataset)      load_pincode_directory()
+    3. geo_cache          (earlier remote hits)  TTL index on expires_at
+    4. public API over one shared, pooled httpx client
+
+Remote answers, including "no such pincode", are written to geo_cache so a
+pincode costs at most one remote call per GEO_CACHE_TTL_DAYS across all
+workers and restarts. The public APIs are slow and sometimes down; remote
+calls use a short timeout and a failure is not cached.
+
+The pincode directory is the India Post "All India Pincode Directory" CSV
+(data.gov.in), imported with load_pincode_directory() or the admin upload
+endpoint. Without it every lookup falls through to the cache and the API.
+
+Batch resolves (resolve_pincodes) are local-only unless asked otherwise, and
+then make at most MAX_REMOTE_PER_CALL remote calls; the remaining pincodes
+come back as pending for the caller to resolve in a later call.
+"""
+
+import asyncio
+import csv
+import io
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from cachetools import TTLCache
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+INDIA_STATES_UT = [
+    "Andhra Pradesh", "Arunachal Pradesh", "Assam", "Bihar", "Chhattisgarh", "Goa",
+    "Gujarat", "Haryana", "Himachal Pradesh", "Jharkhand", "Karnataka", "Kerala",
+    "Madhya Pradesh", "Maharashtra", "Manipur", "Meghalaya", "Mizoram", "Nagaland",
+    "Odisha", "Punjab", "Rajasthan", "Sikkim", "Tamil Nadu", "Telangana", "Tripura",
+    "Uttar Pradesh", "Uttarakhand", "West Bengal",
+    "Andaman and Nicobar Islands", "Chandigarh", "Dadra and Nagar Haveli and Daman and Diu",
+    "Delhi", "Jammu and Kashmir", "Ladakh", "Lakshadweep", "Puducherry"
+]
+_INDIA_NAMES = {"india", "bharat", "in"}
+
+PINCODE_API_BASE = "https://api.postalpincode.in/pincode/"
+COUNTRIESNOW_STATES_API = "https://countriesnow.space/api/v0.1/countries/states"
+
+CACHE_TTL = timedelta(days=int(os.environ.get('GEO_CACHE_TTL_DAYS', 30)))
+NEGATIVE_CACHE_TTL = timedelta(days=1)
+REMOTE_TIMEOUT = float(os.environ.get('GEO_REMOTE_TIMEOUT_SECONDS', 4))
+# Concurrent remote calls per batch resolve
+REMOTE_CONCURRENCY = 8
+MAX_BATCH = 5000
+# Remote calls one batch resolve may make; the rest are returned as pending
+MAX_REMOTE_PER_CALL = int(os.environ.get('GEO_MAX_REMOTE_PER_CALL', 200))
+
+_memory: TTLCache = TTLCache(maxsize=20000, ttl=3600)
+_MISSING = {"missing": True}
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def http_client() -> httpx.AsyncClient:
+    """Shared client for the public geo APIs (connection pooling, short timeouts)"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(REMOTE_TIMEOUT, connect=2.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            headers={"User-Agent": "adhesive-erp"},
+            follow_redirects=True,
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def is_pincode(pincode: Any) -> bool:
+    return isinstance(pincode, str) and len(pincode) == 6 and pincode.isdigit() and pincode[0] != "0"
+
+
+# ==================== PERSISTENT CACHE ====================
+
+async def _cache_get_many(db, keys: List[str]) -> Dict[str, Any]:
+    now = datetime.now(timezone.utc)
+    rows = await db.geo_cache.find({"_id": {"$in": keys}, "expires_at": {"$gt": now}}).to_list(None)
+    return {row["_id"]: row["value"] for row in rows}
+
+
+async def _cache_put(db, key: str, value: Any, ttl: timedelta) -> None:
+    now = datetime.now(timezone.utc)
+    await db.geo_cache.update_one(
+        {"_id": key},
+        {"$set": {"value": value, "cached_at": now, "expires_at": now + ttl}},
+        upsert=True
+    )
+
+
+# ==================== PINCODES ====================
+
+def _from_api(data: Any) -> Optional[Dict[str, Any]]:
+    if not isinstance(data, list) or not data:
+        return None
+    entry = data[0]
+    if entry.get("Status") != "Success":
+        return None
+    offices = entry.get("PostOffice") or []
+    if not offices:
+        return None
+    po = offices[0]
+    return {
+        "country": "India",
+        "state": po.get("State"),
+        "district": po.get("District"),
+        "city": po.get("Block") or po.get("Region") or po.get("Taluk")
+    }
+
+
+async def _fetch_pincode(db, pincode: str) -> Optional[Dict[str, Any]]:
+    """Ask the public API; returns None and caches nothing when the API fails"""
+    try:
+        resp = await http_client().get(f"{PINCODE_API_BASE}{pincode}")
+        if resp.status_code != 200:
+            return None
+        details = _from_api(resp.json())
+    except (httpx.HTTPError, ValueError) as e:
+        logger.info(f"Pincode API lookup for {pincode} failed: {e}")
+        return None
+    if details:
+        await _cache_put(db, f"pincode:{pincode}", details, CACHE_TTL)
+    else:
+        await _cache_put(db, f"pincode:{pincode}", _MISSING, NEGATIVE_CACHE_TTL)
+        _memory[pincode] = _MISSING
+    return details
+
+
+async def resolve_pincodes(db, pincodes: Iterable[str], remote: bool = False
+                           ) -> Tuple[Dict[str, Optional[Dict[str, Any]]], List[str]]:
+    """
+    Resolve many pincodes at once: one query against the directory, one
+    against the cache, then (with remote=True) the API for at most
+    MAX_REMOTE_PER_CALL of what is left, so one call stays within seconds.
+
+    Returns:
+        (pincode -> {country, state, district, city, source} or None,
+         pincodes not looked up remotely in this call; resolve them again later)
+    """
+    wanted = list(dict.fromkeys(p.strip() for p in pincodes if isinstance(p, str)))
+    results: Dict[str, Optional[Dict[str, Any]]] = {}
+    pending = []
+    for pincode in wanted:
+        if not is_pincode(pincode):
+            results[pincode] = None
+            continue
+        cached = _memory.get(pincode)
+        if cached is None:
+            pending.append(pincode)
+        else:
+            results[pincode] = None if cached is _MISSING or cached.get("missing") else cached
+
+    if pending:
+        async for row in db.pincode_directory.find({"pincode": {"$in": pending}}, {"_id": 0}):
+            details = {"country": "India", "state": row.get("state"), "district": row.get("district"),
+                       "city": row.get("city"), "source": "directory"}
+            _memory[row["pincode"]] = results[row["pincode"]] = details
+        pending = [p for p in pending if p not in results]
+
+    if pending:
+        cached = await _cache_get_many(db, [f"pincode:{p}" for p in pending])
+        for pincode in pending:
+            value = cached.get(f"pincode:{pincode}")
+            if value is None:
+                continue
+            if value.get("missing"):
+                _memory[pincode] = _MISSING
+                results[pincode] = None
+            else:
+                _memory[pincode] = results[pincode] = {**value, "source": "cache"}
+        pending = [p for p in pending if p not in results]
+
+    if pending and remote:
+        semaphore = asyncio.Semaphore(REMOTE_CONCURRENCY)
+
+        async def fetch(pincode):
+            async with semaphore:
+                details = await _fetch_pincode(db, pincode)
+            if details:
+                _memory[pincode] = results[pincode] = {**details, "source": "api"}
+
+        await asyncio.gather(*(fetch(p) for p in pending[:MAX_REMOTE_PER_CALL]))
+        pending = pending[MAX_REMOTE_PER_CALL:]
+
+    return {pincode: results.get(pincode) for pincode in wanted}, pending
+
+
+async def lookup_india_pincode(db, pincode: str) -> Optional[Dict[str, Any]]:
+    """Return {city, district, state, country} for India PIN (6 digits)"""
+    if not is_pincode(pincode):
+        return None
+    details = (await resolve_pincodes(db, [pincode]))[pincode]
+    if details is None:
+        return None
+    return {k: v for k, v in details.items() if k != "source"}
+
+
+def _column(row: Dict[str, str], *names: str) -> Optional[str]:
+    for name in names:
+        value = (row.get(name) or "").strip()
+        if value and value.upper() != "NA":
+            return value
+    return None
+
+
+def _parse_directory(stream: io.TextIOBase) -> Dict[str, Any]:
+    reader = csv.DictReader(stream)
+    pincodes: Dict[str, Dict[str, Any]] = {}
+    rows = 0
+    for raw in reader:
+        rows += 1
+        row = {(k or "").strip().lower(): v for k, v in raw.items()}
+        pincode = (row.get("pincode") or "").strip()
+        if not is_pincode(pincode) or pincode in pincodes:
+            continue
+        state = _column(row, "statename", "state")
+        district = _column(row, "district", "districtname")
+        pincodes[pincode] = {
+            "pincode": pincode,
+            "state": state.title() if state and state.isupper() else state,
+            "district": district.title() if district and district.isupper() else district,
+            "city": _column(row, "taluk", "divisionname", "officename") or district,
+        }
+    return {"rows": rows, "pincodes": pincodes}
+
+
+async def load_pincode_directory(db, stream: io.TextIOBase) -> Dict[str, int]:
+    """
+    Import the All India Pincode Directory CSV (one row per post office).
+
+    Columns used (case-insensitive): pincode, statename/state,
+    district/districtname, taluk/divisionname/officename for the city.
+    The first post office seen for a pincode wins.
+    """
+    parsed = await asyncio.to_thread(_parse_directory, stream)
+    ops = [UpdateOne({"pincode": p}, {"$set": doc}, upsert=True) for p, doc in parsed["pincodes"].items()]
+    for start in range(0, len(ops), 1000):
+        await db.pincode_directory.bulk_write(ops[start:start + 1000], ordered=False)
+    _memory.clear()
+    return {"rows": parsed["rows"], "pincodes": len(ops)}
+
+
+# ==================== COUNTRY STATES ====================
+
+async def lookup_states_for_country(db, country_name: str) -> List[str]:
+    """States/provinces of a country; India is answered locally, others cached after one API call"""
+    if not country_name:
+        return []
+    if country_name.strip().lower() in _INDIA_NAMES:
+        return INDIA_STATES_UT
+
+    key = f"states:{country_name.strip().lower()}"
+    cached = _memory.get(key)
+    if cached is None:
+        cached = (await _cache_get_many(db, [key])).get(key)
+    if cached is not None:
+        _memory[key] = cached
+        return cached
+
+    try:
+        resp = await http_client().post(COUNTRIESNOW_STATES_API, json={"country": country_name})
+        if resp.status_code != 200:
+            return []
+        data = resp.json()
+    except (httpx.HTTPError, ValueError) as e:
+        logger.info(f"States API lookup for {country_name} failed: {e}")
+        return []
+
+    states = [s["name"] for s in (data.get("data", {}).get("states") or []) if s.get("name")]
+    await _cache_put(db, key, states, CACHE_TTL if states else NEGATIVE_CACHE_TTL)
+    _memory[key] = states
+    return states
@@ -0,0 +1,169 @@
+"""
+MongoDB Index Registry
+Central, declarative list of the indexes each collection needs
+
+Route modules declare the indexes backing their hot queries at import time,
+in one block near the top of the module, after `router = APIRouter()`:
+
+    register_index("invoices", [("invoice_type", 1), ("invoice_date", -1)])
+    register_index("stock_balance", [("item_id", 1), ("warehouse_id", 1)], unique=True)
+
+Declaring an index only registers it; nothing touches the database until
+startup.
+
+The FastAPI startup hook in server.py calls ensure_indexes() to create
+(or verify) every registered index, and index_report() compares the
+registry with what actually exists using $indexStats.
+"""
+
+import logging
+from typing import Dict, List, Tuple, Any
+
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+IndexKeys = List[Tuple[str, Any]]
+
+# collection name -> list of {"keys": [...], "options": {...}}
+INDEX_REGISTRY: Dict[str, List[Dict[str, Any]]] = {}
+
+
+def index_name(keys: IndexKeys) -> str:
+    """Default MongoDB index name for a key spec, e.g. 'item_id_1_warehouse_id_1'"""
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+def _normalize_keys(keys) -> IndexKeys:
+    """Normalize directions so server-reported keys (1.0) compare equal to 1"""
+    return [
+        (field, int(direction) if isinstance(direction, float) else direction)
+        for field, direction in keys
+    ]
+
+
+def register_index(collection: str, keys: IndexKeys, **options) -> None:
+    """
+    Declare an index for a collection.
+
+    Args:
+        collection: Collection name (e.g. 'invoices')
+        keys: List of (field, direction) tuples, direction 1 / -1 / 'text'
+        **options: Passed to IndexModel (unique, sparse, name,
+                   partialFilterExpression, expireAfterSeconds...)
+    """
+    keys = _normalize_keys(keys)
+    options.setdefault("name", index_name(keys))
+
+    specs = INDEX_REGISTRY.setdefault(collection, [])
+    for spec in specs:
+        if spec["keys"] == keys:
+            # Same key pattern registered twice: last declaration wins
+            spec["options"].update(options)
+            return
+    specs.append({"keys": keys, "options": options})
+
+
+def get_registered_indexes(collection: str = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Return the registry (optionally for a single collection)"""
+    if collection:
+        return {collection: INDEX_REGISTRY.get(collection, [])}
+    return INDEX_REGISTRY
+
+
+async def ensure_indexes(db) -> Dict[str, Any]:
+    """
+    Create every registered index. Existing identical indexes are a no-op on
+    the server, so this is safe to run on every worker start.
+
+    A failing index (e.g. a unique index over duplicate legacy data) is logged
+    and reported but never blocks the remaining indexes or app startup.
+    """
+    created = 0
+    failed = []
+
+    for collection, specs in INDEX_REGISTRY.items():
+        models = [IndexModel(spec["keys"], **spec["options"]) for spec in specs]
+        try:
+            await db[collection].create_indexes(models)
+            created += len(models)
+            continue
+        except PyMongoError:
+            pass
+
+        # Batch failed - retry one by one to isolate the offending index
+        for spec in specs:
+            try:
+                await db[collection].create_index(spec["keys"], **spec["options"])
+                created += 1
+            except PyMongoError as e:
+                failed.append({
+                    "collection": collection,
+                    "index": spec["options"]["name"],
+                    "error": str(e)
+                })
+                logger.warning(f"Index {collection}.{spec['options']['name']} not created: {e}")
+
+    logger.info(f"Index registry applied: {created} ok, {len(failed)} failed")
+    return {"ensured": created, "failed": failed}
+
+
+async def index_report(db) -> Dict[str, Any]:
+    """
+    Compare registered indexes with the server state.
+
+    Returns per collection:
+        missing      - registered but not present
+        unused       - present but zero accesses since server start ($indexStats)
+        unregistered - present but not declared in the registry
+    """
+    report = {}
+
+    for collection, specs in sorted(INDEX_REGISTRY.items()):
+        existing = await db[collection].index_information()
+        existing_keys = {
+            name: _normalize_keys(info["key"])
+            for name, info in existing.items()
+        }
+        registered_keys = [spec["keys"] for spec in specs]
+
+        missing = [
+            spec["options"]["name"] for spec in specs
+            if spec["keys"] not in existing_keys.values()
+        ]
+        unregistered = [
+            name for name, keys in existing_keys.items()
+            if name != "_id_" and keys not in registered_keys
+        ]
+
+        usage = {}
+        try:
+            stats = await db[collection].aggregate([{"$indexStats": {}}]).to_list(None)
+            for s in stats:
+                usage[s["name"]] = {
+                    "ops": s.get("accesses", {}).get("ops", 0),
+                    "since": str(s.get("accesses", {}).get("since", ""))
+                }
+        except OperationFailure as e:
+            logger.debug(f"$indexStats unavailable for {collection}: {e}")
+
+        unused = [
+            name for name, u in usage.items()
+            if name != "_id_" and u["ops"] == 0
+        ]
+
+        report[collection] = {
+            "registered": len(specs),
+            "existing": len(existing_keys),
+            "missing": missing,
+            "unused": sorted(unused),
+            "unregistered": sorted(unregistered),
+            "usage": usage
+        }
+
+    return {
+        "collections": report,
+        "total_missing": sum(len(r["missing"]) for r in report.values()),
+        "total_unused": sum(len(r["unused"]) for r in report.values())
+    }
@@ -0,0 +1,227 @@
+"""
+Request & MongoDB Metrics
+Per-route latency histograms and Mongo command counts in Prometheus text format
+
+Two pieces work together:
+- MongoCommandListener (pymongo CommandListener) is registered on the
+  AsyncIOMotorClient and counts every command sent to the server.
+- MetricsMiddleware (ASGI) times each request, resolves the FastAPI route
+  template (/api/crm/leads/{lead_id}, never the raw path, to keep label
+  cardinality bounded) and records how many Mongo commands it issued.
+
+Motor runs pymongo on executor threads with a copy of the caller's context,
+so the listener attributes commands to the originating request through the
+_request_stats context variable.
+
+Metrics are per worker process; scrape each worker or aggregate upstream.
+"""
+
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple, List
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COMMAND_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestStats:
+    """Mutable per-request accumulator shared with Motor executor threads"""
+    __slots__ = ("mongo_commands", "mongo_seconds", "scope")
+
+    def __init__(self, scope: dict):
+        self.mongo_commands = 0
+        self.mongo_seconds = 0.0
+        self.scope = scope
+
+    @property
+    def route(self) -> str:
+        """Route template once FastAPI has matched the request"""
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics)"""
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        running = 0
+        out = []
+        for bound, n in zip(self.bounds, self.counts):
+            running += n
+            out.append((_fmt(bound), running))
+        out.append(("+Inf", self.count))
+        return out
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.commands_per_request: Dict[Tuple[str, str], Histogram] = {}
+        self.requests_total: Dict[Tuple[str, str, str], int] = {}
+        self.mongo_commands_total: Dict[str, int] = {}
+        self.mongo_failures_total: Dict[str, int] = {}
+        self.mongo_seconds_total: Dict[str, float] = {}
+
+    # ---- HTTP ----
+    def observe_request(self, method: str, route: str, status: int, seconds: float, mongo_commands: int) -> None:
+        key = (method, route)
+        with self._lock:
+            hist = self.latency.get(key)
+            if hist is None:
+                hist = self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.commands_per_request[key] = Histogram(COMMAND_COUNT_BUCKETS)
+            hist.observe(seconds)
+            self.commands_per_request[key].observe(mongo_commands)
+            status_key = (method, route, str(status))
+            self.requests_total[status_key] = self.requests_total.get(status_key, 0) + 1
+
+    # ---- Mongo ----
+    def observe_command(self, command: str, seconds: float, failed: bool = False) -> None:
+        with self._lock:
+            self.mongo_commands_total[command] = self.mongo_commands_total.get(command, 0) + 1
+            self.mongo_seconds_total[command] = self.mongo_seconds_total.get(command, 0.0) + seconds
+            if failed:
+                self.mongo_failures_total[command] = self.mongo_failures_total.get(command, 0) + 1
+
+    def reset(self) -> None:
+        with self._lock:
+            for series in (self.latency, self.commands_per_request, self.requests_total,
+                           self.mongo_commands_total, self.mongo_failures_total, self.mongo_seconds_total):
+                series.clear()
+
+    # ---- Exposition ----
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            lines.append("# HELP http_request_duration_seconds Request latency by route template")
+            lines.append("# TYPE http_request_duration_seconds histogram")
+            for (method, route), hist in sorted(self.latency.items()):
+                _render_histogram(lines, "http_request_duration_seconds", {"method": method, "route": route}, hist)
+
+            lines.append("# HELP http_requests_total Requests by route template and status code")
+            lines.append("# TYPE http_requests_total counter")
+            for (method, route, status), n in sorted(self.requests_total.items()):
+                lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {n}")
+
+            lines.append("# HELP http_request_mongo_commands Mongo commands issued per request")
+            lines.append("# TYPE http_request_mongo_commands histogram")
+            for (method, route), hist in sorted(self.commands_per_request.items()):
+                _render_histogram(lines, "http_request_mongo_commands", {"method": method, "route": route}, hist)
+
+            lines.append("# HELP mongo_commands_total Mongo commands by command name")
+            lines.append("# TYPE mongo_commands_total counter")
+            for command, n in sorted(self.mongo_commands_total.items()):
+                lines.append(f"mongo_commands_total{_labels(command=command)} {n}")
+
+            lines.append("# HELP mongo_command_failures_total Failed Mongo commands by command name")
+            lines.append("# TYPE mongo_command_failures_total counter")
+            for command, n in sorted(self.mongo_failures_total.items()):
+                lines.append(f"mongo_command_failures_total{_labels(command=command)} {n}")
+
+            lines.append("# HELP mongo_command_seconds_total Time spent in Mongo commands by command name")
+            lines.append("# TYPE mongo_command_seconds_total counter")
+            for command, s in sorted(self.mongo_seconds_total.items()):
+                lines.append(f"mongo_command_seconds_total{_labels(command=command)} {s:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+def _fmt(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _render_histogram(lines: List[str], name: str, labels: Dict[str, str], hist: Histogram) -> None:
+    for le, n in hist.cumulative():
+        lines.append(f"{name}_bucket{_labels(**labels, le=le)} {n}")
+    lines.append(f"{name}_sum{_labels(**labels)} {hist.sum:.6f}")
+    lines.append(f"{name}_count{_labels(**labels)} {hist.count}")
+
+
+metrics = MetricsRegistry()
+
+
+# ==================== MONGO COMMAND LISTENER ====================
+class MongoCommandListener(monitoring.CommandListener):
+    """Counts Mongo commands globally and against the current request"""
+
+    def started(self, event):
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.mongo_commands += 1
+
+    def succeeded(self, event):
+        seconds = event.duration_micros / 1_000_000
+        metrics.observe_command(event.command_name, seconds)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.mongo_seconds += seconds
+
+    def failed(self, event):
+        metrics.observe_command(event.command_name, event.duration_micros / 1_000_000, failed=True)
+
+
+# ==================== ASGI MIDDLEWARE ====================
+class MetricsMiddleware:
+    """Times HTTP requests and attributes Mongo commands to their route"""
+
+    def __init__(self, app, exclude_paths: Tuple[str, ...] = ()):
+        self.app = app
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _request_stats.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.observe_request(scope.get("method", "GET"), stats.route, status_code, elapsed, stats.mongo_commands)
+            _request_stats.reset(token)
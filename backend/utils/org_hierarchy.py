@@ -0,0 +1,165 @@
+"""
+Org Hierarchy
+Materialized reporting lines for row-level data visibility
+
+Each user document carries `ancestors`: the chain of managers above it,
+nearest first, derived from `reports_to`:
+
+    A (no manager)         ancestors: []
+    B reports_to A         ancestors: [A]
+    C reports_to B         ancestors: [B, A]
+
+Everyone below a manager, at any depth, is one indexed query:
+
+    db.users.find({"ancestors": manager_id})
+
+set_manager() keeps the paths right when a reporting line changes (the
+moved user and its whole subtree are rewritten in two updates),
+remove_from_hierarchy() hands a deleted user's reports to its manager, and
+rebuild_org_hierarchy() recomputes every path from reports_to (backfill).
+
+Compiled visibility filters are cached per worker in `visibility_cache`.
+Any hierarchy or access change clears it; other workers catch up within
+VISIBILITY_CACHE_TTL_SECONDS.
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+from cachetools import TTLCache
+from pymongo import UpdateOne
+
+# (user_id, module) -> compiled Mongo filter
+visibility_cache: TTLCache = TTLCache(
+    maxsize=int(os.environ.get('VISIBILITY_CACHE_SIZE', 4096)),
+    ttl=float(os.environ.get('VISIBILITY_CACHE_TTL_SECONDS', 60)),
+)
+
+
+def invalidate_visibility() -> None:
+    """Drop every compiled filter; a reporting line change affects all managers above it"""
+    visibility_cache.clear()
+
+
+async def ancestors_of(db, manager_id: Optional[str]) -> List[str]:
+    """Ancestor path for a user reporting to `manager_id`"""
+    if not manager_id:
+        return []
+    manager = await db.users.find_one({"id": manager_id}, {"_id": 0, "ancestors": 1})
+    if manager is None:
+        raise ValueError(f"Manager {manager_id} not found")
+    return [manager_id] + (manager.get("ancestors") or [])
+
+
+async def set_manager(db, user_id: str, manager_id: Optional[str]) -> bool:
+    """
+    Point `user_id` at a new manager and rewrite the paths of its subtree.
+
+    Returns False if the user does not exist.
+
+    Raises:
+        ValueError: unknown manager, or the change would create a cycle
+    """
+    manager_id = manager_id or None
+    ancestors = await ancestors_of(db, manager_id)
+    if user_id in ancestors or manager_id == user_id:
+        raise ValueError("A user cannot report to themselves or to someone in their own team")
+
+    result = await db.users.update_one(
+        {"id": user_id},
+        {"$set": {"reports_to": manager_id, "ancestors": ancestors}}
+    )
+    if result.matched_count == 0:
+        return False
+
+    # Descendants keep their path down to user_id and take its new path above
+    await db.users.update_many(
+        {"ancestors": user_id},
+        [{"$set": {"ancestors": {"$concatArrays": [
+            {"$slice": ["$ancestors", {"$add": [{"$indexOfArray": ["$ancestors", user_id]}, 1]}]},
+            ancestors,
+        ]}}}]
+    )
+    invalidate_visibility()
+    return True
+
+
+async def remove_from_hierarchy(db, user_id: str, manager_id: Optional[str] = None) -> None:
+    """
+    After deleting a user, its direct reports report to the user's manager
+    (`manager_id`, read before the delete) and the whole subtree drops the
+    user from its paths.
+    """
+    await db.users.update_many({"reports_to": user_id}, {"$set": {"reports_to": manager_id or None}})
+    await db.users.update_many({"ancestors": user_id}, {"$pull": {"ancestors": user_id}})
+    invalidate_visibility()
+
+
+def _cut_cycles(manager_of: Dict[str, Optional[str]]) -> List[str]:
+    """Break every reporting cycle by removing one user's manager; returns those users"""
+    cut: List[str] = []
+    done: set = set()
+    for start in manager_of:
+        trail: set = set()
+        current = start
+        while current in manager_of and current not in done:
+            if current in trail:
+                manager_of[current] = None
+                cut.append(current)
+                break
+            trail.add(current)
+            current = manager_of[current]
+        done |= trail
+    return cut
+
+
+async def rebuild_org_hierarchy(db) -> Dict[str, int]:
+    """
+    Recompute every ancestor path from reports_to.
+
+    Each reporting cycle is cut at one of its users, whose reports_to is
+    cleared; that user heads the former cycle.
+    """
+    users = await db.users.find({}, {"_id": 0, "id": 1, "reports_to": 1, "ancestors": 1}).to_list(None)
+    manager_of = {u["id"]: u.get("reports_to") for u in users if u.get("id")}
+    cut = _cut_cycles(manager_of)
+
+    paths: Dict[str, List[str]] = {}
+    for user_id in manager_of:
+        below: List[str] = []
+        current = user_id
+        while current in manager_of and current not in paths:
+            below.append(current)
+            current = manager_of[current]
+        above = [current] + paths[current] if current in paths else []
+        for member in reversed(below):
+            paths[member] = above
+            above = [member] + above
+
+    ops = [
+        UpdateOne({"id": user_id}, {"$set": {"reports_to": None}})
+        for user_id in cut
+    ] + [
+        UpdateOne({"id": u["id"]}, {"$set": {"ancestors": paths[u["id"]]}})
+        for u in users if u.get("id") and u.get("ancestors") != paths[u["id"]]
+    ]
+    if ops:
+        await db.users.bulk_write(ops, ordered=False)
+    invalidate_visibility()
+    return {"users": len(paths), "updated": len(ops) - len(cut), "cycles": len(cut)}
+
+
+async def subordinate_ids(db, user_id: str) -> List[str]:
+    """Everyone reporting to `user_id` at any depth"""
+    return [u["id"] for u in await db.users.find({"ancestors": user_id}, {"_id": 0, "id": 1}).to_list(None)]
+
+
+def owned_by(user_ids: List[str], unassigned_by_creator: bool = True) -> Dict[str, Any]:
+    """Filter for records assigned to (or, when unassigned, created by) any of `user_ids`"""
+    match: Any = user_ids[0] if len(user_ids) == 1 else {"$in": user_ids}
+    if not unassigned_by_creator:
+        return {"$or": [{"created_by": match}, {"assigned_to": match}]}
+    return {"$or": [
+        {"assigned_to": match},
+        {"assigned_to": {"$in": [None, ""]}, "created_by": match}
+    ]}
@@ -0,0 +1,97 @@
+"""
+Keyset (Cursor) Pagination
+Stable paging for list endpoints using an indexed sort key plus `id` as tiebreaker
+
+Instead of skip/offset or a silent to_list(N) cap, each page continues strictly
+after the last row of the previous one:
+
+    sort:   [(sort_field, direction), ("id", direction)]
+    filter: sort_field beyond last value, or equal value and id beyond last id
+
+List endpoints keep returning a plain JSON array. The opaque cursor for the
+next page is sent in the X-Next-Cursor response header (absent on the last
+page), so existing clients keep working and new ones can follow the cursor:
+
+    GET /api/crm/leads?limit=200
+    GET /api/crm/leads?limit=200&cursor=<X-Next-Cursor>
+"""
+
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Response
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(doc: Dict[str, Any], sort_field: str) -> str:
+    payload = json.dumps([doc.get(sort_field), doc.get("id")], default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return value, last_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(query: Dict[str, Any], sort_field: str, direction: int, cursor: Optional[str]) -> Dict[str, Any]:
+    """AND the 'after cursor' condition onto an existing query"""
+    if not cursor:
+        return query
+
+    value, last_id = decode_cursor(cursor)
+    op = "$lt" if direction < 0 else "$gt"
+    tie = {sort_field: value, "id": {op: last_id}}
+
+    if value is None:
+        # Nulls sort first ascending / last descending; comparison operators never match null
+        after = {"$or": [{sort_field: {"$ne": None}}, tie]} if direction > 0 else tie
+    else:
+        after = {"$or": [{sort_field: {op: value}}, tie]}
+
+    return {"$and": [query, after]} if query else after
+
+
+async def fetch_page(
+    collection,
+    query: Dict[str, Any],
+    sort_field: str,
+    direction: int = -1,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    projection: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Fetch one page of documents.
+
+    Returns:
+        (documents, next_cursor) - next_cursor is None on the last page
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    # id is needed to build the cursor even when the caller projects it out
+    projection = dict(projection if projection is not None else {"_id": 0})
+    if any(v for k, v in projection.items() if k != "_id"):
+        projection.setdefault(sort_field, 1)
+        projection.setdefault("id", 1)
+
+    docs = await collection.find(
+        keyset_filter(query, sort_field, direction, cursor), projection
+    ).sort([(sort_field, direction), ("id", direction)]).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort_field)
+    return docs, next_cursor
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
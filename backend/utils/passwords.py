@@ -0,0 +1,55 @@
+"""
+Password Hashing
+bcrypt hashing/verification run off the event loop
+
+bcrypt is deliberately slow (~100-300 ms per call) and releases the GIL while
+hashing. Calling it directly inside an async handler blocks every other request
+on the worker, so both operations are dispatched to a small dedicated thread
+pool. The pool size caps how many hashes run at once; a login storm queues
+in the pool instead of stalling the event loop.
+
+Configure with PASSWORD_HASH_CONCURRENCY (default 4).
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', 4))
+
+_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_CONCURRENCY,
+    thread_name_prefix="bcrypt"
+)
+
+
+def _hash(password: str) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+def _verify(password: str, hashed: str) -> bool:
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    except ValueError:
+        # Malformed/legacy hash in the user document
+        return False
+
+
+async def hash_password(password: str) -> str:
+    """Return the bcrypt hash of password (computed in the bcrypt pool)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    """Check password against a stored bcrypt hash (computed in the bcrypt pool)"""
+    if not hashed:
+        return False
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _verify, password, hashed)
+
+
+def shutdown_password_pool() -> None:
+    _executor.shutdown(wait=False)
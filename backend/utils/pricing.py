@@ -0,0 +1,227 @@
+"""
+Pricing Engine
+Line, discount and GST totals for quotations, orders and invoices in exact paise
+
+Money is held as integer paise, quantities in thousandths and percentages in
+hundredths of a percent, and each line is priced in plain integer arithmetic:
+
+    subtotal  = qty x unit price
+    discount  = subtotal x line discount %
+    header    = (subtotal - discount) x header discount %
+    taxable   = subtotal - discount - header
+    CGST/SGST = taxable x rate / 2 each      intra-state supply
+    IGST      = taxable x rate               inter-state supply
+
+Every amount is rounded half-up to the paisa once, on its line, and a
+document's totals are exact sums of its lines, so lines always add up to the
+header and CGST always equals SGST.
+
+Whether a supply is inter-state is decided by the place of supply: the
+party's state (from its GSTIN, else its address) against the company's
+state (settings document {"type": "company"}), see supply_terms(). With
+either state unknown the supply is treated as intra-state, as before.
+"""
+
+import re
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, Dict, List, Optional, Sequence
+
+from cachetools import TTLCache
+
+DEFAULT_TAX_PERCENT = 18
+
+_QTY_SCALE = 1000     # quantities in thousandths
+_MONEY_SCALE = 100    # paise
+_RATE_SCALE = 10000   # hundredths of a percent
+
+GST_STATE_CODES = {
+    "01": "Jammu and Kashmir", "02": "Himachal Pradesh", "03": "Punjab", "04": "Chandigarh",
+    "05": "Uttarakhand", "06": "Haryana", "07": "Delhi", "08": "Rajasthan", "09": "Uttar Pradesh",
+    "10": "Bihar", "11": "Sikkim", "12": "Arunachal Pradesh", "13": "Nagaland", "14": "Manipur",
+    "15": "Mizoram", "16": "Tripura", "17": "Meghalaya", "18": "Assam", "19": "West Bengal",
+    "20": "Jharkhand", "21": "Odisha", "22": "Chhattisgarh", "23": "Madhya Pradesh", "24": "Gujarat",
+    "26": "Dadra and Nagar Haveli and Daman and Diu", "27": "Maharashtra", "29": "Karnataka",
+    "30": "Goa", "31": "Lakshadweep", "32": "Kerala", "33": "Tamil Nadu", "34": "Puducherry",
+    "35": "Andaman and Nicobar Islands", "36": "Telangana", "37": "Andhra Pradesh", "38": "Ladakh",
+}
+_STATE_ALIASES = {
+    "daman and diu": "26", "dadra and nagar haveli": "26", "orissa": "21", "pondicherry": "34",
+    "andaman and nicobar": "35", "andhra pradesh new": "37", "new delhi": "07", "nct of delhi": "07",
+}
+
+_company_state: TTLCache = TTLCache(maxsize=1, ttl=300)
+
+
+# ==================== PLACE OF SUPPLY ====================
+
+def _normalize_state(name: str) -> str:
+    return " ".join(re.findall(r"[a-z]+", name.lower().replace("&", " and ")))
+
+
+_STATE_BY_NAME = {**{_normalize_state(n): c for c, n in GST_STATE_CODES.items()}, **_STATE_ALIASES}
+
+
+def state_code(gstin: Optional[str] = None, state: Optional[str] = None) -> Optional[str]:
+    """GST state code from a GSTIN (first two digits) or a state name/code"""
+    if gstin and len(gstin.strip()) == 15 and gstin.strip()[:2] in GST_STATE_CODES:
+        return gstin.strip()[:2]
+    if state:
+        state = state.strip()
+        if state.isdigit():
+            return state.zfill(2) if state.zfill(2) in GST_STATE_CODES else None
+        return _STATE_BY_NAME.get(_normalize_state(state))
+    return None
+
+
+def party_state_code(party: Optional[Dict[str, Any]]) -> Optional[str]:
+    """State of a customer/supplier: registered GSTIN state, else billing state"""
+    if not party:
+        return None
+    return state_code(party.get("gstin"), party.get("billing_state") or party.get("state"))
+
+
+async def company_state_code(db) -> Optional[str]:
+    if "code" not in _company_state:
+        company = await db.settings.find_one({"type": "company"}, {"_id": 0, "gstin": 1, "state": 1})
+        _company_state["code"] = party_state_code(company)
+    return _company_state["code"]
+
+
+def supply_for(company_code: Optional[str], party: Optional[Dict[str, Any]], inward: bool = False) -> Dict[str, Any]:
+    party_code = party_state_code(party)
+    place = company_code if inward else party_code
+    return {
+        "is_interstate": bool(company_code and party_code and company_code != party_code),
+        "place_of_supply": f"{place}-{GST_STATE_CODES[place]}" if place else None,
+    }
+
+
+async def supply_terms(db, party: Optional[Dict[str, Any]], inward: bool = False) -> Dict[str, Any]:
+    """
+    {"is_interstate", "place_of_supply"} for a document with this party:
+    a customer (outward supply, delivered to the party) or, with inward=True,
+    a supplier (delivered to the company)
+    """
+    return supply_for(await company_state_code(db), party, inward)
+
+
+# ==================== ARITHMETIC ====================
+
+def _scaled(value: Any, scale: int, default: Any = 0) -> int:
+    """Decimal value as an integer number of 1/scale units, rounded half-up"""
+    if value is None or value == "":
+        value = default
+    if type(value) is int:
+        return value * scale
+    if type(value) is float:
+        # Values already at the unit's precision skip Decimal; float error is far below a unit
+        units = value * scale
+        if abs(units - round(units)) < 1e-6:
+            return int(round(units))
+    try:
+        return int((Decimal(str(value)) * scale).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except InvalidOperation:
+        raise ValueError(f"Not a number: {value!r}")
+
+
+def _div_round(n: int, d: int) -> int:
+    """n / d rounded half away from zero, in integers"""
+    q = (2 * abs(n) + d) // (2 * d)
+    return -q if n < 0 else q
+
+
+def _rupees(paise: int) -> float:
+    return paise / _MONEY_SCALE
+
+
+def to_paise(value: Any) -> int:
+    return _scaled(value, _MONEY_SCALE)
+
+
+def apply_percent(price: Any, percent: Any) -> float:
+    """`price` changed by `percent` (5 = +5%, -3 = -3%), rounded to the paisa"""
+    changed = Decimal(str(price or 0)) * (100 + Decimal(str(percent))) / 100
+    return _scaled(changed, _MONEY_SCALE) / _MONEY_SCALE
+
+
+# ==================== ENGINE ====================
+
+def price_documents(documents: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Price many documents in one call.
+
+    Args:
+        documents: [{"items": [...], "header_discount_percent": 0, "is_interstate": False}]
+                   Items carry quantity, unit_price, discount_percent and
+                   tax_percent (default 18%)
+
+    Returns:
+        Per document: items (each with line_subtotal, line_discount,
+        line_taxable, line_cgst, line_sgst, line_igst, line_tax, line_total)
+        and subtotal, discount_amount, header_discount_amount,
+        taxable_amount, cgst/sgst/igst_amount, total_tax, grand_total
+
+    Raises:
+        ValueError: a quantity, price or percentage is not a number
+    """
+    return [_price(doc) for doc in documents]
+
+
+_TOTALS = (
+    ("subtotal", "line_subtotal"), ("discount_amount", "line_discount"),
+    ("header_discount_amount", "line_header_discount"), ("taxable_amount", "line_taxable"),
+    ("cgst_amount", "line_cgst"), ("sgst_amount", "line_sgst"), ("igst_amount", "line_igst"),
+    ("total_tax", "line_tax"), ("grand_total", "line_total"),
+)
+
+
+def _price(doc: Dict[str, Any]) -> Dict[str, Any]:
+    header = _scaled(doc.get("header_discount_percent"), 100)
+    interstate = bool(doc.get("is_interstate"))
+    totals = dict.fromkeys((name for name, _ in _TOTALS), 0)
+    items = []
+
+    for item in doc.get("items") or []:
+        qty = _scaled(item.get("quantity"), _QTY_SCALE)
+        price = _scaled(item.get("unit_price"), _MONEY_SCALE)
+        discount = _scaled(item.get("discount_percent"), 100)
+        rate = _scaled(item.get("tax_percent"), 100, DEFAULT_TAX_PERCENT)
+
+        subtotal = _div_round(qty * price, _QTY_SCALE)
+        line_discount = _div_round(subtotal * discount, _RATE_SCALE)
+        header_discount = _div_round((subtotal - line_discount) * header, _RATE_SCALE)
+        taxable = subtotal - line_discount - header_discount
+        if interstate:
+            cgst = sgst = 0
+            igst = _div_round(taxable * rate, _RATE_SCALE)
+        else:
+            cgst = sgst = _div_round(taxable * rate, 2 * _RATE_SCALE)
+            igst = 0
+        tax = cgst + sgst + igst
+
+        line = {
+            "line_subtotal": subtotal, "line_discount": line_discount, "line_header_discount": header_discount,
+            "line_taxable": taxable, "line_cgst": cgst, "line_sgst": sgst, "line_igst": igst,
+            "line_tax": tax, "line_total": taxable + tax,
+        }
+        for name, field in _TOTALS:
+            totals[name] += line[field]
+        del line["line_header_discount"]
+        items.append({**item, **{field: _rupees(paise) for field, paise in line.items()}})
+
+    return {
+        "items": items,
+        **{name: _rupees(paise) for name, paise in totals.items()},
+        "header_discount_percent": header / 100,
+        "is_interstate": interstate,
+    }
+
+
+def price_document(
+    items: List[Dict[str, Any]],
+    header_discount_percent: float = 0,
+    is_interstate: bool = False
+) -> Dict[str, Any]:
+    return price_documents([{
+        "items": items, "header_discount_percent": header_discount_percent, "is_interstate": is_interstate
+    }])[0]
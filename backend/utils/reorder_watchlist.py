@@ -0,0 +1,188 @@
+"""
+Reorder Watchlist
+Items at or below their reorder level, maintained as stock moves
+
+reorder_watchlist holds one document per item that has ever crossed its
+reorder level. Stock posting (utils/stock_posting.py) and item edits call
+sync_reorder_watchlist() for just the items they touched, so readers never
+scan items for `current_stock <= reorder_level`:
+
+    status "open"     current_stock <= reorder_level (reorder_level > 0, item active)
+    status "cleared"  back above the level; kept so the change feed reports it
+
+Every state change (opened, cleared, warning <-> critical) takes the next
+value of a global sequence. Consumers poll the change feed with the last
+sequence they saw and receive only items that changed since.
+
+A sequence is reserved before its entry is written, so concurrent syncs can
+land out of order. Each reservation stays listed in the counter's `pending`
+array until its write finishes, and changes_since() never returns anything at
+or above the lowest pending sequence; a poller therefore cannot step past a
+change that is still being written. A reservation left by a worker that died
+mid-write is ignored after PENDING_TIMEOUT.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+SEQUENCE_ID = "reorder_watchlist_changes"
+
+# A reservation not released within this long belongs to a dead writer
+PENDING_TIMEOUT = timedelta(seconds=60)
+
+_ITEM_FIELDS = {"_id": 0, "id": 1, "item_code": 1, "item_name": 1, "is_active": 1, "current_stock": 1,
+                "reorder_level": 1, "safety_stock": 1, "min_order_qty": 1}
+
+
+def _evaluate(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Watchlist fields for an item below its reorder level, else None"""
+    current_stock = item.get("current_stock", 0) or 0
+    reorder_level = item.get("reorder_level", 0) or 0
+    safety_stock = item.get("safety_stock", 0) or 0
+    if not item.get("is_active", True) or reorder_level <= 0 or current_stock > reorder_level:
+        return None
+    return {
+        "item_code": item.get("item_code"),
+        "item_name": item.get("item_name"),
+        "current_stock": current_stock,
+        "reorder_level": reorder_level,
+        "safety_stock": safety_stock,
+        "suggested_qty": max(item.get("min_order_qty", 1) or 1, (reorder_level + safety_stock) - current_stock),
+        "urgency": "critical" if current_stock <= safety_stock else "warning",
+    }
+
+
+async def _reserve_sequence(db, count: int, token: str) -> int:
+    """Reserve `count` sequence numbers and list them as pending under `token`; returns the first"""
+    counter = await db.document_counters.find_one_and_update(
+        {"_id": SEQUENCE_ID},
+        [
+            {"$set": {"seq": {"$add": [{"$ifNull": ["$seq", 0]}, count]}}},
+            {"$set": {"pending": {"$concatArrays": [{"$ifNull": ["$pending", []]}, [{
+                "token": token,
+                "first": {"$subtract": ["$seq", count - 1]},
+                "reserved_at": datetime.now(timezone.utc).isoformat(),
+            }]]}}},
+        ],
+        upsert=True, return_document=True
+    )
+    return counter["seq"] - count + 1
+
+
+async def _release_sequence(db, token: str) -> None:
+    """The reservation's entries are written (or never will be); drop it and any abandoned ones"""
+    expired = (datetime.now(timezone.utc) - PENDING_TIMEOUT).isoformat()
+    await db.document_counters.update_one(
+        {"_id": SEQUENCE_ID},
+        {"$pull": {"pending": {"$or": [{"token": token}, {"reserved_at": {"$lt": expired}}]}}}
+    )
+
+
+async def changes_since(db, since: int, limit: int) -> List[Dict[str, Any]]:
+    """Committed changes after `since`, in sequence order, stopping below any in-flight reservation"""
+    counter = await db.document_counters.find_one({"_id": SEQUENCE_ID}, {"_id": 0, "seq": 1, "pending": 1}) or {}
+    expired = (datetime.now(timezone.utc) - PENDING_TIMEOUT).isoformat()
+    in_flight = [p["first"] for p in counter.get("pending") or [] if p["reserved_at"] >= expired]
+    # Sequences reserved after the counter was read are not in `pending` yet: stop at its seq too
+    window: Dict[str, Any] = {"$gt": since, "$lte": counter.get("seq", 0)}
+    if in_flight:
+        window["$lte"] = min(min(in_flight) - 1, window["$lte"])
+    return await db.reorder_watchlist.find({"seq": window}, {"_id": 0}).sort("seq", 1).limit(limit).to_list(limit)
+
+
+# Re-evaluation rounds when stock moved while a sync was writing
+_MAX_SYNC_ROUNDS = 3
+
+
+async def sync_reorder_watchlist(db, item_ids: Iterable[str]) -> int:
+    """
+    Bring the watchlist in line with the given items' current stock.
+    Returns the number of state changes written.
+
+    Two concurrent syncs of one item can finish in either order, so after
+    writing, items whose stock changed since they were read are evaluated
+    again; whichever sync writes last therefore writes the latest stock.
+    """
+    item_ids = list(set(item_ids))
+    changed = 0
+    for _ in range(_MAX_SYNC_ROUNDS):
+        if not item_ids:
+            break
+        count, seen = await _sync_once(db, item_ids)
+        changed += count
+        now_stock = await db.items.find(
+            {"id": {"$in": item_ids}}, {"_id": 0, "id": 1, "current_stock": 1}
+        ).to_list(None)
+        item_ids = [i["id"] for i in now_stock if (i.get("current_stock", 0) or 0) != seen.get(i["id"])]
+    return changed
+
+
+async def _sync_once(db, item_ids: List[str]):
+    """One evaluation pass; returns (state changes, current_stock read per item)"""
+    items = await db.items.find({"id": {"$in": item_ids}}, _ITEM_FIELDS).to_list(None)
+    seen = {item["id"]: item.get("current_stock", 0) or 0 for item in items}
+    existing = {
+        w["item_id"]: w for w in await db.reorder_watchlist.find(
+            {"item_id": {"$in": item_ids}}, {"_id": 0, "item_id": 1, "status": 1, "urgency": 1}
+        ).to_list(None)
+    }
+
+    now = datetime.now(timezone.utc).isoformat()
+    changes: List[Dict[str, Any]] = []  # state changes; each takes a new sequence
+    refreshes: List[UpdateOne] = []
+    for item in items:
+        current = existing.get(item["id"])
+        entry = _evaluate(item)
+        if entry:
+            if current and current["status"] == "open" and current.get("urgency") == entry["urgency"]:
+                # Still below the level: refresh the figures without a feed entry
+                refreshes.append(UpdateOne({"item_id": item["id"]}, {"$set": {**entry, "updated_at": now}}))
+            else:
+                opened = {} if current and current["status"] == "open" else {"opened_at": now}
+                changes.append({"item_id": item["id"], "status": "open", **entry, **opened})
+        elif current and current["status"] == "open":
+            changes.append({"item_id": item["id"], "status": "cleared", "cleared_at": now,
+                            "current_stock": item.get("current_stock", 0) or 0,
+                            "reorder_level": item.get("reorder_level", 0) or 0})
+
+    if refreshes:
+        await db.reorder_watchlist.bulk_write(refreshes, ordered=False)
+    if changes:
+        token = str(uuid.uuid4())
+        seq = await _reserve_sequence(db, len(changes), token)
+        try:
+            await db.reorder_watchlist.bulk_write([
+                UpdateOne(
+                    {"item_id": change["item_id"]},
+                    {"$set": {**change, "seq": seq + offset, "updated_at": now},
+                     "$setOnInsert": {"id": str(uuid.uuid4())}},
+                    upsert=True
+                ) for offset, change in enumerate(changes)
+            ], ordered=False)
+        finally:
+            await _release_sequence(db, token)
+    return len(changes), seen
+
+
+async def rebuild_reorder_watchlist(db, batch_size: int = 1000) -> int:
+    """Re-evaluate every item (backfill, or after bulk imports that bypass stock posting)"""
+    changed, batch = 0, []
+    async for item in db.items.find({}, {"_id": 0, "id": 1}).batch_size(batch_size):
+        batch.append(item["id"])
+        if len(batch) >= batch_size:
+            changed += await sync_reorder_watchlist(db, batch)
+            batch = []
+    if batch:
+        changed += await sync_reorder_watchlist(db, batch)
+    return changed
+
+
+def open_entries(db, limit: Optional[int] = None):
+    """Open watchlist entries, critical first then largest shortfall"""
+    cursor = db.reorder_watchlist.find({"status": "open"}, {"_id": 0}).sort(
+        [("urgency", 1), ("suggested_qty", -1)]
+    )
+    return cursor.limit(limit) if limit else cursor
@@ -0,0 +1,299 @@
+"""
+CRM Search Index
+Prefix-token search over leads and accounts
+
+An unanchored, case-insensitive $regex over company names or GSTINs can
+never use an index. Instead every searchable record gets one entry in
+`search_index` holding the edge n-grams (prefixes, MIN_TOKEN..MAX_TOKEN
+characters) of its searchable words:
+
+    "Insta Tapes Pvt Ltd", Pune   ->  in ins inst insta  ta tap tape tapes ...  pu pun pune
+
+A query matches when every query word is one of the entry's tokens, which
+is a single multikey index lookup ({tokens, type}):
+
+    {"type": "accounts", "tokens": {"$all": ["tap", "pun"]}}
+
+Phone numbers are indexed as digits only (and by their last 10 digits, so
+"98765" finds "+91 98765 43210"). Entries also carry the owner fields the
+CRM data filters use (assigned_to, created_by, location), so visibility is
+applied to the index query itself.
+
+List endpoints get their `search=` filter from list_filter(). Matching is
+by word prefix ("tap" finds "Insta Tapes"), not by arbitrary substring.
+
+Writers call index_documents() (record in hand) or index_records() (by id)
+after creating or changing a record and remove_records() after deleting
+one; rebuild_search_index() backfills.
+"""
+
+import logging
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+MIN_TOKEN = 2
+MAX_TOKEN = 15
+
+# Matching index entries considered for ranking in one search
+MAX_CANDIDATES = 500
+# Largest id list a list endpoint filters on; beyond it search= falls back to a regex
+MAX_LIST_MATCHES = 5000
+
+_BATCH = 1000
+_WORD = re.compile(r"[a-z0-9]+")
+_DIGITS = re.compile(r"\D")
+
+# collection -> {field path: rank weight}; paths reach into lists (contacts.phone)
+SEARCH_FIELDS: Dict[str, Dict[str, int]] = {
+    # CRM accounts (customer_name, contacts, billing_city) and bulk-imported ones (account_name, phone, city)
+    "accounts": {
+        "customer_name": 8, "account_name": 8, "gstin": 6, "customer_code": 6, "contact_person": 3,
+        "contacts.name": 3, "phone": 4, "mobile": 4, "contacts.phone": 4, "contacts.mobile": 4,
+        "billing_city": 2, "city": 2,
+    },
+    "leads": {
+        "company_name": 8, "contact_person": 4, "phone": 4, "mobile": 4, "email": 3, "city": 2,
+    },
+}
+PHONE_FIELDS = {"phone", "mobile", "contacts.phone", "contacts.mobile"}
+
+# How an entry is shown in typeahead results
+_DISPLAY = {
+    "accounts": {"title": ("customer_name", "account_name"), "subtitle": ("gstin", "billing_city", "city")},
+    "leads": {"title": ("company_name",), "subtitle": ("contact_person", "city")},
+}
+_OWNER_FIELDS = ("assigned_to", "created_by", "location", "is_active")
+
+
+def _values(doc: Dict[str, Any], path: str) -> List[str]:
+    value: Any = doc
+    for part in path.split("."):
+        if isinstance(value, list):
+            value = [v.get(part) for v in value if isinstance(v, dict)]
+        elif isinstance(value, dict):
+            value = value.get(part)
+        else:
+            return []
+    values = value if isinstance(value, list) else [value]
+    return [str(v) for v in values if v not in (None, "")]
+
+
+def _words(text: str, phone: bool = False) -> List[str]:
+    if phone:
+        digits = _DIGITS.sub("", text)
+        return [d for d in dict.fromkeys((digits, digits[-10:])) if d]
+    return _WORD.findall(text.lower())
+
+
+def _prefixes(word: str) -> List[str]:
+    return [word[:n] for n in range(MIN_TOKEN, min(len(word), MAX_TOKEN) + 1)]
+
+
+def query_terms(q: str) -> List[str]:
+    """Normalized query words; digit groups typed with spaces or dashes are joined"""
+    terms: List[str] = []
+    for word in _WORD.findall(q.lower()):
+        if terms and word.isdigit() and terms[-1].isdigit():
+            terms[-1] += word
+        else:
+            terms.append(word)
+    return list(dict.fromkeys(t[:MAX_TOKEN] for t in terms if len(t) >= MIN_TOKEN))
+
+
+def build_entry(collection: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    tokens = set()
+    fields: Dict[str, List[str]] = {}
+    for path in SEARCH_FIELDS[collection]:
+        words = [w for value in _values(doc, path) for w in _words(value, path in PHONE_FIELDS)]
+        if words:
+            fields[path.replace(".", "_")] = words
+        for word in words:
+            tokens.update(_prefixes(word))
+
+    display = _DISPLAY[collection]
+    title = next((v[0] for f in display["title"] for v in [_values(doc, f)] if v), "")
+    subtitle = " · ".join(v[0] for f in display["subtitle"] for v in [_values(doc, f)] if v)
+    return {
+        "type": collection,
+        "doc_id": doc["id"],
+        "title": title,
+        "subtitle": subtitle,
+        "words": fields,
+        "tokens": sorted(tokens),
+        **{f: doc.get(f) for f in _OWNER_FIELDS},
+        "indexed_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def _projection(collection: str) -> Dict[str, int]:
+    projection = {"_id": 0, "id": 1, **{f: 1 for f in _OWNER_FIELDS}}
+    projection.update({path: 1 for path in SEARCH_FIELDS[collection]})
+    return projection
+
+
+async def index_documents(db, collection: str, docs: Iterable[Dict[str, Any]]) -> None:
+    """Write index entries for records the caller already holds in full"""
+    ops = [
+        UpdateOne({"type": collection, "doc_id": doc["id"]}, {"$set": build_entry(collection, doc)}, upsert=True)
+        for doc in docs
+    ]
+    if ops:
+        await db.search_index.bulk_write(ops, ordered=False)
+
+
+async def index_records(db, collection: str, ids: Iterable[str]) -> int:
+    """(Re)index the given records by id; ids that no longer exist are dropped from the index"""
+    ids = list(set(ids))
+    if not ids:
+        return 0
+    docs = await db[collection].find({"id": {"$in": ids}}, _projection(collection)).to_list(None)
+    await index_documents(db, collection, docs)
+    found = {doc["id"] for doc in docs}
+    await remove_records(db, collection, [i for i in ids if i not in found])
+    return len(docs)
+
+
+async def remove_records(db, collection: str, ids: Iterable[str]) -> None:
+    ids = list(ids)
+    if ids:
+        await db.search_index.delete_many({"type": collection, "doc_id": {"$in": ids}})
+
+
+async def rebuild_search_index(db, collections: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """Index every record of the given collections (default: all searchable collections)"""
+    stats = {}
+    for collection in collections or SEARCH_FIELDS:
+        started = datetime.now(timezone.utc).isoformat()
+        count, ops = 0, []
+        async for doc in db[collection].find({}, _projection(collection)).batch_size(_BATCH):
+            if not doc.get("id"):
+                continue
+            ops.append(UpdateOne({"type": collection, "doc_id": doc["id"]},
+                                 {"$set": build_entry(collection, doc)}, upsert=True))
+            if len(ops) >= _BATCH:
+                await db.search_index.bulk_write(ops, ordered=False)
+                count += len(ops)
+                ops = []
+        if ops:
+            await db.search_index.bulk_write(ops, ordered=False)
+            count += len(ops)
+        # Entries not touched by this pass belong to deleted records
+        removed = await db.search_index.delete_many({"type": collection, "indexed_at": {"$lt": started}})
+        stats[collection] = count
+        stats[f"{collection}_removed"] = removed.deleted_count
+    return stats
+
+
+def token_filter(terms: List[str]) -> Dict[str, Any]:
+    return {"tokens": terms[0]} if len(terms) == 1 else {"tokens": {"$all": terms}}
+
+
+def word_prefix_filter(collection: str, words: List[str]) -> Dict[str, Any]:
+    """
+    Unindexed equivalent of the token match: every word must start a word
+    in one of the searchable fields. Used when the index cannot answer.
+    """
+    return {"$and": [
+        {"$or": [
+            {path: {"$regex": f"(^|[^a-z0-9]){re.escape(word)}", "$options": "i"}}
+            for path in SEARCH_FIELDS[collection]
+        ]}
+        for word in words
+    ]}
+
+
+async def list_filter(db, collection: str, q: str, visibility: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Filter for a list endpoint's `search=` parameter.
+
+    Normally {"id": {"$in": [...]}} from the index, with the caller's
+    visibility filter applied to the index query. One-character words
+    (below MIN_TOKEN) and queries matching more than MAX_LIST_MATCHES
+    visible records fall back to word_prefix_filter() rather than
+    truncating the match list.
+    """
+    words = _WORD.findall(q.lower())
+    terms = query_terms(q)
+    if not terms or any(len(w) < MIN_TOKEN for w in words):
+        return word_prefix_filter(collection, words) if words else {"id": {"$in": []}}
+
+    query = {"type": collection, **token_filter(terms)}
+    if visibility:
+        query = {"$and": [query, visibility]}
+    entries = await db.search_index.find(query, {"_id": 0, "doc_id": 1}).limit(MAX_LIST_MATCHES + 1).to_list(None)
+    if len(entries) > MAX_LIST_MATCHES:
+        return word_prefix_filter(collection, terms)
+    return {"id": {"$in": [e["doc_id"] for e in entries]}}
+
+
+def _score(entry: Dict[str, Any], terms: List[str], phrase: str) -> int:
+    weights = SEARCH_FIELDS[entry["type"]]
+    score = 0
+    for term in terms:
+        best = 0
+        for path, weight in weights.items():
+            for word in entry.get("words", {}).get(path.replace(".", "_"), []):
+                if word == term:
+                    best = max(best, weight * 2)
+                elif word.startswith(term):
+                    best = max(best, weight)
+        score += best
+    title = (entry.get("title") or "").lower()
+    if title.startswith(phrase):
+        score += 20
+    if title == phrase:
+        score += 20
+    return score
+
+
+async def search(
+    db,
+    q: str,
+    filters: Dict[str, Dict[str, Any]],
+    limit: int = 10
+) -> List[Dict[str, Any]]:
+    """
+    Ranked typeahead results.
+
+    Args:
+        filters: collection -> visibility filter for that collection; only
+                 these collections are searched
+    """
+    terms = query_terms(q)
+    if not terms:
+        return []
+    phrase = " ".join(_WORD.findall(q.lower()))
+
+    candidates: List[Dict[str, Any]] = []
+    for collection, visibility in filters.items():
+        query = {"type": collection, **token_filter(terms)}
+        if visibility:
+            query = {"$and": [query, visibility]}
+        candidates += await db.search_index.find(
+            query, {"_id": 0, "type": 1, "doc_id": 1, "title": 1, "subtitle": 1, "words": 1, "is_active": 1}
+        ).limit(MAX_CANDIDATES).to_list(MAX_CANDIDATES)
+
+    for entry in candidates:
+        entry["score"] = _score(entry, terms, phrase) - (5 if entry.get("is_active") is False else 0)
+    candidates.sort(key=lambda e: (-e["score"], e.get("title") or ""))
+    return [
+        {"type": e["type"], "id": e["doc_id"], "title": e.get("title"), "subtitle": e.get("subtitle"),
+         "score": e["score"]}
+        for e in candidates[:limit]
+    ]
+
+
+async def backfill_search_index(db) -> None:
+    """Build the index on first start; runs in the background and only logs failures"""
+    try:
+        if await db.search_index.find_one({}, {"_id": 1}):
+            return
+        stats = await rebuild_search_index(db)
+        logger.info(f"Search index built: {stats}")
+    except Exception as e:
+        logger.warning(f"Search index backfill failed, run POST /api/crm/search/reindex: {e}")
@@ -0,0 +1,128 @@
+"""
+Serial Number Ranges
+Claim a contiguous block of serial numbers in one atomic counter update
+
+serial_number_configs holds one counter (current_number) per doc_type and
+warehouse. reserve_range() claims N numbers with a single $inc; the caller
+owns [start, end] outright and formats them locally, so a 50k-roll label run
+costs one counter round trip instead of 50k read-increment-write cycles (which
+could also hand the same number to two concurrent callers).
+
+    config, start, end = await reserve_range(db, "batch", warehouse_id, 500)
+    for serial in expand(config, start, end): ...
+"""
+
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+MAX_RANGE = 100_000
+
+# warehouse_id of a counter shared by every warehouse (e.g. item serials,
+# which must be unique per item, not per item and warehouse)
+ALL_WAREHOUSES = "*"
+
+# Format used when a doc_type/warehouse has no saved configuration
+DEFAULT_CONFIG = {
+    "separator": "/",
+    "include_fy": True,
+    "fy_format": "2425",
+    "number_length": 4,
+    "reset_on_fy": True,
+}
+
+
+def fy_code(config: Dict[str, Any], now: Optional[datetime] = None) -> str:
+    now = now or datetime.now()
+    fy_start_year = now.year if now.month >= 4 else now.year - 1
+    fy_end_year = fy_start_year + 1
+
+    if config.get("fy_format") == "2425":
+        return f"{str(fy_start_year)[-2:]}{str(fy_end_year)[-2:]}"
+    if config.get("fy_format") == "24-25":
+        return f"{str(fy_start_year)[-2:]}-{str(fy_end_year)[-2:]}"
+    return f"{fy_start_year}-{str(fy_end_year)[-2:]}"
+
+
+def format_serial(config: Dict[str, Any], number: int, fy: Optional[str] = None) -> str:
+    sep = config.get("separator", "/")
+    parts = []
+    if config.get("prefix"):
+        parts.append(config["prefix"])
+    if config.get("include_fy", True):
+        parts.append(fy or fy_code(config))
+    parts.append(str(number).zfill(config.get("number_length", 4)))
+    if config.get("suffix"):
+        parts.append(config["suffix"])
+    return sep.join(parts)
+
+
+def expand(config: Dict[str, Any], start: int, end: int) -> Iterator[str]:
+    """Format every number in [start, end]; the FY is fixed for the whole block"""
+    fy = fy_code(config)
+    for number in range(start, end + 1):
+        yield format_serial(config, number, fy)
+
+
+async def reserve_range(db, doc_type: str, warehouse_id: str, count: int = 1,
+                        prefix: Optional[str] = None) -> Tuple[Dict[str, Any], int, int]:
+    """
+    Atomically claim `count` consecutive numbers.
+
+    Creates the configuration on first use (prefix defaults to the first three
+    letters of doc_type). Returns (config, first_number, last_number).
+    """
+    if count < 1 or count > MAX_RANGE:
+        raise ValueError(f"count must be between 1 and {MAX_RANGE}")
+    config = await db.serial_number_configs.find_one_and_update(
+        {"doc_type": doc_type, "warehouse_id": warehouse_id},
+        {
+            "$inc": {"current_number": count},
+            "$setOnInsert": {
+                "id": str(uuid.uuid4()),
+                "prefix": prefix or doc_type[:3].upper(),
+                **DEFAULT_CONFIG,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+            },
+        },
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    end = config["current_number"]
+    return config, end - count + 1, end
+
+
+async def adopt_warehouse_counters(db, doc_type: str, prefix: Optional[str] = None) -> None:
+    """
+    Create the ALL_WAREHOUSES counter of doc_type, starting above any
+    per-warehouse counters it replaces so numbers already issued from them
+    are not issued again. No-op once the shared counter exists.
+    """
+    if await db.serial_number_configs.find_one({"doc_type": doc_type, "warehouse_id": ALL_WAREHOUSES}, {"_id": 1}):
+        return
+    legacy = await db.serial_number_configs.find(
+        {"doc_type": doc_type}, {"_id": 0, "current_number": 1}
+    ).sort("current_number", -1).limit(1).to_list(1)
+    if not legacy:
+        return
+    try:
+        await db.serial_number_configs.update_one(
+            {"doc_type": doc_type, "warehouse_id": ALL_WAREHOUSES},
+            {
+                "$max": {"current_number": legacy[0].get("current_number") or 0},
+                "$setOnInsert": {
+                    "id": str(uuid.uuid4()),
+                    "prefix": prefix or doc_type[:3].upper(),
+                    **DEFAULT_CONFIG,
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                },
+            },
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # A concurrent caller created it from the same counters
+        pass
@@ -0,0 +1,301 @@
+"""
+Slow MongoDB Operation Log
+Records find/aggregate/count commands slower than a threshold
+
+SlowOpListener (pymongo CommandListener) remembers each read command when it
+starts and, if it finishes over SLOW_OP_THRESHOLD_MS, queues a record with:
+- the originating FastAPI route template (via utils.metrics request context)
+- the collection, command name and filter/pipeline shape with values stripped
+- the duration
+
+A find/aggregate that returns a cursor is not finished until its last
+getMore: each getMore is matched to the originating command by cursor id and
+its time added to that query's, so a large scan read in many fast batches is
+recorded once, under its find/aggregate shape, with the total time and the
+number of batches. Cursors closed early (killCursors) are recorded as of then.
+
+A background task flushes queued records into the capped `_slow_ops`
+collection and, when SLOW_OP_EXPLAIN is enabled, attaches the queryPlanner
+winning plan from explain(). slow_op_report() ranks query shapes by total time.
+
+Configuration:
+    SLOW_OP_THRESHOLD_MS    default 100
+    SLOW_OP_EXPLAIN         default false
+    SLOW_OPS_CAP_MB         default 64 (capped collection size)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from pymongo import monitoring
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+from utils.metrics import current_request_stats
+
+logger = logging.getLogger(__name__)
+
+SLOW_OPS_COLLECTION = "_slow_ops"
+TRACKED_COMMANDS = {"find", "aggregate", "count", "distinct", "getMore", "killCursors"}
+CURSOR_COMMANDS = {"find", "aggregate"}
+
+# Command fields that are driver/session plumbing, not part of the query
+_DRIVER_FIELDS = {"lsid", "$db", "$clusterTime", "$readPreference", "txnNumber",
+                  "autocommit", "startTransaction", "readConcern", "signature"}
+
+
+def strip_values(value: Any) -> Any:
+    """
+    Reduce a filter/pipeline to its shape: keep field names and operators,
+    replace literal values with a type placeholder.
+
+        {"status": "paid", "total": {"$gte": 100}}
+        -> {"status": "?", "total": {"$gte": "?"}}
+    """
+    if isinstance(value, dict):
+        return {k: strip_values(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(v, dict) for v in value):
+            # $or / $and clauses and pipeline stages keep their structure
+            return [strip_values(v) for v in value]
+        return ["?"]
+    if isinstance(value, str) and value.startswith("$"):
+        return value  # field path ("$warehouse_id") is part of the shape
+    return "?"
+
+
+def command_shape(command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    """The parts of a read command that identify its access pattern"""
+    if command_name == "find":
+        shape = {"filter": strip_values(command.get("filter", {}))}
+        if command.get("sort"):
+            shape["sort"] = dict(command["sort"])
+        if command.get("projection"):
+            shape["projection"] = sorted(command["projection"].keys())
+        return shape
+    if command_name == "aggregate":
+        return {"pipeline": strip_values(command.get("pipeline", []))}
+    if command_name == "count":
+        return {"query": strip_values(command.get("query", {}))}
+    if command_name == "distinct":
+        return {"key": command.get("key"), "query": strip_values(command.get("query", {}))}
+    return {}
+
+
+def shape_hash(collection: str, command_name: str, shape: Dict[str, Any]) -> str:
+    canonical = json.dumps([collection, command_name, shape], sort_keys=True, default=str)
+    return hashlib.md5(canonical.encode()).hexdigest()
+
+
+class SlowOpListener(monitoring.CommandListener):
+    """Captures slow read commands; flushing happens on the event loop"""
+
+    def __init__(self, threshold_ms: float, buffer_size: int = 5000, max_open_cursors: int = 10000):
+        self.threshold_ms = threshold_ms
+        self._pending: Dict[tuple, Dict[str, Any]] = {}
+        # (server address, cursor id) -> originating command, with time so far
+        self._cursors: Dict[tuple, Dict[str, Any]] = {}
+        self.max_open_cursors = max_open_cursors
+        self._lock = threading.Lock()
+        self.queue: deque = deque(maxlen=buffer_size)
+        self.dropped = 0
+
+    def started(self, event):
+        if event.command_name not in TRACKED_COMMANDS:
+            return
+        if event.command_name == "killCursors":
+            self._kill(event)
+            return
+        if event.command_name == "getMore":
+            with self._lock:
+                self._pending[(event.connection_id, event.request_id)] = {"cursor_id": event.command["getMore"]}
+            return
+        collection = event.command.get(event.command_name)
+        if collection == SLOW_OPS_COLLECTION:
+            return
+        stats = current_request_stats()
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = {
+                "database": event.database_name,
+                "collection": collection,
+                "command_name": event.command_name,
+                "command": event.command,
+                "route": stats.route if stats else None,
+                "method": stats.scope.get("method") if stats else None,
+                "duration_ms": 0.0,
+                "batches": 0,
+            }
+
+    def _finish(self, event, failed: bool):
+        if event.command_name not in TRACKED_COMMANDS or event.command_name == "killCursors":
+            return
+        with self._lock:
+            started = self._pending.pop((event.connection_id, event.request_id), None)
+            if started is None:
+                return
+            if event.command_name == "getMore":
+                started = self._cursors.pop((event.connection_id, started["cursor_id"]), None)
+                if started is None:
+                    return  # cursor opened on an untracked collection
+            started["duration_ms"] += event.duration_micros / 1000
+            started["batches"] += 1
+            cursor_id = 0 if failed else ((getattr(event, "reply", None) or {}).get("cursor") or {}).get("id", 0)
+            if cursor_id and started["command_name"] in CURSOR_COMMANDS:
+                # More batches to come; the query is recorded after its last getMore
+                if len(self._cursors) >= self.max_open_cursors:
+                    self._cursors.pop(next(iter(self._cursors)))
+                self._cursors[(event.connection_id, cursor_id)] = started
+                return
+        self._record(started, failed)
+
+    def _kill(self, event):
+        with self._lock:
+            closed = [self._cursors.pop((event.connection_id, cursor_id), None)
+                      for cursor_id in event.command.get("cursors") or []]
+        for started in filter(None, closed):
+            self._record(started, failed=False)
+
+    def _record(self, started: Dict[str, Any], failed: bool):
+        if started["duration_ms"] < self.threshold_ms:
+            return
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        started["duration_ms"] = round(started["duration_ms"], 3)
+        started["failed"] = failed
+        started["recorded_at"] = datetime.now(timezone.utc).isoformat()
+        self.queue.append(started)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+
+class SlowOpRecorder:
+    """Owns the listener and the background flush task"""
+
+    def __init__(self):
+        self.threshold_ms = float(os.environ.get('SLOW_OP_THRESHOLD_MS', 100))
+        self.explain = os.environ.get('SLOW_OP_EXPLAIN', 'false').lower() in ('1', 'true', 'yes')
+        self.cap_bytes = int(float(os.environ.get('SLOW_OPS_CAP_MB', 64)) * 1024 * 1024)
+        self.flush_interval = 2.0
+        self.listener = SlowOpListener(self.threshold_ms)
+        self._task: Optional[asyncio.Task] = None
+        self._db = None
+
+    async def start(self, db) -> None:
+        self._db = db
+        try:
+            await db.create_collection(SLOW_OPS_COLLECTION, capped=True, size=self.cap_bytes)
+        except CollectionInvalid:
+            pass  # already exists
+        except PyMongoError as e:
+            logger.warning(f"Could not create capped {SLOW_OPS_COLLECTION}: {e}")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._db is not None:
+            await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Slow-op flush failed: {e}")
+
+    async def flush(self) -> int:
+        records = []
+        while self.listener.queue:
+            records.append(self._to_record(self.listener.queue.popleft()))
+        if not records:
+            return 0
+        if self.explain:
+            for record, raw in records:
+                record["explain"] = await self._explain(raw)
+        await self._db[SLOW_OPS_COLLECTION].insert_many([r for r, _ in records])
+        return len(records)
+
+    def _to_record(self, op: Dict[str, Any]):
+        shape = command_shape(op["command_name"], op["command"])
+        record = {
+            "recorded_at": op["recorded_at"],
+            "route": op["route"],
+            "method": op["method"],
+            "database": op["database"],
+            "collection": op["collection"],
+            "command": op["command_name"],
+            "shape": json.dumps(shape, sort_keys=True, default=str),
+            "shape_hash": shape_hash(op["collection"], op["command_name"], shape),
+            "duration_ms": op["duration_ms"],
+            "batches": op["batches"],
+            "failed": op["failed"],
+        }
+        return record, op
+
+    async def _explain(self, op: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        command = {k: v for k, v in op["command"].items() if k not in _DRIVER_FIELDS}
+        try:
+            result = await self._db.client[op["database"]].command(
+                {"explain": command, "verbosity": "queryPlanner"}
+            )
+        except PyMongoError as e:
+            return {"error": str(e)}
+        planner = result.get("queryPlanner") or {}
+        if not planner and result.get("stages"):
+            # aggregate explain wraps the planner in the first $cursor stage
+            planner = result["stages"][0].get("$cursor", {}).get("queryPlanner", {})
+        return {
+            "namespace": planner.get("namespace"),
+            "winning_plan": json.loads(json.dumps(planner.get("winningPlan", {}), default=str)),
+        }
+
+
+slow_op_recorder = SlowOpRecorder()
+
+
+async def slow_op_report(db, limit: int = 20, route: str = None, collection: str = None) -> List[Dict[str, Any]]:
+    """Rank recorded query shapes by total time spent"""
+    match: Dict[str, Any] = {}
+    if route:
+        match["route"] = route
+    if collection:
+        match["collection"] = collection
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": "$shape_hash",
+            "collection": {"$first": "$collection"},
+            "command": {"$first": "$command"},
+            "shape": {"$first": "$shape"},
+            "count": {"$sum": 1},
+            "total_ms": {"$sum": "$duration_ms"},
+            "avg_ms": {"$avg": "$duration_ms"},
+            "max_ms": {"$max": "$duration_ms"},
+            "batches": {"$sum": "$batches"},
+            "routes": {"$addToSet": "$route"},
+            "last_seen": {"$max": "$recorded_at"},
+            "explain": {"$last": "$explain"},
+        }},
+        {"$sort": {"total_ms": -1}},
+        {"$limit": limit},
+    ]
+    rows = await db[SLOW_OPS_COLLECTION].aggregate(pipeline).to_list(limit)
+    for row in rows:
+        row["shape_hash"] = row.pop("_id")
+        row["avg_ms"] = round(row["avg_ms"], 3)
+        row["total_ms"] = round(row["total_ms"], 3)
+    return rows
@@ -0,0 +1,58 @@
+"""
+Sparse Fieldsets
+Turn a `fields=` query parameter into a Mongo inclusion projection
+
+    GET /api/crm/accounts?fields=customer_name,gstin,billing_city,total_outstanding
+
+Requested names are checked against the entity's allowed fields (field
+registry + response model, see routes/field_registry.fields_projection) so a
+client can only narrow a response, never reach into arbitrary document paths.
+Dotted paths (`items.item_name`) are accepted when their top-level field is
+allowed. `id` is always included.
+
+Responses built from a sparse projection are returned as-is (not through the
+endpoint's response_model), since required model fields may be left out.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+
+MAX_FIELDS = 60
+ALWAYS_INCLUDED = ("id",)
+
+_FIELD_PATH = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Split a comma-separated fields parameter, dropping blanks and duplicates"""
+    if not fields:
+        return []
+    names = []
+    for name in fields.split(","):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def build_projection(requested: Iterable[str], allowed: Iterable[str], label: str) -> Dict[str, int]:
+    requested = list(requested)
+    if len(requested) > MAX_FIELDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_FIELDS} fields can be requested")
+
+    allowed = set(allowed)
+    invalid = [name for name in requested
+               if not _FIELD_PATH.match(name) or name.split(".", 1)[0] not in allowed]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s) for {label}: {', '.join(invalid)}")
+
+    projection = {"_id": 0}
+    for name in ALWAYS_INCLUDED:
+        projection[name] = 1
+    for name in requested:
+        # A parent path already covers its children and Mongo rejects both
+        if not any(name.startswith(other + ".") for other in requested):
+            projection[name] = 1
+    return projection
@@ -0,0 +1,448 @@
+"""
+Stock Posting Engine
+Applies one stock movement to stock_balance, stock_ledger and items atomically per document
+
+The balance is changed with a single conditional update instead of
+read-check-write, so concurrent issues can never drive a balance negative:
+
+    outward:  find_one_and_update({item, warehouse, quantity >= n}, {$inc: {quantity: -n}})
+              -> no match means insufficient stock, nothing was changed
+    inward:   find_one_and_update({item, warehouse}, {$inc: {quantity: +n}}, upsert=True)
+
+available_qty (quantity - reserved_qty) is changed in the same $inc. The
+post-movement quantity returned by that update becomes the ledger row's
+balance_qty, and items.current_stock is adjusted with $inc rather than
+re-aggregated across warehouses. A movement costs four round trips (item,
+balance, ledger, item total) however many warehouses hold the item.
+
+post_stock_movements() applies a batch (GRN lines, transfer legs, production
+output) with one item/warehouse prefetch, one bulk_write of per-balance
+deltas, one insert_many into the ledger and one bulk_write of item totals.
+On a replica set the batch runs in a transaction and is all-or-nothing; on a
+standalone server outward balances are guarded one key at a time and
+compensated if a later step fails.
+
+Once a movement is posted, its FIFO/LIFO cost layers (utils/cost_layers.py)
+and the reorder watchlist (utils/reorder_watchlist.py) are updated.
+"""
+
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from utils.cost_layers import apply_cost_layers
+from utils.reorder_watchlist import sync_reorder_watchlist
+
+logger = logging.getLogger(__name__)
+
+INWARD_TYPES = {"receipt", "transfer_in", "adjustment_in", "production_in"}
+
+_ITEM_FIELDS = {"_id": 0, "id": 1, "item_code": 1, "item_name": 1, "uom": 1}
+
+
+class StockPostingError(Exception):
+    status_code = 400
+
+
+class ItemNotFound(StockPostingError):
+    status_code = 404
+
+    def __init__(self, item_id: str):
+        self.item_id = item_id
+        super().__init__("Item not found")
+
+
+class WarehouseNotFound(StockPostingError):
+    status_code = 404
+
+    def __init__(self, warehouse_id: str):
+        self.warehouse_id = warehouse_id
+        super().__init__("Warehouse not found")
+
+
+class InsufficientStock(StockPostingError):
+    def __init__(self, item_id: str, warehouse_id: str, requested: float):
+        self.item_id = item_id
+        self.warehouse_id = warehouse_id
+        self.requested = requested
+        super().__init__("Insufficient stock")
+
+
+def is_inward(transaction_type: str) -> bool:
+    return transaction_type in INWARD_TYPES
+
+
+def _qty_inc(delta: float) -> Dict[str, float]:
+    """Movements leave reserved_qty alone, so available_qty moves with quantity"""
+    return {"quantity": delta, "available_qty": delta}
+
+
+async def post_stock_movement(
+    db,
+    item_id: str,
+    warehouse_id: str,
+    quantity: float,
+    transaction_type: str,
+    created_by: str,
+    reference_type: Optional[str] = None,
+    reference_id: Optional[str] = None,
+    batch_no: Optional[str] = None,
+    unit_cost: float = 0,
+    notes: Optional[str] = None,
+    item: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Post one movement and return its ledger row.
+
+    Raises:
+        ItemNotFound: item_id does not exist
+        InsufficientStock: outward movement larger than the warehouse balance
+    """
+    if item is None:
+        item = await db.items.find_one({"id": item_id}, _ITEM_FIELDS)
+        if not item:
+            raise ItemNotFound(item_id)
+
+    now = datetime.now(timezone.utc).isoformat()
+    inward = is_inward(transaction_type)
+    delta = quantity if inward else -quantity
+
+    balance = await _apply_balance_delta(db, item, warehouse_id, delta, unit_cost, now)
+    if balance is None:
+        raise InsufficientStock(item_id, warehouse_id, quantity)
+
+    ledger_doc = {
+        "id": str(uuid.uuid4()),
+        "item_id": item_id,
+        "warehouse_id": warehouse_id,
+        "transaction_date": now,
+        "transaction_type": transaction_type,
+        "reference_type": reference_type,
+        "reference_id": reference_id,
+        "in_qty": quantity if inward else 0,
+        "out_qty": 0 if inward else quantity,
+        "balance_qty": balance["quantity"],
+        "unit_cost": unit_cost,
+        "batch_no": batch_no,
+        "notes": notes,
+        "created_by": created_by
+    }
+    try:
+        await db.stock_ledger.insert_one(ledger_doc)
+    except Exception:
+        # Keep balance and ledger consistent: undo the delta we just applied
+        await db.stock_balance.update_one(
+            {"item_id": item_id, "warehouse_id": warehouse_id},
+            {"$inc": _qty_inc(-delta)}
+        )
+        raise
+
+    await db.items.update_one({"id": item_id}, {"$inc": {"current_stock": delta}})
+    ledger_doc.pop("_id", None)
+    await _after_posting(db, [ledger_doc])
+    return ledger_doc
+
+
+async def _after_posting(db, rows: List[Dict[str, Any]]) -> None:
+    """
+    Derived data for posted movements. The movements themselves are already
+    committed, so failures are logged and repaired by the rebuild endpoints.
+    """
+    try:
+        await apply_cost_layers(db, rows)
+    except Exception as e:
+        logger.error(f"Cost layer update failed for ledger rows {[r['id'] for r in rows]}: {e}")
+    try:
+        await sync_reorder_watchlist(db, (r["item_id"] for r in rows))
+    except Exception as e:
+        logger.error(f"Reorder watchlist update failed: {e}")
+
+
+async def _apply_balance_delta(db, item: Dict[str, Any], warehouse_id: str, delta: float,
+                               unit_cost: float, now: str) -> Optional[Dict[str, Any]]:
+    """Conditionally $inc the balance; returns the updated document or None if stock is short"""
+    key = {"item_id": item["id"], "warehouse_id": warehouse_id}
+
+    if delta < 0:
+        return await db.stock_balance.find_one_and_update(
+            {**key, "quantity": {"$gte": -delta}},
+            {"$inc": _qty_inc(delta), "$set": {"last_updated": now, "last_issue_date": now}},
+            projection={"_id": 0, "quantity": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    balance_id = str(uuid.uuid4())
+    update = {
+        "$inc": _qty_inc(delta),
+        "$set": {"last_updated": now, "last_receipt_date": now},
+        "$setOnInsert": {
+            "id": balance_id,
+            "item_code": item.get("item_code"),
+            "item_name": item.get("item_name"),
+            "reserved_qty": 0,
+            "uom": item.get("uom"),
+            "avg_cost": unit_cost,
+            "total_value": delta * unit_cost,
+        },
+    }
+    try:
+        balance = await db.stock_balance.find_one_and_update(
+            key, update, projection={"_id": 0, "id": 1, "quantity": 1},
+            upsert=True, return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # A concurrent first receipt created the row; this update now matches it
+        balance = await db.stock_balance.find_one_and_update(
+            key, update, projection={"_id": 0, "id": 1, "quantity": 1},
+            upsert=True, return_document=ReturnDocument.AFTER,
+        )
+    if balance.get("id") == balance_id:
+        # First movement for this item/warehouse: fill in the display name
+        wh = await db.warehouses.find_one({"id": warehouse_id}, {"warehouse_name": 1})
+        await db.stock_balance.update_one(
+            key, {"$set": {"warehouse_name": wh.get("warehouse_name") if wh else ""}}
+        )
+    return balance
+
+
+# ==================== BATCH POSTING ====================
+_transactions_supported: Optional[bool] = None
+
+
+async def transactions_supported(db) -> bool:
+    """Multi-document transactions need a replica set or sharded cluster"""
+    global _transactions_supported
+    if _transactions_supported is None:
+        hello = await db.client.admin.command("hello")
+        _transactions_supported = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+    return _transactions_supported
+
+
+BalanceKey = Tuple[str, str]
+
+
+async def post_stock_movements(db, movements: List[Dict[str, Any]], created_by: str) -> List[Dict[str, Any]]:
+    """
+    Post a batch of movements and return their ledger rows in input order.
+
+    Each movement is a dict with item_id, warehouse_id, quantity and
+    transaction_type, plus optional reference_type, reference_id, batch_no,
+    unit_cost and notes (the StockEntry fields).
+
+    Raises:
+        ItemNotFound / WarehouseNotFound: unknown id anywhere in the batch
+        InsufficientStock: a balance would go negative; nothing is posted
+    """
+    if not movements:
+        return []
+
+    item_ids = list({m["item_id"] for m in movements})
+    warehouse_ids = list({m["warehouse_id"] for m in movements})
+    items = {i["id"]: i for i in await db.items.find({"id": {"$in": item_ids}}, _ITEM_FIELDS).to_list(None)}
+    warehouses = {
+        w["id"]: w for w in await db.warehouses.find(
+            {"id": {"$in": warehouse_ids}}, {"_id": 0, "id": 1, "warehouse_name": 1}
+        ).to_list(None)
+    }
+    for m in movements:
+        if m["item_id"] not in items:
+            raise ItemNotFound(m["item_id"])
+        if m["warehouse_id"] not in warehouses:
+            raise WarehouseNotFound(m["warehouse_id"])
+
+    # Net delta per balance row; issues are guarded against the net outflow
+    deltas: "OrderedDict[BalanceKey, float]" = OrderedDict()
+    unit_costs: Dict[BalanceKey, float] = {}
+    for m in movements:
+        key = (m["item_id"], m["warehouse_id"])
+        delta = m["quantity"] if is_inward(m["transaction_type"]) else -m["quantity"]
+        deltas[key] = deltas.get(key, 0) + delta
+        unit_costs.setdefault(key, m.get("unit_cost") or 0)
+
+    batch = _Batch(db, movements, created_by, items, warehouses, deltas, unit_costs)
+    if await transactions_supported(db):
+        try:
+            async with await db.client.start_session() as session:
+                # with_transaction retries write conflicts from concurrent batches
+                rows = await session.with_transaction(batch.apply_in_transaction)
+        except _Shortfall:
+            raise await batch.shortfall_error()
+    else:
+        rows = await batch.apply_with_compensation()
+    await _after_posting(db, rows)
+    return rows
+
+
+class _Shortfall(Exception):
+    """Internal: a guarded balance update matched nothing"""
+
+
+class _Batch:
+    def __init__(self, db, movements, created_by, items, warehouses, deltas, unit_costs):
+        self.db = db
+        self.movements = movements
+        self.created_by = created_by
+        self.items = items
+        self.warehouses = warehouses
+        self.deltas = deltas
+        self.unit_costs = unit_costs
+        self.now = datetime.now(timezone.utc).isoformat()
+
+    @staticmethod
+    def _filter(key: BalanceKey) -> Dict[str, Any]:
+        return {"item_id": key[0], "warehouse_id": key[1]}
+
+    def _balance_update(self, key: BalanceKey, net: float):
+        """(filter, update, upsert) for one balance row's net delta"""
+        if net < 0:
+            return (
+                {**self._filter(key), "quantity": {"$gte": -net}},
+                {"$inc": _qty_inc(net), "$set": {"last_updated": self.now, "last_issue_date": self.now}},
+                False,
+            )
+        item = self.items[key[0]]
+        unit_cost = self.unit_costs[key]
+        return (
+            self._filter(key),
+            {
+                "$inc": _qty_inc(net),
+                "$set": {"last_updated": self.now, "last_receipt_date": self.now},
+                "$setOnInsert": {
+                    "id": str(uuid.uuid4()),
+                    "item_code": item.get("item_code"),
+                    "item_name": item.get("item_name"),
+                    "warehouse_name": self.warehouses[key[1]].get("warehouse_name", ""),
+                    "reserved_qty": 0,
+                    "uom": item.get("uom"),
+                    "avg_cost": unit_cost,
+                    "total_value": net * unit_cost,
+                },
+            },
+            True,
+        )
+
+    def _balance_op(self, key: BalanceKey, net: float) -> UpdateOne:
+        filter_, update, upsert = self._balance_update(key, net)
+        return UpdateOne(filter_, update, upsert=upsert)
+
+    async def _read_balances(self, keys, session=None) -> Dict[BalanceKey, float]:
+        rows = await self.db.stock_balance.find(
+            {"$or": [self._filter(key) for key in keys]},
+            {"_id": 0, "item_id": 1, "warehouse_id": 1, "quantity": 1},
+            session=session,
+        ).to_list(None)
+        return {(r["item_id"], r["warehouse_id"]): r.get("quantity", 0) for r in rows}
+
+    def _ledger_rows(self, after: Dict[BalanceKey, float]) -> List[Dict[str, Any]]:
+        """Replay the batch from each balance's opening quantity to get running balance_qty"""
+        running = {key: after.get(key, 0) - net for key, net in self.deltas.items()}
+        rows = []
+        for m in self.movements:
+            key = (m["item_id"], m["warehouse_id"])
+            inward = is_inward(m["transaction_type"])
+            running[key] += m["quantity"] if inward else -m["quantity"]
+            rows.append({
+                "id": str(uuid.uuid4()),
+                "item_id": m["item_id"],
+                "warehouse_id": m["warehouse_id"],
+                "transaction_date": self.now,
+                "transaction_type": m["transaction_type"],
+                "reference_type": m.get("reference_type"),
+                "reference_id": m.get("reference_id"),
+                "in_qty": m["quantity"] if inward else 0,
+                "out_qty": 0 if inward else m["quantity"],
+                "balance_qty": running[key],
+                "unit_cost": m.get("unit_cost") or 0,
+                "batch_no": m.get("batch_no"),
+                "notes": m.get("notes"),
+                "created_by": self.created_by
+            })
+        return rows
+
+    def _item_ops(self) -> List[UpdateOne]:
+        per_item: Dict[str, float] = {}
+        for (item_id, _), net in self.deltas.items():
+            per_item[item_id] = per_item.get(item_id, 0) + net
+        return [UpdateOne({"id": item_id}, {"$inc": {"current_stock": net}})
+                for item_id, net in per_item.items() if net]
+
+    async def _insert_ledger(self, rows, session=None):
+        await self.db.stock_ledger.insert_many(rows, session=session)
+        for row in rows:
+            row.pop("_id", None)
+
+    async def apply_in_transaction(self, session) -> List[Dict[str, Any]]:
+        ops = [self._balance_op(key, net) for key, net in self.deltas.items()]
+        result = await self.db.stock_balance.bulk_write(ops, ordered=False, session=session)
+        if result.matched_count + result.upserted_count < len(ops):
+            raise _Shortfall()
+
+        rows = self._ledger_rows(await self._read_balances(self.deltas, session))
+        await self._insert_ledger(rows, session)
+        item_ops = self._item_ops()
+        if item_ops:
+            await self.db.items.bulk_write(item_ops, ordered=False, session=session)
+        return rows
+
+    async def shortfall_error(self) -> InsufficientStock:
+        """After the transaction aborted: name the first balance that cannot cover its outflow"""
+        current = await self._read_balances(self.deltas)
+        for key, net in self.deltas.items():
+            if net < 0 and current.get(key, 0) < -net:
+                return InsufficientStock(key[0], key[1], -net)
+        key = next(k for k, net in self.deltas.items() if net < 0)
+        return InsufficientStock(key[0], key[1], -self.deltas[key])
+
+    async def apply_with_compensation(self) -> List[Dict[str, Any]]:
+        applied: Dict[BalanceKey, float] = {}
+        after: Dict[BalanceKey, float] = {}
+        try:
+            # Guarded outflows one key at a time so a shortfall is attributable
+            for key, net in self.deltas.items():
+                if net >= 0:
+                    continue
+                filter_, update, _ = self._balance_update(key, net)
+                doc = await self.db.stock_balance.find_one_and_update(
+                    filter_, update, projection={"_id": 0, "quantity": 1},
+                    return_document=ReturnDocument.AFTER,
+                )
+                if doc is None:
+                    raise InsufficientStock(key[0], key[1], -net)
+                applied[key] = net
+                after[key] = doc["quantity"]
+
+            inflows = [(key, net) for key, net in self.deltas.items() if net >= 0]
+            if inflows:
+                await self._bulk_upsert([self._balance_op(key, net) for key, net in inflows])
+                applied.update(inflows)
+                after.update(await self._read_balances([key for key, _ in inflows]))
+
+            rows = self._ledger_rows(after)
+            await self._insert_ledger(rows)
+        except Exception:
+            if applied:
+                await self.db.stock_balance.bulk_write([
+                    UpdateOne(self._filter(key), {"$inc": _qty_inc(-net)}) for key, net in applied.items()
+                ], ordered=False)
+            raise
+
+        item_ops = self._item_ops()
+        if item_ops:
+            await self.db.items.bulk_write(item_ops, ordered=False)
+        return rows
+
+    async def _bulk_upsert(self, ops: List[UpdateOne]) -> None:
+        try:
+            await self.db.stock_balance.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # Concurrent first receipts race on the unique (item, warehouse) index;
+            # the losing upserts now match the existing row, so replay just those
+            errors = e.details.get("writeErrors", [])
+            if not errors or any(err.get("code") != 11000 for err in errors):
+                raise
+            await self.db.stock_balance.bulk_write([ops[err["index"]] for err in errors], ordered=False)
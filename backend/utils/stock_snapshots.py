@@ -0,0 +1,316 @@
+"""
+Stock Balance Snapshots
+Per item x warehouse balance checkpoints for as-of-date stock queries
+
+A snapshot for date D holds, for every item/warehouse that ever moved, the
+closing quantity at the end of D (UTC) plus that period's in/out totals. It
+is built server-side in one aggregation:
+
+    ledger rows after the previous snapshot, up to end of D   ($match/$group)
+    + previous snapshot's closing quantities                   ($unionWith)
+    -> closing quantity per item/warehouse                     ($merge into stock_snapshots)
+
+An as-of query then reads the nearest snapshot at or before the date and
+adds only the ledger delta since it, instead of replaying the whole ledger.
+
+Snapshots are written by a background task once a day (for every completed
+day, or only month-ends with STOCK_SNAPSHOT_FREQUENCY=monthly). Daily
+checkpoints older than STOCK_SNAPSHOT_RETENTION_DAYS are pruned; month-end
+checkpoints are kept for audit.
+
+A day is only checkpointed once STOCK_SNAPSHOT_SETTLE_SECONDS have passed
+after its end: ledger rows are stamped before they are written, so a movement
+posted at 23:59:59 can land a moment after midnight.
+
+Each snapshot is built on the one before it, so rebuilding a past snapshot
+(rebuild_snapshots) also rebuilds every later one, in date order.
+
+Configuration:
+    STOCK_SNAPSHOTS_ENABLED         default true
+    STOCK_SNAPSHOT_FREQUENCY        daily | monthly (default daily)
+    STOCK_SNAPSHOT_RETENTION_DAYS   default 62
+    STOCK_SNAPSHOT_SETTLE_SECONDS   default 300
+"""
+
+import asyncio
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOTS = "stock_snapshots"
+RUNS = "stock_snapshot_runs"
+DATE_FORMAT = "%Y-%m-%d"
+
+# A run stuck in "running" this long (worker died mid-build) may be retried
+STALE_RUN = timedelta(hours=1)
+
+# Wait this long after a day ends before checkpointing it
+SETTLE = timedelta(seconds=float(os.environ.get('STOCK_SNAPSHOT_SETTLE_SECONDS', 300)))
+
+
+def parse_date(value: str) -> date:
+    return datetime.strptime(value, DATE_FORMAT).date()
+
+
+def _day(d: date) -> str:
+    return d.strftime(DATE_FORMAT)
+
+
+def is_month_end(d: date) -> bool:
+    return (d + timedelta(days=1)).day == 1
+
+
+def last_settled_day(now: Optional[datetime] = None) -> date:
+    """Latest day whose ledger is complete: it ended at least SETTLE ago"""
+    now = now or datetime.now(timezone.utc)
+    return (now - SETTLE).date() - timedelta(days=1)
+
+
+def _ledger_window(after: Optional[str], through: str) -> Dict[str, Any]:
+    """
+    transaction_date filter for ledger rows after snapshot `after` up to the
+    end of `through`. ISO timestamps compare correctly against a bare date:
+    "2025-01-31T23:59:59+00:00" < "2025-02-01" <= "2025-02-01T00:00:00+00:00"
+    """
+    window = {"$lt": _day(parse_date(through) + timedelta(days=1))}
+    if after:
+        window["$gte"] = _day(parse_date(after) + timedelta(days=1))
+    return window
+
+
+def _balance_pipeline(match: Dict[str, Any], after: Optional[str], through: str) -> List[Dict[str, Any]]:
+    """Closing quantity per item/warehouse = snapshot `after` + ledger delta through `through`"""
+    pipeline: List[Dict[str, Any]] = [
+        {"$match": {**match, "transaction_date": _ledger_window(after, through)}},
+        {"$group": {
+            "_id": {"item_id": "$item_id", "warehouse_id": "$warehouse_id"},
+            "in_qty": {"$sum": {"$ifNull": ["$in_qty", 0]}},
+            "out_qty": {"$sum": {"$ifNull": ["$out_qty", 0]}},
+            "movements": {"$sum": 1},
+        }},
+        {"$project": {
+            "_id": 0, "item_id": "$_id.item_id", "warehouse_id": "$_id.warehouse_id",
+            "opening": {"$literal": 0}, "in_qty": 1, "out_qty": 1, "movements": 1,
+        }},
+    ]
+    if after:
+        pipeline.append({"$unionWith": {"coll": SNAPSHOTS, "pipeline": [
+            {"$match": {**match, "snapshot_date": after}},
+            {"$project": {
+                "_id": 0, "item_id": 1, "warehouse_id": 1, "opening": "$quantity",
+                "in_qty": {"$literal": 0}, "out_qty": {"$literal": 0}, "movements": {"$literal": 0},
+            }},
+        ]}})
+    pipeline += [
+        {"$group": {
+            "_id": {"item_id": "$item_id", "warehouse_id": "$warehouse_id"},
+            "opening": {"$sum": "$opening"},
+            "in_qty": {"$sum": "$in_qty"},
+            "out_qty": {"$sum": "$out_qty"},
+            "movements": {"$sum": "$movements"},
+        }},
+        {"$project": {
+            "_id": 0,
+            "item_id": "$_id.item_id",
+            "warehouse_id": "$_id.warehouse_id",
+            "opening": 1,
+            "in_qty": 1,
+            "out_qty": 1,
+            "movements": 1,
+            "quantity": {"$subtract": [{"$add": ["$opening", "$in_qty"]}, "$out_qty"]},
+        }},
+    ]
+    return pipeline
+
+
+async def latest_snapshot_date(db, on_or_before: str) -> Optional[str]:
+    run = await db[RUNS].find_one(
+        {"status": "completed", "snapshot_date": {"$lte": on_or_before}},
+        {"_id": 0, "snapshot_date": 1},
+        sort=[("snapshot_date", -1)],
+    )
+    return run["snapshot_date"] if run else None
+
+
+async def _claim_run(db, snapshot_date: str, force: bool) -> bool:
+    now = datetime.now(timezone.utc)
+    claim = {"status": "running", "started_at": now.isoformat(), "completed_at": None, "error": None}
+    try:
+        await db[RUNS].insert_one({"snapshot_date": snapshot_date, **claim})
+        return True
+    except DuplicateKeyError:
+        pass
+    retryable: Dict[str, Any] = {"snapshot_date": snapshot_date, "$or": [
+        {"status": "failed"},
+        {"status": "running", "started_at": {"$lt": (now - STALE_RUN).isoformat()}},
+    ]}
+    if force:
+        retryable["$or"].append({"status": "completed"})
+    result = await db[RUNS].update_one(retryable, {"$set": claim})
+    return result.modified_count == 1
+
+
+async def build_snapshot(db, snapshot_date: str, force: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Write the checkpoint for the end of snapshot_date.
+
+    Returns the run record, or None if another worker already built (or is
+    building) it. force=True rebuilds a completed snapshot but not the ones
+    after it; use rebuild_snapshots() for that.
+    """
+    if not await _claim_run(db, snapshot_date, force):
+        return None
+
+    d = parse_date(snapshot_date)
+    previous = await latest_snapshot_date(db, _day(d - timedelta(days=1)))
+    now = datetime.now(timezone.utc).isoformat()
+    pipeline = _balance_pipeline({}, previous, snapshot_date) + [
+        {"$addFields": {
+            "snapshot_date": snapshot_date,
+            "is_month_end": is_month_end(d),
+            "previous_snapshot": previous,
+            "created_at": now,
+        }},
+        {"$merge": {
+            "into": SNAPSHOTS,
+            "on": ["snapshot_date", "item_id", "warehouse_id"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert",
+        }},
+    ]
+    try:
+        # $merge needs a unique index on its "on" fields
+        await db[SNAPSHOTS].create_index(
+            [("snapshot_date", 1), ("item_id", 1), ("warehouse_id", 1)], unique=True
+        )
+        await db.stock_ledger.aggregate(pipeline).to_list(None)
+        rows = await db[SNAPSHOTS].count_documents({"snapshot_date": snapshot_date})
+    except Exception as e:
+        await db[RUNS].update_one({"snapshot_date": snapshot_date},
+                                  {"$set": {"status": "failed", "error": str(e)}})
+        raise
+
+    update = {
+        "status": "completed",
+        "completed_at": datetime.now(timezone.utc).isoformat(),
+        "previous_snapshot": previous,
+        "is_month_end": is_month_end(d),
+        "rows": rows,
+    }
+    await db[RUNS].update_one({"snapshot_date": snapshot_date}, {"$set": update})
+    return {"snapshot_date": snapshot_date, **update}
+
+
+async def rebuild_snapshots(db, snapshot_date: str) -> List[Dict[str, Any]]:
+    """
+    Force-rebuild snapshot_date, then every later completed snapshot in date
+    order, since each one carries the previous one's closing quantities.
+
+    Returns the runs rebuilt, or [] if snapshot_date itself is being built by
+    another worker; a later snapshot another worker is building is skipped.
+    """
+    first = await build_snapshot(db, snapshot_date, force=True)
+    if first is None:
+        return []
+    later = await db[RUNS].find(
+        {"status": "completed", "snapshot_date": {"$gt": snapshot_date}}, {"_id": 0, "snapshot_date": 1}
+    ).sort("snapshot_date", 1).to_list(None)
+    runs = [first]
+    for run in later:
+        rebuilt = await build_snapshot(db, run["snapshot_date"], force=True)
+        if rebuilt:
+            runs.append(rebuilt)
+    return runs
+
+
+def stock_as_of_pipeline(snapshot_date: Optional[str], as_of: str,
+                         item_id: Optional[str] = None, warehouse_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    match: Dict[str, Any] = {}
+    if item_id:
+        match["item_id"] = item_id
+    if warehouse_id:
+        match["warehouse_id"] = warehouse_id
+    return _balance_pipeline(match, snapshot_date, as_of) + [
+        {"$sort": {"item_id": 1, "warehouse_id": 1}},
+    ]
+
+
+class StockSnapshotScheduler:
+    """Background task that checkpoints every completed day (or month)"""
+
+    def __init__(self):
+        self.enabled = os.environ.get('STOCK_SNAPSHOTS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+        self.frequency = os.environ.get('STOCK_SNAPSHOT_FREQUENCY', 'daily').lower()
+        self.retention_days = int(os.environ.get('STOCK_SNAPSHOT_RETENTION_DAYS', 62))
+        self.check_interval = 3600.0
+        self._task: Optional[asyncio.Task] = None
+        self._db = None
+
+    async def start(self, db) -> None:
+        if not self.enabled:
+            return
+        self._db = db
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Stock snapshot run failed: {e}")
+            await asyncio.sleep(self.check_interval)
+
+    def due_dates(self, last: Optional[str], today: date) -> List[str]:
+        """
+        Completed days after the last snapshot. The first run only checkpoints
+        yesterday (or the most recent month-end) rather than back-filling history.
+        """
+        yesterday = today - timedelta(days=1)
+        if last:
+            start = parse_date(last) + timedelta(days=1)
+        elif self.frequency == "monthly":
+            start = today.replace(day=1) - timedelta(days=1)
+        else:
+            start = yesterday
+        days = []
+        d = start
+        while d <= yesterday:
+            if self.frequency != "monthly" or is_month_end(d):
+                days.append(_day(d))
+            d += timedelta(days=1)
+        return days
+
+    async def run_due(self) -> List[Dict[str, Any]]:
+        db = self._db
+        today = datetime.now(timezone.utc).date()
+        last = await latest_snapshot_date(db, _day(today))
+        built = []
+        # due_dates() stops the day before the date it is given
+        for snapshot_date in self.due_dates(last, last_settled_day() + timedelta(days=1)):
+            run = await build_snapshot(db, snapshot_date)
+            if run:
+                built.append(run)
+        if built:
+            await self.prune(today)
+        return built
+
+    async def prune(self, today: date) -> None:
+        cutoff = _day(today - timedelta(days=self.retention_days))
+        old_daily = {"snapshot_date": {"$lt": cutoff}, "is_month_end": False}
+        await self._db[SNAPSHOTS].delete_many(old_daily)
+        await self._db[RUNS].delete_many(old_daily)
+
+
+stock_snapshot_scheduler = StockSnapshotScheduler()
@@ -0,0 +1,113 @@
+"""
+Streaming Responses
+Send large Mongo result sets row by row instead of building a list first
+
+A route opts in by calling wants_stream() and returning stream_rows() with a
+Motor cursor (or any async iterator of dicts). Rows are serialized and
+flushed as the cursor yields them, so worker memory stays flat regardless of
+how many documents match.
+
+Two wire formats:
+- NDJSON (`Accept: application/x-ndjson`): one JSON object per line
+- JSON array (`?stream=1`): a regular `[...]` body, written incrementally
+
+    @router.get("/things")
+    async def get_things(request: Request, stream: bool = False, ...):
+        cursor = db.things.find(query, {"_id": 0}).batch_size(STREAM_BATCH_SIZE)
+        if wants_stream(request, stream):
+            return stream_rows(request, cursor)
+        ...
+"""
+
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from utils.fast_json import dumps
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = 500
+
+# Rows are buffered into chunks of roughly this size before being written
+_CHUNK_BYTES = 64 * 1024
+
+Transform = Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def wants_stream(request: Request, stream: bool = False) -> bool:
+    """True when the client asked for ?stream=1 or an NDJSON body"""
+    return stream or wants_ndjson(request)
+
+
+async def _rows(source, transform: Optional[Transform]) -> AsyncIterator[Dict[str, Any]]:
+    async for row in source:
+        if transform is not None:
+            row = transform(row)
+            if row is None:
+                continue
+        yield row
+
+
+async def iter_ndjson(source, transform: Optional[Transform] = None,
+                      trailer: Optional[Callable[[], Iterable[Dict[str, Any]]]] = None) -> AsyncIterator[bytes]:
+    buf, size = [], 0
+    async for row in _rows(source, transform):
+        line = dumps(row) + b"\n"
+        buf.append(line)
+        size += len(line)
+        if size >= _CHUNK_BYTES:
+            yield b"".join(buf)
+            buf, size = [], 0
+    if trailer is not None:
+        buf.extend(dumps(row) + b"\n" for row in trailer())
+    if buf:
+        yield b"".join(buf)
+
+
+async def iter_json_array(source, transform: Optional[Transform] = None,
+                          trailer: Optional[Callable[[], Iterable[Dict[str, Any]]]] = None) -> AsyncIterator[bytes]:
+    buf, size = [b"["], 1
+    first = True
+    async for row in _rows(source, transform):
+        item = (b"" if first else b",") + dumps(row)
+        first = False
+        buf.append(item)
+        size += len(item)
+        if size >= _CHUNK_BYTES:
+            yield b"".join(buf)
+            buf, size = [], 0
+    if trailer is not None:
+        for row in trailer():
+            buf.append((b"" if first else b",") + dumps(row))
+            first = False
+    buf.append(b"]")
+    yield b"".join(buf)
+
+
+def stream_rows(request: Request, source, transform: Optional[Transform] = None,
+                trailer: Optional[Callable[[], Iterable[Dict[str, Any]]]] = None,
+                filename: Optional[str] = None) -> StreamingResponse:
+    """
+    Stream rows from an async iterator (usually a Motor cursor).
+
+    Args:
+        transform: optional per-row mapping; returning None drops the row
+        trailer: optional callable evaluated after the last row, yielding
+            extra rows such as totals accumulated by transform
+        filename: sets Content-Disposition so browsers save the export
+    """
+    if wants_ndjson(request):
+        body, media_type = iter_ndjson(source, transform, trailer), NDJSON_MEDIA_TYPE
+    else:
+        body, media_type = iter_json_array(source, transform, trailer), "application/json"
+
+    headers = {}
+    if filename:
+        ext = "ndjson" if media_type == NDJSON_MEDIA_TYPE else "json"
+        headers["Content-Disposition"] = f'attachment; filename="{filename}.{ext}"'
+    return StreamingResponse(body, media_type=media_type, headers=headers)
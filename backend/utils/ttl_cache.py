@@ -0,0 +1,54 @@
+"""
+Counted TTL Cache
+Bounded TTL/LRU cache with hit/miss/invalidation counters
+
+Shared by the per-worker caches (user_cache, barcode_cache) so they report
+the same stats under /api/system. Dict values are copied on the way in and
+out, so callers can't mutate a cached document.
+"""
+
+from typing import Any, Dict, Hashable, Optional
+
+from cachetools import TTLCache
+
+
+class CountedTTLCache:
+    """TTL cache (LRU eviction when full) with hit/miss counters"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self._cache.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(value) if isinstance(value, dict) else value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._cache[key] = dict(value) if isinstance(value, dict) else value
+
+    def invalidate(self, *keys: Hashable) -> None:
+        for key in keys:
+            if self._cache.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        self.invalidations += len(self._cache)
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+            "ttl_seconds": self._cache.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,22 @@
+"""
+Authenticated User Cache
+Bounded TTL/LRU cache of user documents keyed by user id
+
+get_current_user() in server.py resolves the JWT's user_id through this cache
+instead of hitting db.users on every request. Endpoints that change a user
+(role, access level, permissions, deletion) must call
+user_cache.invalidate(user_id).
+
+The cache is per worker process. Invalidation only reaches the worker that
+handled the change; other workers pick it up when the TTL expires, so keep
+USER_CACHE_TTL_SECONDS short.
+"""
+
+import os
+
+from utils.ttl_cache import CountedTTLCache
+
+user_cache = CountedTTLCache(
+    maxsize=int(os.environ.get('USER_CACHE_SIZE', 2048)),
+    ttl=float(os.environ.get('USER_CACHE_TTL_SECONDS', 60))
+)